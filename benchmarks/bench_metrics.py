@@ -0,0 +1,58 @@
+"""Measure the per-request overhead of the Prometheus instrumentation.
+
+Usage::
+
+    python -m benchmarks.bench_metrics --requests 5000
+
+``GET /players/<id>`` and ``GET /health`` are timed with ``METRICS_ENABLED``
+on and off against the same SQLite database, with the player cache disabled
+so that every read executes SQL (and therefore the engine event listeners).
+"""
+
+import argparse
+import os
+import time
+
+from .common import AUTH_HEADERS, make_app, reset_database, temp_sqlite_url
+
+
+def measure(database_url: str, path: str, enabled: bool, requests: int) -> float:
+    """Return the mean wall time per request in microseconds."""
+
+    app = make_app(database_url, METRICS_ENABLED=enabled, PLAYER_CACHE_LOCAL_SIZE=0)
+    client = app.test_client()
+
+    for _ in range(100):
+        client.get(path, headers=AUTH_HEADERS)
+
+    started = time.perf_counter()
+    for _ in range(requests):
+        client.get(path, headers=AUTH_HEADERS)
+    return (time.perf_counter() - started) / requests * 1e6
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=5_000)
+    parser.add_argument("--rounds", type=int, default=3)
+    args = parser.parse_args()
+
+    database_url = temp_sqlite_url()
+    reset_database(make_app(database_url), players=10)
+
+    for path in ("/health", "/players/1"):
+        # Interleave the runs and keep the best of each to damp machine noise.
+        off = on = float("inf")
+        for _ in range(args.rounds):
+            off = min(off, measure(database_url, path, False, args.requests))
+            on = min(on, measure(database_url, path, True, args.requests))
+        print(
+            f"{path:<12} metrics off {off:7.1f} us/req, on {on:7.1f} us/req "
+            f"({on - off:+.1f} us, {(on - off) / off:+.1%})"
+        )
+
+    os.unlink(database_url[len("sqlite:///") :])
+
+
+if __name__ == "__main__":
+    main()
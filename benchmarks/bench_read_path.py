@@ -0,0 +1,78 @@
+"""Compare the ORM and ORM-free read paths of ``GET /players/<id>``.
+
+Usage::
+
+    python -m benchmarks.bench_read_path --requests 5000
+
+Each path is measured twice: with the player cache disabled (every request
+loads from the database) and with warm local cache hits (only envelope
+encoding differs).
+"""
+
+import argparse
+import os
+import tempfile
+import time
+
+from src.extensions import db
+from src.main import create_app
+from src.models import Player, PlayerStats
+
+TOKEN = "bench-token"
+
+
+def measure(fast_reads: bool, cached: bool, database_url: str, requests: int) -> float:
+    """Return the mean wall time per request in microseconds."""
+
+    app = create_app(
+        {
+            "SQLALCHEMY_DATABASE_URI": database_url,
+            "API_AUTH_TOKEN": TOKEN,
+            "REDIS_URL": None,
+            "PLAYER_CACHE_LOCAL_SIZE": 1024 if cached else 0,
+            "PLAYER_CACHE_LOCAL_TTL": 3600,
+            "PLAYER_FAST_READS": fast_reads,
+        }
+    )
+    client = app.test_client()
+    headers = {"Authorization": f"Bearer {TOKEN}"}
+
+    for _ in range(100):
+        client.get("/players/1", headers=headers)
+
+    started = time.perf_counter()
+    for _ in range(requests):
+        client.get("/players/1", headers=headers)
+    return (time.perf_counter() - started) / requests * 1e6
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=5_000)
+    args = parser.parse_args()
+
+    handle, path = tempfile.mkstemp(suffix=".db")
+    os.close(handle)
+    database_url = f"sqlite:///{path}"
+    app = create_app({"SQLALCHEMY_DATABASE_URI": database_url, "REDIS_URL": None})
+    with app.app_context():
+        db.create_all()
+        player = Player(user_id="bench", name="Benchmark", level=7, xp=123)
+        player.stats = PlayerStats()
+        db.session.add(player)
+        db.session.commit()
+
+    for cached in (False, True):
+        orm = measure(False, cached, database_url, args.requests)
+        fast = measure(True, cached, database_url, args.requests)
+        label = "cache hit " if cached else "cache miss"
+        print(
+            f"{label}: orm+jsonify {orm:7.1f} us/req, core+snapshot+fast json "
+            f"{fast:7.1f} us/req ({(orm - fast) / orm:+.0%} saved)"
+        )
+
+    os.unlink(path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""Compare response size and CPU cost of each wire format and encoding.
+
+Usage::
+
+    python -m benchmarks.bench_wire_formats --requests 500
+
+``GET /players?limit=500``, ``POST /players:batchGet`` with 100 ids and
+``GET /players/<id>`` are requested as JSON and MessagePack, uncompressed,
+gzip and brotli. Sizes are the bytes on the wire (after compression); CPU is
+process time per request, so the columns of one endpoint differ only by
+encoding and compression cost.
+"""
+
+import argparse
+import os
+import time
+
+from .common import AUTH_HEADERS, make_app, reset_database, temp_sqlite_url
+
+FORMATS = {"json": "application/json", "msgpack": "application/msgpack"}
+ENCODINGS = ("identity", "gzip", "br")
+
+
+def measure(client, method: str, path: str, body, headers, requests: int):
+    """Return the response size in bytes and the CPU microseconds per request."""
+
+    send = getattr(client, method)
+    for _ in range(20):
+        response = send(path, json=body, headers=headers)
+    assert response.status_code == 200, response.status_code
+
+    started = time.process_time()
+    for _ in range(requests):
+        send(path, json=body, headers=headers)
+    return len(response.data), (time.process_time() - started) / requests * 1e6
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--players", type=int, default=1000)
+    args = parser.parse_args()
+
+    database_url = temp_sqlite_url()
+    reset_database(make_app(database_url), players=args.players)
+    app = make_app(
+        database_url,
+        METRICS_ENABLED=False,
+        PLAYER_CACHE_LOCAL_TTL=3600,
+        PLAYER_LIST_MAX_LIMIT=500,
+    )
+    client = app.test_client()
+
+    endpoints = (
+        ("list 500", "get", "/players?limit=500", None),
+        ("batch 100", "post", "/players:batchGet", {"ids": list(range(1, 101))}),
+        ("single", "get", "/players/1", None),
+    )
+    for label, method, path, body in endpoints:
+        baseline = None
+        for fmt, mimetype in FORMATS.items():
+            for coding in ENCODINGS:
+                headers = {
+                    **AUTH_HEADERS,
+                    "Accept": mimetype,
+                    "Accept-Encoding": coding,
+                }
+                size, cpu = measure(client, method, path, body, headers, args.requests)
+                baseline = baseline or size
+                print(
+                    f"{label:<10} {fmt:<8} {coding:<9} {size:8d} B "
+                    f"({size / baseline:6.1%}) {cpu:8.1f} us CPU/req"
+                )
+        print()
+
+    os.unlink(database_url[len("sqlite:///") :])
+
+
+if __name__ == "__main__":
+    main()
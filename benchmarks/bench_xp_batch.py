@@ -0,0 +1,66 @@
+"""Measure ``POST /players/xp:batch`` throughput in players per second.
+
+Usage::
+
+    python -m benchmarks.bench_xp_batch --players 100000
+    python -m benchmarks.bench_xp_batch --database-url postgresql://...
+
+The target database is dropped and recreated, so never point this at a
+database holding real data.
+"""
+
+import argparse
+import os
+import random
+import time
+
+from .common import AUTH_HEADERS, make_app, reset_database, temp_sqlite_url
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--players", type=int, default=50_000)
+    parser.add_argument("--batch-size", type=int, default=10_000)
+    parser.add_argument("--chunk-size", type=int, default=1_000)
+    parser.add_argument("--max-amount", type=int, default=5_000)
+    parser.add_argument("--database-url", default=os.getenv("BENCH_DATABASE_URL"))
+    args = parser.parse_args()
+
+    database_url = args.database_url or temp_sqlite_url()
+    app = make_app(
+        database_url,
+        XP_BATCH_MAX_SIZE=args.batch_size,
+        XP_BATCH_CHUNK_SIZE=args.chunk_size,
+    )
+    reset_database(app, args.players)
+
+    rng = random.Random(42)
+    player_ids = list(range(1, args.players + 1))
+    rng.shuffle(player_ids)
+    batches = [
+        [
+            {"player_id": player_id, "amount": rng.randint(0, args.max_amount)}
+            for player_id in player_ids[start : start + args.batch_size]
+        ]
+        for start in range(0, len(player_ids), args.batch_size)
+    ]
+
+    client = app.test_client()
+    started = time.perf_counter()
+    for awards in batches:
+        response = client.post(
+            "/players/xp:batch", json={"awards": awards}, headers=AUTH_HEADERS
+        )
+        assert response.status_code == 200, response.get_json()
+    elapsed = time.perf_counter() - started
+
+    dialect = database_url.split(":", 1)[0]
+    print(
+        f"{dialect}: {args.players} players in {len(batches)} batches "
+        f"({args.batch_size}/batch, {args.chunk_size}/chunk): "
+        f"{elapsed:.2f}s, {args.players / elapsed:,.0f} players/s"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""Helpers shared by the benchmark scripts."""
+
+import math
+import os
+import tempfile
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+
+from flask import Flask
+from sqlalchemy import insert
+
+from src.extensions import db
+from src.main import create_app
+from src.models import Player, PlayerStats
+
+TOKEN = "bench-token"
+AUTH_HEADERS = {"Authorization": f"Bearer {TOKEN}"}
+
+
+def temp_sqlite_url() -> str:
+    handle, path = tempfile.mkstemp(suffix=".db")
+    os.close(handle)
+    return f"sqlite:///{path}"
+
+
+def make_app(database_url: str, **overrides: Any) -> Flask:
+    """Build an application pointed at *database_url* without Redis."""
+
+    config: Dict[str, Any] = {
+        "SQLALCHEMY_DATABASE_URI": database_url,
+        "API_AUTH_TOKEN": TOKEN,
+        "REDIS_URL": None,
+    }
+    config.update(overrides)
+    return create_app(config)
+
+
+def seed_players(count: int, chunk_size: int = 10_000) -> None:
+    """Insert *count* players with default stats using executemany batches.
+
+    Player ``n`` (1-based) gets id ``n`` and user id ``bench-{n - 1}``.
+    """
+
+    for start in range(0, count, chunk_size):
+        stop = min(start + chunk_size, count)
+        db.session.execute(
+            insert(Player),
+            [
+                {
+                    "id": i + 1,
+                    "user_id": f"bench-{i}",
+                    "name": f"Bench {i}",
+                    "level": i % 50 + 1,
+                }
+                for i in range(start, stop)
+            ],
+        )
+        db.session.execute(
+            insert(PlayerStats), [{"player_id": i + 1} for i in range(start, stop)]
+        )
+    db.session.commit()
+
+
+def reset_database(app: Flask, players: int) -> None:
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        seed_players(players)
+
+
+def percentile(sorted_values: Sequence[float], fraction: float) -> float:
+    """Nearest-rank percentile of already sorted values."""
+
+    if not sorted_values:
+        return 0.0
+    rank = max(math.ceil(fraction * len(sorted_values)), 1)
+    return sorted_values[rank - 1]
+
+
+def summarize(latencies: Iterable[float], elapsed: float) -> Dict[str, float]:
+    """Return throughput and latency percentiles (milliseconds)."""
+
+    values: List[float] = sorted(latencies)
+    return {
+        "requests": len(values),
+        "throughput": len(values) / elapsed if elapsed else 0.0,
+        "p50_ms": percentile(values, 0.50) * 1000,
+        "p95_ms": percentile(values, 0.95) * 1000,
+        "p99_ms": percentile(values, 0.99) * 1000,
+    }
+
+
+def database_label(database_url: Optional[str]) -> str:
+    return (database_url or "sqlite").split(":", 1)[0].split("+", 1)[0]
@@ -0,0 +1,201 @@
+"""Concurrent load driver to expose contention on player endpoints.
+
+Usage::
+
+    # 8 threads sharing one in-process app, 200 requests each
+    python -m benchmarks.load --mode threads --concurrency 8
+
+    # 4 processes, each with its own app and connection pool
+    python -m benchmarks.load --mode processes --concurrency 4
+
+    # A running server (e.g. make serve), over HTTP
+    python -m benchmarks.load --mode http --url http://localhost:5001 \\
+        --token "$API_AUTH_TOKEN"
+
+The ``create`` scenario signs up a new user per request, which is what
+contends on the ``players.user_id`` unique index; ``mixed`` adds reads and
+renames of seeded players. Every response status is counted, so conflicts and
+server errors under contention show up next to the latency figures.
+"""
+
+import argparse
+import json
+import multiprocessing
+import random
+import threading
+import time
+import urllib.error
+import urllib.request
+from collections import Counter
+from typing import Any, Dict, List, Optional, Tuple
+
+from .common import (
+    AUTH_HEADERS,
+    make_app,
+    reset_database,
+    summarize,
+    temp_sqlite_url,
+)
+
+Result = Tuple[List[float], Counter, float]
+
+
+class _HttpResponse:
+    def __init__(self, status_code: int) -> None:
+        self.status_code = status_code
+
+
+class HttpClient:
+    """Minimal stand-in for the Flask test client over real HTTP."""
+
+    def __init__(self, base_url: str) -> None:
+        self.base_url = base_url.rstrip("/")
+
+    def open(self, method: str, path: str, json_body: Any, headers: Dict[str, str]):
+        data = None if json_body is None else json.dumps(json_body).encode()
+        request = urllib.request.Request(
+            self.base_url + path,
+            data=data,
+            method=method,
+            headers={**headers, "Content-Type": "application/json"},
+        )
+        try:
+            with urllib.request.urlopen(request, timeout=30) as response:
+                response.read()
+                return _HttpResponse(response.status)
+        except urllib.error.HTTPError as exc:
+            return _HttpResponse(exc.code)
+
+    def get(self, path, headers=None):
+        return self.open("GET", path, None, headers or {})
+
+    def post(self, path, json=None, headers=None):
+        return self.open("POST", path, json, headers or {})
+
+    def put(self, path, json=None, headers=None):
+        return self.open("PUT", path, json, headers or {})
+
+
+def _issue(client: Any, scenario: str, worker: int, i: int, rng, players: int, headers):
+    if scenario == "mixed":
+        roll = rng.random()
+        player_id = rng.randint(1, players)
+        if roll < 0.7:
+            return client.get(f"/players/{player_id}", headers=headers)
+        if roll < 0.9:
+            return client.put(
+                f"/players/{player_id}",
+                json={"name": f"Load {worker}-{i}"},
+                headers={**headers, "X-User-Id": f"bench-{player_id - 1}"},
+            )
+
+    return client.post(
+        "/players",
+        json={"name": f"Load {worker}-{i}"},
+        headers={**headers, "X-User-Id": f"load-{worker}-{i}-{rng.random():.12f}"},
+    )
+
+
+def _drive(client: Any, args: argparse.Namespace, worker: int, headers) -> Result:
+    rng = random.Random(worker)
+    latencies: List[float] = []
+    statuses: Counter = Counter()
+    driving_started = time.perf_counter()
+    for i in range(args.requests):
+        started = time.perf_counter()
+        try:
+            status = str(
+                _issue(
+                    client, args.scenario, worker, i, rng, args.players, headers
+                ).status_code
+            )
+        except Exception as exc:
+            status = type(exc).__name__
+        latencies.append(time.perf_counter() - started)
+        statuses[status] += 1
+    return latencies, statuses, time.perf_counter() - driving_started
+
+
+def _process_worker(payload: Tuple[argparse.Namespace, str, int]) -> Result:
+    args, database_url, worker = payload
+    app = make_app(database_url, PROPAGATE_EXCEPTIONS=False)
+    return _drive(app.test_client(), args, worker, AUTH_HEADERS)
+
+
+def run(args: argparse.Namespace) -> List[Result]:
+    """Run the configured load and return the per-worker results.
+
+    Each worker times its own request loop, so process start-up and app
+    creation are excluded from throughput.
+    """
+
+    if args.mode == "http":
+        headers = {"Authorization": f"Bearer {args.token}"}
+        clients = [HttpClient(args.url) for _ in range(args.concurrency)]
+    else:
+        database_url = args.database_url or temp_sqlite_url()
+        app = make_app(database_url, PROPAGATE_EXCEPTIONS=False)
+        reset_database(app, args.players)
+        headers = AUTH_HEADERS
+        clients = [app.test_client() for _ in range(args.concurrency)]
+
+    if args.mode == "processes":
+        with multiprocessing.get_context("spawn").Pool(args.concurrency) as pool:
+            results = pool.map(
+                _process_worker,
+                [(args, database_url, worker) for worker in range(args.concurrency)],
+            )
+    else:
+        results: List[Optional[Result]] = [None] * args.concurrency
+
+        def target(worker: int) -> None:
+            results[worker] = _drive(clients[worker], args, worker, headers)
+
+        threads = [
+            threading.Thread(target=target, args=(worker,))
+            for worker in range(args.concurrency)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--mode", choices=("threads", "processes", "http"))
+    parser.add_argument("--scenario", choices=("create", "mixed"), default="create")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--requests", type=int, default=200, help="per worker")
+    parser.add_argument("--players", type=int, default=10_000)
+    parser.add_argument("--database-url")
+    parser.add_argument("--url", default="http://localhost:5001")
+    parser.add_argument("--token", default="")
+    parser.set_defaults(mode="threads")
+    args = parser.parse_args()
+
+    results = run(args)
+
+    latencies: List[float] = []
+    statuses: Counter = Counter()
+    for worker_latencies, worker_statuses, _ in results:
+        latencies.extend(worker_latencies)
+        statuses.update(worker_statuses)
+    elapsed = max(worker_elapsed for _, _, worker_elapsed in results)
+
+    summary = summarize(latencies, elapsed)
+    print(
+        f"{args.mode} x{args.concurrency} {args.scenario}: "
+        f"{summary['throughput']:.1f} req/s, p50 {summary['p50_ms']:.2f} ms, "
+        f"p95 {summary['p95_ms']:.2f} ms, p99 {summary['p99_ms']:.2f} ms"
+    )
+    print(
+        "statuses: "
+        + ", ".join(f"{status}={count}" for status, count in sorted(statuses.items()))
+    )
+
+
+if __name__ == "__main__":
+    main()
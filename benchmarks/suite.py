@@ -0,0 +1,252 @@
+"""In-process endpoint benchmark suite with regression thresholds.
+
+Usage::
+
+    # Run every scenario against a temporary SQLite database
+    python -m benchmarks.suite --players 100000
+
+    # Record a baseline, then fail later runs that regress past 25%
+    python -m benchmarks.suite --save-baseline
+    python -m benchmarks.suite --threshold 0.25
+
+    # Same against a local Postgres (the database is recreated!)
+    python -m benchmarks.suite --database-url postgresql://...
+
+Each scenario issues requests through the Flask test client, so the numbers
+cover routing, auth, SQL and serialization but not the network or gunicorn.
+Use :mod:`benchmarks.load` for concurrent load.
+"""
+
+import argparse
+import json
+import platform
+import random
+import sys
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+from .common import (
+    AUTH_HEADERS,
+    database_label,
+    make_app,
+    reset_database,
+    summarize,
+    temp_sqlite_url,
+)
+
+BASELINE_DIR = Path(__file__).resolve().parent / "baselines"
+
+
+class Context:
+    """State shared by the scenarios of one run."""
+
+    def __init__(self, client: Any, players: int, seed: int = 42) -> None:
+        self.client = client
+        self.players = players
+        self.rng = random.Random(seed)
+        self.run_id = f"{time.time_ns():x}"
+
+    def player_id(self) -> int:
+        return self.rng.randint(1, self.players)
+
+    def owner_headers(self, player_id: int) -> Dict[str, str]:
+        return {**AUTH_HEADERS, "X-User-Id": f"bench-{player_id - 1}"}
+
+
+def _health(ctx: Context, i: int):
+    return ctx.client.get("/health")
+
+
+def _get_player(ctx: Context, i: int):
+    return ctx.client.get(f"/players/{ctx.player_id()}", headers=AUTH_HEADERS)
+
+
+def _create_player(ctx: Context, i: int):
+    return ctx.client.post(
+        "/players",
+        json={"name": f"New {i}"},
+        headers={**AUTH_HEADERS, "X-User-Id": f"new-{ctx.run_id}-{i}"},
+    )
+
+
+def _update_player(ctx: Context, i: int):
+    player_id = ctx.player_id()
+    return ctx.client.put(
+        f"/players/{player_id}",
+        json={"name": f"Renamed {i}"},
+        headers=ctx.owner_headers(player_id),
+    )
+
+
+def _batch_get(ctx: Context, i: int):
+    ids = [ctx.player_id() for _ in range(50)]
+    return ctx.client.post("/players:batchGet", json={"ids": ids}, headers=AUTH_HEADERS)
+
+
+def _list_players(ctx: Context, i: int):
+    cursor = ctx.rng.randint(0, max(ctx.players - 50, 0))
+    return ctx.client.get(f"/players?limit=50&cursor={cursor}", headers=AUTH_HEADERS)
+
+
+def _xp_batch(ctx: Context, i: int):
+    awards = [
+        {"player_id": ctx.player_id(), "amount": ctx.rng.randint(0, 500)}
+        for _ in range(1000)
+    ]
+    return ctx.client.post(
+        "/players/xp:batch", json={"awards": awards}, headers=AUTH_HEADERS
+    )
+
+
+def _leaderboard(ctx: Context, i: int):
+    return ctx.client.get("/leaderboard?limit=10", headers=AUTH_HEADERS)
+
+
+SCENARIOS: Dict[str, Callable[[Context, int], Any]] = {
+    "health": _health,
+    "get_player": _get_player,
+    "create_player": _create_player,
+    "update_player": _update_player,
+    "batch_get": _batch_get,
+    "list_players": _list_players,
+    "xp_batch": _xp_batch,
+    "leaderboard": _leaderboard,
+}
+
+REQUEST_SCALE = {"xp_batch": 0.05, "batch_get": 0.5}
+"""Heavier scenarios run a fraction of ``--requests``."""
+
+
+def run_scenario(
+    ctx: Context, name: str, requests: int, warmup: int
+) -> Dict[str, float]:
+    scenario = SCENARIOS[name]
+    for i in range(warmup):
+        scenario(ctx, -i - 1)
+
+    latencies: List[float] = []
+    started = time.perf_counter()
+    for i in range(requests):
+        request_started = time.perf_counter()
+        response = scenario(ctx, i)
+        latencies.append(time.perf_counter() - request_started)
+        if response.status_code >= 400:
+            raise RuntimeError(
+                f"{name}: HTTP {response.status_code} {response.get_data(as_text=True)}"
+            )
+    return summarize(latencies, time.perf_counter() - started)
+
+
+def compare(
+    results: Dict[str, Any],
+    baseline: Dict[str, Any],
+    threshold: float,
+) -> List[str]:
+    """Return one message per metric that regressed beyond *threshold*.
+
+    Throughput may drop and p95/p99 latency may grow by at most *threshold*
+    (a fraction); a baseline may override it per scenario under
+    ``"thresholds"``.
+    """
+
+    overrides = baseline.get("thresholds", {})
+    regressions = []
+    for name, current in results["scenarios"].items():
+        reference = baseline.get("scenarios", {}).get(name)
+        if reference is None:
+            continue
+
+        allowed = overrides.get(name, threshold)
+        if current["throughput"] < reference["throughput"] * (1 - allowed):
+            regressions.append(
+                f"{name}: throughput {current['throughput']:.1f} req/s < "
+                f"baseline {reference['throughput']:.1f} req/s - {allowed:.0%}"
+            )
+        for metric in ("p95_ms", "p99_ms"):
+            if current[metric] > reference[metric] * (1 + allowed):
+                regressions.append(
+                    f"{name}: {metric} {current[metric]:.2f} ms > "
+                    f"baseline {reference[metric]:.2f} ms + {allowed:.0%}"
+                )
+    return regressions
+
+
+def print_table(results: Dict[str, Any]) -> None:
+    print(f"{'scenario':<15} {'req/s':>10} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    for name, summary in results["scenarios"].items():
+        print(
+            f"{name:<15} {summary['throughput']:>10.1f} {summary['p50_ms']:>9.2f} "
+            f"{summary['p95_ms']:>9.2f} {summary['p99_ms']:>9.2f}"
+        )
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--players", type=int, default=10_000)
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--warmup", type=int, default=20)
+    parser.add_argument("--database-url")
+    parser.add_argument(
+        "--scenarios",
+        default=",".join(SCENARIOS),
+        help="Comma-separated subset of: " + ", ".join(SCENARIOS),
+    )
+    parser.add_argument("--baseline", type=Path)
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--threshold", type=float, default=0.25)
+    parser.add_argument("--output", type=Path)
+    args = parser.parse_args(argv)
+
+    names = [name for name in args.scenarios.split(",") if name]
+    unknown = set(names) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(sorted(unknown))}")
+
+    database = database_label(args.database_url)
+    baseline_path = args.baseline or BASELINE_DIR / f"{database}.json"
+
+    app = make_app(args.database_url or temp_sqlite_url())
+    reset_database(app, args.players)
+    ctx = Context(app.test_client(), args.players)
+
+    results: Dict[str, Any] = {
+        "meta": {
+            "database": database,
+            "players": args.players,
+            "requests": args.requests,
+            "python": platform.python_version(),
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+        },
+        "scenarios": {},
+    }
+    for name in names:
+        requests = max(int(args.requests * REQUEST_SCALE.get(name, 1)), 1)
+        results["scenarios"][name] = run_scenario(ctx, name, requests, args.warmup)
+
+    print_table(results)
+
+    if args.output:
+        args.output.write_text(json.dumps(results, indent=2) + "\n")
+
+    if args.save_baseline:
+        baseline_path.parent.mkdir(parents=True, exist_ok=True)
+        baseline_path.write_text(json.dumps(results, indent=2) + "\n")
+        print(f"Baseline saved to {baseline_path}")
+        return 0
+
+    if not baseline_path.exists():
+        print(f"No baseline at {baseline_path}; run with --save-baseline first.")
+        return 0
+
+    regressions = compare(
+        results, json.loads(baseline_path.read_text()), args.threshold
+    )
+    for message in regressions:
+        print(f"REGRESSION {message}")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,48 @@
+"""Configuration gunicorn du service umbra-player-service.
+
+Chargée automatiquement par ``gunicorn src.wsgi:app`` depuis la racine du
+projet. Toutes les valeurs sont surchargeables par variables d'environnement.
+"""
+
+import multiprocessing
+import os
+
+bind = f"0.0.0.0:{os.getenv('PORT', '5001')}"
+
+workers = int(os.getenv("WEB_CONCURRENCY", multiprocessing.cpu_count() * 2 + 1))
+threads = int(os.getenv("GUNICORN_THREADS", "4"))
+worker_class = "gthread" if threads > 1 else "sync"
+
+# The app (and its imports) is loaded once in the master and shared by the
+# workers copy-on-write; post_fork drops the DB connections this inherits.
+preload_app = os.getenv("GUNICORN_PRELOAD", "1") == "1"
+
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "30"))
+graceful_timeout = int(os.getenv("GUNICORN_GRACEFUL_TIMEOUT", "30"))
+keepalive = int(os.getenv("GUNICORN_KEEPALIVE", "5"))
+
+# Recycle workers periodically to bound memory growth; jitter avoids every
+# worker restarting at once.
+max_requests = int(os.getenv("GUNICORN_MAX_REQUESTS", "10000"))
+max_requests_jitter = int(os.getenv("GUNICORN_MAX_REQUESTS_JITTER", "1000"))
+
+accesslog = os.getenv("GUNICORN_ACCESS_LOG", "-")
+errorlog = "-"
+loglevel = os.getenv("LOG_LEVEL", "info").lower()
+
+
+def post_fork(server, worker):
+    """Discard database connections inherited from the preloaded master."""
+
+    from src.extensions import dispose_engines
+    from src.wsgi import app
+
+    dispose_engines(app)
+
+
+def worker_exit(server, worker):
+    """Apply the XP events still buffered by this worker before it exits."""
+
+    from src.wsgi import app
+
+    app.extensions["xp_flusher"].stop(timeout=graceful_timeout)
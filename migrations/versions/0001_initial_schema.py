@@ -0,0 +1,58 @@
+"""Initial players and player_stats schema.
+
+Revision ID: 0001_initial_schema
+Revises:
+Create Date: 2026-10-16 09:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0001_initial_schema"
+down_revision: Union[str, None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "players",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("user_id", sa.String(length=64), nullable=False),
+        sa.Column("name", sa.String(length=120), nullable=False),
+        sa.Column("level", sa.Integer(), nullable=False),
+        sa.Column("xp", sa.Integer(), nullable=False),
+        sa.CheckConstraint("level >= 1", name="ck_player_level_positive"),
+        sa.CheckConstraint("xp >= 0", name="ck_player_xp_non_negative"),
+        sa.PrimaryKeyConstraint("id"),
+        sa.UniqueConstraint("user_id"),
+    )
+    op.create_table(
+        "player_stats",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("player_id", sa.Integer(), nullable=False),
+        sa.Column("health", sa.Integer(), nullable=False),
+        sa.Column("attack", sa.Integer(), nullable=False),
+        sa.Column("defense", sa.Integer(), nullable=False),
+        sa.CheckConstraint(
+            "health >= 0", name="ck_player_stats_health_non_negative"
+        ),
+        sa.CheckConstraint(
+            "attack >= 0", name="ck_player_stats_attack_non_negative"
+        ),
+        sa.CheckConstraint(
+            "defense >= 0", name="ck_player_stats_defense_non_negative"
+        ),
+        sa.ForeignKeyConstraint(["player_id"], ["players.id"]),
+        sa.PrimaryKeyConstraint("id"),
+        sa.UniqueConstraint("player_id"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("player_stats")
+    op.drop_table("players")
@@ -0,0 +1,33 @@
+"""Index players in leaderboard order.
+
+Supports ``ORDER BY level DESC, xp DESC, id`` scans used to rebuild the
+leaderboard and to page through it straight from the database.
+
+Revision ID: 0002_leaderboard_index
+Revises: 0001_initial_schema
+Create Date: 2026-10-16 10:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0002_leaderboard_index"
+down_revision: Union[str, None] = "0001_initial_schema"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index(
+        "ix_players_leaderboard",
+        "players",
+        [sa.text("level DESC"), sa.text("xp DESC"), "id"],
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_players_leaderboard", table_name="players")
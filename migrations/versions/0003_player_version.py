@@ -0,0 +1,30 @@
+"""Add the optimistic concurrency version to players.
+
+Revision ID: 0003_player_version
+Revises: 0002_leaderboard_index
+Create Date: 2026-10-16 11:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0003_player_version"
+down_revision: Union[str, None] = "0002_leaderboard_index"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    with op.batch_alter_table("players") as batch_op:
+        batch_op.add_column(
+            sa.Column("version", sa.Integer(), nullable=False, server_default="1")
+        )
+
+
+def downgrade() -> None:
+    with op.batch_alter_table("players") as batch_op:
+        batch_op.drop_column("version")
@@ -0,0 +1,36 @@
+"""Add receipts of applied XP events for redelivery deduplication.
+
+Revision ID: 0004_xp_event_receipts
+Revises: 0003_player_version
+Create Date: 2026-10-16 14:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0004_xp_event_receipts"
+down_revision: Union[str, None] = "0003_player_version"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "xp_event_receipts",
+        sa.Column("event_id", sa.String(length=64), nullable=False),
+        sa.Column("player_id", sa.Integer(), nullable=False),
+        sa.Column("applied_at", sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint("event_id"),
+    )
+    op.create_index(
+        "ix_xp_event_receipts_applied_at", "xp_event_receipts", ["applied_at"]
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_xp_event_receipts_applied_at", table_name="xp_event_receipts")
+    op.drop_table("xp_event_receipts")
@@ -0,0 +1,65 @@
+"""Add the case-folded player name and its prefix search index.
+
+Revision ID: 0005_player_name_folded
+Revises: 0004_xp_event_receipts
+Create Date: 2026-10-16 16:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0005_player_name_folded"
+down_revision: Union[str, None] = "0004_xp_event_receipts"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+BATCH_SIZE = 10_000
+
+FOLDED_NAME_TYPE = sa.String(length=120).with_variant(
+    postgresql.VARCHAR(length=120, collation="C"), "postgresql"
+)
+
+
+def upgrade() -> None:
+    with op.batch_alter_table("players") as batch_op:
+        batch_op.add_column(sa.Column("name_folded", FOLDED_NAME_TYPE, nullable=True))
+
+    # str.casefold() has no SQL equivalent; backfill from Python in id order.
+    players = sa.table(
+        "players", sa.column("id"), sa.column("name"), sa.column("name_folded")
+    )
+    connection = op.get_bind()
+    last_id = 0
+    while True:
+        rows = connection.execute(
+            sa.select(players.c.id, players.c.name)
+            .where(players.c.id > last_id)
+            .order_by(players.c.id)
+            .limit(BATCH_SIZE)
+        ).all()
+        if not rows:
+            break
+        connection.execute(
+            players.update()
+            .where(players.c.id == sa.bindparam("player_id"))
+            .values(name_folded=sa.bindparam("folded")),
+            [{"player_id": row.id, "folded": row.name.casefold()} for row in rows],
+        )
+        last_id = rows[-1].id
+
+    with op.batch_alter_table("players") as batch_op:
+        batch_op.alter_column(
+            "name_folded", existing_type=FOLDED_NAME_TYPE, nullable=False
+        )
+    op.create_index("ix_players_name_folded", "players", ["name_folded", "id"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_players_name_folded", table_name="players")
+    with op.batch_alter_table("players") as batch_op:
+        batch_op.drop_column("name_folded")
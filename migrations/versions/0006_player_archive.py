@@ -0,0 +1,59 @@
+"""Track when players were last seen and add the archive of removed players.
+
+Revision ID: 0006_player_archive
+Revises: 0005_player_name_folded
+Create Date: 2026-10-17 10:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0006_player_archive"
+down_revision: Union[str, None] = "0005_player_name_folded"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Existing players count as seen now. CURRENT_TIMESTAMP is stable, so
+    # PostgreSQL stores it as the column default without rewriting the table.
+    with op.batch_alter_table("players") as batch_op:
+        batch_op.add_column(
+            sa.Column(
+                "last_seen_at",
+                sa.DateTime(),
+                nullable=False,
+                server_default=sa.func.current_timestamp(),
+            )
+        )
+    op.create_index("ix_players_last_seen_at", "players", ["last_seen_at"])
+
+    op.create_table(
+        "players_archive",
+        sa.Column("id", sa.Integer(), autoincrement=False, nullable=False),
+        sa.Column("user_id", sa.String(length=64), nullable=False),
+        sa.Column("name", sa.String(length=120), nullable=False),
+        sa.Column("level", sa.Integer(), nullable=False),
+        sa.Column("xp", sa.Integer(), nullable=False),
+        sa.Column("version", sa.Integer(), nullable=False),
+        sa.Column("health", sa.Integer(), nullable=True),
+        sa.Column("attack", sa.Integer(), nullable=True),
+        sa.Column("defense", sa.Integer(), nullable=True),
+        sa.Column("last_seen_at", sa.DateTime(), nullable=False),
+        sa.Column("archived_at", sa.DateTime(), nullable=False),
+        sa.Column("deleted_at", sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index("ix_players_archive_user_id", "players_archive", ["user_id"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_players_archive_user_id", table_name="players_archive")
+    op.drop_table("players_archive")
+    op.drop_index("ix_players_last_seen_at", table_name="players")
+    with op.batch_alter_table("players") as batch_op:
+        batch_op.drop_column("last_seen_at")
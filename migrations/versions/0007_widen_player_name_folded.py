@@ -0,0 +1,49 @@
+"""Widen the case-folded player name to fit any folded 120-character name.
+
+Revision ID: 0007_widen_player_name_folded
+Revises: 0006_player_archive
+Create Date: 2026-10-17 16:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0007_widen_player_name_folded"
+down_revision: Union[str, None] = "0006_player_archive"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+OLD_TYPE = sa.String(length=120).with_variant(
+    postgresql.VARCHAR(length=120, collation="C"), "postgresql"
+)
+# str.casefold() maps one character to at most three ("ﬃ" -> "ffi").
+NEW_TYPE = sa.String(length=360).with_variant(
+    postgresql.VARCHAR(length=360, collation="C"), "postgresql"
+)
+
+
+def upgrade() -> None:
+    # Widening a VARCHAR keeps the same collation, so PostgreSQL neither
+    # rewrites the table nor rebuilds ix_players_name_folded.
+    with op.batch_alter_table("players") as batch_op:
+        batch_op.alter_column(
+            "name_folded",
+            existing_type=OLD_TYPE,
+            type_=NEW_TYPE,
+            existing_nullable=False,
+        )
+
+
+def downgrade() -> None:
+    with op.batch_alter_table("players") as batch_op:
+        batch_op.alter_column(
+            "name_folded",
+            existing_type=NEW_TYPE,
+            type_=OLD_TYPE,
+            existing_nullable=False,
+        )
@@ -0,0 +1,47 @@
+"""Store player ids as 64-bit integers.
+
+Revision ID: 0008_bigint_player_ids
+Revises: 0007_widen_player_name_folded
+Create Date: 2026-10-17 18:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0008_bigint_player_ids"
+down_revision: Union[str, None] = "0007_widen_player_name_folded"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Sharded ids are nextval('players_id_seq') * 1024 + slot: int4 columns run
+# out after about two million players. SQLite integers are already 64-bit.
+PLAYER_ID_TYPE = sa.BigInteger().with_variant(sa.Integer(), "sqlite")
+
+COLUMNS = (
+    ("players", "id"),
+    ("player_stats", "player_id"),
+    ("xp_event_receipts", "player_id"),
+    ("players_archive", "id"),
+)
+
+
+def upgrade() -> None:
+    if op.get_bind().dialect.name == "sqlite":
+        return
+
+    for table, column in COLUMNS:
+        op.alter_column(table, column, existing_type=sa.Integer(), type_=PLAYER_ID_TYPE)
+    op.execute("ALTER SEQUENCE players_id_seq AS bigint")
+
+
+def downgrade() -> None:
+    if op.get_bind().dialect.name == "sqlite":
+        return
+
+    op.execute("ALTER SEQUENCE players_id_seq AS integer")
+    for table, column in reversed(COLUMNS):
+        op.alter_column(table, column, existing_type=PLAYER_ID_TYPE, type_=sa.Integer())
@@ -0,0 +1,656 @@
+"""Soft deletion and archival of inactive players.
+
+Abandoned accounts make up most of ``players`` and ``player_stats`` and
+bloat their indexes and the cache working sets. Players that have not been
+seen for ``ARCHIVE_INACTIVE_DAYS`` are moved, with their stats, into one
+compact ``players_archive`` row each by ``flask archive inactive``. The job
+works in small batches, one short transaction per batch (rows locked with
+``FOR UPDATE SKIP LOCKED`` on PostgreSQL, so concurrent writers are never
+queued behind a batch for long), and pauses between batches.
+
+An archived player is restored transparently the next time it is addressed
+(``GET``/``PUT /players/<id>``, ``PATCH /players/<id>/stats``, its leaderboard
+rank, experience awards, or ``POST /players`` by its user, which still answers 409).
+``DELETE /players/<id>`` moves the player into the same table with
+``deleted_at`` set; deleted players are never restored.
+
+``players.last_seen_at`` is maintained by :class:`LastSeenTracker`: a process
+writes a player's timestamp at most once per ``LAST_SEEN_RESOLUTION`` seconds,
+in batched ``UPDATE`` statements issued from a background thread, and rows
+already refreshed by another worker within the resolution are skipped.
+"""
+
+import atexit
+import logging
+import os
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Iterable,
+    List,
+    NamedTuple,
+    Optional,
+    Sequence,
+)
+
+import click
+from flask import Flask, current_app
+from flask.cli import AppGroup
+from sqlalchemy import DateTime, literal, select, text, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.engine import Connection, Engine, Row
+from sqlalchemy.exc import OperationalError
+
+from .cache import LocalLRU
+from .models import Player, PlayerArchive, PlayerStats, fold_name
+from .signals import players_removed
+from .snapshots import PlayerSnapshot
+
+logger = logging.getLogger(__name__)
+
+_players = Player.__table__
+_stats = PlayerStats.__table__
+_archive = PlayerArchive.__table__
+
+REPORTED_TABLES = ("players", "player_stats", "players_archive")
+
+
+class TableSize(NamedTuple):
+    """Rows, data bytes and index bytes of a table (``None`` if unknown)."""
+
+    rows: Optional[int]
+    table_bytes: Optional[int]
+    index_bytes: Optional[int]
+
+
+class ArchiveReport(NamedTuple):
+    archived: int
+    batches: int
+    elapsed: float
+
+
+def _utcnow() -> datetime:
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def _insert(connection: Connection, table: Any):
+    if connection.dialect.name == "postgresql":
+        return postgresql.insert(table)
+    return sqlite.insert(table)
+
+
+def archive_players(
+    connection: Connection,
+    player_ids: Sequence[int],
+    deleted_at: Optional[datetime] = None,
+) -> int:
+    """Move *player_ids* and their stats into the archive; return the count.
+
+    The caller owns the transaction and should hold the players' row locks.
+    """
+
+    source = (
+        select(
+            _players.c.id,
+            _players.c.user_id,
+            _players.c.name,
+            _players.c.level,
+            _players.c.xp,
+            _players.c.version,
+            _stats.c.health,
+            _stats.c.attack,
+            _stats.c.defense,
+            _players.c.last_seen_at,
+            literal(_utcnow(), DateTime()),
+            literal(deleted_at, DateTime()),
+        )
+        .select_from(_players.outerjoin(_stats, _stats.c.player_id == _players.c.id))
+        .where(_players.c.id.in_(player_ids))
+    )
+    connection.execute(
+        _archive.insert().from_select(
+            [
+                "id",
+                "user_id",
+                "name",
+                "level",
+                "xp",
+                "version",
+                "health",
+                "attack",
+                "defense",
+                "last_seen_at",
+                "archived_at",
+                "deleted_at",
+            ],
+            source,
+        )
+    )
+    connection.execute(_stats.delete().where(_stats.c.player_id.in_(player_ids)))
+    return connection.execute(
+        _players.delete().where(_players.c.id.in_(player_ids))
+    ).rowcount
+
+
+def archive_inactive_batch(
+    connection: Connection, cutoff: datetime, limit: int
+) -> List[int]:
+    """Archive up to *limit* players last seen before *cutoff*; return their ids.
+
+    Rows another transaction has locked are skipped, not waited for.
+    """
+
+    player_ids = list(
+        connection.scalars(
+            select(_players.c.id)
+            .where(_players.c.last_seen_at < cutoff)
+            .order_by(_players.c.last_seen_at)
+            .limit(limit)
+            .with_for_update(skip_locked=True)
+        )
+    )
+    if player_ids:
+        archive_players(connection, player_ids)
+    return player_ids
+
+
+def archive_inactive(
+    cutoff: datetime,
+    batch_size: int = 500,
+    pause: float = 0.0,
+    max_batches: Optional[int] = None,
+    on_batch: Optional[Callable[[ArchiveReport], None]] = None,
+) -> ArchiveReport:
+    """Archive every player last seen before *cutoff*, shard after shard.
+
+    Runs inside an application context. Each batch commits on its own and is
+    followed by a *pause* (seconds), so an interrupted run keeps its work.
+    """
+
+    app = current_app._get_current_object()
+    shards = app.extensions["shards"]
+    started = time.perf_counter()
+    archived = batches = 0
+
+    for engine in shards.engines:
+        while max_batches is None or batches < max_batches:
+            with engine.begin() as connection:
+                player_ids = archive_inactive_batch(connection, cutoff, batch_size)
+            if not player_ids:
+                break
+
+            batches += 1
+            archived += len(player_ids)
+            players_removed.send(app, player_ids=player_ids)
+            if on_batch is not None:
+                on_batch(
+                    ArchiveReport(archived, batches, time.perf_counter() - started)
+                )
+            if len(player_ids) < batch_size:
+                break
+            if pause:
+                time.sleep(pause)
+
+    return ArchiveReport(archived, batches, time.perf_counter() - started)
+
+
+def soft_delete_player(
+    connection: Connection,
+    player_id: int,
+    user_id: str,
+    expected_versions: Optional[Sequence[int]] = None,
+) -> bool:
+    """Mark *user_id*'s player deleted, moving it into the archive if needed.
+
+    Returns ``False`` when no matching player (owner and, if given, version)
+    is live or archived; the caller owns the transaction.
+    """
+
+    now = _utcnow()
+    query = (
+        select(_players.c.id)
+        .where(_players.c.id == player_id, _players.c.user_id == user_id)
+        .with_for_update()
+    )
+    archived = update(_archive).where(
+        _archive.c.id == player_id,
+        _archive.c.user_id == user_id,
+        _archive.c.deleted_at.is_(None),
+    )
+    if expected_versions is not None:
+        query = query.where(_players.c.version.in_(expected_versions))
+        archived = archived.where(_archive.c.version.in_(expected_versions))
+
+    if connection.scalar(query) is not None:
+        return archive_players(connection, [player_id], deleted_at=now) > 0
+    return connection.execute(archived.values(deleted_at=now)).rowcount > 0
+
+
+def load_owner(connection: Connection, player_id: int) -> Optional[Row]:
+    """Return ``(user_id, version)`` of a live or archived, undeleted player."""
+
+    current = connection.execute(
+        select(_players.c.user_id, _players.c.version).where(_players.c.id == player_id)
+    ).first()
+    if current is not None:
+        return current
+
+    return connection.execute(
+        select(_archive.c.user_id, _archive.c.version).where(
+            _archive.c.id == player_id, _archive.c.deleted_at.is_(None)
+        )
+    ).first()
+
+
+def _restorable(query: Any, player_id: Optional[int], user_id: Optional[str]) -> Any:
+    query = query.where(_archive.c.deleted_at.is_(None))
+    if player_id is not None:
+        query = query.where(_archive.c.id == player_id)
+    else:
+        query = query.where(_archive.c.user_id == user_id)
+    return query.limit(1)
+
+
+def is_archived(
+    connection: Connection,
+    player_id: Optional[int] = None,
+    user_id: Optional[str] = None,
+) -> bool:
+    """Return whether :func:`restore_player` would find a player to restore.
+
+    A plain read without locks, safe on a replica, so that a miss for an
+    unknown player does not open a write transaction on the primary.
+    """
+
+    query = _restorable(select(_archive.c.id), player_id, user_id)
+    return connection.execute(query).first() is not None
+
+
+def restore_player(
+    connection: Connection,
+    player_id: Optional[int] = None,
+    user_id: Optional[str] = None,
+) -> Optional[PlayerSnapshot]:
+    """Move an archived, undeleted player back into ``players``.
+
+    The player is looked up by *player_id* or by *user_id* and keeps its id,
+    stats and version. Returns ``None`` when there is nothing to restore; the
+    caller owns the transaction.
+    """
+
+    query = _restorable(select(_archive), player_id, user_id)
+    row = connection.execute(query.with_for_update()).first()
+    if row is None:
+        return None
+
+    restored = connection.execute(
+        _insert(connection, _players)
+        .values(
+            id=row.id,
+            user_id=row.user_id,
+            name=row.name,
+            name_folded=fold_name(row.name),
+            level=row.level,
+            xp=row.xp,
+            version=row.version,
+            last_seen_at=_utcnow(),
+        )
+        .on_conflict_do_nothing()
+    )
+    if restored.rowcount == 0:
+        # The user owns another player or the id was taken meanwhile.
+        return None
+
+    if row.health is not None:
+        connection.execute(
+            _stats.insert().values(
+                player_id=row.id,
+                health=row.health,
+                attack=row.attack,
+                defense=row.defense,
+            )
+        )
+    connection.execute(_archive.delete().where(_archive.c.id == row.id))
+    return PlayerSnapshot(
+        (
+            row.id,
+            row.user_id,
+            row.name,
+            row.level,
+            row.xp,
+            row.version,
+            row.health,
+            row.attack,
+            row.defense,
+        )
+    )
+
+
+def restore_players(
+    connection: Connection, player_ids: Sequence[int], chunk_size: int = 1000
+) -> List[PlayerSnapshot]:
+    """Restore those of *player_ids* that are archived and not deleted.
+
+    Used by writes addressed to many players at once (experience awards);
+    the caller owns the transaction.
+    """
+
+    restored = []
+    for start in range(0, len(player_ids), chunk_size):
+        archived = connection.scalars(
+            select(_archive.c.id).where(
+                _archive.c.id.in_(player_ids[start : start + chunk_size]),
+                _archive.c.deleted_at.is_(None),
+            )
+        ).all()
+        for player_id in archived:
+            snapshot = restore_player(connection, player_id=player_id)
+            if snapshot is not None:
+                restored.append(snapshot)
+    return restored
+
+
+def table_sizes(
+    connection: Connection, tables: Iterable[str] = REPORTED_TABLES
+) -> Dict[str, TableSize]:
+    """Measure *tables* and their indexes on one database.
+
+    PostgreSQL reports ``pg_table_size``/``pg_indexes_size`` and the planner's
+    row estimate; SQLite counts rows and sums the pages of each b-tree from
+    the ``dbstat`` table, when the library provides it.
+    """
+
+    sizes = {}
+    if connection.dialect.name == "postgresql":
+        for table in tables:
+            row = connection.execute(
+                text(
+                    "SELECT c.reltuples::bigint, pg_table_size(c.oid), "
+                    "pg_indexes_size(c.oid) FROM pg_class c "
+                    "WHERE c.oid = to_regclass(:table)"
+                ),
+                {"table": table},
+            ).first()
+            if row is not None:
+                rows = row[0] if row[0] >= 0 else None
+                sizes[table] = TableSize(rows, row[1], row[2])
+        return sizes
+
+    try:
+        pages = dict(
+            connection.execute(
+                text("SELECT name, SUM(pgsize) FROM dbstat GROUP BY name")
+            ).all()
+        )
+    except OperationalError:  # SQLite built without SQLITE_ENABLE_DBSTAT_VTAB
+        pages = None
+    for table in tables:
+        rows = connection.scalar(text(f'SELECT COUNT(*) FROM "{table}"'))
+        if pages is None:
+            sizes[table] = TableSize(rows, None, None)
+            continue
+        indexes = connection.scalars(
+            text(
+                "SELECT name FROM sqlite_master WHERE type = 'index' "
+                "AND tbl_name = :table"
+            ),
+            {"table": table},
+        )
+        sizes[table] = TableSize(
+            rows,
+            pages.get(table, 0),
+            sum(pages.get(index, 0) for index in indexes),
+        )
+    return sizes
+
+
+def total_table_sizes(engines: Iterable[Engine]) -> Dict[str, TableSize]:
+    """Add up :func:`table_sizes` over every shard."""
+
+    totals: Dict[str, TableSize] = {}
+    for engine in engines:
+        with engine.connect() as connection:
+            for table, size in table_sizes(connection).items():
+                previous = totals.get(table)
+                totals[table] = (
+                    size
+                    if previous is None
+                    else TableSize(*(_sum(a, b) for a, b in zip(previous, size)))
+                )
+    return totals
+
+
+def _sum(a: Optional[int], b: Optional[int]) -> Optional[int]:
+    return None if a is None or b is None else a + b
+
+
+def vacuum(engine: Engine) -> None:
+    """Make the space freed by archival reusable and refresh the statistics."""
+
+    with engine.connect() as connection:
+        connection = connection.execution_options(isolation_level="AUTOCOMMIT")
+        if connection.dialect.name == "postgresql":
+            connection.execute(text(f"VACUUM (ANALYZE) {', '.join(REPORTED_TABLES)}"))
+        else:
+            connection.execute(text("VACUUM"))
+
+
+class LastSeenTracker:
+    """Coalesce and batch the ``players.last_seen_at`` writes of a process.
+
+    The background thread is started lazily, as for
+    :class:`~src.xp_events.XpFlusher`, unless *background* is off; :meth:`flush`
+    can then be called directly.
+    """
+
+    def __init__(
+        self,
+        app: Flask,
+        resolution: float = 3600.0,
+        interval: float = 60.0,
+        maxsize: int = 100_000,
+        chunk_size: int = 500,
+        background: bool = True,
+    ) -> None:
+        self.app = app
+        self.resolution = resolution
+        self.interval = interval
+        self.maxsize = maxsize
+        self.chunk_size = chunk_size
+        self.background = background
+        self._recent = LocalLRU(maxsize, resolution)
+        self._pending: set = set()
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._start_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stopping = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._pid: Optional[int] = None
+        self._exit_hook_registered = False
+
+    def touch(self, player_ids: Iterable[int]) -> None:
+        """Record that *player_ids* were seen; cheap when seen recently."""
+
+        fresh = [
+            player_id for player_id in player_ids if self._recent.add(player_id, True)
+        ]
+        if not fresh:
+            return
+
+        with self._lock:
+            self._pending.update(fresh)
+            full = len(self._pending) >= self.maxsize
+        if self.background:
+            self.ensure_running()
+        if full:
+            self._wake.set()
+
+    def apply_changes(self, sender: Any, changes: Iterable[Any]) -> None:
+        """``players_changed`` receiver: a written player counts as seen."""
+
+        self.touch(change.player_id for change in changes)
+
+    def ensure_running(self) -> None:
+        """Start the background thread in this process if it is not running."""
+
+        if self._thread is not None and self._pid == os.getpid():
+            return
+
+        with self._start_lock:
+            if self._thread is not None and self._pid == os.getpid():
+                return
+            self._stopping.clear()
+            self._pid = os.getpid()
+            self._thread = threading.Thread(
+                target=self._run, name="last-seen-flusher", daemon=True
+            )
+            self._thread.start()
+            if not self._exit_hook_registered:
+                atexit.register(self.stop)
+                self._exit_hook_registered = True
+
+    def stop(self, timeout: Optional[float] = None) -> None:
+        """Stop the background thread and write the pending timestamps."""
+
+        self._stopping.set()
+        self._wake.set()
+        if self._thread is not None and self._pid == os.getpid():
+            self._thread.join(timeout)
+        self._thread = None
+        try:
+            self.flush()
+        except Exception:
+            logger.exception("Final last-seen flush failed")
+
+    def flush(self) -> int:
+        """Write the pending timestamps; return the number of players written."""
+
+        with self._flush_lock:
+            with self._lock:
+                pending, self._pending = self._pending, set()
+            if not pending:
+                return 0
+
+            now = _utcnow()
+            stale = now - timedelta(seconds=self.resolution)
+            shards = self.app.extensions["shards"]
+            try:
+                for shard, player_ids in shards.group_by_shard(sorted(pending)).items():
+                    with shards.engines[shard].begin() as connection:
+                        for start in range(0, len(player_ids), self.chunk_size):
+                            connection.execute(
+                                update(_players)
+                                .where(
+                                    _players.c.id.in_(
+                                        player_ids[start : start + self.chunk_size]
+                                    ),
+                                    _players.c.last_seen_at < stale,
+                                )
+                                .values(last_seen_at=now)
+                            )
+            except Exception:
+                with self._lock:
+                    self._pending.update(pending)
+                raise
+            return len(pending)
+
+    def _run(self) -> None:
+        while not self._stopping.is_set():
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            if self._stopping.is_set():
+                break
+            try:
+                self.flush()
+            except Exception:
+                logger.exception("Last-seen flush failed")
+
+
+def _format_bytes(size: Optional[int]) -> str:
+    if size is None:
+        return "?"
+    value = float(size)
+    for unit in ("o", "Kio", "Mio", "Gio"):
+        if value < 1024 or unit == "Gio":
+            break
+        value /= 1024
+    return f"{value:.0f} {unit}" if unit == "o" else f"{value:.1f} {unit}"
+
+
+def _format_size(size: Optional[TableSize]) -> str:
+    if size is None:
+        return "absente"
+    rows = "?" if size.rows is None else str(size.rows)
+    return (
+        f"{rows} lignes, données {_format_bytes(size.table_bytes)}, "
+        f"index {_format_bytes(size.index_bytes)}"
+    )
+
+
+archive_cli = AppGroup("archive", help="Archivage des joueurs inactifs.")
+
+
+@archive_cli.command("inactive")
+@click.option(
+    "--inactive-days", type=float, help="Défaut : ARCHIVE_INACTIVE_DAYS (180)."
+)
+@click.option("--batch-size", type=int, help="Défaut : ARCHIVE_BATCH_SIZE (500).")
+@click.option(
+    "--pause",
+    type=float,
+    help="Pause entre deux lots en secondes (défaut : ARCHIVE_BATCH_PAUSE).",
+)
+@click.option("--max-batches", type=int, help="Nombre maximal de lots.")
+@click.option("--vacuum", "run_vacuum", is_flag=True, help="VACUUM après l'archivage.")
+def inactive_command(
+    inactive_days: Optional[float],
+    batch_size: Optional[int],
+    pause: Optional[float],
+    max_batches: Optional[int],
+    run_vacuum: bool,
+) -> None:
+    """Archiver les joueurs inactifs et afficher la taille des tables."""
+
+    config = current_app.config
+    engines = current_app.extensions["shards"].engines
+    if inactive_days is None:
+        inactive_days = config["ARCHIVE_INACTIVE_DAYS"]
+    cutoff = _utcnow() - timedelta(days=inactive_days)
+
+    before = total_table_sizes(engines)
+    report = archive_inactive(
+        cutoff,
+        batch_size=batch_size or config["ARCHIVE_BATCH_SIZE"],
+        pause=config["ARCHIVE_BATCH_PAUSE"] if pause is None else pause,
+        max_batches=max_batches,
+    )
+    if run_vacuum:
+        for engine in engines:
+            vacuum(engine)
+    after = total_table_sizes(engines)
+
+    for table in REPORTED_TABLES:
+        click.echo(
+            f"{table} : {_format_size(before.get(table))} → "
+            f"{_format_size(after.get(table))}"
+        )
+    rate = report.archived / report.elapsed if report.elapsed else 0.0
+    click.echo(
+        f"{report.archived} joueurs inactifs depuis {inactive_days:g} jours "
+        f"archivés en {report.batches} lots, {report.elapsed:.1f} s "
+        f"({rate:.0f} joueurs/s)."
+    )
+
+
+@archive_cli.command("sizes")
+def sizes_command() -> None:
+    """Afficher la taille des tables de joueurs et de leurs index."""
+
+    sizes = total_table_sizes(current_app.extensions["shards"].engines)
+    for table in REPORTED_TABLES:
+        click.echo(f"{table} : {_format_size(sizes.get(table))}")
@@ -0,0 +1,529 @@
+"""Bulk import and export of players from the command line.
+
+``flask players import`` loads NDJSON or CSV records into ``players`` and
+``player_stats`` in batches of ``--batch-size`` rows, each committed in one
+transaction per shard. Records are validated with the rules of
+``POST /players`` (a ``user_id`` and a non-blank ``name``) plus the table
+constraints for the optional ``level``, ``xp`` and stats; rejected records are
+reported with their line number and an error code, and never abort the import.
+A ``user_id`` that already owns a player, live or archived, is rejected as
+``player_already_exists``. Ids are assigned as on creation (slot-encoded when
+sharded); ``id`` and ``version`` columns of the input are ignored.
+
+* PostgreSQL: each batch is ``COPY``-ed into a temporary staging table, then
+  moved into ``players`` (``ON CONFLICT (user_id) DO NOTHING``) and
+  ``player_stats`` by one statement chaining data-modifying CTEs.
+* SQLite: ids are assigned above the shard's largest id and both tables are
+  filled with ``executemany``; the rows that lost a conflict are found by
+  reading the assigned ids back.
+
+``flask players export`` writes the same formats, reading every shard through
+server-side cursors (``yield_per``) merged by id. Both commands hold one batch
+in memory at a time and report their throughput.
+"""
+
+import csv
+import io
+import json
+import time
+from itertools import islice
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    NamedTuple,
+    Optional,
+    TextIO,
+    Tuple,
+    Union,
+)
+
+import click
+from flask import current_app
+from flask.cli import AppGroup
+from sqlalchemy import Column, Integer, MetaData, String, Table, exists, func, select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.engine import Connection
+
+from .fieldsets import FULL_FIELDSET, STATS_FIELD, FieldSet, parse_fieldset
+from .increments import MAX_STAT_VALUE
+from .leveling import XP_PER_LEVEL
+from .models import Player, PlayerArchive, PlayerStats, fold_name
+from .sharding import SLOT_COUNT, largest_player_id, slot_for_user
+from .signals import PlayerChange, players_changed
+
+_players = Player.__table__
+_stats = PlayerStats.__table__
+_archive = PlayerArchive.__table__
+
+MAX_USER_ID_LENGTH = _players.c.user_id.type.length
+MAX_NAME_LENGTH = _players.c.name.type.length
+STAT_FIELDS = ("health", "attack", "defense")
+STAT_DEFAULTS = {name: _stats.c[name].default.arg for name in STAT_FIELDS}
+INTEGER_FIELDS = ("id", "level", "xp", "version", *STAT_FIELDS)
+FORMATS = ("ndjson", "csv")
+
+_staging = Table(
+    "player_import",
+    MetaData(),
+    Column("user_id", String(MAX_USER_ID_LENGTH)),
+    Column("name", String(MAX_NAME_LENGTH)),
+    Column("name_folded", String(MAX_NAME_LENGTH)),
+    Column("level", Integer),
+    Column("xp", Integer),
+    Column("health", Integer),
+    Column("attack", Integer),
+    Column("defense", Integer),
+    Column("slot", Integer),
+    prefixes=["TEMPORARY"],
+    postgresql_on_commit="DROP",
+)
+
+
+class ImportRow(NamedTuple):
+    """A validated record, with its line number in the input."""
+
+    line: int
+    user_id: str
+    name: str
+    level: int
+    xp: int
+    health: int
+    attack: int
+    defense: int
+
+
+class Rejection(NamedTuple):
+    line: int
+    code: str
+    message: str
+
+
+class BulkReport(NamedTuple):
+    rows: int
+    rejected: int
+    elapsed: float
+
+    @property
+    def rate(self) -> float:
+        return self.rows / self.elapsed if self.elapsed else 0.0
+
+
+def detect_format(filename: str) -> str:
+    return "csv" if filename.lower().endswith(".csv") else "ndjson"
+
+
+def read_records(stream: TextIO, fmt: str) -> Iterator[Tuple[int, Any]]:
+    """Yield ``(line, record)`` pairs; a record that cannot be parsed is ``None``.
+
+    CSV cells are strings: empty cells are dropped and integer columns are
+    converted when they look like integers, so both formats validate alike.
+    """
+
+    if fmt == "csv":
+        reader = csv.DictReader(stream)
+        for record in reader:
+            yield reader.line_num, {
+                key: (int(value) if key in INTEGER_FIELDS and _is_int(value) else value)
+                for key, value in record.items()
+                if key is not None and value not in ("", None)
+            }
+        return
+
+    for line, text in enumerate(stream, 1):
+        if not text.strip():
+            continue
+        try:
+            yield line, json.loads(text)
+        except ValueError:
+            yield line, None
+
+
+def validate_record(line: int, record: Any) -> Union[ImportRow, Rejection]:
+    """Apply the ``POST /players`` rules (and the table constraints) to *record*."""
+
+    if not isinstance(record, dict):
+        return Rejection(line, "invalid_payload", "Enregistrement illisible.")
+
+    user_id = record.get("user_id")
+    if isinstance(user_id, int) and not isinstance(user_id, bool):
+        user_id = str(user_id)
+    if not isinstance(user_id, str) or not user_id:
+        return Rejection(line, "user_id_missing", "Le champ 'user_id' est requis.")
+    if len(user_id) > MAX_USER_ID_LENGTH:
+        return Rejection(
+            line,
+            "invalid_payload",
+            f"Le champ 'user_id' dépasse {MAX_USER_ID_LENGTH} caractères.",
+        )
+
+    name = record.get("name")
+    if not isinstance(name, str) or not name.strip():
+        return Rejection(line, "invalid_payload", "Le champ 'name' est requis.")
+    name = name.strip()
+    if len(name) > MAX_NAME_LENGTH:
+        return Rejection(
+            line,
+            "invalid_payload",
+            f"Le champ 'name' dépasse {MAX_NAME_LENGTH} caractères.",
+        )
+
+    stats = record.get(STATS_FIELD) or {}
+    if not isinstance(stats, dict):
+        return Rejection(line, "invalid_payload", "Le champ 'stats' est invalide.")
+    values = {"level": record.get("level", 1), "xp": record.get("xp", 0)}
+    for field in STAT_FIELDS:
+        values[field] = stats.get(field, record.get(field, STAT_DEFAULTS[field]))
+    for field, value in values.items():
+        if isinstance(value, bool) or not isinstance(value, int):
+            return Rejection(
+                line, "invalid_payload", f"Le champ '{field}' doit être un entier."
+            )
+        if not 0 <= value <= MAX_STAT_VALUE:
+            return Rejection(
+                line,
+                "invalid_payload",
+                f"Le champ '{field}' doit être compris entre 0 et {MAX_STAT_VALUE}.",
+            )
+    if values["level"] < 1 or values["xp"] >= values["level"] * XP_PER_LEVEL:
+        return Rejection(
+            line,
+            "invalid_payload",
+            f"'level' doit être >= 1 et 'xp' inférieur à level * {XP_PER_LEVEL}.",
+        )
+
+    return ImportRow(line, user_id, name, **values)
+
+
+def import_players(
+    records: Iterable[Tuple[int, Any]],
+    batch_size: int = 5000,
+    on_reject: Optional[Callable[[Rejection], None]] = None,
+    on_progress: Optional[Callable[[BulkReport], None]] = None,
+) -> BulkReport:
+    """Insert the valid *records* and return the import totals.
+
+    Runs inside an application context. Each batch is committed separately
+    (one transaction per shard), so an interrupted import keeps the batches
+    already written; importing again rejects those rows as duplicates.
+    """
+
+    app = current_app._get_current_object()
+    shards = app.extensions["shards"]
+    started = time.perf_counter()
+    imported = rejected = 0
+
+    def reject(rejection: Rejection) -> None:
+        nonlocal rejected
+        rejected += 1
+        if on_reject is not None:
+            on_reject(rejection)
+
+    records = iter(records)
+    while True:
+        batch = list(islice(records, batch_size))
+        if not batch:
+            break
+
+        by_shard: Dict[int, List[ImportRow]] = {}
+        seen = set()
+        for line, record in batch:
+            row = validate_record(line, record)
+            if isinstance(row, Rejection):
+                reject(row)
+            elif row.user_id in seen:
+                reject(_duplicate(line))
+            else:
+                seen.add(row.user_id)
+                by_shard.setdefault(shards.shard_for_user(row.user_id), []).append(row)
+
+        changes = []
+        for shard, rows in by_shard.items():
+            with shards.engines[shard].begin() as connection:
+                if connection.dialect.name == "postgresql":
+                    created = _copy_rows(connection, rows, shards.is_sharded)
+                else:
+                    created = _insert_rows(connection, rows, shards.is_sharded)
+            for row in rows:
+                player_id = created.get(row.user_id)
+                if player_id is None:
+                    reject(_duplicate(row.line))
+                else:
+                    changes.append(PlayerChange(player_id, row.level, row.xp))
+
+        imported += len(changes)
+        if changes:
+            players_changed.send(app, changes=changes)
+        if on_progress is not None:
+            on_progress(BulkReport(imported, rejected, time.perf_counter() - started))
+
+    # The change signal carries no stats; have the population summary pick
+    # them up from the database.
+    if imported and "population" in app.extensions:
+        app.extensions["population"].invalidate()
+    return BulkReport(imported, rejected, time.perf_counter() - started)
+
+
+def export_players(
+    output: TextIO,
+    fmt: str,
+    fieldset: FieldSet = FULL_FIELDSET,
+    batch_size: int = 5000,
+    on_progress: Optional[Callable[[BulkReport], None]] = None,
+) -> BulkReport:
+    """Write every player, in id order, to *output*; runs in an app context."""
+
+    shards = current_app.extensions["shards"]
+    started = time.perf_counter()
+    writer = None
+    if fmt == "csv":
+        columns = list(fieldset.fields) + (list(STAT_FIELDS) if fieldset.stats else [])
+        writer = csv.writer(output)
+        writer.writerow(columns)
+
+    count = 0
+    rows = shards.merged(
+        fieldset.select().order_by(_players.c.id),
+        key=lambda row: row.id,
+        batch_size=batch_size,
+    )
+    try:
+        for row in rows:
+            if writer is not None:
+                writer.writerow(row)
+            else:
+                output.write(json.dumps(fieldset.payload(row), separators=(",", ":")))
+                output.write("\n")
+            count += 1
+            if on_progress is not None and count % batch_size == 0:
+                on_progress(BulkReport(count, 0, time.perf_counter() - started))
+    finally:
+        rows.close()
+
+    return BulkReport(count, 0, time.perf_counter() - started)
+
+
+def _is_int(value: str) -> bool:
+    return value.lstrip("-").isdigit()
+
+
+def _duplicate(line: int) -> Rejection:
+    return Rejection(
+        line,
+        "player_already_exists",
+        "Un joueur est déjà associé à cet utilisateur.",
+    )
+
+
+def _copy_rows(
+    connection: Connection, rows: List[ImportRow], sharded: bool
+) -> Dict[str, int]:
+    _staging.create(connection)
+
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for row in rows:
+        writer.writerow(
+            (
+                row.user_id,
+                row.name,
+                fold_name(row.name),
+                row.level,
+                row.xp,
+                row.health,
+                row.attack,
+                row.defense,
+                slot_for_user(row.user_id),
+            )
+        )
+    buffer.seek(0)
+    cursor = connection.connection.cursor()
+    try:
+        cursor.copy_expert(f"COPY {_staging.name} FROM STDIN WITH (FORMAT csv)", buffer)
+    finally:
+        cursor.close()
+
+    columns = ["user_id", "name", "name_folded", "level", "xp"]
+    source = [_staging.c[name] for name in columns]
+    if sharded:
+        columns.insert(0, "id")
+        source.insert(0, func.nextval("players_id_seq") * SLOT_COUNT + _staging.c.slot)
+    archived = exists().where(
+        _archive.c.user_id == _staging.c.user_id, _archive.c.deleted_at.is_(None)
+    )
+    new_players = (
+        postgresql.insert(_players)
+        .from_select(columns, select(*source).where(~archived))
+        .on_conflict_do_nothing(index_elements=[_players.c.user_id])
+        .returning(_players.c.id, _players.c.user_id)
+        .cte("new_players")
+    )
+    new_stats = (
+        _stats.insert()
+        .from_select(
+            ["player_id", *STAT_FIELDS],
+            select(new_players.c.id, *(_staging.c[name] for name in STAT_FIELDS)).join(
+                _staging, _staging.c.user_id == new_players.c.user_id
+            ),
+        )
+        .returning(_stats.c.player_id)
+        .cte("new_stats")
+    )
+    created = connection.execute(
+        select(new_players.c.user_id, new_players.c.id).join(
+            new_stats, new_stats.c.player_id == new_players.c.id
+        )
+    )
+    return dict(created.all())
+
+
+def _insert_rows(
+    connection: Connection, rows: List[ImportRow], sharded: bool
+) -> Dict[str, int]:
+    archived = set(
+        connection.scalars(
+            select(_archive.c.user_id).where(
+                _archive.c.user_id.in_([row.user_id for row in rows]),
+                _archive.c.deleted_at.is_(None),
+            )
+        )
+    )
+    largest = connection.scalar(select(largest_player_id()))
+    sequence = largest // SLOT_COUNT + 1 if sharded else largest + 1
+    players = []
+    for row in rows:
+        if row.user_id in archived:
+            continue
+        if sharded:
+            player_id = sequence * SLOT_COUNT + slot_for_user(row.user_id)
+        else:
+            player_id = sequence
+        sequence += 1
+        players.append(
+            {
+                "id": player_id,
+                "user_id": row.user_id,
+                "name": row.name,
+                "name_folded": fold_name(row.name),
+                "level": row.level,
+                "xp": row.xp,
+                "version": 1,
+            }
+        )
+
+    if not players:
+        return {}
+
+    # Without a conflict target, an id taken meanwhile is skipped like a
+    # duplicate user_id instead of failing the batch.
+    connection.execute(sqlite.insert(_players).on_conflict_do_nothing(), players)
+    assigned = {player["id"]: player["user_id"] for player in players}
+    stored = connection.execute(
+        select(_players.c.id, _players.c.user_id).where(
+            _players.c.id.in_(list(assigned))
+        )
+    )
+    created = {
+        user_id: player_id
+        for player_id, user_id in stored
+        if assigned[player_id] == user_id
+    }
+
+    stats = [
+        {
+            "player_id": created[row.user_id],
+            "health": row.health,
+            "attack": row.attack,
+            "defense": row.defense,
+        }
+        for row in rows
+        if row.user_id in created
+    ]
+    if stats:
+        connection.execute(_stats.insert(), stats)
+    return created
+
+
+class _Progress:
+    """Report throughput on stderr at most once per *interval* seconds."""
+
+    def __init__(self, label: str, interval: float = 1.0) -> None:
+        self.label = label
+        self.interval = interval
+        self._last = 0.0
+
+    def __call__(self, report: BulkReport) -> None:
+        if report.elapsed - self._last < self.interval:
+            return
+        self._last = report.elapsed
+        click.echo(
+            f"{report.rows} joueurs {self.label} ({report.rate:.0f} joueurs/s)",
+            err=True,
+        )
+
+
+players_cli = AppGroup("players", help="Import et export des joueurs.")
+
+
+@players_cli.command("import")
+@click.argument("source", type=click.File("r", encoding="utf-8"))
+@click.option("--format", "fmt", type=click.Choice(FORMATS), help="Défaut : extension.")
+@click.option("--batch-size", default=5000, show_default=True)
+@click.option(
+    "--rejects",
+    type=click.File("w", encoding="utf-8"),
+    help="Fichier NDJSON recevant les lignes rejetées (défaut : stderr).",
+)
+def import_command(
+    source: TextIO, fmt: Optional[str], batch_size: int, rejects: Optional[TextIO]
+) -> None:
+    """Importer des joueurs depuis un fichier NDJSON ou CSV (- pour stdin)."""
+
+    def on_reject(rejection: Rejection) -> None:
+        line = json.dumps(rejection._asdict(), ensure_ascii=False)
+        if rejects is not None:
+            rejects.write(line + "\n")
+        else:
+            click.echo(line, err=True)
+
+    report = import_players(
+        read_records(source, fmt or detect_format(source.name)),
+        batch_size=batch_size,
+        on_reject=on_reject,
+        on_progress=_Progress("importés"),
+    )
+    click.echo(
+        f"{report.rows} joueurs importés, {report.rejected} rejetés en "
+        f"{report.elapsed:.1f} s ({report.rate:.0f} joueurs/s)."
+    )
+
+
+@players_cli.command("export")
+@click.argument("destination", type=click.File("w", encoding="utf-8"))
+@click.option("--format", "fmt", type=click.Choice(FORMATS), help="Défaut : extension.")
+@click.option("--fields", help="Champs exportés, comme ?fields= (défaut : tous).")
+@click.option("--batch-size", default=5000, show_default=True)
+def export_command(
+    destination: TextIO, fmt: Optional[str], fields: Optional[str], batch_size: int
+) -> None:
+    """Exporter tous les joueurs en NDJSON ou CSV (- pour stdout)."""
+
+    fieldset = parse_fieldset(fields, None)
+    if fieldset is None:
+        raise click.BadParameter("champ inconnu.", param_hint="--fields")
+
+    report = export_players(
+        destination,
+        fmt or detect_format(destination.name),
+        fieldset=fieldset,
+        batch_size=batch_size,
+        on_progress=_Progress("exportés"),
+    )
+    click.echo(
+        f"{report.rows} joueurs exportés en {report.elapsed:.1f} s "
+        f"({report.rate:.0f} joueurs/s).",
+        err=destination.name == "<stdout>",
+    )
@@ -0,0 +1,480 @@
+"""Read-through cache for serialized player payloads.
+
+Payloads are looked up in a small in-process LRU first, then in Redis, and only
+then loaded from the database. Concurrent misses on the same key are coalesced
+so that a burst of requests for one player results in a single load.
+
+A load can race a write: the row is read, the write commits and refreshes or
+drops the cached payload, then the load stores the row it read. Every write
+therefore bumps a per-player generation counter in Redis, the lookup that
+precedes a load reads it in the same round-trip, and :data:`FILL_SCRIPT`
+stores the loaded payload only if the generation has not moved since.
+"""
+
+import hashlib
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Hashable,
+    Iterable,
+    List,
+    Optional,
+    Sequence,
+    Set,
+    Tuple,
+)
+
+from redis.exceptions import RedisError
+
+logger = logging.getLogger(__name__)
+
+Payload = Dict[str, Any]
+Loader = Callable[[int], Optional[Payload]]
+BulkLoader = Callable[[List[int]], Dict[int, Payload]]
+Generation = bytes
+
+FILL_SCRIPT = """
+local ttl, variant = tonumber(ARGV[1]), ARGV[2]
+local filled = 0
+for i = 1, #KEYS, 2 do
+    local generation = redis.call('GET', KEYS[i + 1]) or ''
+    if generation == ARGV[i + 2] then
+        if variant == '' then
+            redis.call('SET', KEYS[i], ARGV[i + 3], 'EX', ttl)
+        else
+            redis.call('HSET', KEYS[i], variant, ARGV[i + 3])
+            redis.call('EXPIRE', KEYS[i], ttl)
+        end
+        filled = filled + 1
+    end
+end
+return filled
+"""
+"""Store loaded payloads whose generation is unchanged.
+
+``KEYS`` alternate payload key and generation key; ``ARGV`` is the TTL, the
+variant (empty for the full payload), then for each player the generation
+seen before the load (empty if none) and the encoded payload.
+"""
+
+
+def shape_version(fields: Iterable[str]) -> str:
+    """Return a short, stable version tag for a serialized payload shape."""
+
+    digest = hashlib.sha1(",".join(fields).encode("utf-8")).hexdigest()
+    return digest[:8]
+
+
+class LocalLRU:
+    """Thread-safe, size-bounded LRU mapping with per-entry expiry."""
+
+    def __init__(self, maxsize: int, ttl: float) -> None:
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+
+            expires_at, value = entry
+            if expires_at <= time.monotonic():
+                del self._data[key]
+                return None
+
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key: Hashable, value: Any) -> None:
+        if self.maxsize <= 0:
+            return
+
+        with self._lock:
+            self._store(key, value)
+
+    def add(self, key: Hashable, value: Any) -> bool:
+        """Store *value* unless *key* holds a live entry; return whether it did."""
+
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None and entry[0] > time.monotonic():
+                return False
+            if self.maxsize > 0:
+                self._store(key, value)
+            return True
+
+    def delete(self, key: Hashable) -> None:
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def _store(self, key: Hashable, value: Any) -> None:
+        self._data[key] = (time.monotonic() + self.ttl, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+
+class _Call:
+    __slots__ = ("event", "result", "error")
+
+    def __init__(self) -> None:
+        self.event = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+
+
+class SingleFlight:
+    """Coalesce concurrent calls for the same key into a single execution."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._calls: Dict[Hashable, _Call] = {}
+
+    def do(self, key: Hashable, fn: Callable[[], Any]) -> Any:
+        with self._lock:
+            call = self._calls.get(key)
+            is_leader = call is None
+            if is_leader:
+                call = self._calls[key] = _Call()
+
+        if not is_leader:
+            call.event.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+            return call.result
+        except BaseException as exc:
+            call.error = exc
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.event.set()
+
+
+class PlayerCache:
+    """Two-level (in-process LRU + Redis) cache of serialized players.
+
+    Redis is optional: when no client is configured, or when it raises, the
+    cache degrades to the local LRU and the loader. After a Redis failure the
+    remote tier is skipped for ``retry_after`` seconds so that an outage does
+    not add a socket timeout to every request.
+
+    Besides the full payload, each player can have partial payloads (sparse
+    fieldsets) cached under a *variant* name. Remotely they are the fields of
+    one hash per player, so that invalidating a player drops every variant
+    with the same single ``DEL``.
+
+    *remote_fill_allowed*, when given, is asked before a loaded payload is
+    stored in Redis; loads it rejects (reads served by a lagging replica) only
+    fill the local tier.
+
+    Cached payloads are shared between callers and must not be mutated.
+    """
+
+    def __init__(
+        self,
+        redis_client: Any = None,
+        ttl: int = 60,
+        local_ttl: float = 5.0,
+        local_maxsize: int = 1024,
+        namespace: str = "player",
+        version: str = "v1",
+        retry_after: float = 5.0,
+        remote_fill_allowed: Optional[Callable[[], bool]] = None,
+    ) -> None:
+        self.redis = redis_client
+        self.ttl = ttl
+        self.prefix = f"{namespace}:{version}:"
+        self.retry_after = retry_after
+        self.remote_fill_allowed = remote_fill_allowed
+        self._local = LocalLRU(local_maxsize, local_ttl)
+        self._flight = SingleFlight()
+        self._variants: Set[str] = set()
+        self._redis_down_until = 0.0
+        self._fill = (
+            redis_client.register_script(FILL_SCRIPT)
+            if redis_client is not None
+            else None
+        )
+
+    def key(self, player_id: int) -> str:
+        return f"{self.prefix}{player_id}"
+
+    def variants_key(self, player_id: int) -> str:
+        return f"{self.prefix}{player_id}:fields"
+
+    def generation_key(self, player_id: int) -> str:
+        return f"{self.prefix}{player_id}:gen"
+
+    def get_or_load(
+        self, player_id: int, loader: Loader, variant: Optional[str] = None
+    ) -> Optional[Payload]:
+        """Return the payload for *player_id*, calling *loader* on a full miss.
+
+        Missing players (``loader`` returning ``None``) are not cached.
+        """
+
+        key = self._local_key(player_id, variant)
+        payload = self._local.get(key)
+        if payload is not None:
+            return payload
+
+        return self._flight.do(key, lambda: self._load(key, player_id, variant, loader))
+
+    def get(self, player_id: int, variant: Optional[str] = None) -> Optional[Payload]:
+        """Return the cached payload for *player_id* without loading it."""
+
+        key = self._local_key(player_id, variant)
+        payload = self._local.get(key)
+        if payload is None:
+            payload = self._remote_get_many([player_id], variant)[0][0]
+            if payload is not None:
+                self._local.set(key, payload)
+        return payload
+
+    def get_many_or_load(
+        self,
+        player_ids: Sequence[int],
+        loader: BulkLoader,
+        variant: Optional[str] = None,
+    ) -> Dict[int, Payload]:
+        """Return the cached payloads for *player_ids*, bulk-loading the misses.
+
+        Local hits are served first, the remaining keys are fetched with a
+        single round-trip and whatever is still missing is handed to *loader*
+        in one call. Players unknown to the loader are absent from the result.
+        """
+
+        found: Dict[int, Payload] = {}
+        pending: List[int] = []
+        for player_id in player_ids:
+            payload = self._local.get(self._local_key(player_id, variant))
+            if payload is None:
+                pending.append(player_id)
+            else:
+                found[player_id] = payload
+
+        if not pending:
+            return found
+
+        remote, generations = self._remote_get_many(pending, variant)
+        missing: List[int] = []
+        seen: Dict[int, Optional[Generation]] = {}
+        for player_id, payload, generation in zip(pending, remote, generations):
+            if payload is None:
+                missing.append(player_id)
+                seen[player_id] = generation
+            else:
+                found[player_id] = payload
+                self._local.set(self._local_key(player_id, variant), payload)
+
+        if missing:
+            loaded = loader(missing)
+            for player_id, payload in loaded.items():
+                self._local.set(self._local_key(player_id, variant), payload)
+            self._remote_fill(loaded, variant, seen)
+            found.update(loaded)
+
+        return found
+
+    def set(self, player_id: int, payload: Payload) -> None:
+        """Store a freshly committed full payload; drop the partial ones."""
+
+        self._local.set(self.key(player_id), payload)
+        self._drop_local_variants([player_id])
+        if self.ttl <= 0 or not self._remote_available():
+            return
+
+        try:
+            pipe = self.redis.pipeline(transaction=False)
+            pipe.set(self.key(player_id), self._encode(payload), ex=self.ttl)
+            pipe.delete(self.variants_key(player_id))
+            self._bump_generations(pipe, [player_id])
+            pipe.execute()
+        except RedisError as exc:
+            self._mark_redis_down(exc)
+
+    def invalidate(self, player_id: int) -> None:
+        """Drop every payload of *player_id* from both cache tiers."""
+
+        self.invalidate_many([player_id])
+
+    def invalidate_many(self, player_ids: Iterable[int]) -> None:
+        """Drop every payload of the players in *player_ids* from both tiers."""
+
+        player_ids = list(player_ids)
+        for player_id in player_ids:
+            self._local.delete(self.key(player_id))
+        self._drop_local_variants(player_ids)
+        if player_ids and self._remote_available():
+            keys = [self.key(player_id) for player_id in player_ids]
+            keys += [self.variants_key(player_id) for player_id in player_ids]
+            try:
+                pipe = self.redis.pipeline(transaction=False)
+                pipe.delete(*keys)
+                self._bump_generations(pipe, player_ids)
+                pipe.execute()
+            except RedisError as exc:
+                self._mark_redis_down(exc)
+
+    def apply_changes(self, sender: Any, changes: Iterable[Any]) -> None:
+        """``players_changed`` receiver: refresh or drop the changed players."""
+
+        stale = []
+        for change in changes:
+            if change.payload is None:
+                stale.append(change.player_id)
+            else:
+                self.set(change.player_id, change.payload)
+        if stale:
+            self.invalidate_many(stale)
+
+    def apply_removals(self, sender: Any, player_ids: Iterable[int]) -> None:
+        """``players_removed`` receiver: drop the removed players."""
+
+        self.invalidate_many(player_ids)
+
+    def clear_local(self) -> None:
+        self._local.clear()
+
+    def _local_key(self, player_id: int, variant: Optional[str]) -> Hashable:
+        if variant is None:
+            return self.key(player_id)
+        self._variants.add(variant)
+        return (player_id, variant)
+
+    def _drop_local_variants(self, player_ids: Iterable[int]) -> None:
+        variants = list(self._variants)
+        for player_id in player_ids:
+            for variant in variants:
+                self._local.delete((player_id, variant))
+
+    def _load(
+        self, key: Hashable, player_id: int, variant: Optional[str], loader: Loader
+    ) -> Optional[Payload]:
+        payloads, generations = self._remote_get_many([player_id], variant)
+        payload = payloads[0]
+        if payload is None:
+            payload = loader(player_id)
+            if payload is None:
+                return None
+            self._remote_fill(
+                {player_id: payload}, variant, {player_id: generations[0]}
+            )
+
+        self._local.set(key, payload)
+        return payload
+
+    def _remote_available(self) -> bool:
+        return self.redis is not None and time.monotonic() >= self._redis_down_until
+
+    def _mark_redis_down(self, exc: Exception) -> None:
+        logger.warning("Redis unavailable for player cache: %s", exc)
+        self._redis_down_until = time.monotonic() + self.retry_after
+
+    def _remote_get_many(
+        self, player_ids: List[int], variant: Optional[str]
+    ) -> Tuple[List[Optional[Payload]], List[Optional[Generation]]]:
+        """Return the cached payloads and the generations of *player_ids*.
+
+        A generation is ``None`` when Redis could not be read, which rules out
+        filling the player afterwards.
+        """
+
+        count = len(player_ids)
+        if not self._remote_available():
+            return [None] * count, [None] * count
+
+        generation_keys = [self.generation_key(player_id) for player_id in player_ids]
+        try:
+            if variant is None:
+                raws = self.redis.mget(
+                    [self.key(player_id) for player_id in player_ids] + generation_keys
+                )
+            else:
+                pipe = self.redis.pipeline(transaction=False)
+                for player_id in player_ids:
+                    pipe.hget(self.variants_key(player_id), variant)
+                for key in generation_keys:
+                    pipe.get(key)
+                raws = pipe.execute()
+        except RedisError as exc:
+            self._mark_redis_down(exc)
+            return [None] * count, [None] * count
+
+        return (
+            [self._decode(raw) for raw in raws[:count]],
+            [b"" if raw is None else raw for raw in raws[count:]],
+        )
+
+    @staticmethod
+    def _decode(raw: Optional[bytes]) -> Optional[Payload]:
+        if raw is None:
+            return None
+
+        try:
+            return json.loads(raw)
+        except ValueError:
+            return None
+
+    def _remote_fill(
+        self,
+        payloads: Dict[int, Payload],
+        variant: Optional[str],
+        generations: Dict[int, Optional[Generation]],
+    ) -> None:
+        """Store loaded *payloads* unless a write happened since the lookup."""
+
+        if self.ttl <= 0 or not self._remote_available():
+            return
+        if self.remote_fill_allowed is not None and not self.remote_fill_allowed():
+            return
+
+        keys: List[str] = []
+        args: List[Any] = [self.ttl, variant or ""]
+        for player_id, payload in payloads.items():
+            generation = generations.get(player_id)
+            if generation is None:
+                continue
+            keys.append(
+                self.key(player_id) if variant is None else self.variants_key(player_id)
+            )
+            keys.append(self.generation_key(player_id))
+            args += [generation, self._encode(payload)]
+        if not keys:
+            return
+
+        try:
+            self._fill(keys=keys, args=args)
+        except RedisError as exc:
+            self._mark_redis_down(exc)
+
+    def _bump_generations(self, pipe: Any, player_ids: Iterable[int]) -> None:
+        for player_id in player_ids:
+            key = self.generation_key(player_id)
+            pipe.incr(key)
+            pipe.expire(key, max(self.ttl, 1))
+
+    @staticmethod
+    def _encode(payload: Payload) -> str:
+        return json.dumps(payload, separators=(",", ":"))
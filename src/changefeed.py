@@ -0,0 +1,470 @@
+"""Change feed of committed player writes, streamed as Server-Sent Events.
+
+Every ``players_changed`` notification is turned into compact events (id,
+level, experience and, when the writer knows them, name and version) and
+published to a feed. ``GET /players/changes`` subscribes to the events of a
+few players and streams them; each event carries an id, and a client that
+reconnects with ``Last-Event-ID`` first receives the events it missed.
+
+Missed events are replayed from a bounded ring buffer. When the requested id
+has already left the ring, the stream sends a ``reset`` event instead: the
+consumer must re-read the players it follows.
+
+Two feeds are provided:
+
+* :class:`LocalChangeFeed` keeps the ring in process and delivers directly to
+  the subscribers of that process. It only sees writes made by its own
+  process, so it is meant for single-process and test setups;
+* :class:`RedisChangeFeed` appends events to a capped Redis stream, which is
+  both the bus and the ring shared by every worker. One listener thread per
+  process reads new entries and fans them out to the local subscribers, so a
+  worker holds a single Redis connection for the feed however many clients are
+  connected.
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import deque
+from typing import (
+    Any,
+    Deque,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    NamedTuple,
+    Optional,
+    Sequence,
+    Set,
+    Tuple,
+)
+
+from redis.exceptions import RedisError
+
+logger = logging.getLogger(__name__)
+
+EventKey = Tuple[int, int]
+"""Ordering key of an event id: ``(sequence, 0)`` or a Redis ``(ms, seq)``."""
+
+
+class ChangeEvent(NamedTuple):
+    """A published change: its feed id and its JSON body."""
+
+    event_id: str
+    player_id: int
+    data: Dict[str, Any]
+
+
+class FeedFull(Exception):
+    """The process already serves as many change streams as it accepts."""
+
+
+class FeedUnavailable(Exception):
+    """The feed backend could not be reached."""
+
+
+def event_key(event_id: str) -> Optional[EventKey]:
+    """Return the ordering key of *event_id*, or ``None`` if it is malformed."""
+
+    first, _, second = event_id.partition("-")
+    if not first.isdigit() or (second and not second.isdigit()):
+        return None
+    return int(first), int(second or 0)
+
+
+def compact_event(change: Any) -> Dict[str, Any]:
+    """Return the event body published for a ``PlayerChange``."""
+
+    data = {"player_id": change.player_id, "level": change.level, "xp": change.xp}
+    if change.payload is not None:
+        for field in ("name", "version"):
+            if field in change.payload:
+                data[field] = change.payload[field]
+    return data
+
+
+def format_event(event: ChangeEvent) -> str:
+    body = json.dumps(event.data, separators=(",", ":"))
+    return f"id: {event.event_id}\nevent: player\ndata: {body}\n\n"
+
+
+def format_reset(event_id: Optional[str]) -> str:
+    """Tell the client its history is gone; it resumes from *event_id*."""
+
+    prefix = f"id: {event_id}\n" if event_id is not None else ""
+    return f"{prefix}event: reset\ndata: {{}}\n\n"
+
+
+class Subscription:
+    """Events of a set of players, queued for one stream."""
+
+    def __init__(
+        self, feed: "_Fanout", player_ids: Sequence[int], maxsize: int
+    ) -> None:
+        self.player_ids = frozenset(player_ids)
+        self.maxsize = maxsize
+        self.overflowed = False
+        self._feed = feed
+        self._events: Deque[ChangeEvent] = deque()
+        self._ready = threading.Condition()
+
+    def put(self, event: ChangeEvent) -> None:
+        with self._ready:
+            if len(self._events) >= self.maxsize:
+                # A consumer this slow resumes through Last-Event-ID instead.
+                self.overflowed = True
+            else:
+                self._events.append(event)
+            self._ready.notify()
+
+    def get(self, timeout: float) -> List[ChangeEvent]:
+        """Return the queued events, waiting up to *timeout* for the first."""
+
+        with self._ready:
+            if not self._events and not self.overflowed:
+                self._ready.wait(timeout)
+            events = list(self._events)
+            self._events.clear()
+            return events
+
+    def close(self) -> None:
+        self._feed.unsubscribe(self)
+
+    def __enter__(self) -> "Subscription":
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.close()
+
+
+class _Fanout:
+    """Subscriber registry shared by both feeds."""
+
+    def __init__(self, max_subscribers: int, queue_size: int) -> None:
+        self.max_subscribers = max_subscribers
+        self.queue_size = queue_size
+        self._subscribers: Dict[int, Set[Subscription]] = {}
+        self._count = 0
+        self._lock = threading.Lock()
+
+    def subscribe(self, player_ids: Sequence[int]) -> Subscription:
+        subscription = Subscription(self, player_ids, self.queue_size)
+        with self._lock:
+            if self._count >= self.max_subscribers:
+                raise FeedFull()
+            self._count += 1
+            for player_id in subscription.player_ids:
+                self._subscribers.setdefault(player_id, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        with self._lock:
+            removed = False
+            for player_id in subscription.player_ids:
+                subscribers = self._subscribers.get(player_id)
+                if subscribers is None or subscription not in subscribers:
+                    continue
+                removed = True
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._subscribers[player_id]
+            if removed:
+                self._count -= 1
+
+    def dispatch(self, events: Iterable[ChangeEvent]) -> None:
+        with self._lock:
+            targets = [
+                (event, list(self._subscribers.get(event.player_id, ())))
+                for event in events
+            ]
+        for event, subscribers in targets:
+            for subscription in subscribers:
+                subscription.put(event)
+
+    @property
+    def subscriber_count(self) -> int:
+        return self._count
+
+
+class ChangeFeed(ABC):
+    """Base feed: publication from ``players_changed`` and SSE streams."""
+
+    def __init__(self, max_subscribers: int = 2, queue_size: int = 1000) -> None:
+        self.fanout = _Fanout(max_subscribers, queue_size)
+
+    def apply_changes(self, sender: Any, changes: Iterable[Any]) -> None:
+        """``players_changed`` receiver: publish one event per changed player."""
+
+        events = [(change.player_id, compact_event(change)) for change in changes]
+        if not events:
+            return
+
+        try:
+            self.publish(events)
+        except RedisError as exc:
+            logger.warning("Change feed publication failed: %s", exc)
+
+    def subscribe(self, player_ids: Sequence[int]) -> Subscription:
+        return self.fanout.subscribe(player_ids)
+
+    @abstractmethod
+    def publish(self, events: Sequence[Tuple[int, Dict[str, Any]]]) -> None:
+        """Append *events* to the feed and deliver them to subscribers."""
+
+    @abstractmethod
+    def replay(
+        self, after: EventKey, player_ids: Iterable[int]
+    ) -> Tuple[Optional[List[ChangeEvent]], Optional[str]]:
+        """Return the events after *after* and the newest id of the feed.
+
+        The events are ``None`` when some of them have left the ring.
+        """
+
+    def stream(
+        self,
+        subscription: Subscription,
+        last_event_id: Optional[str],
+        heartbeat: float,
+        duration: float,
+    ) -> Iterator[str]:
+        """Yield the SSE text of *subscription* for *duration* seconds.
+
+        *subscription* must be taken before the replay so that no event falls
+        between the two; events delivered by both are sent once.
+        """
+
+        try:
+            yield ": connected\n\n"
+            seen = event_key(last_event_id) if last_event_id is not None else None
+            if seen is not None:
+                try:
+                    missed, newest = self.replay(seen, subscription.player_ids)
+                except RedisError as exc:
+                    logger.warning("Change feed replay failed: %s", exc)
+                    missed, newest = None, None
+                if missed is None:
+                    yield format_reset(newest)
+                    if newest is not None:
+                        seen = event_key(newest)
+                else:
+                    for event in missed:
+                        yield format_event(event)
+                        seen = event_key(event.event_id)
+
+            deadline = time.monotonic() + duration
+            while not subscription.overflowed:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                events = subscription.get(min(heartbeat, remaining))
+                if not events:
+                    yield ": keepalive\n\n"
+                    continue
+                for event in events:
+                    key = event_key(event.event_id)
+                    if seen is not None and key <= seen:
+                        continue
+                    yield format_event(event)
+                    seen = key
+        finally:
+            subscription.close()
+
+    def stop(self) -> None:
+        pass
+
+
+class LocalChangeFeed(ChangeFeed):
+    """In-process feed with a ring of the last ``ring_size`` events."""
+
+    def __init__(
+        self, ring_size: int = 10_000, max_subscribers: int = 2, queue_size: int = 1000
+    ) -> None:
+        super().__init__(max_subscribers, queue_size)
+        self._ring: Deque[Tuple[int, ChangeEvent]] = deque(maxlen=ring_size)
+        self._sequence = 0
+        self._lock = threading.Lock()
+
+    def publish(self, events: Sequence[Tuple[int, Dict[str, Any]]]) -> None:
+        published = []
+        with self._lock:
+            for player_id, data in events:
+                self._sequence += 1
+                event = ChangeEvent(str(self._sequence), player_id, data)
+                self._ring.append((self._sequence, event))
+                published.append(event)
+            # Dispatching under the lock keeps every subscriber's queue in id
+            # order when writers publish concurrently.
+            self.fanout.dispatch(published)
+
+    def replay(
+        self, after: EventKey, player_ids: Iterable[int]
+    ) -> Tuple[Optional[List[ChangeEvent]], Optional[str]]:
+        player_ids = frozenset(player_ids)
+        with self._lock:
+            newest = str(self._sequence)
+            oldest = self._ring[0][0] if self._ring else self._sequence + 1
+            if after[0] > self._sequence or after[0] < oldest - 1:
+                return None, newest
+            missed = [
+                event
+                for sequence, event in self._ring
+                if sequence > after[0] and event.player_id in player_ids
+            ]
+        return missed, newest
+
+    def __len__(self) -> int:
+        return len(self._ring)
+
+
+class RedisChangeFeed(ChangeFeed):
+    """Feed stored in a capped Redis stream and read by one thread per process.
+
+    The listener blocks on ``XREAD`` for ``poll_interval`` seconds at a time,
+    which must stay below the client's socket timeout. It runs only while the
+    process has subscribers. The stream is trimmed approximately, so replay
+    may ask for a reset slightly earlier than ``ring_size`` events.
+    """
+
+    def __init__(
+        self,
+        redis_client: Any,
+        ring_size: int = 10_000,
+        max_subscribers: int = 2,
+        queue_size: int = 1000,
+        stream: str = "players:changes",
+        poll_interval: float = 0.2,
+        retry_delay: float = 1.0,
+    ) -> None:
+        super().__init__(max_subscribers, queue_size)
+        self.redis = redis_client
+        self.ring_size = ring_size
+        self.stream = stream
+        self.poll_interval = poll_interval
+        self.retry_delay = retry_delay
+        self._start_lock = threading.Lock()
+        self._stopping = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._pid: Optional[int] = None
+        self._position = "0-0"
+
+    def publish(self, events: Sequence[Tuple[int, Dict[str, Any]]]) -> None:
+        pipe = self.redis.pipeline(transaction=False)
+        for player_id, data in events:
+            pipe.xadd(
+                self.stream,
+                {"player": player_id, "data": json.dumps(data, separators=(",", ":"))},
+                maxlen=self.ring_size,
+                approximate=True,
+            )
+        pipe.execute()
+
+    def subscribe(self, player_ids: Sequence[int]) -> Subscription:
+        subscription = super().subscribe(player_ids)
+        try:
+            self.ensure_running()
+        except RedisError as exc:
+            subscription.close()
+            raise FeedUnavailable(str(exc)) from exc
+        return subscription
+
+    def replay(
+        self, after: EventKey, player_ids: Iterable[int]
+    ) -> Tuple[Optional[List[ChangeEvent]], Optional[str]]:
+        player_ids = frozenset(player_ids)
+        after_id = f"{after[0]}-{after[1]}"
+        pipe = self.redis.pipeline(transaction=True)
+        pipe.xrange(self.stream, "-", "+", count=1)
+        pipe.xrevrange(self.stream, "+", "-", count=1)
+        pipe.xrange(self.stream, f"({after_id}", "+")
+        oldest, newest, entries = pipe.execute()
+        if not newest:
+            # An empty stream lost its history (Redis was flushed or restarted).
+            return None, None
+
+        newest_id = newest[0][0].decode("ascii")
+        oldest_key = event_key(oldest[0][0].decode("ascii"))
+        if after > event_key(newest_id) or after < oldest_key:
+            # Ids between *after* and the oldest entry may have been trimmed.
+            return None, newest_id
+
+        events = [self._decode(entry_id, fields) for entry_id, fields in entries]
+        return [
+            event
+            for event in events
+            if event is not None and event.player_id in player_ids
+        ], newest_id
+
+    def ensure_running(self) -> None:
+        """Start the listener thread in this process if it is not running."""
+
+        with self._start_lock:
+            if self._thread is not None and self._pid == os.getpid():
+                return
+            # Position the listener before any replay, so that every event
+            # after it reaches the subscribers.
+            newest = self.redis.xrevrange(self.stream, "+", "-", count=1)
+            self._position = newest[0][0].decode("ascii") if newest else "0-0"
+            self._stopping.clear()
+            self._pid = os.getpid()
+            self._thread = threading.Thread(
+                target=self._run, name="change-feed", daemon=True
+            )
+            self._thread.start()
+
+    def stop(self) -> None:
+        self._stopping.set()
+        thread = self._thread
+        if thread is not None and self._pid == os.getpid():
+            thread.join(self.poll_interval + self.retry_delay)
+        self._thread = None
+
+    def poll(self, block: Optional[float] = None) -> int:
+        """Dispatch the entries after the listener position; return their count."""
+
+        response = self.redis.xread(
+            {self.stream: self._position},
+            count=self.fanout.queue_size,
+            block=None if block is None else int(block * 1000),
+        )
+        entries = response[0][1] if response else []
+        if entries:
+            self._position = entries[-1][0].decode("ascii")
+            events = [self._decode(entry_id, fields) for entry_id, fields in entries]
+            self.fanout.dispatch(event for event in events if event is not None)
+        return len(entries)
+
+    def _run(self) -> None:
+        while not self._stopping.is_set():
+            with self._start_lock:
+                if not self.fanout.subscriber_count:
+                    self._thread = None
+                    return
+            try:
+                # Drain what is already there before blocking: some
+                # Redis-compatible servers only wake a blocked XREAD for
+                # entries appended during the call.
+                if not self.poll():
+                    self.poll(self.poll_interval)
+            except RedisError as exc:
+                logger.warning(
+                    "Change feed read failed; retrying in %.1fs: %s",
+                    self.retry_delay,
+                    exc,
+                )
+                self._stopping.wait(self.retry_delay)
+
+    @staticmethod
+    def _decode(entry_id: bytes, fields: Dict[bytes, bytes]) -> Optional[ChangeEvent]:
+        try:
+            return ChangeEvent(
+                entry_id.decode("ascii"),
+                int(fields[b"player"]),
+                json.loads(fields[b"data"]),
+            )
+        except (KeyError, ValueError, UnicodeDecodeError):
+            logger.warning("Dropping malformed change event %r", entry_id)
+            return None
@@ -0,0 +1,81 @@
+"""Set-based experience awards for many players at once."""
+
+from typing import Dict, List, Mapping, NamedTuple
+
+import numpy as np
+from sqlalchemy import bindparam, select
+
+from .extensions import db
+from .leveling import apply_experience_batch
+from .models import Player
+
+
+class ExperienceResult(NamedTuple):
+    """Outcome of an experience award for a single player."""
+
+    level: int
+    xp: int
+    levels_gained: int
+
+
+def apply_experience_awards(
+    awards: Mapping[int, int], chunk_size: int = 1000
+) -> Dict[int, ExperienceResult]:
+    """Apply ``{player_id: amount}`` awards within the current transaction.
+
+    Players are processed in ascending id order, *chunk_size* at a time: each
+    chunk's rows are read (and locked where the dialect supports it), the new
+    levels are computed for the whole chunk with
+    :func:`~src.leveling.apply_experience_batch`, and written back with a
+    single executemany ``UPDATE`` by primary key that also bumps ``version``.
+    The caller owns the transaction and is responsible for committing or
+    rolling back.
+
+    Args:
+        awards: Non-negative experience amounts keyed by player id.
+        chunk_size: Maximum number of players read and updated per statement.
+
+    Returns:
+        The new state of every awarded player that exists, keyed by id.
+    """
+
+    results: Dict[int, ExperienceResult] = {}
+    player_ids = sorted(awards)
+    players = Player.__table__
+    update_statement = (
+        players.update()
+        .where(players.c.id == bindparam("player_id"))
+        .values(
+            level=bindparam("new_level"),
+            xp=bindparam("new_xp"),
+            version=players.c.version + 1,
+        )
+    )
+
+    for start in range(0, len(player_ids), chunk_size):
+        chunk = player_ids[start : start + chunk_size]
+        rows = db.session.execute(
+            select(Player.id, Player.level, Player.xp)
+            .where(Player.id.in_(chunk))
+            .with_for_update()
+        ).all()
+        if not rows:
+            continue
+
+        ids = [row.id for row in rows]
+        levels, xps, gained = apply_experience_batch(
+            np.fromiter((row.level for row in rows), dtype=np.int64, count=len(rows)),
+            np.fromiter((row.xp for row in rows), dtype=np.int64, count=len(rows)),
+            np.fromiter((awards[pid] for pid in ids), dtype=np.int64, count=len(ids)),
+        )
+
+        params: List[Dict[str, int]] = []
+        for player_id, level, xp, levels_gained in zip(
+            ids, levels.tolist(), xps.tolist(), gained.tolist()
+        ):
+            params.append({"player_id": player_id, "new_level": level, "new_xp": xp})
+            results[player_id] = ExperienceResult(level, xp, levels_gained)
+
+        db.session.execute(update_statement, params)
+
+    return results
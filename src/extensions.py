@@ -1,6 +1,164 @@
 """Application extensions used across the service."""
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Iterable, Iterator, Mapping, Optional
+
+import redis
+from flask import has_request_context, request
 from flask_sqlalchemy import SQLAlchemy
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event
+from sqlalchemy.engine import Engine, make_url
+
+READ_ENGINE_ENVIRON_KEY = "db.read_engine"
+"""WSGI environ key holding the engine chosen for a read-only request."""
+
+SHARD_ENGINE_ENVIRON_KEY = "db.shard_engine"
+"""WSGI environ key holding the shard engine owning the request's player."""
+
+SUPPORTED_DIALECTS = ("postgresql", "sqlite")
+"""Database backends whose upsert and ``RETURNING`` statements the service uses."""
+
+_bound_engine: ContextVar[Optional[Engine]] = ContextVar("bound_engine", default=None)
+
+
+@contextmanager
+def bound_engine(engine: Engine) -> Iterator[None]:
+    """Send every session statement issued in the block to *engine*."""
+
+    token = _bound_engine.set(engine)
+    try:
+        yield
+    finally:
+        _bound_engine.reset(token)
+
+
+class RoutingSession(Session):
+    """Session that can be pointed at another engine than the default bind.
+
+    In order of precedence: an engine bound with :func:`bound_engine`, the
+    shard engine chosen for the request by :class:`~src.sharding.ShardSet`,
+    and, outside flushes, the replica engine chosen for a read-only request by
+    :class:`~src.replicas.ReplicaRouter`. Everything else uses the regular
+    binds, i.e. the primary.
+    """
 
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None:
+            engine = _bound_engine.get()
+            if engine is not None:
+                return engine
 
-db = SQLAlchemy()
+            if has_request_context():
+                environ = request.environ
+                engine = environ.get(SHARD_ENGINE_ENVIRON_KEY)
+                if engine is None and not self._flushing:
+                    engine = environ.get(READ_ENGINE_ENVIRON_KEY)
+                if engine is not None:
+                    return engine
+
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+db = SQLAlchemy(session_options={"class_": RoutingSession})
 """Database extension instance."""
+
+
+def engine_options(config: Mapping[str, Any]) -> Dict[str, Any]:
+    """Return SQLAlchemy engine options for the configured database.
+
+    Server databases get a connection pool sized for one worker process: each
+    request thread holds at most one connection, so ``pool_size`` defaults to
+    the number of gunicorn threads, with a small overflow for bursts. SQLite
+    keeps Flask-SQLAlchemy's driver defaults.
+    """
+
+    url = make_url(config["SQLALCHEMY_DATABASE_URI"])
+    if url.get_backend_name() == "sqlite":
+        return {}
+
+    return {
+        "pool_size": int(config["DB_POOL_SIZE"]),
+        "max_overflow": int(config["DB_MAX_OVERFLOW"]),
+        "pool_timeout": float(config["DB_POOL_TIMEOUT"]),
+        "pool_recycle": int(config["DB_POOL_RECYCLE"]),
+        "pool_pre_ping": True,
+    }
+
+
+def check_database_urls(urls: Iterable[str]) -> None:
+    """Raise ``ValueError`` unless every URL targets a supported backend.
+
+    Registration, stat increments and XP receipts build dialect-specific
+    statements, so an unsupported backend is rejected at startup rather than
+    on the first write.
+    """
+
+    for url in urls:
+        backend = make_url(url).get_backend_name()
+        if backend not in SUPPORTED_DIALECTS:
+            raise ValueError(
+                f"Unsupported database dialect {backend!r}; "
+                f"expected one of: {', '.join(SUPPORTED_DIALECTS)}."
+            )
+
+
+def _set_sqlite_pragmas(dbapi_connection: Any, connection_record: Any) -> None:
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.execute("PRAGMA busy_timeout=5000")
+    cursor.close()
+
+
+def configure_sqlite(engine: Engine) -> None:
+    """Enable WAL and a busy timeout on file-backed SQLite engines.
+
+    WAL lets readers proceed while a writer holds the lock, which matters once
+    several gunicorn workers share the default ``players.db`` file.
+    """
+
+    url = engine.url
+    if url.get_backend_name() != "sqlite" or url.database in (None, "", ":memory:"):
+        return
+
+    if not event.contains(engine, "connect", _set_sqlite_pragmas):
+        event.listen(engine, "connect", _set_sqlite_pragmas)
+
+
+def dispose_engines(app: Any) -> None:
+    """Drop pooled connections inherited from a parent process.
+
+    Called after ``fork()``: the child must not reuse sockets owned by the
+    parent, and ``close=False`` leaves them open for the parent to keep using.
+    """
+
+    with app.app_context():
+        for engine in db.engines.values():
+            engine.dispose(close=False)
+
+    for name in ("replica_router", "shards"):
+        extension = app.extensions.get(name)
+        if extension is not None:
+            extension.dispose(close=False)
+
+
+def create_redis_client(config: Mapping[str, Any]) -> Optional[redis.Redis]:
+    """Return the Redis client configured for the application, if any.
+
+    ``REDIS_CLIENT`` takes precedence so tests can inject a fake server;
+    otherwise a client is built lazily from ``REDIS_URL``.
+    """
+
+    client = config.get("REDIS_CLIENT")
+    if client is not None:
+        return client
+
+    url = config.get("REDIS_URL")
+    if not url:
+        return None
+
+    timeout = config.get("REDIS_SOCKET_TIMEOUT", 0.25)
+    return redis.Redis.from_url(
+        url, socket_timeout=timeout, socket_connect_timeout=timeout
+    )
@@ -0,0 +1,122 @@
+"""Sparse fieldsets for player reads.
+
+``?fields=name,level`` limits a player payload to the listed fields, and
+``include=stats`` (or ``stats`` in ``fields``) adds the combat stats. The
+fieldset shapes the SQL: only the requested columns are selected, and the
+``player_stats`` join is left out unless stats are requested. ``id`` and
+``version`` are always included, for cursors and ETags.
+
+Without either parameter a read returns the full payload, as before.
+"""
+
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from sqlalchemy import bindparam, select
+from sqlalchemy.engine import Connection
+from sqlalchemy.sql import Select
+
+from .models import Player, PlayerStats
+
+PLAYER_FIELDS = ("id", "user_id", "name", "level", "xp", "version")
+"""Player columns that can be requested, in payload order."""
+
+STATS_FIELD = "stats"
+
+_REQUIRED_FIELDS = frozenset({"id", "version"})
+
+_players = Player.__table__
+_stats = PlayerStats.__table__
+_STATS_COLUMNS = (_stats.c.health, _stats.c.attack, _stats.c.defense)
+
+
+class FieldSet(NamedTuple):
+    """The player fields a read returns, and whether stats are joined."""
+
+    fields: Tuple[str, ...]
+    stats: bool
+
+    @property
+    def is_full(self) -> bool:
+        return self == FULL_FIELDSET
+
+    @property
+    def variant(self) -> str:
+        """Cache variant name; distinct for every distinct fieldset."""
+
+        return ",".join(self.fields + ((STATS_FIELD,) if self.stats else ()))
+
+    def select(self) -> Select:
+        columns = [_players.c[name] for name in self.fields]
+        if not self.stats:
+            return select(*columns)
+
+        return select(*columns, *_STATS_COLUMNS).select_from(
+            _players.outerjoin(_stats, _stats.c.player_id == _players.c.id)
+        )
+
+    def payload(self, row: Any) -> Dict[str, Any]:
+        payload = {name: row[index] for index, name in enumerate(self.fields)}
+        if self.stats:
+            health = row[len(self.fields)]
+            payload[STATS_FIELD] = (
+                None
+                if health is None
+                else {
+                    "health": health,
+                    "attack": row[len(self.fields) + 1],
+                    "defense": row[len(self.fields) + 2],
+                }
+            )
+        return payload
+
+    def project(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        """Return the part of a full player *payload* this fieldset selects."""
+
+        projected = {name: payload[name] for name in self.fields}
+        if self.stats:
+            projected[STATS_FIELD] = payload[STATS_FIELD]
+        return projected
+
+
+FULL_FIELDSET = FieldSet(PLAYER_FIELDS, True)
+
+
+def parse_fieldset(fields: Optional[str], include: Optional[str]) -> Optional[FieldSet]:
+    """Return the fieldset for the ``fields``/``include`` arguments.
+
+    Returns ``None`` if either argument names an unknown field.
+    """
+
+    included = {name for name in (include or "").split(",") if name}
+    if not included <= {STATS_FIELD}:
+        return None
+    if fields is None:
+        return FULL_FIELDSET
+
+    requested = {name.strip() for name in fields.split(",") if name.strip()}
+    if not requested <= set(PLAYER_FIELDS) | {STATS_FIELD}:
+        return None
+
+    return FieldSet(
+        tuple(
+            name
+            for name in PLAYER_FIELDS
+            if name in requested or name in _REQUIRED_FIELDS
+        ),
+        STATS_FIELD in requested or STATS_FIELD in included,
+    )
+
+
+def load_fieldset_payloads(
+    connection: Connection, fieldset: FieldSet, player_ids: Iterable[int]
+) -> Dict[int, Dict[str, Any]]:
+    """Return the *fieldset* payloads of the existing players in *player_ids*."""
+
+    rows = connection.execute(
+        fieldset.select().where(
+            _players.c.id.in_(bindparam("player_ids", expanding=True))
+        ),
+        {"player_ids": list(player_ids)},
+    )
+    payloads: List[Dict[str, Any]] = [fieldset.payload(row) for row in rows]
+    return {payload["id"]: payload for payload in payloads}
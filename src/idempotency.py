@@ -0,0 +1,150 @@
+"""Stored responses for requests carrying an ``Idempotency-Key`` header.
+
+A client that retries a request after a timeout cannot tell whether the first
+attempt was applied. When the request carries an idempotency key, the first
+attempt claims the key, runs, and stores its response; retries with the same
+key are answered from the stored response without re-running the handler.
+
+Keys are claimed with ``SET NX`` in Redis so that workers agree on them, and
+fall back to an in-process map when Redis is not configured or unavailable.
+A claimed key whose request has not finished is reported as in use rather
+than executed twice. Reusing a key for a different request body is rejected.
+"""
+
+import json
+import logging
+import time
+from typing import Any, NamedTuple, Optional
+
+from redis.exceptions import RedisError
+
+from .cache import LocalLRU
+
+logger = logging.getLogger(__name__)
+
+_PENDING = "pending"
+_DONE = "done"
+
+
+class IdempotencyKeyInUse(Exception):
+    """The key was claimed by a request that has not finished yet."""
+
+
+class IdempotencyKeyMismatch(Exception):
+    """The key was already used for a request with a different body."""
+
+
+class StoredResponse(NamedTuple):
+    status: int
+    body: str
+    etag: Optional[str] = None
+
+
+class IdempotencyStore:
+    """Claim idempotency keys and remember the responses they produced."""
+
+    def __init__(
+        self,
+        redis_client: Any = None,
+        ttl: int = 86400,
+        pending_ttl: int = 60,
+        local_maxsize: int = 10000,
+        namespace: str = "idempotency",
+        retry_after: float = 5.0,
+    ) -> None:
+        self.redis = redis_client
+        self.ttl = ttl
+        self.pending_ttl = pending_ttl
+        self.prefix = f"{namespace}:"
+        self.retry_after = retry_after
+        self._local = LocalLRU(local_maxsize, ttl)
+        self._redis_down_until = 0.0
+
+    def key(self, scope: str, idempotency_key: str) -> str:
+        return f"{self.prefix}{scope}:{idempotency_key}"
+
+    def begin(self, key: str, fingerprint: str) -> Optional[StoredResponse]:
+        """Claim *key* for a request whose body hashes to *fingerprint*.
+
+        Returns ``None`` when the caller now owns the key and must run the
+        request, then call :meth:`complete` or :meth:`release`. Returns the
+        stored response when the key was already completed.
+
+        Raises:
+            IdempotencyKeyInUse: If another request holds the key.
+            IdempotencyKeyMismatch: If the key was used with another body.
+        """
+
+        pending = self._encode({"state": _PENDING, "fingerprint": fingerprint})
+        record = None
+        if self._remote_available():
+            try:
+                # The key can expire between SET NX and GET; claim it again then.
+                for _ in range(2):
+                    if self.redis.set(key, pending, nx=True, ex=self.pending_ttl):
+                        return None
+                    record = self._decode(self.redis.get(key))
+                    if record is not None:
+                        break
+                else:
+                    return None
+            except RedisError as exc:
+                self._mark_redis_down(exc)
+                record = None
+
+        if record is None:
+            if self._local.add(key, pending):
+                return None
+            record = self._decode(self._local.get(key))
+            if record is None:
+                return None
+
+        if record.get("fingerprint") != fingerprint:
+            raise IdempotencyKeyMismatch(key)
+        if record.get("state") != _DONE:
+            raise IdempotencyKeyInUse(key)
+        return StoredResponse(record["status"], record["body"], record.get("etag"))
+
+    def complete(self, key: str, fingerprint: str, response: StoredResponse) -> None:
+        """Store *response* as the outcome of the request holding *key*."""
+
+        record = self._encode(
+            {"state": _DONE, "fingerprint": fingerprint, **response._asdict()}
+        )
+        self._local.set(key, record)
+        if self._remote_available():
+            try:
+                self.redis.set(key, record, ex=self.ttl)
+            except RedisError as exc:
+                self._mark_redis_down(exc)
+
+    def release(self, key: str) -> None:
+        """Give up *key* without storing a response so that a retry can run."""
+
+        self._local.delete(key)
+        if self._remote_available():
+            try:
+                self.redis.delete(key)
+            except RedisError as exc:
+                self._mark_redis_down(exc)
+
+    def _remote_available(self) -> bool:
+        return self.redis is not None and time.monotonic() >= self._redis_down_until
+
+    def _mark_redis_down(self, exc: Exception) -> None:
+        logger.warning("Redis unavailable for idempotency keys: %s", exc)
+        self._redis_down_until = time.monotonic() + self.retry_after
+
+    @staticmethod
+    def _encode(record: dict) -> str:
+        return json.dumps(record, separators=(",", ":"))
+
+    @staticmethod
+    def _decode(raw: Any) -> Optional[dict]:
+        if raw is None:
+            return None
+
+        try:
+            return json.loads(raw)
+        except ValueError:
+            return None
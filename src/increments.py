@@ -0,0 +1,248 @@
+"""Atomic stat and experience increments computed by the database.
+
+Applying a delta by loading the row, changing it in Python and committing
+costs two round-trips and loses updates when two requests interleave. Here
+the delta is part of the ``UPDATE`` itself (``health = health + :delta``) and
+the new row comes back through ``RETURNING``, so concurrent increments all
+apply and the caller never reads the row again.
+
+Experience gains level the player up inside the same statement, using the
+closed form of :mod:`src.leveling` with an integer square root (``isqrt``,
+registered as a function on SQLite connections).
+
+Stats must stay within ``0..MAX_STAT_VALUE`` (the database also enforces the
+``ck_player_stats_*_non_negative`` constraints). Out-of-range results are
+either clamped to the bounds or make the update match no row, in which case
+nothing is applied and the caller rolls back.
+
+On PostgreSQL the player and stats updates run as one statement through
+data-modifying CTEs; SQLite runs them as two statements in the caller's
+transaction. :func:`rename_player` returns renamed players the same way.
+"""
+
+import math
+import sqlite3
+from typing import Any, Mapping, Optional, Sequence
+
+from sqlalchemy import BigInteger, case, cast, event, select, update
+from sqlalchemy.engine import Engine
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.orm import Session
+from sqlalchemy.sql.functions import FunctionElement
+
+from .leveling import XP_PER_LEVEL
+from .models import Player, PlayerStats, fold_name
+from .snapshots import PlayerSnapshot
+
+STAT_COLUMNS = ("health", "attack", "defense")
+"""Stats accepting deltas."""
+
+MAX_STAT_VALUE = 2**31 - 1
+"""Largest value a stat may reach (the columns are 32-bit integers)."""
+
+_players = Player.__table__
+_stats = PlayerStats.__table__
+
+_PLAYER_COLUMNS = (
+    _players.c.id,
+    _players.c.user_id,
+    _players.c.name,
+    _players.c.level,
+    _players.c.xp,
+    _players.c.version,
+)
+_STATS_COLUMNS = (_stats.c.health, _stats.c.attack, _stats.c.defense)
+
+
+class isqrt(FunctionElement):
+    """``floor(sqrt(n))`` computed exactly on integers."""
+
+    type = BigInteger()
+    name = "isqrt"
+    inherit_cache = True
+
+
+@compiles(isqrt)
+def _compile_isqrt(element, compiler, **kw):
+    return f"isqrt({compiler.process(element.clauses, **kw)})"
+
+
+@compiles(isqrt, "postgresql")
+def _compile_isqrt_postgresql(element, compiler, **kw):
+    argument = compiler.process(element.clauses, **kw)
+    return f"CAST(floor(sqrt(CAST({argument} AS numeric))) AS bigint)"
+
+
+def _sqlite_isqrt(value: Optional[int]) -> Optional[int]:
+    return None if value is None else math.isqrt(value)
+
+
+@event.listens_for(Engine, "connect")
+def _register_sqlite_functions(dbapi_connection: Any, connection_record: Any) -> None:
+    if isinstance(dbapi_connection, sqlite3.Connection):
+        dbapi_connection.create_function("isqrt", 1, _sqlite_isqrt, deterministic=True)
+
+
+def experience_values(amount: int) -> dict:
+    """Return ``SET`` values adding *amount* experience and levelling up.
+
+    Mirrors :func:`~src.leveling.apply_experience` for players at level 1 or
+    above (which the ``ck_player_level_positive`` constraint guarantees).
+    """
+
+    level = cast(_players.c.level, BigInteger)
+    total = cast(_players.c.xp, BigInteger) + amount
+    b = 2 * level - 1
+    gained = (isqrt(b * b + 8 * (total // XP_PER_LEVEL)) - b) // 2
+    spent = XP_PER_LEVEL * (gained * level + gained * (gained - 1) // 2)
+    return {"level": level + gained, "xp": total - spent}
+
+
+def _stat_value(column: Any, delta: int, clamp: bool) -> Any:
+    value = cast(column, BigInteger) + delta
+    if not clamp:
+        return value
+    return case((value < 0, 0), (value > MAX_STAT_VALUE, MAX_STAT_VALUE), else_=value)
+
+
+def _statements(
+    player_id: int,
+    user_id: Optional[str],
+    deltas: Mapping[str, int],
+    xp: int,
+    clamp: bool,
+    expected_versions: Optional[Sequence[int]],
+):
+    player_update = (
+        update(_players)
+        .where(_players.c.id == player_id)
+        .values(version=_players.c.version + 1)
+    )
+    if user_id is not None:
+        player_update = player_update.where(_players.c.user_id == user_id)
+    if xp:
+        player_update = player_update.values(**experience_values(xp))
+    if expected_versions is not None:
+        player_update = player_update.where(_players.c.version.in_(expected_versions))
+
+    stats_update = update(_stats).values(
+        {
+            name: _stat_value(_stats.c[name], deltas.get(name, 0), clamp)
+            for name in STAT_COLUMNS
+            if deltas.get(name)
+        }
+        or {"health": _stats.c.health}
+    )
+    if not clamp:
+        stats_update = stats_update.where(
+            *(
+                (cast(_stats.c[name], BigInteger) + delta).between(0, MAX_STAT_VALUE)
+                for name, delta in deltas.items()
+                if delta
+            )
+        )
+    return player_update, stats_update
+
+
+def apply_increments(
+    session: Session,
+    player_id: int,
+    deltas: Mapping[str, int],
+    xp: int = 0,
+    clamp: bool = False,
+    expected_versions: Optional[Sequence[int]] = None,
+    user_id: Optional[str] = None,
+) -> Optional[PlayerSnapshot]:
+    """Add stat *deltas* and *xp* experience to a player and bump its version.
+
+    Args:
+        session: Session whose transaction the updates join.
+        player_id: Player to update.
+        deltas: Signed amounts keyed by names from :data:`STAT_COLUMNS`.
+        xp: Non-negative experience to add.
+        clamp: Clamp out-of-range stats to their bounds instead of refusing.
+        expected_versions: Only update if the player has one of these versions.
+        user_id: Only update if the player belongs to this user.
+
+    Returns:
+        The updated player, or ``None`` when nothing matched: the player or
+        its stats row is missing, the owner or version differs, or a stat
+        would leave its bounds. The caller must roll back in that case, since the player
+        row may already have been updated.
+    """
+
+    player_update, stats_update = _statements(
+        player_id, user_id, deltas, xp, clamp, expected_versions
+    )
+
+    dialect = session.get_bind().dialect.name
+    if dialect == "postgresql":
+        updated_player = player_update.returning(*_PLAYER_COLUMNS).cte("updated_player")
+        updated_stats = (
+            stats_update.where(_stats.c.player_id.in_(select(updated_player.c.id)))
+            .returning(_stats.c.player_id, *_STATS_COLUMNS)
+            .cte("updated_stats")
+        )
+        row = session.execute(
+            select(
+                *(updated_player.c[column.name] for column in _PLAYER_COLUMNS),
+                *(updated_stats.c[column.name] for column in _STATS_COLUMNS),
+            ).select_from(
+                updated_player.join(
+                    updated_stats, updated_stats.c.player_id == updated_player.c.id
+                )
+            )
+        ).first()
+        return None if row is None else PlayerSnapshot(row)
+
+    player = session.execute(player_update.returning(*_PLAYER_COLUMNS)).first()
+    if player is None:
+        return None
+
+    stats = session.execute(
+        stats_update.where(_stats.c.player_id == player_id).returning(*_STATS_COLUMNS)
+    ).first()
+    if stats is None:
+        return None
+    return PlayerSnapshot(tuple(player) + tuple(stats))
+
+
+def rename_player(
+    session: Session,
+    player_id: int,
+    user_id: str,
+    name: str,
+    expected_versions: Optional[Sequence[int]] = None,
+) -> Optional[PlayerSnapshot]:
+    """Rename a player owned by *user_id* and bump its version.
+
+    Returns the renamed player with its stats, or ``None`` when nothing
+    matched: the player is missing, or the owner or version differs.
+    """
+
+    player_update = (
+        update(_players)
+        .where(_players.c.id == player_id, _players.c.user_id == user_id)
+        .values(name=name, name_folded=fold_name(name), version=_players.c.version + 1)
+    )
+    if expected_versions is not None:
+        player_update = player_update.where(_players.c.version.in_(expected_versions))
+
+    if session.get_bind().dialect.name == "postgresql":
+        renamed = player_update.returning(*_PLAYER_COLUMNS).cte("renamed_player")
+        row = session.execute(
+            select(
+                *(renamed.c[column.name] for column in _PLAYER_COLUMNS),
+                *_STATS_COLUMNS,
+            ).select_from(renamed.outerjoin(_stats, _stats.c.player_id == renamed.c.id))
+        ).first()
+        return None if row is None else PlayerSnapshot(row)
+
+    player = session.execute(player_update.returning(*_PLAYER_COLUMNS)).first()
+    if player is None:
+        return None
+
+    stats = session.execute(
+        select(*_STATS_COLUMNS).where(_stats.c.player_id == player_id)
+    ).first()
+    return PlayerSnapshot(tuple(player) + (tuple(stats) if stats else (None,) * 3))
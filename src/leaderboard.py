@@ -0,0 +1,460 @@
+"""Player leaderboard ordered by level, then experience.
+
+Scores combine both columns as ``level * 2**32 + xp`` so a single sorted set
+orders players the same way as ``ORDER BY level DESC, xp DESC``. The score is
+exact as long as it stays below 2**53 (levels under ~2 million), which the
+experience curve keeps us far from. Players with equal scores are ranked by
+id, oldest first: members are fixed-width strings counting down from
+:data:`MEMBER_BASE`, so the sorted set's lexical tie-break follows the ids.
+
+The ranking is built from the database whenever the ready marker is missing
+(a fresh deploy, a flushed Redis): reads raise :class:`LeaderboardRebuilding`
+meanwhile, and the rebuild runs in a background thread, or from
+``flask leaderboard rebuild`` when background rebuilds are disabled. It never
+runs inside a request. Scores only grow, so writes made while a rebuild
+streams the table are applied to the staging set as well, keeping the higher
+score, and players removed meanwhile are dropped from it before it replaces
+the live set.
+"""
+
+import bisect
+import logging
+import threading
+import time
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+import click
+from flask import Flask, current_app
+from flask.cli import AppGroup
+from redis.exceptions import RedisError
+from sqlalchemy import select
+
+from .extensions import db
+from .models import Player
+
+logger = logging.getLogger(__name__)
+
+SCORE_LEVEL_FACTOR = 2**32
+MEMBER_WIDTH = 19
+MEMBER_BASE = 10**MEMBER_WIDTH - 1
+REBUILD_LOCK_TTL = 60.0
+"""Seconds a rebuild holds its claim without writing a batch."""
+
+SET_SCORES_SCRIPT = """
+local rebuilding = redis.call('EXISTS', KEYS[4]) == 1
+for i = 1, #ARGV, 2 do
+    redis.call('ZADD', KEYS[1], ARGV[i + 1], ARGV[i])
+    if rebuilding then
+        redis.call('ZADD', KEYS[2], 'GT', ARGV[i + 1], ARGV[i])
+        redis.call('SREM', KEYS[3], ARGV[i])
+    end
+end
+return #ARGV / 2
+"""
+"""Set member/score pairs, mirrored into the staging set during a rebuild."""
+
+REMOVE_SCRIPT = """
+local rebuilding = redis.call('EXISTS', KEYS[4]) == 1
+for i = 1, #ARGV do
+    redis.call('ZREM', KEYS[1], ARGV[i])
+    if rebuilding then
+        redis.call('ZREM', KEYS[2], ARGV[i])
+        redis.call('SADD', KEYS[3], ARGV[i])
+    end
+end
+return #ARGV
+"""
+"""Remove members, remembering them until a running rebuild completes."""
+
+CLAIM_SCRIPT = """
+if redis.call('SET', KEYS[4], 1, 'NX', 'PX', ARGV[1]) then
+    redis.call('DEL', KEYS[2], KEYS[3])
+    return 1
+end
+return 0
+"""
+
+SWAP_SCRIPT = """
+local removed = redis.call('SMEMBERS', KEYS[3])
+for i = 1, #removed do
+    redis.call('ZREM', KEYS[2], removed[i])
+end
+if redis.call('EXISTS', KEYS[2]) == 1 then
+    redis.call('RENAME', KEYS[2], KEYS[1])
+else
+    redis.call('DEL', KEYS[1])
+end
+redis.call('DEL', KEYS[3], KEYS[4])
+redis.call('SET', KEYS[5], ARGV[1])
+return redis.call('ZCARD', KEYS[1])
+"""
+
+
+class LeaderboardUnavailable(Exception):
+    """Raised when the leaderboard backend cannot serve a read."""
+
+
+class LeaderboardRebuilding(LeaderboardUnavailable):
+    """Raised while the leaderboard is not built yet."""
+
+
+class LeaderboardEntry(NamedTuple):
+    """A ranked player; ``rank`` is 1-based."""
+
+    rank: int
+    player_id: int
+    level: int
+    xp: int
+
+
+def encode_score(level: int, xp: int) -> int:
+    return level * SCORE_LEVEL_FACTOR + xp
+
+
+def decode_score(score: float) -> Tuple[int, int]:
+    level, xp = divmod(int(score), SCORE_LEVEL_FACTOR)
+    return level, xp
+
+
+def encode_member(player_id: int) -> str:
+    return f"{MEMBER_BASE - player_id:0{MEMBER_WIDTH}d}"
+
+
+def decode_member(member: Any) -> int:
+    return MEMBER_BASE - int(member)
+
+
+class RedisLeaderboardBackend:
+    """Sorted-set backend; every operation is O(log n) in Redis."""
+
+    def __init__(self, redis_client: Any, key: str = "leaderboard:players") -> None:
+        self.redis = redis_client
+        self.key = key
+        self.staging_key = f"{key}:rebuild"
+        self.removed_key = f"{key}:rebuild:removed"
+        self.lock_key = f"{key}:rebuilding"
+        self.ready_key = f"{key}:ready"
+        self._set_scores = redis_client.register_script(SET_SCORES_SCRIPT)
+        self._remove = redis_client.register_script(REMOVE_SCRIPT)
+        self._claim = redis_client.register_script(CLAIM_SCRIPT)
+        self._swap = redis_client.register_script(SWAP_SCRIPT)
+
+    @property
+    def _keys(self) -> List[str]:
+        return [self.key, self.staging_key, self.removed_key, self.lock_key]
+
+    def is_ready(self) -> bool:
+        return bool(self.redis.exists(self.ready_key))
+
+    def set_scores(self, scores: Dict[int, int]) -> None:
+        args: List[Any] = []
+        for player_id, score in scores.items():
+            args += [encode_member(player_id), score]
+        self._set_scores(keys=self._keys, args=args)
+
+    def remove(self, player_id: int) -> None:
+        self.remove_many([player_id])
+
+    def remove_many(self, player_ids: Iterable[int]) -> None:
+        members = [encode_member(player_id) for player_id in player_ids]
+        if members:
+            self._remove(keys=self._keys, args=members)
+
+    def size(self) -> int:
+        return self.redis.zcard(self.key)
+
+    def rank(self, player_id: int) -> Optional[int]:
+        return self.redis.zrevrank(self.key, encode_member(player_id))
+
+    def score(self, player_id: int) -> Optional[int]:
+        score = self.redis.zscore(self.key, encode_member(player_id))
+        return None if score is None else int(score)
+
+    def range(self, start: int, stop: int) -> List[Tuple[int, int]]:
+        members = self.redis.zrevrange(self.key, start, stop, withscores=True)
+        return [(decode_member(member), int(score)) for member, score in members]
+
+    def replace(self, batches: Iterable[Dict[int, int]]) -> Optional[int]:
+        """Rebuild from *batches*; ``None`` if another rebuild is running."""
+
+        ttl = int(REBUILD_LOCK_TTL * 1000)
+        if not self._claim(keys=self._keys, args=[ttl]):
+            return None
+
+        try:
+            for scores in batches:
+                if scores:
+                    self.redis.zadd(
+                        self.staging_key,
+                        {encode_member(pid): s for pid, s in scores.items()},
+                        gt=True,
+                    )
+                self.redis.pexpire(self.lock_key, ttl)
+        except BaseException:
+            self.redis.delete(self.lock_key, self.staging_key, self.removed_key)
+            raise
+
+        return self._swap(keys=self._keys + [self.ready_key], args=[time.time()])
+
+
+class LocalLeaderboardBackend:
+    """In-process fallback mirroring Redis sorted-set ordering.
+
+    Lookups are O(log n) bisections; inserts shift the underlying list, which
+    is fine for tests and single-node development but not for production.
+    """
+
+    def __init__(self) -> None:
+        self._entries: List[Tuple[int, str]] = []
+        self._scores: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self._ready = False
+        self._during_rebuild: Optional[Dict[str, Optional[int]]] = None
+
+    def is_ready(self) -> bool:
+        return self._ready
+
+    def set_scores(self, scores: Dict[int, int]) -> None:
+        with self._lock:
+            for player_id, score in scores.items():
+                member = encode_member(player_id)
+                self._discard(member)
+                self._scores[member] = score
+                bisect.insort(self._entries, (score, member))
+                if self._during_rebuild is not None:
+                    self._during_rebuild[member] = score
+
+    def remove(self, player_id: int) -> None:
+        self.remove_many([player_id])
+
+    def remove_many(self, player_ids: Iterable[int]) -> None:
+        with self._lock:
+            for player_id in player_ids:
+                member = encode_member(player_id)
+                self._discard(member)
+                if self._during_rebuild is not None:
+                    self._during_rebuild[member] = None
+
+    def size(self) -> int:
+        return len(self._entries)
+
+    def rank(self, player_id: int) -> Optional[int]:
+        with self._lock:
+            member = encode_member(player_id)
+            score = self._scores.get(member)
+            if score is None:
+                return None
+            index = bisect.bisect_left(self._entries, (score, member))
+            return len(self._entries) - 1 - index
+
+    def score(self, player_id: int) -> Optional[int]:
+        return self._scores.get(encode_member(player_id))
+
+    def range(self, start: int, stop: int) -> List[Tuple[int, int]]:
+        with self._lock:
+            total = len(self._entries)
+            stop = min(stop, total - 1)
+            return [
+                (decode_member(member), score)
+                for score, member in (
+                    self._entries[total - 1 - rank] for rank in range(start, stop + 1)
+                )
+            ]
+
+    def replace(self, batches: Iterable[Dict[int, int]]) -> Optional[int]:
+        with self._lock:
+            if self._during_rebuild is not None:
+                return None
+            self._during_rebuild = {}
+
+        try:
+            scores = {
+                encode_member(player_id): score
+                for batch in batches
+                for player_id, score in batch.items()
+            }
+        except BaseException:
+            with self._lock:
+                self._during_rebuild = None
+            raise
+
+        with self._lock:
+            for member, score in self._during_rebuild.items():
+                if score is None:
+                    scores.pop(member, None)
+                else:
+                    scores[member] = max(score, scores.get(member, score))
+            self._during_rebuild = None
+            self._scores = scores
+            self._entries = sorted((score, member) for member, score in scores.items())
+            self._ready = True
+        return len(scores)
+
+    def _discard(self, member: str) -> None:
+        score = self._scores.pop(member, None)
+        if score is None:
+            return
+        index = bisect.bisect_left(self._entries, (score, member))
+        del self._entries[index]
+
+
+class Leaderboard:
+    """Ranking of all players, kept current from committed player writes."""
+
+    def __init__(self, backend: Any, background: bool = True) -> None:
+        self.backend = backend
+        self.background = background
+        self._rebuilding = threading.Lock()
+
+    @classmethod
+    def from_redis(cls, redis_client: Any, background: bool = True) -> "Leaderboard":
+        if redis_client is None:
+            return cls(LocalLeaderboardBackend(), background)
+        return cls(RedisLeaderboardBackend(redis_client), background)
+
+    def apply_changes(self, sender: Any, changes: Iterable[Any]) -> None:
+        """``players_changed`` receiver: record the new scores."""
+
+        scores = {
+            change.player_id: encode_score(change.level, change.xp)
+            for change in changes
+        }
+        if not scores:
+            return
+
+        try:
+            self.backend.set_scores(scores)
+        except RedisError as exc:
+            logger.warning("Leaderboard update failed, rebuild required: %s", exc)
+
+    def remove(self, player_id: int) -> None:
+        try:
+            self.backend.remove(player_id)
+        except RedisError as exc:
+            logger.warning("Leaderboard removal failed, rebuild required: %s", exc)
+
+    def apply_removals(self, sender: Any, player_ids: Iterable[int]) -> None:
+        """``players_removed`` receiver: drop the removed players."""
+
+        player_ids = list(player_ids)
+        if not player_ids:
+            return
+
+        try:
+            self.backend.remove_many(player_ids)
+        except RedisError as exc:
+            logger.warning("Leaderboard removal failed, rebuild required: %s", exc)
+
+    def ensure_ready(self) -> None:
+        """Raise :class:`LeaderboardRebuilding` unless the leaderboard is built.
+
+        A missing leaderboard is rebuilt in a background thread, at most one
+        per process (and, with Redis, one across all workers).
+        """
+
+        if self._guard(self.backend.is_ready):
+            return
+        if self.background:
+            self._start_rebuild()
+        raise LeaderboardRebuilding("leaderboard is not built")
+
+    def _start_rebuild(self) -> None:
+        if not self._rebuilding.acquire(blocking=False):
+            return
+
+        threading.Thread(
+            target=self._rebuild_in_background,
+            args=(current_app._get_current_object(),),
+            name="leaderboard-rebuild",
+            daemon=True,
+        ).start()
+
+    def _rebuild_in_background(self, app: Flask) -> None:
+        try:
+            with app.app_context():
+                self.rebuild()
+        except Exception:
+            logger.exception("Leaderboard rebuild failed")
+        finally:
+            self._rebuilding.release()
+
+    def rebuild(self, batch_size: int = 10_000) -> Optional[int]:
+        """Recompute every score from the ``players`` table.
+
+        Rows are streamed with ``yield_per`` (from every shard, when players
+        are sharded) and the new ranking replaces the old one atomically once
+        it is complete; writes made meanwhile are carried over. Returns the
+        number of ranked players, or ``None`` if a rebuild is already running.
+        """
+
+        def batches():
+            query = select(Player.id, Player.level, Player.xp)
+            shards = current_app.extensions.get("shards")
+            if shards is not None:
+                partitions = shards.partitions(query, batch_size)
+            else:
+                partitions = db.session.execute(
+                    query.execution_options(yield_per=batch_size)
+                ).partitions()
+            for partition in partitions:
+                yield {row.id: encode_score(row.level, row.xp) for row in partition}
+
+        return self._guard(self.backend.replace, batches())
+
+    def top(self, limit: int, offset: int = 0) -> List[LeaderboardEntry]:
+        members = self._guard(self.backend.range, offset, offset + limit - 1)
+        return self._entries(offset, members)
+
+    def rank(self, player_id: int) -> Optional[LeaderboardEntry]:
+        rank = self._guard(self.backend.rank, player_id)
+        if rank is None:
+            return None
+
+        score = self._guard(self.backend.score, player_id)
+        if score is None:
+            return None
+
+        level, xp = decode_score(score)
+        return LeaderboardEntry(rank + 1, player_id, level, xp)
+
+    def around(self, player_id: int, radius: int) -> Optional[List[LeaderboardEntry]]:
+        rank = self._guard(self.backend.rank, player_id)
+        if rank is None:
+            return None
+
+        start = max(rank - radius, 0)
+        members = self._guard(self.backend.range, start, rank + radius)
+        return self._entries(start, members)
+
+    def size(self) -> int:
+        return self._guard(self.backend.size)
+
+    @staticmethod
+    def _entries(start: int, members: List[Tuple[int, int]]) -> List[LeaderboardEntry]:
+        entries = []
+        for offset, (player_id, score) in enumerate(members):
+            level, xp = decode_score(score)
+            entries.append(LeaderboardEntry(start + offset + 1, player_id, level, xp))
+        return entries
+
+    @staticmethod
+    def _guard(fn, *args):
+        try:
+            return fn(*args)
+        except RedisError as exc:
+            raise LeaderboardUnavailable(str(exc)) from exc
+
+
+leaderboard_cli = AppGroup("leaderboard", help="Gestion du classement des joueurs.")
+
+
+@leaderboard_cli.command("rebuild")
+@click.option("--batch-size", default=10_000, show_default=True)
+def rebuild_command(batch_size: int) -> None:
+    """Reconstruire le classement depuis la base de données."""
+
+    leaderboard: Leaderboard = current_app.extensions["leaderboard"]
+    count = leaderboard.rebuild(batch_size=batch_size)
+    if count is None:
+        raise click.ClickException("Une reconstruction du classement est en cours.")
+    click.echo(f"Classement reconstruit : {count} joueurs.")
@@ -1,55 +1,566 @@
 """umbra-player-service - Service de gestion des profils et données des joueurs."""
 
+import hashlib
+import json
+import math
 import os
-from typing import Any, Dict, Optional
+import tempfile
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
 
-from flask import Flask, jsonify, request
+from flask import Flask, Response, jsonify, request, stream_with_context
 from flask_cors import CORS
+from sqlalchemy import Select, select
 from sqlalchemy.orm import joinedload
 
-from .extensions import db
-from .models import Player, PlayerStats
+from .archive import (
+    LastSeenTracker,
+    archive_cli,
+    is_archived,
+    load_owner,
+    restore_player,
+    restore_players,
+    soft_delete_player,
+)
+from .bulk import players_cli
+from .cache import PlayerCache, shape_version
+from .changefeed import (
+    FeedFull,
+    FeedUnavailable,
+    LocalChangeFeed,
+    RedisChangeFeed,
+    event_key,
+)
+from .experience import apply_experience_awards
+from .extensions import (
+    check_database_urls,
+    configure_sqlite,
+    create_redis_client,
+    db,
+    engine_options,
+)
+from .fieldsets import FieldSet, load_fieldset_payloads, parse_fieldset
+from .increments import (
+    MAX_STAT_VALUE,
+    STAT_COLUMNS,
+    apply_increments,
+    rename_player,
+)
+from .idempotency import (
+    IdempotencyKeyInUse,
+    IdempotencyKeyMismatch,
+    IdempotencyStore,
+    StoredResponse,
+)
+from . import serialization, wire
+from .leaderboard import (
+    Leaderboard,
+    LeaderboardRebuilding,
+    LeaderboardUnavailable,
+    leaderboard_cli,
+)
+from .metrics import (
+    Metrics,
+    TimedQueuePool,
+    current_request_stats,
+    track_request_stats,
+    untrack_request_stats,
+)
+from .models import Player, PlayerStats, fold_name
+from .population import (
+    PopulationStats,
+    PopulationStatsRebuilding,
+    PopulationStatsUnavailable,
+    population_cli,
+)
+from .profiling import FORMATS as PROFILE_FORMATS, Profiler
+from .ratelimit import (
+    AdmissionController,
+    RateLimiter,
+    client_key,
+    parse_rate,
+    parse_route_rates,
+    rate_limit_headers,
+)
+from .registration import insert_player
+from .replicas import ReplicaRouter, is_replica_read
+from .search import (
+    DatabasePrefixIndex,
+    LocalPrefixIndex,
+    decode_cursor,
+    encode_cursor,
+)
+from .sharding import ShardSet, shards_cli
+from .signals import PlayerChange, players_changed, players_removed
+from .snapshots import PlayerSnapshot, load_player_snapshot, load_player_snapshots
+from .xp_events import (
+    BufferFull,
+    BufferUnavailable,
+    LocalXpBuffer,
+    RedisXpBuffer,
+    XpEvent,
+    XpFlusher,
+)
 
+PLAYER_PAYLOAD_SHAPE = (
+    "id",
+    "user_id",
+    "name",
+    "level",
+    "xp",
+    "version",
+    "stats.health",
+    "stats.attack",
+    "stats.defense",
+)
+"""Keys produced by ``_serialize_player``; cached payloads are versioned on it."""
 
-def create_app() -> Flask:
+NDJSON_MIMETYPE = "application/x-ndjson"
+"""Media type selecting the streamed player export on ``GET /players``."""
+
+MAX_XP_AWARD = 2**31 - 1
+"""Largest experience amount accepted for a single player in one request."""
+
+MAX_SEARCH_PREFIX_LENGTH = 120
+"""Longest name prefix accepted by ``GET /players/search``."""
+
+EVENT_STREAM_MIMETYPE = "text/event-stream"
+"""Media type of the Server-Sent Events change feed."""
+
+MAX_IDEMPOTENCY_KEY_LENGTH = 255
+"""Longest ``Idempotency-Key`` header value accepted."""
+
+
+def create_app(config: Optional[Dict[str, Any]] = None) -> Flask:
     """Create and configure the Flask application."""
 
     app = Flask(__name__)
     CORS(app)
 
+    if config:
+        app.config.update(config)
+
     # Configuration
     app.config.setdefault(
         "SQLALCHEMY_DATABASE_URI", os.getenv("DATABASE_URL", "sqlite:///players.db")
     )
     app.config.setdefault("SQLALCHEMY_TRACK_MODIFICATIONS", False)
     app.config["DEBUG"] = os.getenv("FLASK_DEBUG", "0") == "1"
+    app.config.setdefault(
+        "DB_POOL_SIZE",
+        int(os.getenv("DB_POOL_SIZE") or os.getenv("GUNICORN_THREADS", "4")),
+    )
+    app.config.setdefault("DB_MAX_OVERFLOW", int(os.getenv("DB_MAX_OVERFLOW", "2")))
+    app.config.setdefault("DB_POOL_TIMEOUT", float(os.getenv("DB_POOL_TIMEOUT", "5")))
+    app.config.setdefault("DB_POOL_RECYCLE", int(os.getenv("DB_POOL_RECYCLE", "1800")))
+    app.config.setdefault("METRICS_ENABLED", os.getenv("METRICS_ENABLED", "1") == "1")
+    app.config.setdefault(
+        "SLOW_QUERY_THRESHOLD_MS",
+        float(os.getenv("SLOW_QUERY_THRESHOLD_MS", "200")),
+    )
+    app.config.setdefault(
+        "COMPRESSION_ENABLED", os.getenv("COMPRESSION_ENABLED", "1") == "1"
+    )
+    app.config.setdefault(
+        "COMPRESSION_MIN_SIZE", int(os.getenv("COMPRESSION_MIN_SIZE", "1024"))
+    )
+    app.config.setdefault(
+        "COMPRESSION_GZIP_LEVEL", int(os.getenv("COMPRESSION_GZIP_LEVEL", "6"))
+    )
+    app.config.setdefault(
+        "COMPRESSION_BROTLI_QUALITY",
+        int(os.getenv("COMPRESSION_BROTLI_QUALITY", "4")),
+    )
+    app.config.setdefault(
+        "PROFILING_ENABLED", os.getenv("PROFILING_ENABLED", "0") == "1"
+    )
+    app.config.setdefault(
+        "PROFILING_DIR",
+        os.getenv("PROFILING_DIR")
+        or os.path.join(tempfile.gettempdir(), "umbra-player-service-profiles"),
+    )
+    app.config.setdefault(
+        "PROFILING_SAMPLE_RATE", float(os.getenv("PROFILING_SAMPLE_RATE", "0"))
+    )
+    app.config.setdefault("PROFILING_TOKEN", os.getenv("PROFILING_TOKEN"))
+    app.config.setdefault("PROFILING_ADMIN_TOKEN", os.getenv("PROFILING_ADMIN_TOKEN"))
+    app.config.setdefault(
+        "PROFILING_MAX_MB", float(os.getenv("PROFILING_MAX_MB", "50"))
+    )
+    app.config.setdefault(
+        "PROFILING_INTERVAL_MS", float(os.getenv("PROFILING_INTERVAL_MS", "5"))
+    )
+    app.config.setdefault(
+        "DATABASE_REPLICA_URLS",
+        [url for url in os.getenv("DATABASE_REPLICA_URLS", "").split(",") if url],
+    )
+    app.config.setdefault(
+        "DATABASE_SHARD_URLS",
+        [url for url in os.getenv("DATABASE_SHARD_URLS", "").split(",") if url],
+    )
+    if app.config["DATABASE_REPLICA_URLS"] and app.config["DATABASE_SHARD_URLS"]:
+        raise ValueError(
+            "DATABASE_REPLICA_URLS and DATABASE_SHARD_URLS cannot be combined."
+        )
+    check_database_urls(
+        [
+            app.config["SQLALCHEMY_DATABASE_URI"],
+            *app.config["DATABASE_REPLICA_URLS"],
+            *app.config["DATABASE_SHARD_URLS"],
+        ]
+    )
+    app.config.setdefault(
+        "REPLICA_STICKY_SECONDS", float(os.getenv("REPLICA_STICKY_SECONDS", "5"))
+    )
+    app.config.setdefault(
+        "REPLICA_RETRY_AFTER", float(os.getenv("REPLICA_RETRY_AFTER", "30"))
+    )
+    app.config.setdefault(
+        "ADMISSION_MAX_IN_FLIGHT", int(os.getenv("ADMISSION_MAX_IN_FLIGHT", "0"))
+    )
+    app.config.setdefault(
+        "ADMISSION_MAX_POOL_WAIT_MS",
+        float(os.getenv("ADMISSION_MAX_POOL_WAIT_MS", "0")),
+    )
+    pool_options = engine_options(app.config)
+    if pool_options and (
+        app.config["METRICS_ENABLED"] or app.config["ADMISSION_MAX_POOL_WAIT_MS"]
+    ):
+        pool_options["poolclass"] = TimedQueuePool
+    app.config.setdefault("SQLALCHEMY_ENGINE_OPTIONS", pool_options)
+    # Shedding on pool wait with nothing measuring it would silently never shed.
+    if app.config["ADMISSION_MAX_POOL_WAIT_MS"] and not issubclass(
+        app.config["SQLALCHEMY_ENGINE_OPTIONS"].get("poolclass", object),
+        TimedQueuePool,
+    ):
+        raise ValueError(
+            "ADMISSION_MAX_POOL_WAIT_MS requires a pooled database, not SQLite."
+        )
+    app.config.setdefault("SQLITE_WAL", os.getenv("SQLITE_WAL", "1") == "1")
 
     db.init_app(app)
 
+    if app.config["SQLITE_WAL"]:
+        with app.app_context():
+            for engine in db.engines.values():
+                configure_sqlite(engine)
+
+    # Registered first so that it runs after every other after_request hook.
+    if app.config["COMPRESSION_ENABLED"]:
+        wire.Compressor(
+            min_size=app.config["COMPRESSION_MIN_SIZE"],
+            gzip_level=app.config["COMPRESSION_GZIP_LEVEL"],
+            brotli_quality=app.config["COMPRESSION_BROTLI_QUALITY"],
+        ).init_app(app)
+
+    profiler = None
+    if app.config["PROFILING_ENABLED"]:
+        profiler = Profiler(
+            app.config["PROFILING_DIR"],
+            sample_rate=app.config["PROFILING_SAMPLE_RATE"],
+            token=app.config["PROFILING_TOKEN"],
+            interval=app.config["PROFILING_INTERVAL_MS"] / 1000,
+            exempt_endpoints=(
+                "health",
+                "metrics",
+                "static",
+                "list_profiles",
+                "download_profile",
+            ),
+            max_bytes=int(app.config["PROFILING_MAX_MB"] * 1024 * 1024),
+        )
+        profiler.init_app(app)
+
+    if app.config["METRICS_ENABLED"]:
+        slow_query_ms = app.config["SLOW_QUERY_THRESHOLD_MS"]
+        Metrics(
+            slow_query_threshold=slow_query_ms / 1000 if slow_query_ms else None
+        ).init_app(app)
+
+    shards = ShardSet(
+        app.config["DATABASE_SHARD_URLS"], user_endpoints=("create_player",)
+    )
+    shards.init_app(app)
+
     app.config.setdefault("API_AUTH_TOKEN", os.getenv("API_AUTH_TOKEN"))
+    app.config.setdefault("REDIS_URL", os.getenv("REDIS_URL"))
+    app.config.setdefault(
+        "PLAYER_FAST_READS", os.getenv("PLAYER_FAST_READS", "0") == "1"
+    )
+    app.config.setdefault("PLAYER_CACHE_TTL", int(os.getenv("PLAYER_CACHE_TTL", "60")))
+    app.config.setdefault(
+        "PLAYER_CACHE_LOCAL_TTL", float(os.getenv("PLAYER_CACHE_LOCAL_TTL", "5"))
+    )
+    app.config.setdefault(
+        "PLAYER_CACHE_LOCAL_SIZE", int(os.getenv("PLAYER_CACHE_LOCAL_SIZE", "1024"))
+    )
+    app.config.setdefault(
+        "PLAYER_BATCH_MAX_SIZE", int(os.getenv("PLAYER_BATCH_MAX_SIZE", "100"))
+    )
+    app.config.setdefault(
+        "PLAYER_LIST_DEFAULT_LIMIT", int(os.getenv("PLAYER_LIST_DEFAULT_LIMIT", "50"))
+    )
+    app.config.setdefault(
+        "PLAYER_LIST_MAX_LIMIT", int(os.getenv("PLAYER_LIST_MAX_LIMIT", "500"))
+    )
+    app.config.setdefault(
+        "PLAYER_STREAM_BATCH_SIZE", int(os.getenv("PLAYER_STREAM_BATCH_SIZE", "1000"))
+    )
+    app.config.setdefault(
+        "PLAYER_SEARCH_BACKEND",
+        os.getenv(
+            "PLAYER_SEARCH_BACKEND",
+            (
+                "memory"
+                if app.config["SQLALCHEMY_DATABASE_URI"].startswith("sqlite")
+                else "database"
+            ),
+        ),
+    )
+    app.config.setdefault(
+        "PLAYER_SEARCH_DEFAULT_LIMIT",
+        int(os.getenv("PLAYER_SEARCH_DEFAULT_LIMIT", "20")),
+    )
+    app.config.setdefault(
+        "PLAYER_SEARCH_MAX_LIMIT", int(os.getenv("PLAYER_SEARCH_MAX_LIMIT", "100"))
+    )
+    app.config.setdefault(
+        "LEADERBOARD_MAX_LIMIT", int(os.getenv("LEADERBOARD_MAX_LIMIT", "100"))
+    )
+    app.config.setdefault(
+        "LEADERBOARD_REBUILD_BACKGROUND",
+        os.getenv("LEADERBOARD_REBUILD_BACKGROUND", "1") == "1",
+    )
+    app.config.setdefault(
+        "POPULATION_STATS_RECOMPUTE_INTERVAL",
+        float(os.getenv("POPULATION_STATS_RECOMPUTE_INTERVAL", "300")),
+    )
+    app.config.setdefault(
+        "POPULATION_STATS_REBUILD_BACKGROUND",
+        os.getenv("POPULATION_STATS_REBUILD_BACKGROUND", "1") == "1",
+    )
+    app.config.setdefault(
+        "ARCHIVE_INACTIVE_DAYS", float(os.getenv("ARCHIVE_INACTIVE_DAYS", "180"))
+    )
+    app.config.setdefault(
+        "ARCHIVE_BATCH_SIZE", int(os.getenv("ARCHIVE_BATCH_SIZE", "500"))
+    )
+    app.config.setdefault(
+        "ARCHIVE_BATCH_PAUSE", float(os.getenv("ARCHIVE_BATCH_PAUSE", "0.1"))
+    )
+    app.config.setdefault(
+        "LAST_SEEN_RESOLUTION", float(os.getenv("LAST_SEEN_RESOLUTION", "3600"))
+    )
+    app.config.setdefault(
+        "LAST_SEEN_FLUSH_INTERVAL", float(os.getenv("LAST_SEEN_FLUSH_INTERVAL", "60"))
+    )
+    app.config.setdefault(
+        "LAST_SEEN_BACKGROUND", os.getenv("LAST_SEEN_BACKGROUND", "1") == "1"
+    )
+    app.config.setdefault(
+        "XP_BATCH_MAX_SIZE", int(os.getenv("XP_BATCH_MAX_SIZE", "50000"))
+    )
+    app.config.setdefault(
+        "XP_BATCH_CHUNK_SIZE", int(os.getenv("XP_BATCH_CHUNK_SIZE", "1000"))
+    )
+
+    app.config.setdefault(
+        "XP_EVENTS_MAX_BATCH", int(os.getenv("XP_EVENTS_MAX_BATCH", "1000"))
+    )
+    app.config.setdefault(
+        "XP_EVENTS_BUFFER_SIZE", int(os.getenv("XP_EVENTS_BUFFER_SIZE", "100000"))
+    )
+    app.config.setdefault(
+        "XP_EVENTS_FLUSH_INTERVAL", float(os.getenv("XP_EVENTS_FLUSH_INTERVAL", "1"))
+    )
+    app.config.setdefault(
+        "XP_EVENTS_FLUSH_SIZE", int(os.getenv("XP_EVENTS_FLUSH_SIZE", "1000"))
+    )
+    app.config.setdefault(
+        "XP_EVENTS_RETENTION", float(os.getenv("XP_EVENTS_RETENTION", "86400"))
+    )
+    app.config.setdefault(
+        "XP_EVENTS_BACKGROUND", os.getenv("XP_EVENTS_BACKGROUND", "1") == "1"
+    )
+    app.config.setdefault(
+        "CHANGE_FEED_RING_SIZE", int(os.getenv("CHANGE_FEED_RING_SIZE", "10000"))
+    )
+    app.config.setdefault(
+        "CHANGE_FEED_MAX_STREAMS",
+        int(
+            os.getenv("CHANGE_FEED_MAX_STREAMS")
+            or max(1, int(os.getenv("GUNICORN_THREADS", "4")) // 2)
+        ),
+    )
+    app.config.setdefault(
+        "CHANGE_FEED_MAX_PLAYERS", int(os.getenv("CHANGE_FEED_MAX_PLAYERS", "100"))
+    )
+    app.config.setdefault(
+        "CHANGE_FEED_QUEUE_SIZE", int(os.getenv("CHANGE_FEED_QUEUE_SIZE", "1000"))
+    )
+    app.config.setdefault(
+        "CHANGE_FEED_HEARTBEAT", float(os.getenv("CHANGE_FEED_HEARTBEAT", "15"))
+    )
+    app.config.setdefault(
+        "CHANGE_FEED_MAX_DURATION",
+        float(os.getenv("CHANGE_FEED_MAX_DURATION", "300")),
+    )
+    app.config.setdefault("IDEMPOTENCY_TTL", int(os.getenv("IDEMPOTENCY_TTL", "86400")))
+    app.config.setdefault(
+        "IDEMPOTENCY_LOCAL_SIZE", int(os.getenv("IDEMPOTENCY_LOCAL_SIZE", "10000"))
+    )
+    app.config.setdefault(
+        "RATE_LIMIT_DEFAULT", parse_rate(os.getenv("RATE_LIMIT_DEFAULT", ""))
+    )
+    app.config.setdefault(
+        "RATE_LIMITS", parse_route_rates(os.getenv("RATE_LIMITS", ""))
+    )
+    app.config.setdefault(
+        "RATE_LIMIT_LOCAL_SIZE", int(os.getenv("RATE_LIMIT_LOCAL_SIZE", "10000"))
+    )
+
+    redis_client = create_redis_client(app.config)
+    player_cache = PlayerCache(
+        redis_client,
+        ttl=app.config["PLAYER_CACHE_TTL"],
+        local_ttl=app.config["PLAYER_CACHE_LOCAL_TTL"],
+        local_maxsize=app.config["PLAYER_CACHE_LOCAL_SIZE"],
+        version=shape_version(PLAYER_PAYLOAD_SHAPE),
+        remote_fill_allowed=lambda: not is_replica_read(),
+    )
+    leaderboard = Leaderboard.from_redis(
+        redis_client, background=app.config["LEADERBOARD_REBUILD_BACKGROUND"]
+    )
+    app.extensions["redis"] = redis_client
+    app.extensions["player_cache"] = player_cache
+    app.extensions["leaderboard"] = leaderboard
+    population = PopulationStats.from_redis(
+        redis_client,
+        recompute_interval=app.config["POPULATION_STATS_RECOMPUTE_INTERVAL"],
+        background=app.config["POPULATION_STATS_REBUILD_BACKGROUND"],
+    )
+    app.extensions["population"] = population
+    idempotency = IdempotencyStore(
+        redis_client,
+        ttl=app.config["IDEMPOTENCY_TTL"],
+        local_maxsize=app.config["IDEMPOTENCY_LOCAL_SIZE"],
+    )
+    app.extensions["idempotency"] = idempotency
+    if redis_client is not None:
+        xp_buffer = RedisXpBuffer(
+            redis_client, maxsize=app.config["XP_EVENTS_BUFFER_SIZE"]
+        )
+    else:
+        xp_buffer = LocalXpBuffer(app.config["XP_EVENTS_BUFFER_SIZE"])
+    xp_flusher = XpFlusher(
+        app,
+        xp_buffer,
+        interval=app.config["XP_EVENTS_FLUSH_INTERVAL"],
+        batch_size=app.config["XP_EVENTS_FLUSH_SIZE"],
+        chunk_size=app.config["XP_BATCH_CHUNK_SIZE"],
+        retention=app.config["XP_EVENTS_RETENTION"],
+    )
+    app.extensions["xp_flusher"] = xp_flusher
+    last_seen = LastSeenTracker(
+        app,
+        resolution=app.config["LAST_SEEN_RESOLUTION"],
+        interval=app.config["LAST_SEEN_FLUSH_INTERVAL"],
+        background=app.config["LAST_SEEN_BACKGROUND"],
+    )
+    app.extensions["last_seen"] = last_seen
+    players_changed.connect(player_cache.apply_changes, sender=app)
+    players_changed.connect(leaderboard.apply_changes, sender=app)
+    players_changed.connect(population.apply_changes, sender=app)
+    players_changed.connect(last_seen.apply_changes, sender=app)
+    players_removed.connect(player_cache.apply_removals, sender=app)
+    players_removed.connect(leaderboard.apply_removals, sender=app)
+    players_removed.connect(population.apply_removals, sender=app)
+    if app.config["PLAYER_SEARCH_BACKEND"] == "memory":
+        search_index = LocalPrefixIndex(shards)
+        players_changed.connect(search_index.apply_changes, sender=app)
+        players_removed.connect(search_index.apply_removals, sender=app)
+    else:
+        search_index = DatabasePrefixIndex(shards)
+    app.extensions["player_search"] = search_index
+    feed_options = dict(
+        ring_size=app.config["CHANGE_FEED_RING_SIZE"],
+        max_subscribers=app.config["CHANGE_FEED_MAX_STREAMS"],
+        queue_size=app.config["CHANGE_FEED_QUEUE_SIZE"],
+    )
+    if redis_client is not None:
+        change_feed = RedisChangeFeed(redis_client, **feed_options)
+    else:
+        change_feed = LocalChangeFeed(**feed_options)
+    players_changed.connect(change_feed.apply_changes, sender=app)
+    app.extensions["change_feed"] = change_feed
+    rate_limiter = RateLimiter(
+        redis_client,
+        default=app.config["RATE_LIMIT_DEFAULT"],
+        routes=app.config["RATE_LIMITS"],
+        local_maxsize=app.config["RATE_LIMIT_LOCAL_SIZE"],
+    )
+    admission = AdmissionController(
+        max_in_flight=app.config["ADMISSION_MAX_IN_FLIGHT"],
+        max_pool_wait=app.config["ADMISSION_MAX_POOL_WAIT_MS"] / 1000,
+    )
+    app.extensions["rate_limiter"] = rate_limiter
+    app.extensions["admission"] = admission
+
+    def _render_envelope(envelope: Dict[str, Any]) -> Response:
+        if wire.msgpack is None:
+            return jsonify(envelope)
 
-    def _build_success_response(data: Dict[str, Any], message: str, status: int = 200):
+        if wire.wants_msgpack(request.accept_mimetypes):
+            response = app.response_class(
+                wire.pack(envelope), mimetype=wire.MSGPACK_MIMETYPE
+            )
+        else:
+            response = jsonify(envelope)
+        response.vary.add("Accept")
+        return response
+
+    def _build_success_response(
+        data: Any,
+        message: str,
+        status: int = 200,
+        meta: Optional[Dict[str, Any]] = None,
+    ):
         return (
-            jsonify(
+            _render_envelope(
                 {
                     "success": True,
                     "data": data,
                     "message": message,
                     "error": None,
-                    "meta": None,
+                    "meta": meta,
                 }
             ),
             status,
         )
 
+    def _build_read_response(
+        data: Any, message: str, meta: Optional[Dict[str, Any]] = None
+    ):
+        if (
+            app.config["PLAYER_FAST_READS"]
+            and serialization.is_compatible(app)
+            and not wire.wants_msgpack(request.accept_mimetypes)
+        ):
+            body = serialization.success_envelope(data, message, meta)
+            response = app.response_class(body, mimetype="application/json")
+            if wire.msgpack is not None:
+                response.vary.add("Accept")
+            return response, 200
+
+        return _build_success_response(data, message, meta=meta)
+
     def _extract_bearer_token() -> str:
         auth_header = request.headers.get("Authorization", "")
         if auth_header.startswith("Bearer "):
             return auth_header.split(" ", 1)[1].strip()
         return ""
 
-    def _require_authentication():
-        expected_token = app.config.get("API_AUTH_TOKEN")
+    def _require_authentication(setting: str = "API_AUTH_TOKEN"):
+        expected_token = app.config.get(setting)
         token = _extract_bearer_token()
 
         if not expected_token or token != expected_token:
@@ -66,7 +577,7 @@ def create_app() -> Flask:
         message: str, error_code: str, status: int, error_message: Optional[str] = None
     ):
         return (
-            jsonify(
+            _render_envelope(
                 {
                     "success": False,
                     "data": None,
@@ -81,6 +592,108 @@ def create_app() -> Flask:
             status,
         )
 
+    unthrottled_endpoints = {None, "health", "metrics", "static"}
+
+    def _admit_request():
+        if request.endpoint in unthrottled_endpoints:
+            return None
+
+        reason = admission.enter()
+        if reason is not None:
+            response = _build_error_response(
+                message="Service surchargé, réessayez plus tard.",
+                error_code="overloaded",
+                status=503,
+            )
+            response[0].headers["Retry-After"] = "1"
+            return response
+        request.environ["admission.admitted"] = True
+        # Pool waits are charged to the request even with metrics disabled.
+        if admission.max_pool_wait and current_request_stats() is None:
+            request.environ["admission.stats_token"] = track_request_stats()
+        return None
+
+    def _release_request(exc: Optional[BaseException]) -> None:
+        token = request.environ.pop("admission.stats_token", None)
+        if token is not None:
+            untrack_request_stats(token)
+        if request.environ.pop("admission.admitted", False):
+            admission.leave()
+
+    def _observe_pool_wait(response: Response) -> Response:
+        stats = current_request_stats()
+        if stats is not None and request.environ.get("admission.admitted"):
+            admission.observe_pool_wait(stats.pool_wait)
+        return response
+
+    def _rate_limit_request():
+        if request.endpoint in unthrottled_endpoints:
+            return None
+
+        decision = rate_limiter.check(
+            request.endpoint,
+            client_key(_extract_bearer_token(), request.headers.get("X-User-Id")),
+        )
+        if decision is None:
+            return None
+
+        request.environ["ratelimit.decision"] = decision
+        if not decision.allowed:
+            return _build_error_response(
+                message="Trop de requêtes, réessayez plus tard.",
+                error_code="rate_limited",
+                status=429,
+            )
+        return None
+
+    def _add_rate_limit_headers(response: Response) -> Response:
+        decision = request.environ.get("ratelimit.decision")
+        if decision is not None:
+            response.headers.update(rate_limit_headers(decision))
+            response.headers["RateLimit-Policy"] = str(
+                rate_limiter.rate_for(request.endpoint)[1]
+            )
+        return response
+
+    # Load shedding runs first so that a saturated worker refuses requests
+    # without a Redis round trip.
+    if admission.enabled:
+        app.before_request(_admit_request)
+        app.teardown_request(_release_request)
+        if admission.max_pool_wait:
+            app.after_request(_observe_pool_wait)
+    if rate_limiter.enabled:
+        app.before_request(_rate_limit_request)
+        app.after_request(_add_rate_limit_headers)
+
+    def _publish_changes(changes: List[PlayerChange]) -> None:
+        players_changed.send(app, changes=changes)
+
+    def _restore_archived(
+        player_id: Optional[int] = None, user_id: Optional[str] = None
+    ) -> Optional[Dict[str, Any]]:
+        # Misses are usually unknown players: check without locking, on
+        # whichever database serves the request, before writing.
+        if not is_archived(db.session.connection(), player_id, user_id):
+            return None
+
+        # The restore itself always runs on the primary of the player's shard,
+        # even for a GET routed to a replica.
+        if player_id is not None:
+            engine = shards.engine_for_player(player_id)
+        else:
+            engine = shards.engines[shards.shard_for_user(user_id)]
+        with engine.begin() as connection:
+            restored = restore_player(connection, player_id=player_id, user_id=user_id)
+        if restored is None:
+            return None
+
+        payload = restored.to_payload()
+        _publish_changes(
+            [PlayerChange(restored.id, restored.level, restored.xp, payload)]
+        )
+        return payload
+
     def _serialize_stats(stats: Optional[PlayerStats]) -> Optional[Dict[str, Any]]:
         if stats is None:
             return None
@@ -98,9 +711,215 @@ def create_app() -> Flask:
             "name": player.name,
             "level": player.level,
             "xp": player.xp,
+            "version": player.version,
             "stats": _serialize_stats(player.stats),
         }
 
+    def _load_player_payload(player_id: int) -> Optional[Dict[str, Any]]:
+        player = (
+            Player.query.options(joinedload(Player.stats))
+            .filter_by(id=player_id)
+            .first()
+        )
+        if player is None:
+            return None
+
+        return _serialize_player(player)
+
+    def _load_player_snapshot_payload(player_id: int) -> Optional[Dict[str, Any]]:
+        snapshot = load_player_snapshot(db.session.connection(), player_id)
+        return None if snapshot is None else snapshot.to_payload()
+
+    def _load_player_snapshot_payloads(
+        player_ids: List[int],
+    ) -> Dict[int, Dict[str, Any]]:
+        snapshots = load_player_snapshots(db.session.connection(), player_ids)
+        return {snapshot.id: snapshot.to_payload() for snapshot in snapshots}
+
+    def _load_player_payloads(player_ids: List[int]) -> Dict[int, Dict[str, Any]]:
+        players = (
+            Player.query.options(joinedload(Player.stats))
+            .filter(Player.id.in_(player_ids))
+            .all()
+        )
+        return {player.id: _serialize_player(player) for player in players}
+
+    def _fieldset_loader(
+        fieldset: FieldSet,
+    ) -> Callable[[List[int]], Dict[int, Dict[str, Any]]]:
+        def load(player_ids: List[int]) -> Dict[int, Dict[str, Any]]:
+            if not shards.is_sharded:
+                return load_fieldset_payloads(
+                    db.session.connection(), fieldset, player_ids
+                )
+
+            groups = shards.group_by_shard(player_ids)
+            found: Dict[int, Dict[str, Any]] = {}
+            for payloads in shards.scatter(
+                lambda shard, connection: load_fieldset_payloads(
+                    connection, fieldset, groups[shard]
+                ),
+                groups,
+            ):
+                found.update(payloads)
+            return found
+
+        return load
+
+    def _parse_fieldset_args() -> Optional[FieldSet]:
+        return parse_fieldset(request.args.get("fields"), request.args.get("include"))
+
+    def _invalid_fieldset():
+        return _build_error_response(
+            message="Champs demandés invalides.",
+            error_code="invalid_query",
+            status=400,
+            error_message=(
+                "'fields' accepte id, user_id, name, level, xp, version et stats ; "
+                "'include' accepte stats."
+            ),
+        )
+
+    def _load_player_version(player_id: int) -> Optional[int]:
+        return db.session.execute(
+            select(Player.version).where(Player.id == player_id)
+        ).scalar_one_or_none()
+
+    def _with_etag(response, version: int):
+        response[0].set_etag(str(version))
+        return response
+
+    def _if_match_versions() -> Optional[List[int]]:
+        if not request.if_match or request.if_match.star_tag:
+            return None
+        return [int(tag) for tag in request.if_match.as_set() if tag.isdigit()]
+
+    def _parse_player_ids(raw_ids: Any) -> Optional[List[int]]:
+        if not isinstance(raw_ids, list) or not raw_ids:
+            return None
+
+        player_ids: List[int] = []
+        for raw_id in raw_ids:
+            if isinstance(raw_id, bool) or not isinstance(raw_id, int) or raw_id < 1:
+                return None
+            player_ids.append(raw_id)
+
+        return list(dict.fromkeys(player_ids))
+
+    def _parse_int_arg(name: str, minimum: int) -> Tuple[Optional[int], bool]:
+        raw_value = request.args.get(name)
+        if raw_value is None or raw_value == "":
+            return None, True
+
+        try:
+            value = int(raw_value)
+        except ValueError:
+            return None, False
+
+        return value, value >= minimum
+
+    def _player_rows_query(
+        fieldset: FieldSet,
+        cursor: Optional[int],
+        min_level: Optional[int],
+        max_level: Optional[int],
+    ) -> Select:
+        query = fieldset.select().order_by(Player.id)
+        if cursor is not None:
+            query = query.where(Player.id > cursor)
+        if min_level is not None:
+            query = query.where(Player.level >= min_level)
+        if max_level is not None:
+            query = query.where(Player.level <= max_level)
+        return query
+
+    def _stream_player_rows(query: Select, fieldset: FieldSet) -> Iterator[str]:
+        rows = shards.merged(
+            query, key=_row_id, batch_size=app.config["PLAYER_STREAM_BATCH_SIZE"]
+        )
+        try:
+            for row in rows:
+                yield json.dumps(fieldset.payload(row), separators=(",", ":"))
+                yield "\n"
+        finally:
+            rows.close()
+
+    def _row_id(row: Any) -> int:
+        return row.id
+
+    def _parse_xp_awards(raw_awards: Any) -> Optional[Dict[int, int]]:
+        if not isinstance(raw_awards, list) or not raw_awards:
+            return None
+
+        awards: Dict[int, int] = {}
+        for raw_award in raw_awards:
+            if not isinstance(raw_award, dict):
+                return None
+            player_id = raw_award.get("player_id")
+            amount = raw_award.get("amount")
+            if any(
+                isinstance(v, bool) or not isinstance(v, int)
+                for v in (player_id, amount)
+            ):
+                return None
+            if player_id < 1 or not 0 <= amount <= MAX_XP_AWARD:
+                return None
+            awards[player_id] = awards.get(player_id, 0) + amount
+
+        if any(amount > MAX_XP_AWARD for amount in awards.values()):
+            return None
+
+        return awards
+
+    def _parse_stat_deltas(payload: Any) -> Optional[Tuple[Dict[str, int], int, bool]]:
+        if not isinstance(payload, dict):
+            return None
+
+        deltas: Dict[str, int] = {}
+        for name in STAT_COLUMNS:
+            delta = payload.get(name, 0)
+            if isinstance(delta, bool) or not isinstance(delta, int):
+                return None
+            if abs(delta) > MAX_STAT_VALUE:
+                return None
+            if delta:
+                deltas[name] = delta
+
+        xp = payload.get("xp", 0)
+        clamp = payload.get("clamp", False)
+        if isinstance(xp, bool) or not isinstance(xp, int):
+            return None
+        if not 0 <= xp <= MAX_XP_AWARD or not isinstance(clamp, bool):
+            return None
+        if not deltas and not xp:
+            return None
+
+        return deltas, xp, clamp
+
+    def _parse_xp_events(raw_events: Any) -> Optional[List[XpEvent]]:
+        if not isinstance(raw_events, list) or not raw_events:
+            return None
+
+        events: List[XpEvent] = []
+        for raw_event in raw_events:
+            if not isinstance(raw_event, dict):
+                return None
+            event_id = raw_event.get("event_id")
+            player_id = raw_event.get("player_id")
+            amount = raw_event.get("amount")
+            if not isinstance(event_id, str) or not 0 < len(event_id) <= 64:
+                return None
+            if any(
+                isinstance(v, bool) or not isinstance(v, int)
+                for v in (player_id, amount)
+            ):
+                return None
+            if player_id < 1 or not 0 <= amount <= MAX_XP_AWARD:
+                return None
+            events.append(XpEvent(event_id, player_id, amount))
+
+        return events
+
     # Health check endpoint
     @app.route("/health")
     def health():
@@ -118,33 +937,628 @@ def create_app() -> Flask:
             200,
         )
 
+    # Profiles expose code paths and timings: they are only served with their
+    # own token, never with the one shared by API clients.
+    if profiler is not None and app.config["PROFILING_ADMIN_TOKEN"]:
+
+        @app.route("/debug/profiles", methods=["GET"])
+        def list_profiles():
+            is_authenticated, error_response = _require_authentication(
+                "PROFILING_ADMIN_TOKEN"
+            )
+            if not is_authenticated:
+                return error_response
+
+            return _build_success_response(
+                [
+                    {
+                        **summary,
+                        "downloads": {
+                            fmt: f"/debug/profiles/{summary['endpoint']}.{fmt}"
+                            for fmt in PROFILE_FORMATS
+                        },
+                    }
+                    for summary in profiler.profiles()
+                ],
+                message="Profils récupérés avec succès.",
+            )
+
+        @app.route("/debug/profiles/<name>", methods=["GET"])
+        def download_profile(name: str):
+            is_authenticated, error_response = _require_authentication(
+                "PROFILING_ADMIN_TOKEN"
+            )
+            if not is_authenticated:
+                return error_response
+
+            endpoint, _, fmt = name.rpartition(".")
+            data = profiler.export(endpoint, fmt) if fmt in PROFILE_FORMATS else None
+            if data is None:
+                return _build_error_response(
+                    message="Profil introuvable.",
+                    error_code="profile_not_found",
+                    status=404,
+                    error_message=(
+                        "Aucun profil pour cet endpoint ; formats : "
+                        f"{', '.join(PROFILE_FORMATS)}."
+                    ),
+                )
+
+            return app.response_class(
+                data,
+                mimetype=(
+                    "text/plain" if fmt == "collapsed" else "application/octet-stream"
+                ),
+                headers={"Content-Disposition": f"attachment; filename={name}"},
+            )
+
     @app.shell_context_processor
     def shell_context():  # pragma: no cover - dev convenience
         return {"db": db, "Player": Player, "PlayerStats": PlayerStats}
 
+    app.cli.add_command(players_cli)
+    app.cli.add_command(archive_cli)
+    app.cli.add_command(leaderboard_cli)
+    app.cli.add_command(population_cli)
+    app.cli.add_command(shards_cli)
+
     @app.route("/players/<int:player_id>", methods=["GET"])
     def get_player(player_id: int):
         is_authenticated, error_response = _require_authentication()
         if not is_authenticated:
             return error_response
 
-        player = (
-            Player.query.options(joinedload(Player.stats))
-            .filter_by(id=player_id)
-            .first()
-        )
+        fieldset = _parse_fieldset_args()
+        if fieldset is None:
+            return _invalid_fieldset()
+        variant = None if fieldset.is_full else fieldset.variant
 
-        if player is None:
-            return _build_error_response(
-                message="Joueur introuvable.",
-                error_code="player_not_found",
-                status=404,
+        if request.if_none_match:
+            cached = player_cache.get(player_id, variant)
+            version = (
+                cached["version"]
+                if cached is not None
+                else _load_player_version(player_id)
             )
+            if version is not None and request.if_none_match.contains(str(version)):
+                last_seen.touch((player_id,))
+                response = Response(status=304)
+                response.set_etag(str(version))
+                return response
 
-        return _build_success_response(
-            _serialize_player(player),
-            message="Informations du joueur récupérées avec succès.",
-        )
+        if variant is not None:
+            load_partial = _fieldset_loader(fieldset)
+            payload = player_cache.get_or_load(
+                player_id,
+                lambda player_id: load_partial([player_id]).get(player_id),
+                variant=variant,
+            )
+        else:
+            payload = player_cache.get_or_load(
+                player_id,
+                (
+                    _load_player_snapshot_payload
+                    if app.config["PLAYER_FAST_READS"]
+                    else _load_player_payload
+                ),
+            )
+
+        if payload is None:
+            restored = _restore_archived(player_id=player_id)
+            if restored is None:
+                return _build_error_response(
+                    message="Joueur introuvable.",
+                    error_code="player_not_found",
+                    status=404,
+                )
+            payload = fieldset.project(restored)
+
+        last_seen.touch((player_id,))
+        return _with_etag(
+            _build_read_response(
+                payload,
+                message="Informations du joueur récupérées avec succès.",
+            ),
+            payload["version"],
+        )
+
+    @app.route("/players:batchGet", methods=["POST"])
+    def batch_get_players():
+        is_authenticated, error_response = _require_authentication()
+        if not is_authenticated:
+            return error_response
+
+        fieldset = _parse_fieldset_args()
+        if fieldset is None:
+            return _invalid_fieldset()
+
+        payload = request.get_json(silent=True) or {}
+        player_ids = _parse_player_ids(payload.get("ids"))
+        if player_ids is None:
+            return _build_error_response(
+                message="Liste d'identifiants invalide.",
+                error_code="invalid_payload",
+                status=400,
+                error_message="Le champ 'ids' doit être une liste d'entiers positifs.",
+            )
+
+        max_size = app.config["PLAYER_BATCH_MAX_SIZE"]
+        if len(player_ids) > max_size:
+            return _build_error_response(
+                message="Trop d'identifiants demandés.",
+                error_code="batch_too_large",
+                status=400,
+                error_message=f"Au plus {max_size} identifiants par requête.",
+            )
+
+        variant = None if fieldset.is_full else fieldset.variant
+        if variant is not None or shards.is_sharded:
+            loader = _fieldset_loader(fieldset)
+        elif app.config["PLAYER_FAST_READS"]:
+            loader = _load_player_snapshot_payloads
+        else:
+            loader = _load_player_payloads
+        found = player_cache.get_many_or_load(player_ids, loader, variant=variant)
+
+        return _build_read_response(
+            [found[player_id] for player_id in player_ids if player_id in found],
+            message="Informations des joueurs récupérées avec succès.",
+            meta={
+                "missing_ids": [
+                    player_id for player_id in player_ids if player_id not in found
+                ],
+            },
+        )
+
+    @app.route("/players", methods=["GET"])
+    def list_players():
+        is_authenticated, error_response = _require_authentication()
+        if not is_authenticated:
+            return error_response
+
+        fieldset = _parse_fieldset_args()
+        if fieldset is None:
+            return _invalid_fieldset()
+
+        args = {}
+        for name, minimum in (
+            ("cursor", 0),
+            ("limit", 1),
+            ("min_level", 1),
+            ("max_level", 1),
+        ):
+            value, is_valid = _parse_int_arg(name, minimum)
+            if not is_valid:
+                return _build_error_response(
+                    message="Paramètres de pagination invalides.",
+                    error_code="invalid_query",
+                    status=400,
+                    error_message=f"Le paramètre '{name}' doit être un entier >= "
+                    f"{minimum}.",
+                )
+            args[name] = value
+
+        query = _player_rows_query(
+            fieldset, args["cursor"], args["min_level"], args["max_level"]
+        )
+
+        if request.accept_mimetypes.best == NDJSON_MIMETYPE:
+            return Response(
+                stream_with_context(_stream_player_rows(query, fieldset)),
+                mimetype=NDJSON_MIMETYPE,
+            )
+
+        limit = min(
+            args["limit"] or app.config["PLAYER_LIST_DEFAULT_LIMIT"],
+            app.config["PLAYER_LIST_MAX_LIMIT"],
+        )
+        rows = shards.fetch(query, key=_row_id, limit=limit + 1)
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+
+        return _build_success_response(
+            [fieldset.payload(row) for row in rows],
+            message="Liste des joueurs récupérée avec succès.",
+            meta={
+                "limit": limit,
+                "next_cursor": rows[-1].id if has_more else None,
+            },
+        )
+
+    @app.route("/players/search", methods=["GET"])
+    def search_players():
+        is_authenticated, error_response = _require_authentication()
+        if not is_authenticated:
+            return error_response
+
+        fieldset = _parse_fieldset_args()
+        if fieldset is None:
+            return _invalid_fieldset()
+
+        prefix = request.args.get("prefix", "")
+        if not 0 < len(prefix) <= MAX_SEARCH_PREFIX_LENGTH:
+            return _build_error_response(
+                message="Préfixe de recherche invalide.",
+                error_code="invalid_query",
+                status=400,
+                error_message=(
+                    "Le paramètre 'prefix' doit contenir entre 1 et "
+                    f"{MAX_SEARCH_PREFIX_LENGTH} caractères."
+                ),
+            )
+
+        limit, limit_valid = _parse_int_arg("limit", 1)
+        raw_cursor = request.args.get("cursor")
+        after = decode_cursor(raw_cursor) if raw_cursor else None
+        if not limit_valid or (raw_cursor and after is None):
+            return _build_error_response(
+                message="Paramètres de pagination invalides.",
+                error_code="invalid_query",
+                status=400,
+                error_message="'limit' doit être >= 1 et 'cursor' provenir d'une "
+                "réponse précédente.",
+            )
+
+        limit = min(
+            limit or app.config["PLAYER_SEARCH_DEFAULT_LIMIT"],
+            app.config["PLAYER_SEARCH_MAX_LIMIT"],
+        )
+        keys = search_index.search(fold_name(prefix), after, limit + 1)
+        has_more = len(keys) > limit
+        keys = keys[:limit]
+
+        player_ids = [player_id for _, player_id in keys]
+        variant = None if fieldset.is_full else fieldset.variant
+        found = player_cache.get_many_or_load(
+            player_ids, _fieldset_loader(fieldset), variant=variant
+        )
+
+        return _build_read_response(
+            [found[player_id] for player_id in player_ids if player_id in found],
+            message="Résultats de la recherche récupérés avec succès.",
+            meta={
+                "limit": limit,
+                "next_cursor": encode_cursor(keys[-1]) if has_more else None,
+            },
+        )
+
+    @app.route("/players/changes", methods=["GET"])
+    def stream_player_changes():
+        is_authenticated, error_response = _require_authentication()
+        if not is_authenticated:
+            return error_response
+
+        max_players = app.config["CHANGE_FEED_MAX_PLAYERS"]
+        raw_ids = request.args.get("ids", "").split(",")
+        player_ids = _parse_player_ids(
+            [int(raw_id) if raw_id.isdigit() else raw_id for raw_id in raw_ids]
+        )
+        if player_ids is None or len(player_ids) > max_players:
+            return _build_error_response(
+                message="Liste de joueurs invalide.",
+                error_code="invalid_query",
+                status=400,
+                error_message=(
+                    "Le paramètre 'ids' doit contenir entre 1 et "
+                    f"{max_players} identifiants séparés par des virgules."
+                ),
+            )
+
+        last_event_id = request.headers.get("Last-Event-ID") or request.args.get(
+            "last_event_id"
+        )
+        if last_event_id is not None and event_key(last_event_id) is None:
+            return _build_error_response(
+                message="Identifiant d'événement invalide.",
+                error_code="invalid_query",
+                status=400,
+                error_message="'Last-Event-ID' doit provenir du flux.",
+            )
+
+        try:
+            subscription = change_feed.subscribe(player_ids)
+        except (FeedFull, FeedUnavailable) as exc:
+            response = _build_error_response(
+                message="Flux de changements indisponible.",
+                error_code=(
+                    "change_feed_full"
+                    if isinstance(exc, FeedFull)
+                    else "change_feed_unavailable"
+                ),
+                status=503,
+                error_message="Réessayez plus tard.",
+            )
+            response[0].headers["Retry-After"] = "5"
+            return response
+
+        response = Response(
+            change_feed.stream(
+                subscription,
+                last_event_id,
+                heartbeat=app.config["CHANGE_FEED_HEARTBEAT"],
+                duration=app.config["CHANGE_FEED_MAX_DURATION"],
+            ),
+            mimetype=EVENT_STREAM_MIMETYPE,
+        )
+        # The stream releases its subscription when it ends; this covers
+        # clients gone before the first chunk.
+        response.call_on_close(subscription.close)
+        response.headers["Cache-Control"] = "no-cache"
+        response.headers["X-Accel-Buffering"] = "no"
+        return response
+
+    @app.route("/players/xp:events", methods=["POST"])
+    def ingest_experience_events():
+        is_authenticated, error_response = _require_authentication()
+        if not is_authenticated:
+            return error_response
+
+        payload = request.get_json(silent=True) or {}
+        events = _parse_xp_events(payload.get("events"))
+        if events is None:
+            return _build_error_response(
+                message="Liste d'événements d'expérience invalide.",
+                error_code="invalid_payload",
+                status=400,
+                error_message=(
+                    "Le champ 'events' doit être une liste d'objets "
+                    "{'event_id', 'player_id', 'amount'}."
+                ),
+            )
+
+        max_size = app.config["XP_EVENTS_MAX_BATCH"]
+        if len(events) > max_size:
+            return _build_error_response(
+                message="Trop d'événements dans le lot.",
+                error_code="batch_too_large",
+                status=400,
+                error_message=f"Au plus {max_size} événements par requête.",
+            )
+
+        try:
+            xp_buffer.offer(events)
+        except (BufferFull, BufferUnavailable) as exc:
+            response = _build_error_response(
+                message="Ingestion d'expérience saturée.",
+                error_code=(
+                    "xp_buffer_full"
+                    if isinstance(exc, BufferFull)
+                    else "xp_buffer_unavailable"
+                ),
+                status=503,
+                error_message="Réessayez plus tard.",
+            )
+            response[0].headers["Retry-After"] = str(
+                max(1, math.ceil(xp_flusher.interval))
+            )
+            return response
+
+        if app.config["XP_EVENTS_BACKGROUND"]:
+            xp_flusher.ensure_running()
+        xp_flusher.notify(len(events))
+
+        return _build_success_response(
+            {"accepted": len(events)},
+            message="Événements d'expérience acceptés.",
+            status=202,
+        )
+
+    @app.route("/players/xp:batch", methods=["POST"])
+    def award_experience_batch():
+        is_authenticated, error_response = _require_authentication()
+        if not is_authenticated:
+            return error_response
+
+        payload = request.get_json(silent=True) or {}
+        awards = _parse_xp_awards(payload.get("awards"))
+        if awards is None:
+            return _build_error_response(
+                message="Liste de gains d'expérience invalide.",
+                error_code="invalid_payload",
+                status=400,
+                error_message=(
+                    "Le champ 'awards' doit être une liste d'objets "
+                    "{'player_id', 'amount'} avec des entiers positifs."
+                ),
+            )
+
+        max_size = app.config["XP_BATCH_MAX_SIZE"]
+        if len(awards) > max_size:
+            return _build_error_response(
+                message="Trop de joueurs dans le lot.",
+                error_code="batch_too_large",
+                status=400,
+                error_message=f"Au plus {max_size} joueurs par requête.",
+            )
+
+        # One transaction per shard: a failure can leave earlier shards applied.
+        results = {}
+        restored: List[PlayerSnapshot] = []
+        try:
+            for shard, player_ids in shards.group_by_shard(awards).items():
+                with shards.bind(shard):
+                    restored.extend(
+                        restore_players(
+                            db.session.connection(),
+                            sorted(player_ids),
+                            app.config["XP_BATCH_CHUNK_SIZE"],
+                        )
+                    )
+                    results.update(
+                        apply_experience_awards(
+                            {player_id: awards[player_id] for player_id in player_ids},
+                            chunk_size=app.config["XP_BATCH_CHUNK_SIZE"],
+                        )
+                    )
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+
+        if restored:
+            _publish_changes(
+                [
+                    PlayerChange(
+                        snapshot.id, snapshot.level, snapshot.xp, snapshot.to_payload()
+                    )
+                    for snapshot in restored
+                ]
+            )
+        _publish_changes(
+            [
+                PlayerChange(player_id, result.level, result.xp)
+                for player_id, result in results.items()
+            ]
+        )
+
+        return _build_success_response(
+            [
+                {
+                    "player_id": player_id,
+                    "level": results[player_id].level,
+                    "xp": results[player_id].xp,
+                    "levels_gained": results[player_id].levels_gained,
+                }
+                for player_id in awards
+                if player_id in results
+            ],
+            message="Expérience attribuée avec succès.",
+            meta={
+                "missing_ids": [
+                    player_id for player_id in awards if player_id not in results
+                ],
+            },
+        )
+
+    def _serialize_leaderboard_entries(entries) -> List[Dict[str, int]]:
+        return [entry._asdict() for entry in entries]
+
+    def _leaderboard_unavailable(exc: LeaderboardUnavailable):
+        if isinstance(exc, LeaderboardRebuilding):
+            response = _build_error_response(
+                message="Classement en cours de reconstruction.",
+                error_code="leaderboard_rebuilding",
+                status=503,
+            )
+            response[0].headers["Retry-After"] = "5"
+            return response
+        return _build_error_response(
+            message="Classement temporairement indisponible.",
+            error_code="leaderboard_unavailable",
+            status=503,
+        )
+
+    @app.route("/leaderboard", methods=["GET"])
+    def get_leaderboard():
+        is_authenticated, error_response = _require_authentication()
+        if not is_authenticated:
+            return error_response
+
+        limit, limit_valid = _parse_int_arg("limit", 1)
+        offset, offset_valid = _parse_int_arg("offset", 0)
+        if not (limit_valid and offset_valid):
+            return _build_error_response(
+                message="Paramètres de classement invalides.",
+                error_code="invalid_query",
+                status=400,
+                error_message="'limit' doit être >= 1 et 'offset' >= 0.",
+            )
+
+        limit = min(limit or 10, app.config["LEADERBOARD_MAX_LIMIT"])
+        try:
+            leaderboard.ensure_ready()
+            entries = leaderboard.top(limit, offset or 0)
+            total = leaderboard.size()
+        except LeaderboardUnavailable as exc:
+            return _leaderboard_unavailable(exc)
+
+        return _build_success_response(
+            _serialize_leaderboard_entries(entries),
+            message="Classement récupéré avec succès.",
+            meta={"total": total},
+        )
+
+    @app.route("/leaderboard/players/<int:player_id>", methods=["GET"])
+    def get_player_rank(player_id: int):
+        is_authenticated, error_response = _require_authentication()
+        if not is_authenticated:
+            return error_response
+
+        radius, radius_valid = _parse_int_arg("radius", 0)
+        if not radius_valid:
+            return _build_error_response(
+                message="Paramètres de classement invalides.",
+                error_code="invalid_query",
+                status=400,
+                error_message="'radius' doit être >= 0.",
+            )
+
+        radius = min(radius or 0, app.config["LEADERBOARD_MAX_LIMIT"] // 2)
+
+        def read_rank():
+            entry = leaderboard.rank(player_id)
+            window = None
+            if entry is not None and radius:
+                window = leaderboard.around(player_id, radius)
+            return entry, window, leaderboard.size()
+
+        try:
+            leaderboard.ensure_ready()
+            entry, window, total = read_rank()
+            # Restoring publishes the player's score to the leaderboard.
+            if entry is None and _restore_archived(player_id=player_id):
+                entry, window, total = read_rank()
+        except LeaderboardUnavailable as exc:
+            return _leaderboard_unavailable(exc)
+
+        if entry is None:
+            return _build_error_response(
+                message="Joueur absent du classement.",
+                error_code="player_not_found",
+                status=404,
+            )
+
+        return _build_success_response(
+            {
+                **entry._asdict(),
+                "around": (
+                    None if window is None else _serialize_leaderboard_entries(window)
+                ),
+            },
+            message="Rang du joueur récupéré avec succès.",
+            meta={"total": total},
+        )
+
+    @app.route("/players/stats/summary", methods=["GET"])
+    def get_population_summary():
+        is_authenticated, error_response = _require_authentication()
+        if not is_authenticated:
+            return error_response
+
+        try:
+            population.ensure_ready()
+            summary = population.summary()
+        except PopulationStatsRebuilding:
+            response = _build_error_response(
+                message="Statistiques en cours de calcul.",
+                error_code="population_stats_rebuilding",
+                status=503,
+            )
+            response[0].headers["Retry-After"] = "5"
+            return response
+        except PopulationStatsUnavailable:
+            return _build_error_response(
+                message="Statistiques temporairement indisponibles.",
+                error_code="population_stats_unavailable",
+                status=503,
+            )
+
+        computed_at = summary.pop("computed_at")
+        return _build_success_response(
+            summary,
+            message="Statistiques de la population récupérées avec succès.",
+            meta={"computed_at": computed_at},
+        )
 
     @app.route("/players", methods=["POST"])
     def create_player():
@@ -161,6 +1575,75 @@ def create_app() -> Flask:
                 error_message="L'en-tête 'X-User-Id' est requis.",
             )
 
+        idempotency_key = request.headers.get("Idempotency-Key")
+        if idempotency_key is None:
+            return _create_player(user_id)
+
+        if not 0 < len(idempotency_key) <= MAX_IDEMPOTENCY_KEY_LENGTH:
+            return _build_error_response(
+                message="Clé d'idempotence invalide.",
+                error_code="invalid_idempotency_key",
+                status=400,
+                error_message=(
+                    "L'en-tête 'Idempotency-Key' doit contenir entre 1 et "
+                    f"{MAX_IDEMPOTENCY_KEY_LENGTH} caractères."
+                ),
+            )
+
+        key = idempotency.key(f"players:create:{user_id}", idempotency_key)
+        fingerprint = hashlib.sha256(request.get_data()).hexdigest()
+        try:
+            stored = idempotency.begin(key, fingerprint)
+        except IdempotencyKeyInUse:
+            return _build_error_response(
+                message="Requête déjà en cours de traitement.",
+                error_code="idempotency_key_in_use",
+                status=409,
+                error_message="Une requête avec cette clé d'idempotence est en cours.",
+            )
+        except IdempotencyKeyMismatch:
+            return _build_error_response(
+                message="Clé d'idempotence déjà utilisée.",
+                error_code="idempotency_key_reused",
+                status=422,
+                error_message=(
+                    "Cette clé d'idempotence a été utilisée pour une autre requête."
+                ),
+            )
+
+        if stored is not None:
+            # Responses are stored as JSON whatever format the first request
+            # negotiated.
+            response = _render_envelope(json.loads(stored.body))
+            response.status_code = stored.status
+            if stored.etag is not None:
+                response.set_etag(stored.etag)
+            response.headers["Idempotent-Replayed"] = "true"
+            return response
+
+        try:
+            response, status = _create_player(user_id)
+        except BaseException:
+            idempotency.release(key)
+            raise
+
+        if status >= 500:
+            idempotency.release(key)
+        else:
+            etag, _ = response.get_etag()
+            idempotency.complete(
+                key,
+                fingerprint,
+                StoredResponse(status, _json_body(response), etag),
+            )
+        return response, status
+
+    def _json_body(response: Response) -> str:
+        if response.mimetype == wire.MSGPACK_MIMETYPE:
+            return app.json.dumps(wire.unpack(response.get_data())) + "\n"
+        return response.get_data(as_text=True)
+
+    def _create_player(user_id: str):
         payload = request.get_json(silent=True) or {}
         name = payload.get("name")
         if not isinstance(name, str) or not name.strip():
@@ -171,8 +1654,22 @@ def create_app() -> Flask:
                 error_message="Le champ 'name' est requis.",
             )
 
-        existing_player = Player.query.filter_by(user_id=user_id).first()
-        if existing_player is not None:
+        try:
+            player = insert_player(
+                db.session,
+                user_id,
+                name.strip(),
+                player_id=shards.player_id_value(db.session, user_id),
+            )
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+
+        if player is None:
+            # An archived player still belongs to the user: bring it back, and
+            # answer like any other duplicate rather than ignore the name.
+            _restore_archived(user_id=user_id)
             return _build_error_response(
                 message="Un joueur existe déjà pour cet utilisateur.",
                 error_code="player_already_exists",
@@ -180,16 +1677,16 @@ def create_app() -> Flask:
                 error_message="Un joueur est déjà associé à cet utilisateur.",
             )
 
-        player = Player(user_id=user_id, name=name.strip())
-        player.stats = PlayerStats()
-
-        db.session.add(player)
-        db.session.commit()
+        payload = player.to_payload()
+        _publish_changes([PlayerChange(player.id, player.level, player.xp, payload)])
 
-        return _build_success_response(
-            _serialize_player(player),
-            message="Joueur créé avec succès.",
-            status=201,
+        return _with_etag(
+            _build_success_response(
+                payload,
+                message="Joueur créé avec succès.",
+                status=201,
+            ),
+            payload["version"],
         )
 
     @app.route("/players/<int:player_id>", methods=["PUT"])
@@ -207,45 +1704,272 @@ def create_app() -> Flask:
                 error_message="L'en-tête 'X-User-Id' est requis.",
             )
 
-        player = (
-            Player.query.options(joinedload(Player.stats))
-            .filter_by(id=player_id)
-            .first()
+        payload = request.get_json(silent=True) or {}
+        name = payload.get("name")
+        if not isinstance(name, str) or not name.strip():
+            return _build_error_response(
+                message="Nom du joueur invalide.",
+                error_code="invalid_payload",
+                status=400,
+                error_message="Le champ 'name' est requis.",
+            )
+
+        def rename():
+            return rename_player(
+                db.session, player_id, user_id, name.strip(), _if_match_versions()
+            )
+
+        def load_current():
+            db.session.rollback()
+            return db.session.execute(
+                select(Player.user_id, Player.version).where(Player.id == player_id)
+            ).first()
+
+        renamed = rename()
+        if renamed is None:
+            current = load_current()
+            if current is None and _restore_archived(player_id=player_id):
+                renamed = rename()
+                if renamed is None:
+                    current = load_current()
+
+        if renamed is None:
+            if current is None:
+                return _build_error_response(
+                    message="Joueur introuvable.",
+                    error_code="player_not_found",
+                    status=404,
+                )
+
+            if current.user_id != user_id:
+                return _build_error_response(
+                    message="Accès interdit.",
+                    error_code="forbidden",
+                    status=403,
+                    error_message="Vous ne pouvez modifier que vos propres joueurs.",
+                )
+
+            return _with_etag(
+                _build_error_response(
+                    message="Le joueur a été modifié entre-temps.",
+                    error_code="precondition_failed",
+                    status=412,
+                    error_message="L'en-tête 'If-Match' ne correspond plus à la "
+                    "version actuelle du joueur.",
+                ),
+                current.version,
+            )
+
+        db.session.commit()
+
+        payload = renamed.to_payload()
+        _publish_changes([PlayerChange(player_id, renamed.level, renamed.xp, payload)])
+
+        return _with_etag(
+            _build_success_response(
+                payload,
+                message="Joueur mis à jour avec succès.",
+            ),
+            payload["version"],
         )
 
-        if player is None:
+    @app.route("/players/<int:player_id>/stats", methods=["PATCH"])
+    def increment_player_stats(player_id: int):
+        is_authenticated, error_response = _require_authentication()
+        if not is_authenticated:
+            return error_response
+
+        user_id = request.headers.get("X-User-Id")
+        if not user_id:
             return _build_error_response(
-                message="Joueur introuvable.",
-                error_code="player_not_found",
-                status=404,
+                message="Identifiant utilisateur requis.",
+                error_code="user_id_missing",
+                status=400,
+                error_message="L'en-tête 'X-User-Id' est requis.",
             )
 
-        if player.user_id != user_id:
+        parsed = _parse_stat_deltas(request.get_json(silent=True))
+        if parsed is None:
             return _build_error_response(
-                message="Accès interdit.",
-                error_code="forbidden",
-                status=403,
-                error_message="Vous ne pouvez modifier que vos propres joueurs.",
+                message="Variations de statistiques invalides.",
+                error_code="invalid_payload",
+                status=400,
+                error_message=(
+                    "Les champs 'health', 'attack' et 'defense' doivent être des "
+                    "entiers, 'xp' un entier positif et 'clamp' un booléen ; au "
+                    "moins une variation non nulle est requise."
+                ),
             )
 
-        payload = request.get_json(silent=True) or {}
-        name = payload.get("name")
-        if not isinstance(name, str) or not name.strip():
+        deltas, xp, clamp = parsed
+        expected_versions = _if_match_versions()
+
+        def increment():
+            try:
+                player = apply_increments(
+                    db.session,
+                    player_id,
+                    deltas,
+                    xp=xp,
+                    clamp=clamp,
+                    expected_versions=expected_versions,
+                    user_id=user_id,
+                )
+                if player is not None:
+                    db.session.commit()
+            except Exception:
+                db.session.rollback()
+                raise
+            return player
+
+        def load_current():
+            db.session.rollback()
+            return db.session.execute(
+                select(Player.user_id, Player.version, PlayerStats.id.label("stats_id"))
+                .outerjoin(PlayerStats, PlayerStats.player_id == Player.id)
+                .where(Player.id == player_id)
+            ).first()
+
+        player = increment()
+        if player is None:
+            current = load_current()
+            if current is None and _restore_archived(player_id=player_id):
+                player = increment()
+                if player is None:
+                    current = load_current()
+
+        if player is None:
+            if current is None:
+                return _build_error_response(
+                    message="Joueur introuvable.",
+                    error_code="player_not_found",
+                    status=404,
+                )
+
+            if current.user_id != user_id:
+                return _build_error_response(
+                    message="Accès interdit.",
+                    error_code="forbidden",
+                    status=403,
+                    error_message="Vous ne pouvez modifier que vos propres joueurs.",
+                )
+
+            if (
+                expected_versions is not None
+                and current.version not in expected_versions
+            ):
+                return _with_etag(
+                    _build_error_response(
+                        message="Le joueur a été modifié entre-temps.",
+                        error_code="precondition_failed",
+                        status=412,
+                        error_message="L'en-tête 'If-Match' ne correspond plus à "
+                        "la version actuelle du joueur.",
+                    ),
+                    current.version,
+                )
+
+            if current.stats_id is None:
+                return _build_error_response(
+                    message="Statistiques du joueur introuvables.",
+                    error_code="stats_not_found",
+                    status=404,
+                )
+
+            return _with_etag(
+                _build_error_response(
+                    message="Statistiques hors limites.",
+                    error_code="stats_out_of_range",
+                    status=409,
+                    error_message=(
+                        "Les statistiques doivent rester comprises entre 0 et "
+                        f"{MAX_STAT_VALUE} ; utilisez 'clamp' pour les borner."
+                    ),
+                ),
+                current.version,
+            )
+
+        payload = player.to_payload()
+        _publish_changes([PlayerChange(player.id, player.level, player.xp, payload)])
+
+        return _with_etag(
+            _build_success_response(
+                payload,
+                message="Statistiques du joueur mises à jour avec succès.",
+            ),
+            payload["version"],
+        )
+
+    @app.route("/players/<int:player_id>", methods=["DELETE"])
+    def delete_player(player_id: int):
+        is_authenticated, error_response = _require_authentication()
+        if not is_authenticated:
+            return error_response
+
+        user_id = request.headers.get("X-User-Id")
+        if not user_id:
             return _build_error_response(
-                message="Nom du joueur invalide.",
-                error_code="invalid_payload",
+                message="Identifiant utilisateur requis.",
+                error_code="user_id_missing",
                 status=400,
-                error_message="Le champ 'name' est requis.",
+                error_message="L'en-tête 'X-User-Id' est requis.",
             )
 
-        player.name = name.strip()
-        db.session.commit()
+        try:
+            deleted = soft_delete_player(
+                db.session.connection(), player_id, user_id, _if_match_versions()
+            )
+            if deleted:
+                db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+
+        if not deleted:
+            db.session.rollback()
+            current = load_owner(db.session.connection(), player_id)
+
+            if current is None:
+                return _build_error_response(
+                    message="Joueur introuvable.",
+                    error_code="player_not_found",
+                    status=404,
+                )
+
+            if current.user_id != user_id:
+                return _build_error_response(
+                    message="Accès interdit.",
+                    error_code="forbidden",
+                    status=403,
+                    error_message="Vous ne pouvez supprimer que vos propres joueurs.",
+                )
+
+            return _with_etag(
+                _build_error_response(
+                    message="Le joueur a été modifié entre-temps.",
+                    error_code="precondition_failed",
+                    status=412,
+                    error_message="L'en-tête 'If-Match' ne correspond plus à la "
+                    "version actuelle du joueur.",
+                ),
+                current.version,
+            )
+
+        players_removed.send(app, player_ids=[player_id])
 
         return _build_success_response(
-            _serialize_player(player),
-            message="Joueur mis à jour avec succès.",
+            {"id": player_id},
+            message="Joueur supprimé avec succès.",
         )
 
+    ReplicaRouter(
+        app.config["DATABASE_REPLICA_URLS"],
+        redis_client,
+        sticky_seconds=app.config["REPLICA_STICKY_SECONDS"],
+        retry_after=app.config["REPLICA_RETRY_AFTER"],
+        read_endpoints=("batch_get_players",),
+    ).init_app(app)
+
     return app
 
 
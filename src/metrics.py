@@ -0,0 +1,309 @@
+"""Prometheus metrics for requests and database activity.
+
+Everything is kept in-process and rendered in the Prometheus text format on
+``GET /metrics``; with several gunicorn workers each worker reports its own
+series (scrape them per worker or aggregate downstream).
+
+Per-request SQL statement counts, DB time and pool wait are accumulated in a
+context-local :class:`RequestStats` by SQLAlchemy engine events and observed
+once when the request finishes, so the per-statement cost is a context
+variable lookup and two clock reads.
+"""
+
+import logging
+import threading
+import time
+from contextvars import ContextVar, Token
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from flask import Flask, Response, request
+from sqlalchemy import event
+from sqlalchemy.pool import QueuePool
+
+from .extensions import db
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5)
+COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+LabelValues = Tuple[str, ...]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Iterable[str]) -> str:
+    pairs = [f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)]
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(labels)
+        self._lock = threading.Lock()
+
+    def header(self) -> List[str]:
+        return [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.kind}",
+        ]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, *args: Any, **kwargs: Any) -> None:
+        super().__init__(*args, **kwargs)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, labels: LabelValues = (), amount: float = 1) -> None:
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def value(self, labels: LabelValues = ()) -> float:
+        return self._values.get(labels, 0)
+
+    def render(self) -> List[str]:
+        lines = self.header()
+        for labels, value in sorted(self._values.items()):
+            rendered = _format_labels(self.label_names, labels)
+            lines.append(f"{self.name}{rendered} {_format_value(value)}")
+        return lines
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def dec(self, labels: LabelValues = (), amount: float = 1) -> None:
+        self.inc(labels, -amount)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labels: Sequence[str] = (),
+        buckets: Sequence[float] = LATENCY_BUCKETS,
+    ) -> None:
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(buckets) + (float("inf"),)
+        self._series: Dict[LabelValues, List[float]] = {}
+
+    def observe(self, value: float, labels: LabelValues = ()) -> None:
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                # One slot per bucket, then sum and count.
+                series = self._series[labels] = [0] * len(self.buckets) + [0, 0]
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[index] += 1
+                    break
+            series[-2] += value
+            series[-1] += 1
+
+    def count(self, labels: LabelValues = ()) -> int:
+        series = self._series.get(labels)
+        return 0 if series is None else series[-1]
+
+    def total(self, labels: LabelValues = ()) -> float:
+        series = self._series.get(labels)
+        return 0 if series is None else series[-2]
+
+    def render(self) -> List[str]:
+        lines = self.header()
+        for labels, series in sorted(self._series.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets, series):
+                cumulative += count
+                rendered = _format_labels(
+                    self.label_names + ("le",), labels + (_format_value(bound),)
+                )
+                lines.append(f"{self.name}_bucket{rendered} {cumulative}")
+            rendered = _format_labels(self.label_names, labels)
+            lines.append(f"{self.name}_sum{rendered} {_format_value(series[-2])}")
+            lines.append(f"{self.name}_count{rendered} {series[-1]}")
+        return lines
+
+
+class RequestStats:
+    """Database activity attributed to the request being handled."""
+
+    __slots__ = ("sql_count", "sql_time", "pool_wait")
+
+    def __init__(self) -> None:
+        self.sql_count = 0
+        self.sql_time = 0.0
+        self.pool_wait = 0.0
+
+
+_request_stats: ContextVar[Optional[RequestStats]] = ContextVar(
+    "request_stats", default=None
+)
+
+
+def current_request_stats() -> Optional[RequestStats]:
+    return _request_stats.get()
+
+
+def track_request_stats() -> "Token[Optional[RequestStats]]":
+    """Attribute database activity to a fresh :class:`RequestStats`."""
+
+    return _request_stats.set(RequestStats())
+
+
+def untrack_request_stats(token: "Token[Optional[RequestStats]]") -> None:
+    try:
+        _request_stats.reset(token)
+    except ValueError:
+        # Reset from another context than the one that set it.
+        _request_stats.set(None)
+
+
+class TimedQueuePool(QueuePool):
+    """``QueuePool`` that charges checkout wait time to the current request."""
+
+    def _do_get(self) -> Any:
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            stats = _request_stats.get()
+            if stats is not None:
+                stats.pool_wait += time.perf_counter() - started
+
+
+class Metrics:
+    """Request and database instrumentation for one application."""
+
+    def __init__(self, slow_query_threshold: Optional[float] = None) -> None:
+        self.slow_query_threshold = slow_query_threshold
+        self.requests = Counter(
+            "http_requests_total",
+            "HTTP requests by route, method and status code.",
+            ("method", "route", "status"),
+        )
+        self.latency = Histogram(
+            "http_request_duration_seconds",
+            "Time spent handling a request, excluding streamed bodies.",
+            ("method", "route"),
+        )
+        self.in_flight = Gauge(
+            "http_requests_in_flight", "Requests currently being handled."
+        )
+        self.sql_statements = Histogram(
+            "db_statements_per_request",
+            "SQL statements executed per request.",
+            ("method", "route"),
+            buckets=COUNT_BUCKETS,
+        )
+        self.db_time = Histogram(
+            "db_time_per_request_seconds",
+            "Time spent executing SQL per request.",
+            ("method", "route"),
+        )
+        self.pool_wait = Histogram(
+            "db_pool_wait_seconds",
+            "Time spent waiting to check a connection out of the pool.",
+        )
+        self.slow_queries = Counter(
+            "db_slow_queries_total", "Statements slower than the slow query threshold."
+        )
+        self._metrics = (
+            self.requests,
+            self.latency,
+            self.in_flight,
+            self.sql_statements,
+            self.db_time,
+            self.pool_wait,
+            self.slow_queries,
+        )
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+    def instrument_engine(self, engine: Any) -> None:
+        event.listen(engine, "before_cursor_execute", self._before_cursor_execute)
+        event.listen(engine, "after_cursor_execute", self._after_cursor_execute)
+
+    # The start time lives on the execution context, which is discarded with
+    # the statement: a failed statement never reaches after_cursor_execute.
+    def _before_cursor_execute(self, conn, cursor, statement, params, context, many):
+        context.metrics_started = time.perf_counter()
+
+    def _after_cursor_execute(self, conn, cursor, statement, params, context, many):
+        elapsed = time.perf_counter() - context.metrics_started
+
+        stats = _request_stats.get()
+        if stats is not None:
+            stats.sql_count += 1
+            stats.sql_time += elapsed
+
+        threshold = self.slow_query_threshold
+        if threshold is not None and elapsed >= threshold:
+            self.slow_queries.inc()
+            logger.warning(
+                "Slow query (%.1f ms): %s", elapsed * 1000, " ".join(statement.split())
+            )
+
+    def init_app(self, app: Flask) -> None:
+        with app.app_context():
+            for engine in db.engines.values():
+                self.instrument_engine(engine)
+
+        app.before_request(self._before_request)
+        app.after_request(self._after_request)
+        app.teardown_request(self._teardown_request)
+        app.add_url_rule("/metrics", "metrics", self._metrics_view)
+        app.extensions["metrics"] = self
+
+    def _before_request(self) -> None:
+        request.environ["metrics.started"] = time.perf_counter()
+        request.environ["metrics.token"] = track_request_stats()
+        self.in_flight.inc()
+
+    def _after_request(self, response: Response) -> Response:
+        started = request.environ.get("metrics.started")
+        if started is None:
+            return response
+
+        rule = request.url_rule
+        labels = (request.method, rule.rule if rule is not None else "<unmatched>")
+        self.latency.observe(time.perf_counter() - started, labels)
+        self.requests.inc(labels + (str(response.status_code),))
+
+        stats = _request_stats.get()
+        if stats is not None:
+            self.sql_statements.observe(stats.sql_count, labels)
+            self.db_time.observe(stats.sql_time, labels)
+            if stats.pool_wait:
+                self.pool_wait.observe(stats.pool_wait)
+        return response
+
+    def _teardown_request(self, exc: Optional[BaseException]) -> None:
+        token = request.environ.pop("metrics.token", None)
+        if token is None:
+            return
+        self.in_flight.dec()
+        untrack_request_stats(token)
+
+    def _metrics_view(self) -> Response:
+        return Response(self.render(), mimetype="text/plain; version=0.0.4")
@@ -1,8 +1,44 @@
 """Database models for player profiles and statistics."""
 
-from sqlalchemy import CheckConstraint
+from datetime import datetime, timezone
+
+from sqlalchemy import CheckConstraint, Index
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.orm import validates
 
 from .extensions import db
+from .leveling import apply_experience
+
+NAME_LENGTH = 120
+"""Longest player name, in characters."""
+
+FOLDED_NAME_LENGTH = 3 * NAME_LENGTH
+"""Longest case-folded name: ``str.casefold`` maps one character to at most
+three (``"ﬃ"`` becomes ``"ffi"``)."""
+
+PLAYER_ID_TYPE = db.BigInteger().with_variant(db.Integer(), "sqlite")
+"""Type of player ids. Sharded ids are ``seq * SLOT_COUNT + slot`` and outgrow
+32 bits; SQLite keeps ``INTEGER`` so ``players.id`` stays the 64-bit rowid."""
+
+FOLDED_NAME_TYPE = db.String(FOLDED_NAME_LENGTH).with_variant(
+    postgresql.VARCHAR(FOLDED_NAME_LENGTH, collation="C"), "postgresql"
+)
+"""Type of ``players.name_folded``; byte-wise ordering so that prefix ranges
+can use the btree index (SQLite compares bytes by default)."""
+
+
+def fold_name(name: str) -> str:
+    """Return the case-folded form of a player name used for searching."""
+
+    return name.casefold()
+
+
+def _utcnow() -> datetime:
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def _default_name_folded(context) -> str:
+    return fold_name(context.get_current_parameters()["name"])
 
 
 class Player(db.Model):
@@ -10,11 +46,21 @@ class Player(db.Model):
 
     __tablename__ = "players"
 
-    id = db.Column(db.Integer, primary_key=True)
+    id = db.Column(PLAYER_ID_TYPE, primary_key=True)
     user_id = db.Column(db.String(64), nullable=False, unique=True)
-    name = db.Column(db.String(120), nullable=False)
+    name = db.Column(db.String(NAME_LENGTH), nullable=False)
+    name_folded = db.Column(
+        FOLDED_NAME_TYPE, nullable=False, default=_default_name_folded
+    )
     level = db.Column(db.Integer, nullable=False, default=1)
     xp = db.Column(db.Integer, nullable=False, default=0)
+    version = db.Column(db.Integer, nullable=False, default=1, server_default="1")
+    last_seen_at = db.Column(
+        db.DateTime,
+        nullable=False,
+        default=_utcnow,
+        server_default=db.func.current_timestamp(),
+    )
 
     stats = db.relationship(
         "PlayerStats",
@@ -26,8 +72,20 @@ class Player(db.Model):
     __table_args__ = (
         CheckConstraint("level >= 1", name="ck_player_level_positive"),
         CheckConstraint("xp >= 0", name="ck_player_xp_non_negative"),
+        Index("ix_players_leaderboard", level.desc(), xp.desc(), id),
+        Index("ix_players_name_folded", name_folded, id),
+        Index("ix_players_last_seen_at", last_seen_at),
     )
 
+    # Every ORM UPDATE bumps ``version`` and is conditioned on the loaded value;
+    # Core/bulk writers must increment it themselves.
+    __mapper_args__ = {"version_id_col": version}
+
+    @validates("name")
+    def _fold_name(self, key: str, name: str) -> str:
+        self.name_folded = fold_name(name)
+        return name
+
     def xp_to_next_level(self) -> int:
         """Return the amount of experience required to reach the next level."""
 
@@ -46,17 +104,9 @@ class Player(db.Model):
             ValueError: If *amount* is negative.
         """
 
-        if amount < 0:
-            raise ValueError("Experience amount must be non-negative.")
-
-        self.xp += amount
-        levels_gained = 0
-
-        while self.xp >= self.xp_to_next_level():
-            required_xp = self.xp_to_next_level()
-            self.xp -= required_xp
-            self.level += 1
-            levels_gained += 1
+        level, xp, levels_gained = apply_experience(self.level, self.xp, amount)
+        self.level = level
+        self.xp = xp
 
         return levels_gained
 
@@ -80,7 +130,7 @@ class PlayerStats(db.Model):
 
     id = db.Column(db.Integer, primary_key=True)
     player_id = db.Column(
-        db.Integer, db.ForeignKey("players.id"), nullable=False, unique=True
+        PLAYER_ID_TYPE, db.ForeignKey("players.id"), nullable=False, unique=True
     )
     health = db.Column(db.Integer, nullable=False, default=100)
     attack = db.Column(db.Integer, nullable=False, default=10)
@@ -102,3 +152,42 @@ class PlayerStats(db.Model):
             f"attack={self.attack!r} "
             f"defense={self.defense!r}>"
         )
+
+
+class XpEventReceipt(db.Model):
+    """Records an applied XP event so that redelivered copies are ignored."""
+
+    __tablename__ = "xp_event_receipts"
+
+    event_id = db.Column(db.String(64), primary_key=True)
+    player_id = db.Column(PLAYER_ID_TYPE, nullable=False)
+    applied_at = db.Column(db.DateTime, nullable=False, default=_utcnow, index=True)
+
+    def __repr__(self) -> str:  # pragma: no cover - convenience method
+        return f"<XpEventReceipt event_id={self.event_id!r}>"
+
+
+class PlayerArchive(db.Model):
+    """An inactive or deleted player moved out of ``players``.
+
+    One row holds the player and its stats. Rows with ``deleted_at`` set are
+    soft-deleted players and are never restored.
+    """
+
+    __tablename__ = "players_archive"
+
+    id = db.Column(PLAYER_ID_TYPE, primary_key=True, autoincrement=False)
+    user_id = db.Column(db.String(64), nullable=False, index=True)
+    name = db.Column(db.String(NAME_LENGTH), nullable=False)
+    level = db.Column(db.Integer, nullable=False)
+    xp = db.Column(db.Integer, nullable=False)
+    version = db.Column(db.Integer, nullable=False)
+    health = db.Column(db.Integer)
+    attack = db.Column(db.Integer)
+    defense = db.Column(db.Integer)
+    last_seen_at = db.Column(db.DateTime, nullable=False)
+    archived_at = db.Column(db.DateTime, nullable=False, default=_utcnow)
+    deleted_at = db.Column(db.DateTime)
+
+    def __repr__(self) -> str:  # pragma: no cover - convenience method
+        return f"<PlayerArchive id={self.id!r} deleted_at={self.deleted_at!r}>"
@@ -0,0 +1,670 @@
+"""Population statistics maintained incrementally from player writes.
+
+The summary is a set of counters: the number of players, the sum of their
+``xp``, one count per level and one histogram per stat (health, attack,
+defense). Each committed write moves the player's contribution from its old
+buckets to its new ones, and archived or deleted players withdraw theirs, so
+``GET /players/stats/summary`` reads a few hundred counters instead of
+aggregating the ``players`` and ``player_stats`` tables.
+
+To move a contribution the previous one must be known, so the last
+contribution of every player is kept next to the counters (about 30 bytes per
+player). Writes that do not carry stats (experience awards) keep the player's
+previous stat buckets.
+
+Stat histograms use log-linear buckets: values below 32 are exact, above that
+each power of two is split into 16 buckets, so a percentile estimated by
+interpolating inside its bucket is within about 6 % of the true value.
+
+The counters are rebuilt from the database in a background thread, never
+inside a request: when they are missing (reads raise
+:class:`PopulationStatsRebuilding` meanwhile) and when they are older than
+``POPULATION_STATS_RECOMPUTE_INTERVAL`` (the previous counters keep being
+served). ``flask population rebuild`` runs one on demand. Writes made while a
+rebuild streams the tables are applied to the staged counters as well and take
+precedence over the rows read, except for stats the write did not carry;
+players removed meanwhile are left out. Only writes that fail to reach Redis
+make the counters drift, until the next periodic rebuild.
+"""
+
+import logging
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+import click
+from flask import Flask, current_app
+from flask.cli import AppGroup
+from redis.exceptions import RedisError
+from sqlalchemy import select
+
+from .models import Player, PlayerStats
+
+logger = logging.getLogger(__name__)
+
+STATS = ("health", "attack", "defense")
+PERCENTILES = (50, 90, 99)
+SUB_BUCKET_BITS = 4
+REBUILD_LOCK_TTL = 60.0
+"""Seconds a rebuild holds its claim without loading a batch."""
+
+
+class PopulationStatsUnavailable(Exception):
+    """Raised when the population counters cannot be read."""
+
+
+class PopulationStatsRebuilding(PopulationStatsUnavailable):
+    """Raised while the population counters are not built yet."""
+
+
+Contribution = Tuple[int, int, Optional[int], Optional[int], Optional[int]]
+"""``(level, xp, health, attack, defense)`` buckets of one player."""
+
+_CONTRIBUTE_LUA = """
+local stats = {'health:', 'attack:', 'defense:'}
+
+local function add(summary, field, amount)
+    if redis.call('HINCRBY', summary, field, amount) == 0 then
+        redis.call('HDEL', summary, field)
+    end
+end
+
+local function contribute(summary, parts, sign)
+    add(summary, 'players', sign)
+    add(summary, 'level:' .. parts[1], sign)
+    add(summary, 'xp_sum', sign * tonumber(parts[2]))
+    for s = 1, 3 do
+        if parts[s + 2] ~= '-' then
+            add(summary, stats[s] .. parts[s + 2], sign)
+        end
+    end
+end
+
+local function parse(stored)
+    local parts = {}
+    for part in string.gmatch(stored, '%S+') do
+        parts[#parts + 1] = part
+    end
+    return parts
+end
+
+local function withdraw(summary, members, player_id)
+    local stored = redis.call('HGET', members, player_id)
+    if not stored then
+        return nil
+    end
+    local old = parse(stored)
+    contribute(summary, old, -1)
+    return old
+end
+
+local function move(summary, members, player_id, new)
+    local old = withdraw(summary, members, player_id)
+    if old then
+        for s = 3, 5 do
+            if new[s] == '-' then
+                new[s] = old[s]
+            end
+        end
+    end
+    contribute(summary, new, 1)
+    redis.call('HSET', members, player_id, table.concat(new, ' '))
+end
+
+local function entry(i)
+    return {ARGV[i + 1], ARGV[i + 2], ARGV[i + 3], ARGV[i + 4], ARGV[i + 5]}
+end
+"""
+
+APPLY_SCRIPT = (
+    _CONTRIBUTE_LUA
+    + """
+local rebuilding = redis.call('EXISTS', KEYS[6]) == 1
+for i = 1, #ARGV, 6 do
+    if rebuilding then
+        move(KEYS[3], KEYS[4], ARGV[i], entry(i))
+        redis.call('SREM', KEYS[5], ARGV[i])
+    end
+    move(KEYS[1], KEYS[2], ARGV[i], entry(i))
+end
+return #ARGV / 6
+"""
+)
+"""Move each player's contribution, in the staged counters too during a
+rebuild; ``ARGV`` holds six values per player."""
+
+REMOVE_SCRIPT = (
+    _CONTRIBUTE_LUA
+    + """
+local rebuilding = redis.call('EXISTS', KEYS[6]) == 1
+for i = 1, #ARGV do
+    if withdraw(KEYS[1], KEYS[2], ARGV[i]) then
+        redis.call('HDEL', KEYS[2], ARGV[i])
+    end
+    if rebuilding then
+        if withdraw(KEYS[3], KEYS[4], ARGV[i]) then
+            redis.call('HDEL', KEYS[4], ARGV[i])
+        end
+        redis.call('SADD', KEYS[5], ARGV[i])
+    end
+end
+return #ARGV
+"""
+)
+"""Withdraw the contribution of each player id in ``ARGV``, remembering the
+ids until a running rebuild completes."""
+
+LOAD_SCRIPT = (
+    _CONTRIBUTE_LUA
+    + """
+for i = 1, #ARGV, 6 do
+    if redis.call('SISMEMBER', KEYS[3], ARGV[i]) == 0 then
+        local row = entry(i)
+        local stored = redis.call('HGET', KEYS[2], ARGV[i])
+        if not stored then
+            contribute(KEYS[1], row, 1)
+            redis.call('HSET', KEYS[2], ARGV[i], table.concat(row, ' '))
+        else
+            local written = parse(stored)
+            local partial = false
+            for s = 3, 5 do
+                if written[s] == '-' then
+                    written[s] = row[s]
+                    partial = partial or row[s] ~= '-'
+                end
+            end
+            if partial then
+                move(KEYS[1], KEYS[2], ARGV[i], written)
+            end
+        end
+    end
+end
+return #ARGV / 6
+"""
+)
+"""Add rows read by a rebuild to the staged counters. Players written during
+the rebuild keep the written contribution, completed with the row's stats
+where the write carried none."""
+
+CLAIM_SCRIPT = """
+if redis.call('SET', KEYS[6], 1, 'NX', 'PX', ARGV[1]) then
+    redis.call('DEL', KEYS[3], KEYS[4], KEYS[5])
+    return 1
+end
+return 0
+"""
+
+SWAP_SCRIPT = """
+redis.call('HSET', KEYS[3], 'computed_at', ARGV[1])
+redis.call('RENAME', KEYS[3], KEYS[1])
+if redis.call('EXISTS', KEYS[4]) == 1 then
+    redis.call('RENAME', KEYS[4], KEYS[2])
+else
+    redis.call('DEL', KEYS[2])
+end
+redis.call('DEL', KEYS[5], KEYS[6])
+return tonumber(redis.call('HGET', KEYS[1], 'players') or '0')
+"""
+
+
+def bucket_index(value: int) -> int:
+    """Histogram bucket of *value*: exact below 32, 16 buckets per octave above."""
+
+    value = max(0, value)
+    shift = max(0, value.bit_length() - SUB_BUCKET_BITS - 1)
+    return (shift << SUB_BUCKET_BITS) + (value >> shift)
+
+
+def bucket_bounds(index: int) -> Tuple[int, int]:
+    """Return the ``[lower, upper)`` range of values in bucket *index*."""
+
+    shift = max(0, (index >> SUB_BUCKET_BITS) - 1)
+    mantissa = index - (shift << SUB_BUCKET_BITS)
+    return mantissa << shift, (mantissa + 1) << shift
+
+
+def estimate_percentile(histogram: Dict[int, int], percentile: float) -> Optional[int]:
+    """Estimate a percentile by interpolating inside the bucket that holds it."""
+
+    total = sum(histogram.values())
+    if not total:
+        return None
+
+    rank = percentile / 100 * total
+    seen = 0
+    for index in sorted(histogram):
+        count = histogram[index]
+        if seen + count >= rank:
+            lower, upper = bucket_bounds(index)
+            if upper - lower == 1:
+                return lower
+            return round(lower + (rank - seen) / count * (upper - lower - 1))
+        seen += count
+    return bucket_bounds(max(histogram))[0]
+
+
+def contribution(level: int, xp: int, stats: Optional[Dict[str, Any]]) -> Contribution:
+    buckets = [
+        bucket_index(stats[name]) if stats and stats.get(name) is not None else None
+        for name in STATS
+    ]
+    return (level, xp, buckets[0], buckets[1], buckets[2])
+
+
+def _add(counters: Counter, entry: Contribution, sign: int) -> None:
+    level, xp, *buckets = entry
+    counters["players"] += sign
+    counters[f"level:{level}"] += sign
+    counters["xp_sum"] += sign * xp
+    for name, index in zip(STATS, buckets):
+        if index is not None:
+            counters[f"{name}:{index}"] += sign
+
+
+def _move(
+    counters: Counter,
+    members: Dict[int, Contribution],
+    player_id: int,
+    entry: Contribution,
+) -> None:
+    old = members.get(player_id)
+    if old is not None:
+        _add(counters, old, -1)
+        entry = entry[:2] + tuple(
+            previous if new is None else new
+            for new, previous in zip(entry[2:], old[2:])
+        )
+    _add(counters, entry, 1)
+    members[player_id] = entry
+
+
+def _withdraw(
+    counters: Counter, members: Dict[int, Contribution], player_id: int
+) -> None:
+    old = members.pop(player_id, None)
+    if old is not None:
+        _add(counters, old, -1)
+
+
+class RedisPopulationBackend:
+    """Counters in one Redis hash, contributions in another."""
+
+    def __init__(self, redis_client: Any, key: str = "players:summary") -> None:
+        self.redis = redis_client
+        self.key = key
+        self.members_key = f"{key}:members"
+        self.lock_key = f"{key}:rebuilding"
+        self.staging_key = f"{key}:rebuild"
+        self.members_staging_key = f"{self.members_key}:rebuild"
+        self.removed_key = f"{key}:rebuild:removed"
+        self.active_key = f"{key}:rebuild:active"
+        self._apply = redis_client.register_script(APPLY_SCRIPT)
+        self._remove = redis_client.register_script(REMOVE_SCRIPT)
+        self._load = redis_client.register_script(LOAD_SCRIPT)
+        self._claim = redis_client.register_script(CLAIM_SCRIPT)
+        self._swap = redis_client.register_script(SWAP_SCRIPT)
+
+    @property
+    def _keys(self) -> List[str]:
+        return [
+            self.key,
+            self.members_key,
+            self.staging_key,
+            self.members_staging_key,
+            self.removed_key,
+            self.active_key,
+        ]
+
+    def is_ready(self) -> bool:
+        return bool(self.redis.hexists(self.key, "computed_at"))
+
+    def apply(self, entries: Dict[int, Contribution]) -> None:
+        self._apply(keys=self._keys, args=self._args(entries))
+
+    def remove(self, player_ids: List[int]) -> None:
+        self._remove(keys=self._keys, args=player_ids)
+
+    def counters(self) -> Dict[str, float]:
+        return {
+            field.decode(): float(value)
+            for field, value in self.redis.hgetall(self.key).items()
+        }
+
+    def claim_rebuild(self, ttl: float) -> bool:
+        return bool(
+            self.redis.set(self.lock_key, 1, nx=True, px=max(1, int(ttl * 1000)))
+        )
+
+    def invalidate(self) -> None:
+        pipeline = self.redis.pipeline(transaction=True)
+        pipeline.hset(self.key, "computed_at", 0)
+        pipeline.delete(self.lock_key)
+        pipeline.execute()
+
+    def replace(
+        self, batches: Iterable[Dict[int, Contribution]], computed_at: float
+    ) -> Optional[int]:
+        """Rebuild from *batches*; ``None`` if another rebuild is running."""
+
+        ttl = int(REBUILD_LOCK_TTL * 1000)
+        if not self._claim(keys=self._keys, args=[ttl]):
+            return None
+
+        staged = self._keys[2:5]
+        try:
+            for entries in batches:
+                if entries:
+                    self._load(keys=staged, args=self._args(entries))
+                self.redis.pexpire(self.active_key, ttl)
+        except BaseException:
+            self.redis.delete(*self._keys[2:])
+            raise
+
+        return self._swap(keys=self._keys, args=[computed_at])
+
+    @staticmethod
+    def _args(entries: Dict[int, Contribution]) -> List[Any]:
+        args: List[Any] = []
+        for player_id, entry in entries.items():
+            args.append(player_id)
+            args.extend("-" if value is None else value for value in entry)
+        return args
+
+
+class LocalPopulationBackend:
+    """In-process fallback with the same counters."""
+
+    def __init__(self) -> None:
+        self._counters: Counter = Counter()
+        self._members: Dict[int, Contribution] = {}
+        self._lock = threading.Lock()
+        self._staging: Optional[
+            Tuple[Counter, Dict[int, Contribution], Set[int]]
+        ] = None
+
+    def is_ready(self) -> bool:
+        return "computed_at" in self._counters
+
+    def apply(self, entries: Dict[int, Contribution]) -> None:
+        with self._lock:
+            for player_id, entry in entries.items():
+                if self._staging is not None:
+                    counters, members, removed = self._staging
+                    _move(counters, members, player_id, entry)
+                    removed.discard(player_id)
+                _move(self._counters, self._members, player_id, entry)
+
+    def remove(self, player_ids: List[int]) -> None:
+        with self._lock:
+            for player_id in player_ids:
+                _withdraw(self._counters, self._members, player_id)
+                if self._staging is not None:
+                    counters, members, removed = self._staging
+                    _withdraw(counters, members, player_id)
+                    removed.add(player_id)
+
+    def counters(self) -> Dict[str, float]:
+        with self._lock:
+            return {field: value for field, value in self._counters.items() if value}
+
+    def claim_rebuild(self, ttl: float) -> bool:
+        return True
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._counters["computed_at"] = 0
+
+    def replace(
+        self, batches: Iterable[Dict[int, Contribution]], computed_at: float
+    ) -> Optional[int]:
+        with self._lock:
+            if self._staging is not None:
+                return None
+            counters, members, removed = self._staging = (Counter(), {}, set())
+
+        try:
+            for entries in batches:
+                with self._lock:
+                    for player_id, row in entries.items():
+                        if player_id in removed:
+                            continue
+                        written = members.get(player_id)
+                        if written is None:
+                            _add(counters, row, 1)
+                            members[player_id] = row
+                        elif None in written[2:]:
+                            # Written meanwhile without stats: keep the row's.
+                            _move(
+                                counters,
+                                members,
+                                player_id,
+                                written[:2]
+                                + tuple(
+                                    stat if value is None else value
+                                    for value, stat in zip(written[2:], row[2:])
+                                ),
+                            )
+        except BaseException:
+            with self._lock:
+                self._staging = None
+            raise
+
+        with self._lock:
+            counters["computed_at"] = computed_at
+            self._counters = counters
+            self._members = members
+            self._staging = None
+        return counters["players"]
+
+
+class PopulationStats:
+    """Level distribution, average xp and stat percentiles of all players."""
+
+    def __init__(
+        self, backend: Any, recompute_interval: float = 300.0, background: bool = True
+    ) -> None:
+        self.backend = backend
+        self.recompute_interval = recompute_interval
+        self.background = background
+        self._rebuilding = threading.Lock()
+
+    @classmethod
+    def from_redis(
+        cls,
+        redis_client: Any,
+        recompute_interval: float = 300.0,
+        background: bool = True,
+    ) -> "PopulationStats":
+        if redis_client is None:
+            return cls(LocalPopulationBackend(), recompute_interval, background)
+        return cls(RedisPopulationBackend(redis_client), recompute_interval, background)
+
+    def apply_changes(self, sender: Any, changes: Iterable[Any]) -> None:
+        """``players_changed`` receiver: move the contributions of the players."""
+
+        entries = {
+            change.player_id: contribution(
+                change.level,
+                change.xp,
+                change.payload.get("stats") if change.payload else None,
+            )
+            for change in changes
+        }
+        if not entries:
+            return
+
+        try:
+            self.backend.apply(entries)
+        except RedisError as exc:
+            logger.warning("Population stats update failed, rebuild required: %s", exc)
+
+    def apply_removals(self, sender: Any, player_ids: Iterable[int]) -> None:
+        """``players_removed`` receiver: withdraw the players' contributions."""
+
+        player_ids = list(player_ids)
+        if not player_ids:
+            return
+
+        try:
+            self.backend.remove(player_ids)
+        except RedisError as exc:
+            logger.warning("Population stats update failed, rebuild required: %s", exc)
+
+    def invalidate(self) -> None:
+        """Have the next read schedule a rebuild."""
+
+        try:
+            self.backend.invalidate()
+        except RedisError as exc:
+            logger.warning("Population stats invalidation failed: %s", exc)
+
+    def ensure_ready(self) -> None:
+        """Raise :class:`PopulationStatsRebuilding` unless the counters are built.
+
+        Missing counters are rebuilt in a background thread.
+        """
+
+        if self._guard(self.backend.is_ready):
+            return
+        if self.background and self._rebuilding.acquire(blocking=False):
+            self._start_rebuild()
+        raise PopulationStatsRebuilding("population stats are not built")
+
+    def rebuild(self, batch_size: int = 10_000) -> Optional[int]:
+        """Recompute the counters from the ``players`` and ``player_stats`` tables.
+
+        Rows are streamed per shard and the new counters replace the old ones
+        atomically once complete; writes made meanwhile are carried over.
+        Returns the number of players, or ``None`` if a rebuild is already
+        running.
+        """
+
+        def batches() -> Iterator[Dict[int, Contribution]]:
+            query = select(
+                Player.id,
+                Player.level,
+                Player.xp,
+                PlayerStats.health,
+                PlayerStats.attack,
+                PlayerStats.defense,
+            ).outerjoin(PlayerStats, PlayerStats.player_id == Player.id)
+            shards = current_app.extensions["shards"]
+            for partition in shards.partitions(query, batch_size):
+                yield {
+                    row.id: contribution(row.level, row.xp, row._mapping)
+                    for row in partition
+                }
+
+        return self._guard(self.backend.replace, batches(), time.time())
+
+    def _refresh_if_stale(self, computed_at: float) -> None:
+        """Rebuild in the background when the counters are older than the interval.
+
+        At most one rebuild runs per process, and with Redis one per interval
+        across all workers.
+        """
+
+        if not (self.background and self.recompute_interval):
+            return
+        if time.time() - computed_at < self.recompute_interval:
+            return
+        if not self._rebuilding.acquire(blocking=False):
+            return
+        try:
+            claimed = self.backend.claim_rebuild(self.recompute_interval)
+        except RedisError as exc:
+            logger.warning("Population stats rebuild not scheduled: %s", exc)
+            claimed = False
+        if not claimed:
+            self._rebuilding.release()
+            return
+
+        self._start_rebuild()
+
+    def _start_rebuild(self) -> None:
+        # The caller holds ``_rebuilding``; the thread releases it.
+        threading.Thread(
+            target=self._rebuild_in_background,
+            args=(current_app._get_current_object(),),
+            name="population-rebuild",
+            daemon=True,
+        ).start()
+
+    def _rebuild_in_background(self, app: Flask) -> None:
+        try:
+            with app.app_context():
+                self.rebuild()
+        except Exception:
+            logger.exception("Population stats rebuild failed")
+        finally:
+            self._rebuilding.release()
+
+    def summary(self) -> Dict[str, Any]:
+        """Return the summary estimated from the current counters.
+
+        Stale counters are still returned while a rebuild is scheduled.
+        """
+
+        counters = self._guard(self.backend.counters)
+        computed_at = counters.get("computed_at") or 0
+        self._refresh_if_stale(computed_at)
+        players = int(counters.get("players", 0))
+        levels: Dict[int, int] = {}
+        histograms: Dict[str, Dict[int, int]] = {name: {} for name in STATS}
+        for field, value in counters.items():
+            name, _, index = field.partition(":")
+            if name == "level":
+                levels[int(index)] = int(value)
+            elif name in histograms:
+                histograms[name][int(index)] = int(value)
+
+        return {
+            "players": players,
+            "levels": [
+                {"level": level, "players": levels[level]} for level in sorted(levels)
+            ],
+            "xp": {
+                "average": (
+                    round(counters.get("xp_sum", 0) / players, 2) if players else None
+                )
+            },
+            "stats": {
+                name: {
+                    "players": sum(histogram.values()),
+                    **{
+                        f"p{percentile}": estimate_percentile(histogram, percentile)
+                        for percentile in PERCENTILES
+                    },
+                }
+                for name, histogram in histograms.items()
+            },
+            "computed_at": (
+                datetime.fromtimestamp(computed_at, timezone.utc).isoformat()
+                if computed_at
+                else None
+            ),
+        }
+
+    @staticmethod
+    def _guard(fn, *args):
+        try:
+            return fn(*args)
+        except RedisError as exc:
+            raise PopulationStatsUnavailable(str(exc)) from exc
+
+
+population_cli = AppGroup("population", help="Statistiques de la population.")
+
+
+@population_cli.command("rebuild")
+@click.option("--batch-size", default=10_000, show_default=True)
+def rebuild_command(batch_size: int) -> None:
+    """Recalculer les statistiques de la population depuis la base de données."""
+
+    population: PopulationStats = current_app.extensions["population"]
+    count = population.rebuild(batch_size=batch_size)
+    if count is None:
+        raise click.ClickException("Un recalcul des statistiques est en cours.")
+    click.echo(f"Statistiques recalculées : {count} joueurs.")
@@ -0,0 +1,309 @@
+"""On-demand profiling of live requests.
+
+A request is profiled when it carries ``X-Profile-Token`` matching
+``PROFILING_TOKEN`` or when it is drawn at ``PROFILING_SAMPLE_RATE``. The
+profiled request runs under :mod:`cProfile` while a sampler thread records its
+call stack every ``PROFILING_INTERVAL_MS``; when the request is torn down both
+are merged into per-endpoint aggregates in ``PROFILING_DIR``:
+
+* ``<endpoint>.<pid>.pstats``: cumulative :mod:`pstats` data;
+* ``<endpoint>.<pid>.collapsed``: ``frame;frame;frame count`` lines, the input
+  of ``flamegraph.pl`` and speedscope;
+* ``<endpoint>.<pid>.json``: number of profiled requests and their wall time.
+
+Each worker writes its own files, so workers never contend for them; readers
+merge them per endpoint. A worker profiles one request at a time (cProfile
+cannot profile overlapping requests on Python 3.12+); requests arriving while
+one is profiled simply run unprofiled.
+
+The directory is capped at ``max_bytes`` (``PROFILING_MAX_MB``): after each
+write, the least recently updated files of any worker, including workers that
+have since exited, are deleted until it fits.
+
+When ``PROFILING_ENABLED`` is off, :class:`Profiler` is not created and no hook
+is registered.
+"""
+
+import cProfile
+import hmac
+import json
+import logging
+import marshal
+import os
+import pstats
+import random
+import sys
+import threading
+import time
+from collections import Counter
+from types import FrameType
+from typing import Any, Dict, Iterable, List, Optional
+
+from flask import Flask, request
+
+logger = logging.getLogger(__name__)
+
+PROFILE_HEADER = "X-Profile-Token"
+FORMATS = ("pstats", "collapsed")
+
+
+def _frame_label(frame: FrameType) -> str:
+    code = frame.f_code
+    path = code.co_filename.replace(os.sep, "/").rsplit("/", 2)
+    return f"{code.co_name} ({'/'.join(path[-2:])}:{code.co_firstlineno})"
+
+
+def collapse_stack(frame: Optional[FrameType]) -> str:
+    """Render the stack ending at *frame* root first, ``;``-separated."""
+
+    labels: List[str] = []
+    while frame is not None:
+        labels.append(_frame_label(frame))
+        frame = frame.f_back
+    return ";".join(reversed(labels))
+
+
+def read_collapsed(lines: Iterable[str]) -> Counter:
+    stacks: Counter = Counter()
+    for line in lines:
+        stack, _, count = line.rstrip("\n").rpartition(" ")
+        if stack and count.isdigit():
+            stacks[stack] += int(count)
+    return stacks
+
+
+class StackSampler:
+    """Count the call stacks of one thread from a background thread."""
+
+    def __init__(self, thread_id: int, interval: float) -> None:
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks: Counter = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(
+            target=self._run, name="stack-sampler", daemon=True
+        )
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> Counter:
+        self._stop.set()
+        self._thread.join()
+        return self.stacks
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is not None:
+                self.stacks[collapse_stack(frame)] += 1
+
+
+class _Session:
+    def __init__(self, endpoint: str, interval: float) -> None:
+        self.endpoint = endpoint
+        self.profile = cProfile.Profile()
+        self.sampler = StackSampler(threading.get_ident(), interval)
+        self.started = time.perf_counter()
+
+    def start(self) -> None:
+        self.sampler.start()
+        self.profile.enable()
+
+    def stop(self) -> Counter:
+        self.profile.disable()
+        return self.sampler.stop()
+
+
+class Profiler:
+    """Profile selected requests and aggregate the results per endpoint."""
+
+    def __init__(
+        self,
+        directory: str,
+        sample_rate: float = 0.0,
+        token: Optional[str] = None,
+        interval: float = 0.005,
+        exempt_endpoints: Iterable[str] = ("health", "metrics", "static"),
+        max_bytes: int = 0,
+    ) -> None:
+        self.directory = directory
+        self.sample_rate = sample_rate
+        self.token = token
+        self.interval = interval
+        self.max_bytes = max_bytes
+        self.exempt_endpoints = set(exempt_endpoints)
+        self._busy = threading.Lock()
+        self._write_lock = threading.Lock()
+
+    def init_app(self, app: Flask) -> None:
+        os.makedirs(self.directory, exist_ok=True)
+        # Registered before the other extensions so that their hooks, and
+        # authentication, are part of the profile.
+        app.before_request_funcs.setdefault(None, []).insert(0, self._before_request)
+        app.teardown_request(self._teardown_request)
+        app.extensions["profiler"] = self
+
+    def wants(self) -> bool:
+        """Whether the current request should be profiled."""
+
+        if request.endpoint is None or request.endpoint in self.exempt_endpoints:
+            return False
+        supplied = request.headers.get(PROFILE_HEADER)
+        if supplied is not None and self.token:
+            return hmac.compare_digest(supplied, self.token)
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+    def _before_request(self) -> None:
+        if not self.wants() or not self._busy.acquire(blocking=False):
+            return
+        session = _Session(request.endpoint, self.interval)
+        request.environ["profiling.session"] = session
+        session.start()
+
+    def _teardown_request(self, exc: Optional[BaseException]) -> None:
+        session = request.environ.pop("profiling.session", None)
+        if session is None:
+            return
+        try:
+            stacks = session.stop()
+            elapsed = time.perf_counter() - session.started
+        finally:
+            self._busy.release()
+
+        try:
+            self.record(session.endpoint, session.profile, stacks, elapsed)
+        except OSError:
+            logger.exception("Could not write the profile of %s", session.endpoint)
+
+    def _path(self, endpoint: str, suffix: str) -> str:
+        return os.path.join(self.directory, f"{endpoint}.{os.getpid()}.{suffix}")
+
+    def record(
+        self,
+        endpoint: str,
+        profile: cProfile.Profile,
+        stacks: Counter,
+        elapsed: float,
+    ) -> None:
+        """Merge one profiled request into this worker's files for *endpoint*."""
+
+        with self._write_lock:
+            stats = pstats.Stats(profile)
+            stats_path = self._path(endpoint, "pstats")
+            if os.path.exists(stats_path):
+                stats.add(stats_path)
+            _replace(stats_path, marshal.dumps(stats.stats))
+
+            collapsed_path = self._path(endpoint, "collapsed")
+            if os.path.exists(collapsed_path):
+                with open(collapsed_path, encoding="utf-8") as handle:
+                    stacks = stacks + read_collapsed(handle)
+            _replace(collapsed_path, _render_collapsed(stacks).encode("utf-8"))
+
+            summary_path = self._path(endpoint, "json")
+            summary = {"requests": 0, "seconds": 0.0}
+            if os.path.exists(summary_path):
+                with open(summary_path, encoding="utf-8") as handle:
+                    summary = json.load(handle)
+            summary["requests"] += 1
+            summary["seconds"] += elapsed
+            _replace(summary_path, json.dumps(summary).encode("utf-8"))
+
+            if self.max_bytes:
+                self._prune(f"{endpoint}.{os.getpid()}")
+
+    def _prune(self, keep: str) -> None:
+        """Delete the stalest profiles until the directory fits ``max_bytes``.
+
+        Files go by ``<endpoint>.<pid>`` group, so that a summary never outlives
+        its stacks; the group *keep*, just written, is never deleted.
+        """
+
+        groups: Dict[str, List[Any]] = {}
+        total = 0
+        for entry in os.scandir(self.directory):
+            endpoint, _, rest = entry.name.partition(".")
+            pid, _, _ = rest.partition(".")
+            try:
+                stat = entry.stat()
+            except FileNotFoundError:
+                continue
+            total += stat.st_size
+            group = groups.setdefault(f"{endpoint}.{pid}", [0.0, 0, []])
+            group[0] = max(group[0], stat.st_mtime)
+            group[1] += stat.st_size
+            group[2].append(entry.path)
+
+        groups.pop(keep, None)
+        for _, size, paths in sorted(groups.values(), key=lambda group: group[0]):
+            if total <= self.max_bytes:
+                break
+            for path in paths:
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+            total -= size
+
+    def _files(self, suffix: str) -> Dict[str, List[str]]:
+        files: Dict[str, List[str]] = {}
+        for name in sorted(os.listdir(self.directory)):
+            endpoint, _, rest = name.partition(".")
+            pid, _, extension = rest.partition(".")
+            if extension == suffix and pid.isdigit():
+                files.setdefault(endpoint, []).append(
+                    os.path.join(self.directory, name)
+                )
+        return files
+
+    def profiles(self) -> List[Dict[str, Any]]:
+        """Summaries of the profiled endpoints, all workers merged."""
+
+        summaries = []
+        for endpoint, paths in self._files("json").items():
+            requests = 0
+            seconds = 0.0
+            updated_at = 0.0
+            for path in paths:
+                with open(path, encoding="utf-8") as handle:
+                    summary = json.load(handle)
+                requests += summary["requests"]
+                seconds += summary["seconds"]
+                updated_at = max(updated_at, os.path.getmtime(path))
+            summaries.append(
+                {
+                    "endpoint": endpoint,
+                    "requests": requests,
+                    "seconds": round(seconds, 6),
+                    "workers": len(paths),
+                    "updated_at": updated_at,
+                }
+            )
+        return summaries
+
+    def export(self, endpoint: str, fmt: str) -> Optional[bytes]:
+        """Merge every worker's *fmt* profile of *endpoint*; ``None`` if absent."""
+
+        paths = self._files(fmt).get(endpoint)
+        if not paths:
+            return None
+        if fmt == "pstats":
+            return marshal.dumps(pstats.Stats(*paths).stats)
+
+        stacks: Counter = Counter()
+        for path in paths:
+            with open(path, encoding="utf-8") as handle:
+                stacks.update(read_collapsed(handle))
+        return _render_collapsed(stacks).encode("utf-8")
+
+
+def _render_collapsed(stacks: Counter) -> str:
+    return "".join(f"{stack} {count}\n" for stack, count in sorted(stacks.items()))
+
+
+def _replace(path: str, data: bytes) -> None:
+    temporary = f"{path}.tmp"
+    with open(temporary, "wb") as handle:
+        handle.write(data)
+    os.replace(temporary, path)
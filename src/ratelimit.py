@@ -0,0 +1,289 @@
+"""Per-client rate limiting and admission control.
+
+Every request to a limited route takes one token from a bucket keyed by the
+client (a hash of the bearer token and the ``X-User-Id`` header) and the
+route's limit. A route has its own bucket when ``RATE_LIMITS`` names it, and
+shares the default bucket otherwise. Buckets refill continuously: ``100/min``
+allows bursts of 100 requests and then one request every 0.6 s.
+
+With Redis the bucket lives in a hash updated by one Lua script, so the check
+is atomic across workers and uses the Redis clock. Without Redis, or while it
+is unreachable, each process keeps its own buckets in a bounded LRU; limits
+are then enforced per worker.
+
+Admission control is independent of the client: a worker sheds requests with
+``503`` while it already handles ``ADMISSION_MAX_IN_FLIGHT`` requests, or while
+the recent database pool wait (an average decaying with a one-second
+half-life) exceeds ``ADMISSION_MAX_POOL_WAIT_MS``. Both checks happen before
+the view runs and touch neither Redis nor the database.
+"""
+
+import hashlib
+import logging
+import math
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, NamedTuple, Optional, Tuple
+
+from redis.exceptions import RedisError
+
+logger = logging.getLogger(__name__)
+
+_PERIODS = {
+    "s": 1.0,
+    "sec": 1.0,
+    "second": 1.0,
+    "m": 60.0,
+    "min": 60.0,
+    "minute": 60.0,
+    "h": 3600.0,
+    "hour": 3600.0,
+}
+
+TOKEN_BUCKET_SCRIPT = """
+local capacity = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1]) or capacity
+local last = tonumber(state[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - last) * rate)
+local allowed = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+    allowed = 1
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', tostring(now))
+redis.call('PEXPIRE', KEYS[1], math.ceil((capacity - tokens) / rate * 1000) + 1000)
+return {allowed, tostring(tokens)}
+"""
+"""Take one token from the bucket in ``KEYS[1]``; returns ``{allowed, tokens}``."""
+
+
+class Rate(NamedTuple):
+    """``limit`` requests per ``period`` seconds, also the bucket capacity."""
+
+    limit: int
+    period: float
+
+    @property
+    def per_second(self) -> float:
+        return self.limit / self.period
+
+    def __str__(self) -> str:
+        return f"{self.limit};w={self.period:g}"
+
+
+class Decision(NamedTuple):
+    """Outcome of taking a token, with the values of the ``RateLimit-*`` headers."""
+
+    allowed: bool
+    limit: int
+    remaining: int
+    reset: float
+    retry_after: float
+
+
+def parse_rate(text: str) -> Optional[Rate]:
+    """Parse ``"100/min"``-style rates; ``"0"``, ``"none"`` or ``""`` mean none.
+
+    Raises:
+        ValueError: If *text* is not a rate.
+    """
+
+    text = text.strip().lower()
+    if text in ("", "0", "none"):
+        return None
+
+    count, _, unit = text.partition("/")
+    if not count.isdigit() or int(count) < 1 or unit not in _PERIODS:
+        raise ValueError(f"Invalid rate {text!r}; expected e.g. '100/min'.")
+    return Rate(int(count), _PERIODS[unit])
+
+
+def parse_route_rates(text: str) -> Dict[str, Optional[Rate]]:
+    """Parse ``"get_player=200/s,create_player=5/min"`` into rates by endpoint."""
+
+    rates: Dict[str, Optional[Rate]] = {}
+    for item in text.split(","):
+        if not item.strip():
+            continue
+        endpoint, separator, rate = item.partition("=")
+        if not separator or not endpoint.strip():
+            raise ValueError(f"Invalid route rate {item!r}; expected endpoint=rate.")
+        rates[endpoint.strip()] = parse_rate(rate)
+    return rates
+
+
+def client_key(token: str, user_id: Optional[str]) -> str:
+    """Identify a client without storing its bearer token."""
+
+    digest = hashlib.blake2b(token.encode("utf-8"), digest_size=8).hexdigest()
+    return f"{digest}:{user_id or ''}"
+
+
+def _decision(rate: Rate, allowed: bool, tokens: float) -> Decision:
+    per_second = rate.per_second
+    return Decision(
+        allowed,
+        rate.limit,
+        int(tokens),
+        (rate.limit - tokens) / per_second,
+        0.0 if allowed else (1 - tokens) / per_second,
+    )
+
+
+class LocalBuckets:
+    """In-process token buckets, the least recently used evicted first."""
+
+    def __init__(self, maxsize: int = 10_000) -> None:
+        self.maxsize = maxsize
+        self._buckets: "OrderedDict[str, Tuple[float, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def take(self, key: str, rate: Rate) -> Decision:
+        now = time.monotonic()
+        with self._lock:
+            tokens, last = self._buckets.pop(key, (float(rate.limit), now))
+            tokens = min(rate.limit, tokens + (now - last) * rate.per_second)
+            allowed = tokens >= 1
+            if allowed:
+                tokens -= 1
+            self._buckets[key] = (tokens, now)
+            while len(self._buckets) > self.maxsize:
+                self._buckets.popitem(last=False)
+        return _decision(rate, allowed, tokens)
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+
+class RedisBuckets:
+    """Token buckets shared by every worker, updated by :data:`TOKEN_BUCKET_SCRIPT`."""
+
+    def __init__(self, redis_client: Any, prefix: str = "ratelimit:") -> None:
+        self.prefix = prefix
+        self._script = redis_client.register_script(TOKEN_BUCKET_SCRIPT)
+
+    def take(self, key: str, rate: Rate) -> Decision:
+        allowed, tokens = self._script(
+            keys=[self.prefix + key], args=[rate.limit, rate.per_second]
+        )
+        return _decision(rate, bool(allowed), float(tokens))
+
+
+class RateLimiter:
+    """Apply the configured rate of each endpoint to each client."""
+
+    def __init__(
+        self,
+        redis_client: Any = None,
+        default: Optional[Rate] = None,
+        routes: Optional[Dict[str, Optional[Rate]]] = None,
+        local_maxsize: int = 10_000,
+        retry_after: float = 5.0,
+    ) -> None:
+        self.default = default
+        self.routes = dict(routes or {})
+        self.local = LocalBuckets(local_maxsize)
+        self.remote = RedisBuckets(redis_client) if redis_client is not None else None
+        self.retry_after = retry_after
+        self._redis_down_until = 0.0
+
+    @property
+    def enabled(self) -> bool:
+        return self.default is not None or any(self.routes.values())
+
+    def rate_for(self, endpoint: Optional[str]) -> Tuple[str, Optional[Rate]]:
+        """Return the bucket name and rate applying to *endpoint*."""
+
+        if endpoint in self.routes:
+            return endpoint, self.routes[endpoint]
+        return "default", self.default
+
+    def check(self, endpoint: Optional[str], client: str) -> Optional[Decision]:
+        """Take a token for *client* on *endpoint*; ``None`` if it is unlimited."""
+
+        bucket, rate = self.rate_for(endpoint)
+        if rate is None:
+            return None
+
+        key = f"{bucket}:{client}"
+        if self.remote is not None and time.monotonic() >= self._redis_down_until:
+            try:
+                return self.remote.take(key, rate)
+            except RedisError as exc:
+                logger.warning("Redis unavailable for rate limiting: %s", exc)
+                self._redis_down_until = time.monotonic() + self.retry_after
+        return self.local.take(key, rate)
+
+
+def rate_limit_headers(decision: Decision) -> Dict[str, str]:
+    headers = {
+        "RateLimit-Limit": str(decision.limit),
+        "RateLimit-Remaining": str(decision.remaining),
+        "RateLimit-Reset": str(math.ceil(decision.reset)),
+    }
+    if not decision.allowed:
+        headers["Retry-After"] = str(max(1, math.ceil(decision.retry_after)))
+    return headers
+
+
+class AdmissionController:
+    """Shed load when a worker is saturated; thresholds of 0 disable a check."""
+
+    def __init__(
+        self,
+        max_in_flight: int = 0,
+        max_pool_wait: float = 0.0,
+        half_life: float = 1.0,
+    ) -> None:
+        self.max_in_flight = max_in_flight
+        self.max_pool_wait = max_pool_wait
+        self.half_life = half_life
+        self.in_flight = 0
+        self._pool_wait = 0.0
+        self._observed_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_in_flight > 0 or self.max_pool_wait > 0
+
+    def enter(self) -> Optional[str]:
+        """Admit a request and return ``None``, or return why it is refused."""
+
+        with self._lock:
+            if self.max_in_flight and self.in_flight >= self.max_in_flight:
+                return "in_flight"
+            if self.max_pool_wait and self._decayed(time.monotonic()) > (
+                self.max_pool_wait
+            ):
+                return "pool_wait"
+            self.in_flight += 1
+            return None
+
+    def leave(self) -> None:
+        with self._lock:
+            self.in_flight -= 1
+
+    def observe_pool_wait(self, seconds: float) -> None:
+        """Fold a request's pool wait into the decaying average."""
+
+        with self._lock:
+            now = time.monotonic()
+            self._pool_wait = (self._decayed(now) + seconds) / 2
+            self._observed_at = now
+
+    @property
+    def pool_wait(self) -> float:
+        with self._lock:
+            return self._decayed(time.monotonic())
+
+    def _decayed(self, now: float) -> float:
+        # Shed requests add no samples, so the average must fall on its own
+        # for traffic to be admitted again.
+        elapsed = now - self._observed_at
+        return self._pool_wait * 0.5 ** (elapsed / self.half_life)
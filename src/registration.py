@@ -0,0 +1,112 @@
+"""Race-free player creation with ``INSERT ... ON CONFLICT``.
+
+Checking for an existing player before inserting costs a round-trip and is
+racy: two concurrent sign-ups for the same user both pass the check and one
+of them fails on the unique constraint. Here the insert itself resolves the
+conflict on ``players.user_id`` (``ON CONFLICT DO NOTHING ... RETURNING``): an
+empty result means the user already has a player. The same statement skips
+the insert when the user's player is in the archive (see :mod:`src.archive`),
+so the caller can restore it instead of creating a second one.
+
+On PostgreSQL the player and its stats row are inserted by one statement, the
+stats insert reading the new id from a data-modifying CTE. SQLite does not
+allow DML in CTEs, so the stats row is a second statement in the same
+transaction (an in-process call rather than a network round-trip).
+"""
+
+from typing import Any, Optional
+
+from sqlalchemy import ColumnElement, exists, literal, select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+from .models import Player, PlayerArchive, PlayerStats, fold_name
+from .snapshots import PlayerSnapshot
+
+_players = Player.__table__
+_stats = PlayerStats.__table__
+_archive = PlayerArchive.__table__
+
+_PLAYER_COLUMNS = (
+    _players.c.id,
+    _players.c.user_id,
+    _players.c.name,
+    _players.c.level,
+    _players.c.xp,
+    _players.c.version,
+)
+_STATS_COLUMNS = (_stats.c.health, _stats.c.attack, _stats.c.defense)
+
+
+def _insert_player(insert: Any, user_id: str, name: str, player_id: Any) -> Any:
+    values = {"user_id": user_id, "name": name, "name_folded": fold_name(name)}
+    if player_id is not None:
+        values["id"] = player_id
+    archived = exists().where(
+        _archive.c.user_id == user_id, _archive.c.deleted_at.is_(None)
+    )
+    source = select(
+        *(
+            value
+            if isinstance(value, ColumnElement)
+            else literal(value, _players.c[column].type)
+            for column, value in values.items()
+        )
+    ).where(~archived)
+    return (
+        insert(_players)
+        .from_select(list(values), source)
+        .on_conflict_do_nothing(index_elements=[_players.c.user_id])
+    )
+
+
+def postgresql_insert_statement(user_id: str, name: str, player_id: Any = None):
+    """Return the single-statement player + stats insert for PostgreSQL."""
+
+    new_player = (
+        _insert_player(postgresql.insert, user_id, name, player_id)
+        .returning(*_PLAYER_COLUMNS)
+        .cte("new_player")
+    )
+    new_stats = (
+        _stats.insert()
+        .from_select(["player_id"], select(new_player.c.id))
+        .returning(_stats.c.player_id, *_STATS_COLUMNS)
+        .cte("new_stats")
+    )
+    return select(
+        *(new_player.c[column.name] for column in _PLAYER_COLUMNS),
+        *(new_stats.c[column.name] for column in _STATS_COLUMNS),
+    ).select_from(new_player.join(new_stats, new_stats.c.player_id == new_player.c.id))
+
+
+def insert_player(
+    session: Session, user_id: str, name: str, player_id: Any = None
+) -> Optional[PlayerSnapshot]:
+    """Insert a player and its default stats unless *user_id* already has one.
+
+    *player_id* is an optional value or SQL expression for the new id (see
+    :meth:`~src.sharding.ShardSet.player_id_value`); by default the database
+    assigns it. Returns the created player, or ``None`` when the user already
+    owns a player, live or archived. The caller commits.
+    """
+
+    dialect = session.get_bind().dialect.name
+    if dialect == "postgresql":
+        row = session.execute(
+            postgresql_insert_statement(user_id, name, player_id)
+        ).first()
+        return None if row is None else PlayerSnapshot(row)
+
+    player = session.execute(
+        _insert_player(sqlite.insert, user_id, name, player_id).returning(
+            *_PLAYER_COLUMNS
+        )
+    ).first()
+    if player is None:
+        return None
+
+    stats = session.execute(
+        _stats.insert().values(player_id=player.id).returning(*_STATS_COLUMNS)
+    ).one()
+    return PlayerSnapshot(tuple(player) + tuple(stats))
@@ -0,0 +1,224 @@
+"""Routing of read-only requests to database read replicas.
+
+Each replica URL gets its own engine (and pool), created with the primary's
+engine options. For a read-only request (``GET``/``HEAD``, or an endpoint
+declared read-only) :class:`ReplicaRouter` picks a healthy replica round-robin
+and the :class:`~src.extensions.RoutingSession` sends the request's statements
+to it; every other request, and all work outside requests, uses the primary.
+
+Replicas lag behind the primary, so a user who has just written is pinned to
+the primary for ``sticky_seconds``: successful writes carrying ``X-User-Id``
+record a short-lived pin (in Redis when available, so that it holds across
+workers, and in process otherwise), and reads from a pinned user skip the
+replicas. Payloads read from a replica are not written to the shared Redis
+cache either (see :func:`is_replica_read`): a lagging replica could otherwise
+re-cache a row a pinned writer has just changed.
+
+A replica that cannot be reached, or drops the connection, is taken out of
+rotation for ``retry_after`` seconds and the read is run again on the
+primary. Any other error (a missing table, a bad query) is raised as is: it
+says nothing about the replica's health, and retrying would only hide it.
+"""
+
+import itertools
+import logging
+import threading
+import time
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Iterable,
+    List,
+    Optional,
+    Sequence,
+    Tuple,
+)
+
+from flask import Flask, Response, has_request_context, request
+from redis.exceptions import RedisError
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine, ExceptionContext
+from sqlalchemy.exc import DBAPIError, DisconnectionError
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+
+from .cache import LocalLRU
+from .extensions import READ_ENGINE_ENVIRON_KEY, configure_sqlite, db
+
+logger = logging.getLogger(__name__)
+
+READ_METHODS = frozenset({"GET", "HEAD"})
+
+_REPLICA_ENVIRON_KEY = "db.replica"
+
+
+def is_replica_read() -> bool:
+    """Whether the current request's statements are served by a replica."""
+
+    return has_request_context() and READ_ENGINE_ENVIRON_KEY in request.environ
+
+
+def _is_disconnect(exc: BaseException) -> bool:
+    """Whether *exc* means the database could not be reached."""
+
+    if isinstance(exc, (DisconnectionError, PoolTimeoutError)):
+        return True
+    return isinstance(exc, DBAPIError) and exc.connection_invalidated
+
+
+def _connect_errors_are_disconnects(context: ExceptionContext) -> None:
+    # Dialects only recognise a dropped connection; failing to open one at
+    # all (refused, unknown host, missing file) is just as much an outage.
+    if context.connection is None and context.sqlalchemy_exception is not None:
+        context.is_disconnect = True
+
+
+class ReplicaRouter:
+    """Choose the engine serving each request and track replica health."""
+
+    def __init__(
+        self,
+        urls: Sequence[str] = (),
+        redis_client: Any = None,
+        sticky_seconds: float = 5.0,
+        retry_after: float = 30.0,
+        read_endpoints: Sequence[str] = (),
+        local_maxsize: int = 10000,
+        namespace: str = "primary-pin",
+    ) -> None:
+        self.urls = list(urls)
+        self.redis = redis_client
+        self.sticky_seconds = sticky_seconds
+        self.retry_after = retry_after
+        self.read_endpoints = frozenset(read_endpoints)
+        self.prefix = f"{namespace}:"
+        self.replicas: List[Tuple[str, Engine]] = []
+        self._pins = LocalLRU(local_maxsize, sticky_seconds)
+        self._down_until: Dict[str, float] = {}
+        self._cursor = itertools.count()
+        self._lock = threading.Lock()
+
+    def init_app(self, app: Flask) -> None:
+        """Attach to *app*; must run after its routes are registered."""
+
+        app.extensions["replica_router"] = self
+        if not self.urls:
+            return
+
+        options = app.config.get("SQLALCHEMY_ENGINE_OPTIONS", {})
+        metrics = app.extensions.get("metrics")
+        for index, url in enumerate(self.urls):
+            engine = create_engine(url, **options)
+            if app.config.get("SQLITE_WAL"):
+                configure_sqlite(engine)
+            if metrics is not None:
+                metrics.instrument_engine(engine)
+            event.listen(engine, "handle_error", _connect_errors_are_disconnects)
+            self.replicas.append((f"replica-{index}", engine))
+
+        app.before_request(self._before_request)
+        app.after_request(self._after_request)
+        for rule in app.url_map.iter_rules():
+            if self._is_read_rule(rule.endpoint, rule.methods or ()):
+                view = app.view_functions[rule.endpoint]
+                app.view_functions[rule.endpoint] = self._with_fallback(view)
+
+    def dispose(self, close: bool = True) -> None:
+        for _, engine in self.replicas:
+            engine.dispose(close=close)
+
+    def choose_replica(self) -> Optional[Tuple[str, Engine]]:
+        """Return the next healthy replica, or ``None`` if all are down."""
+
+        now = time.monotonic()
+        healthy = [
+            replica
+            for replica in self.replicas
+            if self._down_until.get(replica[0], 0.0) <= now
+        ]
+        if not healthy:
+            return None
+
+        with self._lock:
+            index = next(self._cursor)
+        return healthy[index % len(healthy)]
+
+    def mark_down(self, key: str, exc: Exception) -> None:
+        logger.warning("Read replica %s unavailable, using primary: %s", key, exc)
+        self._down_until[key] = time.monotonic() + self.retry_after
+
+    def pin(self, user_id: str) -> None:
+        """Send *user_id*'s reads to the primary for ``sticky_seconds``."""
+
+        self._pins.set(user_id, True)
+        if self.redis is not None:
+            try:
+                self.redis.set(
+                    self.prefix + user_id, 1, px=max(int(self.sticky_seconds * 1000), 1)
+                )
+            except RedisError as exc:
+                logger.warning("Redis unavailable for primary pins: %s", exc)
+
+    def is_pinned(self, user_id: str) -> bool:
+        if self._pins.get(user_id):
+            return True
+        if self.redis is None:
+            return False
+
+        try:
+            return bool(self.redis.exists(self.prefix + user_id))
+        except RedisError as exc:
+            logger.warning("Redis unavailable for primary pins: %s", exc)
+            return False
+
+    def _is_read_rule(self, endpoint: str, methods: Iterable[str]) -> bool:
+        if endpoint in self.read_endpoints:
+            return True
+        return set(methods) - {"OPTIONS"} <= READ_METHODS
+
+    def _is_read_request(self) -> bool:
+        return request.method in READ_METHODS or request.endpoint in self.read_endpoints
+
+    def _before_request(self) -> None:
+        if not self._is_read_request():
+            return
+
+        user_id = request.headers.get("X-User-Id")
+        if user_id and self.sticky_seconds > 0 and self.is_pinned(user_id):
+            return
+
+        replica = self.choose_replica()
+        if replica is not None:
+            request.environ[_REPLICA_ENVIRON_KEY] = replica[0]
+            request.environ[READ_ENGINE_ENVIRON_KEY] = replica[1]
+
+    def _after_request(self, response: Response) -> Response:
+        if self._is_read_request() or response.status_code >= 400:
+            return response
+
+        user_id = request.headers.get("X-User-Id")
+        if user_id and self.sticky_seconds > 0:
+            self.pin(user_id)
+        return response
+
+    def _with_fallback(self, view: Callable[..., Any]) -> Callable[..., Any]:
+        def routed_view(*args: Any, **kwargs: Any) -> Any:
+            key = request.environ.get(_REPLICA_ENVIRON_KEY)
+            if key is None:
+                return view(*args, **kwargs)
+
+            try:
+                return view(*args, **kwargs)
+            except Exception as exc:
+                if not _is_disconnect(exc):
+                    raise
+                db.session.rollback()
+                db.session.close()
+                self.mark_down(key, exc)
+                del request.environ[_REPLICA_ENVIRON_KEY]
+                del request.environ[READ_ENGINE_ENVIRON_KEY]
+                return view(*args, **kwargs)
+
+        routed_view.__name__ = getattr(view, "__name__", "routed_view")
+        routed_view.__doc__ = view.__doc__
+        return routed_view
@@ -0,0 +1,175 @@
+"""Case-insensitive player name prefix search.
+
+Names are matched on ``players.name_folded`` (:func:`~src.models.fold_name`
+of the name, maintained on every write). A prefix is the key range
+``[prefix, upper_bound(prefix))``, read in ``(name_folded, id)`` order from the
+``ix_players_name_folded`` index and paginated by keyset: the cursor is the
+last ``(name_folded, id)`` pair returned.
+
+Two indexes answer a search with the ordered keys of the matching players:
+
+* :class:`DatabasePrefixIndex` runs an index range scan (on every shard,
+  merged), which suits any deployment;
+* :class:`LocalPrefixIndex` keeps a sorted in-process copy, built from the
+  database on first use and kept current from ``players_changed``. It only
+  sees writes made by its own process, so it is meant for SQLite and test
+  setups running a single process.
+
+Payloads are then fetched by id through the player cache.
+"""
+
+import base64
+import bisect
+import binascii
+import json
+import threading
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import select, tuple_
+
+from .models import Player, fold_name
+
+SearchKey = Tuple[str, int]
+"""``(name_folded, player_id)``: sort key and keyset cursor of a result."""
+
+_MAX_CODE_POINT = 0x10FFFF
+
+
+def prefix_upper_bound(prefix: str) -> Optional[str]:
+    """Return the smallest string greater than every string starting with *prefix*.
+
+    ``None`` means there is no such bound (empty or all-maximal prefix).
+    """
+
+    stripped = prefix.rstrip(chr(_MAX_CODE_POINT))
+    if not stripped:
+        return None
+    return stripped[:-1] + chr(ord(stripped[-1]) + 1)
+
+
+def encode_cursor(key: SearchKey) -> str:
+    raw = json.dumps(list(key), separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Optional[SearchKey]:
+    """Return the key encoded in *cursor*, or ``None`` if it is malformed."""
+
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        name, player_id = json.loads(raw)
+    except (binascii.Error, ValueError, TypeError):
+        return None
+    if not isinstance(name, str) or isinstance(player_id, bool):
+        return None
+    if not isinstance(player_id, int):
+        return None
+    return name, player_id
+
+
+class DatabasePrefixIndex:
+    """Prefix search through the ``ix_players_name_folded`` btree index."""
+
+    def __init__(self, shards: Any) -> None:
+        self.shards = shards
+
+    def search(
+        self, prefix: str, after: Optional[SearchKey], limit: int
+    ) -> List[SearchKey]:
+        query = (
+            select(Player.name_folded, Player.id)
+            .where(Player.name_folded >= prefix)
+            .order_by(Player.name_folded, Player.id)
+        )
+        upper = prefix_upper_bound(prefix)
+        if upper is not None:
+            query = query.where(Player.name_folded < upper)
+        if after is not None:
+            query = query.where(tuple_(Player.name_folded, Player.id) > tuple_(*after))
+
+        rows = self.shards.fetch(query, key=tuple, limit=limit)
+        return [(row.name_folded, row.id) for row in rows]
+
+
+class LocalPrefixIndex:
+    """Sorted in-process list of ``(name_folded, id)`` searched by bisection."""
+
+    def __init__(self, shards: Any, batch_size: int = 10_000) -> None:
+        self.shards = shards
+        self.batch_size = batch_size
+        self._entries: List[SearchKey] = []
+        self._names: Dict[int, str] = {}
+        self._lock = threading.Lock()
+        self._ready = False
+
+    def search(
+        self, prefix: str, after: Optional[SearchKey], limit: int
+    ) -> List[SearchKey]:
+        if not self._ready:
+            self.rebuild()
+
+        upper = prefix_upper_bound(prefix)
+        with self._lock:
+            # Ids are positive, so (prefix, 0) sorts before every match.
+            index = bisect.bisect_left(self._entries, (prefix, 0))
+            if after is not None:
+                index = max(index, bisect.bisect_right(self._entries, after))
+            keys = []
+            for key in self._entries[index:]:
+                if len(keys) >= limit or (upper is not None and key[0] >= upper):
+                    break
+                keys.append(key)
+            return keys
+
+    def rebuild(self) -> int:
+        """Reload every player name from the database."""
+
+        names = {}
+        for partition in self.shards.partitions(
+            select(Player.id, Player.name_folded), self.batch_size
+        ):
+            names.update((row.id, row.name_folded) for row in partition)
+
+        with self._lock:
+            self._names = names
+            self._entries = sorted((name, pid) for pid, name in names.items())
+            self._ready = True
+        return len(names)
+
+    def apply_changes(self, sender: Any, changes: Iterable[Any]) -> None:
+        """``players_changed`` receiver: index created and renamed players."""
+
+        if not self._ready:
+            return
+
+        with self._lock:
+            for change in changes:
+                if change.payload is None or "name" not in change.payload:
+                    continue
+                self._set(change.player_id, fold_name(change.payload["name"]))
+
+    def apply_removals(self, sender: Any, player_ids: Iterable[int]) -> None:
+        """``players_removed`` receiver: forget archived and deleted players."""
+
+        if not self._ready:
+            return
+
+        with self._lock:
+            for player_id in player_ids:
+                name = self._names.pop(player_id, None)
+                if name is not None:
+                    index = bisect.bisect_left(self._entries, (name, player_id))
+                    del self._entries[index]
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _set(self, player_id: int, name: str) -> None:
+        previous = self._names.get(player_id)
+        if previous == name:
+            return
+        if previous is not None:
+            index = bisect.bisect_left(self._entries, (previous, player_id))
+            del self._entries[index]
+        self._names[player_id] = name
+        bisect.insort(self._entries, (name, player_id))
@@ -0,0 +1,78 @@
+"""Fast JSON encoding of the response envelope.
+
+The output is byte-for-byte what Flask's default JSON provider emits out of
+debug mode (sorted keys, ASCII-only, compact separators, trailing newline), so
+the fast path can replace ``jsonify`` without clients or caches noticing.
+``orjson`` is used when installed; the stdlib encoder covers everything orjson
+would render differently (non-ASCII or DEL characters, integers beyond 64
+bits) and the case where orjson is missing.
+"""
+
+import json
+from functools import lru_cache
+from typing import Any, Optional
+
+from flask import Flask
+from flask.json.provider import DefaultJSONProvider
+
+try:  # pragma: no cover - exercised through whichever branch is installed
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None
+
+_ORJSON_OPTIONS = orjson.OPT_SORT_KEYS if orjson is not None else 0
+
+
+def _stdlib_dumps(obj: Any) -> bytes:
+    return json.dumps(
+        obj, ensure_ascii=True, sort_keys=True, separators=(",", ":")
+    ).encode("ascii")
+
+
+def dumps(obj: Any) -> bytes:
+    """Encode *obj* exactly like Flask's compact default provider, minus newline."""
+
+    if orjson is None:
+        return _stdlib_dumps(obj)
+
+    try:
+        encoded = orjson.dumps(obj, option=_ORJSON_OPTIONS)
+    except TypeError:
+        return _stdlib_dumps(obj)
+
+    if encoded.isascii() and b"\x7f" not in encoded:
+        return encoded
+    return _stdlib_dumps(obj)
+
+
+@lru_cache(maxsize=256)
+def _envelope_tail(message: str) -> bytes:
+    return b',"error":null,"message":' + _stdlib_dumps(message)
+
+
+def success_envelope(data: Any, message: str, meta: Optional[Any] = None) -> bytes:
+    """Return the encoded ``success/data/error/meta`` envelope for *data*."""
+
+    meta_part = b"null" if meta is None else dumps(meta)
+    return b"".join(
+        (
+            b'{"data":',
+            dumps(data),
+            _envelope_tail(message),
+            b',"meta":',
+            meta_part,
+            b',"success":true}\n',
+        )
+    )
+
+
+def is_compatible(app: Flask) -> bool:
+    """Whether *app*'s JSON provider produces what :func:`success_envelope` does."""
+
+    provider = app.json
+    return (
+        type(provider) is DefaultJSONProvider
+        and provider.ensure_ascii
+        and provider.sort_keys
+        and (provider.compact or (provider.compact is None and not app.debug))
+    )
@@ -0,0 +1,488 @@
+"""Horizontal sharding of players by ``user_id``.
+
+Every user hashes (BLAKE2b, stable across processes and Python versions) to
+one of :data:`SLOT_COUNT` virtual slots, and the slot map assigns contiguous
+ranges of slots to the configured databases: shard 0 is ``DATABASE_URL``,
+``DATABASE_SHARD_URLS`` lists the others. A player's stats and XP event
+receipts live on the player's shard.
+
+Player ids encode their slot (``id = seq * SLOT_COUNT + slot``), so a request
+for ``/players/<id>`` goes straight to the owning database without a lookup,
+and ids stay valid when slots move to other databases. Requests addressing
+one player (a ``player_id`` in the URL, or the ``X-User-Id`` of a creation)
+are routed before the view runs; operations spanning players group ids by
+shard or scatter a query to every shard and merge the results. Writes that
+span shards commit one transaction per shard.
+
+``flask shards reshard`` copies every player into a new set of databases
+laid out for a different shard count. It runs offline, with writes stopped.
+"""
+
+import hashlib
+import heapq
+import itertools
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack, nullcontext
+from typing import (
+    Any,
+    Callable,
+    ContextManager,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    NamedTuple,
+    Optional,
+    Sequence,
+    TextIO,
+    TypeVar,
+)
+
+import click
+from flask import Flask, current_app, request
+from flask.cli import AppGroup
+from sqlalchemy import create_engine, func, select, text
+from sqlalchemy.engine import Connection, Engine, Row
+from sqlalchemy.orm import Session
+from sqlalchemy.sql import Select
+
+from .extensions import SHARD_ENGINE_ENVIRON_KEY, bound_engine, configure_sqlite, db
+from .models import Player, PlayerArchive, PlayerStats, XpEventReceipt
+
+logger = logging.getLogger(__name__)
+
+SLOT_COUNT = 1024
+"""Number of virtual slots; fixed for the lifetime of the data set."""
+
+T = TypeVar("T")
+
+_players = Player.__table__
+_stats = PlayerStats.__table__
+_receipts = XpEventReceipt.__table__
+_archive = PlayerArchive.__table__
+
+
+def slot_for_user(user_id: str) -> int:
+    digest = hashlib.blake2b(user_id.encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "big") % SLOT_COUNT
+
+
+def slot_for_player(player_id: int) -> int:
+    return player_id % SLOT_COUNT
+
+
+def largest_player_id() -> Any:
+    """SQLite expression of the largest id of a database, archive included.
+
+    SQLite would otherwise hand out the id of an archived player again.
+    """
+
+    return func.max(
+        select(func.coalesce(func.max(_players.c.id), 0)).scalar_subquery(),
+        select(func.coalesce(func.max(_archive.c.id), 0)).scalar_subquery(),
+    )
+
+
+def slot_owners(shard_count: int) -> List[int]:
+    """Return the shard index owning each slot, in contiguous ranges."""
+
+    return [slot * shard_count // SLOT_COUNT for slot in range(SLOT_COUNT)]
+
+
+class ShardSet:
+    """The databases holding players, and the routing between them.
+
+    Without ``DATABASE_SHARD_URLS`` there is a single shard, the default
+    engine, and every helper falls back to the regular session so that
+    unsharded deployments behave exactly as before.
+    """
+
+    def __init__(
+        self, urls: Sequence[str] = (), user_endpoints: Sequence[str] = ()
+    ) -> None:
+        self.urls = list(urls)
+        self.user_endpoints = frozenset(user_endpoints)
+        self.engines: List[Engine] = []
+        self.owners: List[int] = []
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._executor_pid: Optional[int] = None
+        self._lock = threading.Lock()
+
+    def init_app(self, app: Flask) -> None:
+        with app.app_context():
+            self.engines = [db.engine]
+
+        options = app.config.get("SQLALCHEMY_ENGINE_OPTIONS", {})
+        metrics = app.extensions.get("metrics")
+        for url in self.urls:
+            engine = create_engine(url, **options)
+            if app.config.get("SQLITE_WAL"):
+                configure_sqlite(engine)
+            if metrics is not None:
+                metrics.instrument_engine(engine)
+            self.engines.append(engine)
+
+        self.owners = slot_owners(len(self.engines))
+        app.extensions["shards"] = self
+        if self.is_sharded:
+            app.before_request(self._before_request)
+
+    @property
+    def is_sharded(self) -> bool:
+        return len(self.engines) > 1
+
+    def shard_for_user(self, user_id: str) -> int:
+        return self.owners[slot_for_user(user_id)]
+
+    def shard_for_player(self, player_id: int) -> int:
+        return self.owners[slot_for_player(player_id)]
+
+    def engine_for_player(self, player_id: int) -> Engine:
+        return self.engines[self.shard_for_player(player_id)]
+
+    def bind(self, shard: int) -> ContextManager[None]:
+        """Route the session to *shard* inside the block (no-op if unsharded)."""
+
+        if not self.is_sharded:
+            return nullcontext()
+        return bound_engine(self.engines[shard])
+
+    def group_by_shard(self, player_ids: Iterable[int]) -> Dict[int, List[int]]:
+        groups: Dict[int, List[int]] = {}
+        for player_id in player_ids:
+            groups.setdefault(self.shard_for_player(player_id), []).append(player_id)
+        return groups
+
+    def scatter(
+        self,
+        fn: Callable[[int, Connection], T],
+        shards: Optional[Iterable[int]] = None,
+    ) -> List[T]:
+        """Call ``fn(shard, connection)`` on each shard in parallel; keep order."""
+
+        indexes = list(range(len(self.engines)) if shards is None else shards)
+
+        def run(index: int) -> T:
+            with self.engines[index].connect() as connection:
+                return fn(index, connection)
+
+        if len(indexes) <= 1:
+            return [run(index) for index in indexes]
+        return list(self._pool().map(run, indexes))
+
+    def fetch(self, query: Select, key: Callable[[Row], Any], limit: int) -> List[Row]:
+        """Return the first *limit* rows of *query* (ordered by *key*) overall."""
+
+        query = query.limit(limit)
+        if not self.is_sharded:
+            return db.session.execute(query).all()
+
+        results = self.scatter(lambda _, connection: connection.execute(query).all())
+        return list(itertools.islice(heapq.merge(*results, key=key), limit))
+
+    def partitions(self, query: Select, batch_size: int) -> Iterator[Sequence[Row]]:
+        """Stream *query*'s rows from every shard, one shard after the other."""
+
+        if not self.is_sharded:
+            result = db.session.execute(query.execution_options(yield_per=batch_size))
+            yield from result.partitions()
+            return
+
+        for engine in self.engines:
+            with engine.connect() as connection:
+                result = connection.execution_options(yield_per=batch_size).execute(
+                    query
+                )
+                yield from result.partitions()
+
+    def merged(
+        self, query: Select, key: Callable[[Row], Any], batch_size: int
+    ) -> Iterator[Row]:
+        """Stream *query* (ordered by *key*) from every shard as one ordered run."""
+
+        if not self.is_sharded:
+            result = db.session.execute(query.execution_options(yield_per=batch_size))
+            try:
+                yield from result
+            finally:
+                result.close()
+            return
+
+        with ExitStack() as stack:
+            streams = []
+            for engine in self.engines:
+                connection = stack.enter_context(engine.connect())
+                streams.append(
+                    connection.execution_options(yield_per=batch_size).execute(query)
+                )
+            yield from heapq.merge(*streams, key=key)
+
+    def player_id_value(self, session: Session, user_id: str) -> Any:
+        """Return the id expression for a new player of *user_id*, or ``None``.
+
+        Unsharded PostgreSQL leaves the id to the table's sequence; sharded,
+        the sequence part is drawn from it. SQLite serialises writers, so the
+        next id (next multiple of the slot count when sharded) above the
+        database's largest id, archived players included, is race-free there.
+        """
+
+        if session.get_bind().dialect.name == "postgresql":
+            if not self.is_sharded:
+                return None
+            slot = slot_for_user(user_id)
+            return func.nextval("players_id_seq") * SLOT_COUNT + slot
+
+        if not self.is_sharded:
+            return largest_player_id() + 1
+
+        slot = slot_for_user(user_id)
+        next_seq = largest_player_id() // SLOT_COUNT + 1
+        return next_seq * SLOT_COUNT + slot
+
+    def dispose(self, close: bool = True) -> None:
+        # Shard 0 is the default engine, disposed with the others by its owner.
+        for engine in self.engines[1:]:
+            engine.dispose(close=close)
+
+    def _pool(self) -> ThreadPoolExecutor:
+        # Threads do not survive fork(); build the pool in the serving process.
+        with self._lock:
+            if self._executor is None or self._executor_pid != os.getpid():
+                self._executor = ThreadPoolExecutor(
+                    max_workers=len(self.engines), thread_name_prefix="shard"
+                )
+                self._executor_pid = os.getpid()
+            return self._executor
+
+    def _before_request(self) -> None:
+        view_args = request.view_args or {}
+        engine = None
+        if "player_id" in view_args:
+            engine = self.engine_for_player(view_args["player_id"])
+        elif request.endpoint in self.user_endpoints:
+            user_id = request.headers.get("X-User-Id")
+            if user_id:
+                engine = self.engines[self.shard_for_user(user_id)]
+        if engine is not None:
+            request.environ[SHARD_ENGINE_ENVIRON_KEY] = engine
+
+
+class ReshardError(Exception):
+    """The data cannot be copied into the requested layout."""
+
+
+class ReshardReport(NamedTuple):
+    players_per_shard: List[int]
+    renumbered: int
+    elapsed: float
+
+
+def reshard(
+    sources: Sequence[Engine],
+    targets: Sequence[Engine],
+    batch_size: int = 1000,
+    renumber_legacy_ids: bool = False,
+    id_map: Optional[TextIO] = None,
+) -> ReshardReport:
+    """Copy players, stats, archived players and XP receipts into *targets*.
+
+    Rows are placed by the slot of their ``user_id`` under the slot map for
+    ``len(targets)`` shards. The targets must be empty; the sources are left
+    untouched, so the copy can be verified before switching configuration.
+
+    Players (live or archived) created before sharding have ids that do not
+    encode their slot. They are rejected unless *renumber_legacy_ids* is set,
+    in which case they get new slot-encoded ids (written as ``old_id,new_id``
+    lines to *id_map*).
+    """
+
+    started = time.perf_counter()
+    owners = slot_owners(len(targets))
+
+    for target in targets:
+        db.metadata.create_all(target)
+        with target.connect() as connection:
+            if connection.scalar(select(func.count()).select_from(_players)):
+                raise ReshardError(f"Target database {target.url!r} is not empty.")
+
+    legacy = 0
+    max_seq = 0
+    for source in sources:
+        for table in (_players, _archive):
+            with source.connect() as connection:
+                rows = connection.execution_options(yield_per=batch_size).execute(
+                    select(table.c.id, table.c.user_id)
+                )
+                for player_id, user_id in rows:
+                    if slot_for_player(player_id) == slot_for_user(user_id):
+                        max_seq = max(max_seq, player_id // SLOT_COUNT)
+                    else:
+                        legacy += 1
+
+    if legacy and not renumber_legacy_ids:
+        raise ReshardError(
+            f"{legacy} players have ids that do not encode their slot; "
+            "rerun with --renumber-legacy-ids."
+        )
+
+    renumbered: Dict[int, int] = {}
+    next_seq = max_seq + 1
+    counts = [0] * len(targets)
+
+    def place(player_id: int, user_id: str) -> int:
+        nonlocal next_seq
+        slot = slot_for_user(user_id)
+        if slot_for_player(player_id) == slot:
+            return player_id
+        new_id = next_seq * SLOT_COUNT + slot
+        next_seq += 1
+        renumbered[player_id] = new_id
+        if id_map is not None:
+            id_map.write(f"{player_id},{new_id}\n")
+        return new_id
+
+    query = select(
+        *_players.c, _stats.c.health, _stats.c.attack, _stats.c.defense
+    ).outerjoin(_stats, _stats.c.player_id == _players.c.id)
+
+    for source in sources:
+        with source.connect() as connection:
+            result = connection.execution_options(yield_per=batch_size).execute(query)
+            for partition in result.partitions():
+                players: Dict[int, List[Dict[str, Any]]] = {}
+                stats: Dict[int, List[Dict[str, Any]]] = {}
+                for row in partition:
+                    player_id = place(row.id, row.user_id)
+                    shard = owners[slot_for_player(player_id)]
+                    players.setdefault(shard, []).append(
+                        {
+                            "id": player_id,
+                            "user_id": row.user_id,
+                            "name": row.name,
+                            "name_folded": row.name_folded,
+                            "level": row.level,
+                            "xp": row.xp,
+                            "version": row.version,
+                            "last_seen_at": row.last_seen_at,
+                        }
+                    )
+                    if row.health is not None:
+                        stats.setdefault(shard, []).append(
+                            {
+                                "player_id": player_id,
+                                "health": row.health,
+                                "attack": row.attack,
+                                "defense": row.defense,
+                            }
+                        )
+
+                for shard, rows in players.items():
+                    with targets[shard].begin() as target:
+                        target.execute(_players.insert(), rows)
+                        if shard in stats:
+                            target.execute(_stats.insert(), stats[shard])
+                    counts[shard] += len(rows)
+
+    for source in sources:
+        with source.connect() as connection:
+            result = connection.execution_options(yield_per=batch_size).execute(
+                select(_archive)
+            )
+            for partition in result.partitions():
+                archived: Dict[int, List[Dict[str, Any]]] = {}
+                for row in partition:
+                    player_id = place(row.id, row.user_id)
+                    archived.setdefault(owners[slot_for_player(player_id)], []).append(
+                        {**row._asdict(), "id": player_id}
+                    )
+                for shard, rows in archived.items():
+                    with targets[shard].begin() as target:
+                        target.execute(_archive.insert(), rows)
+
+    for source in sources:
+        with source.connect() as connection:
+            result = connection.execution_options(yield_per=batch_size).execute(
+                select(_receipts)
+            )
+            for partition in result.partitions():
+                receipts: Dict[int, List[Dict[str, Any]]] = {}
+                for row in partition:
+                    player_id = renumbered.get(row.player_id, row.player_id)
+                    receipts.setdefault(owners[slot_for_player(player_id)], []).append(
+                        {**row._asdict(), "player_id": player_id}
+                    )
+                for shard, rows in receipts.items():
+                    with targets[shard].begin() as target:
+                        target.execute(_receipts.insert(), rows)
+
+    for target in targets:
+        if target.dialect.name == "postgresql":
+            with target.begin() as connection:
+                connection.execute(
+                    text("SELECT setval('players_id_seq', :value)"),
+                    {"value": max(next_seq - 1, 1)},
+                )
+
+    return ReshardReport(counts, len(renumbered), time.perf_counter() - started)
+
+
+shards_cli = AppGroup("shards", help="Gestion des shards de joueurs.")
+
+
+@shards_cli.command("reshard")
+@click.option(
+    "--target",
+    "targets",
+    multiple=True,
+    required=True,
+    help="URL d'une base cible, dans l'ordre des shards (répétable).",
+)
+@click.option("--batch-size", default=1000, show_default=True)
+@click.option(
+    "--renumber-legacy-ids",
+    is_flag=True,
+    help="Attribuer de nouveaux identifiants aux joueurs créés avant le sharding.",
+)
+@click.option(
+    "--id-map",
+    type=click.File("w"),
+    help="Fichier CSV recevant les couples ancien_id,nouvel_id.",
+)
+def reshard_command(
+    targets: Sequence[str],
+    batch_size: int,
+    renumber_legacy_ids: bool,
+    id_map: Optional[TextIO],
+) -> None:
+    """Copier les joueurs vers une nouvelle répartition (service arrêté)."""
+
+    shards: ShardSet = current_app.extensions["shards"]
+    engines = [create_engine(url) for url in targets]
+    try:
+        report = reshard(
+            shards.engines,
+            engines,
+            batch_size=batch_size,
+            renumber_legacy_ids=renumber_legacy_ids,
+            id_map=id_map,
+        )
+    except ReshardError as exc:
+        raise click.ClickException(str(exc)) from exc
+    finally:
+        for engine in engines:
+            engine.dispose()
+
+    total = sum(report.players_per_shard)
+    for index, count in enumerate(report.players_per_shard):
+        click.echo(f"Shard {index} : {count} joueurs.")
+    if report.renumbered:
+        click.echo(f"Identifiants renumérotés : {report.renumbered}.")
+    rate = total / report.elapsed if report.elapsed else 0.0
+    click.echo(
+        f"{total} joueurs copiés en {report.elapsed:.1f} s ({rate:.0f} joueurs/s). "
+        "Mettez à jour DATABASE_URL et DATABASE_SHARD_URLS puis redémarrez."
+    )
@@ -0,0 +1,35 @@
+"""Signals emitted by the service when player data changes."""
+
+from typing import Any, Dict, NamedTuple, Optional
+
+from blinker import Namespace
+
+_signals = Namespace()
+
+
+class PlayerChange(NamedTuple):
+    """Committed state of a player after a write.
+
+    ``payload`` is the full serialized player when the writer already built it
+    (single-player endpoints); bulk paths leave it ``None``.
+    """
+
+    player_id: int
+    level: int
+    xp: int
+    payload: Optional[Dict[str, Any]] = None
+
+
+players_changed = _signals.signal("players-changed")
+"""Sent with ``changes=[PlayerChange, ...]`` after player writes are committed.
+
+The sender is the Flask application. Receivers must not raise: the data is
+already committed and the request outcome no longer depends on them.
+"""
+
+players_removed = _signals.signal("players-removed")
+"""Sent with ``player_ids=[...]`` after players are archived or deleted.
+
+Same sender and contract as :data:`players_changed`; a restored player comes
+back through :data:`players_changed`.
+"""
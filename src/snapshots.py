@@ -0,0 +1,106 @@
+"""ORM-free player snapshots for the hot read path.
+
+Reading a player through the ORM pays for identity-map bookkeeping and for
+hydrating two mapped objects. The statements below select plain columns from
+``players`` joined with ``player_stats`` and map each row into a slotted
+snapshot; SQLAlchemy caches their compiled form, so a read costs one execute
+and one small object.
+"""
+
+from typing import Any, Dict, Iterable, List, Optional
+
+from sqlalchemy import bindparam, select
+from sqlalchemy.engine import Connection
+
+from .models import Player, PlayerStats
+
+_players = Player.__table__
+_stats = PlayerStats.__table__
+
+_SNAPSHOT_COLUMNS = (
+    _players.c.id,
+    _players.c.user_id,
+    _players.c.name,
+    _players.c.level,
+    _players.c.xp,
+    _players.c.version,
+    _stats.c.health,
+    _stats.c.attack,
+    _stats.c.defense,
+)
+
+PLAYER_SNAPSHOT_QUERY = (
+    select(*_SNAPSHOT_COLUMNS)
+    .select_from(_players.outerjoin(_stats, _stats.c.player_id == _players.c.id))
+    .where(_players.c.id == bindparam("player_id"))
+)
+
+PLAYER_SNAPSHOTS_QUERY = (
+    select(*_SNAPSHOT_COLUMNS)
+    .select_from(_players.outerjoin(_stats, _stats.c.player_id == _players.c.id))
+    .where(_players.c.id.in_(bindparam("player_ids", expanding=True)))
+)
+
+
+class PlayerSnapshot:
+    """Immutable-by-convention view of a player row and its stats."""
+
+    __slots__ = (
+        "id",
+        "user_id",
+        "name",
+        "level",
+        "xp",
+        "version",
+        "health",
+        "attack",
+        "defense",
+    )
+
+    def __init__(self, row: Any) -> None:
+        (
+            self.id,
+            self.user_id,
+            self.name,
+            self.level,
+            self.xp,
+            self.version,
+            self.health,
+            self.attack,
+            self.defense,
+        ) = row
+
+    def to_payload(self) -> Dict[str, Any]:
+        """Return the same dictionary as the ORM ``_serialize_player``."""
+
+        return {
+            "id": self.id,
+            "user_id": self.user_id,
+            "name": self.name,
+            "level": self.level,
+            "xp": self.xp,
+            "version": self.version,
+            "stats": (
+                None
+                if self.health is None
+                else {
+                    "health": self.health,
+                    "attack": self.attack,
+                    "defense": self.defense,
+                }
+            ),
+        }
+
+
+def load_player_snapshot(
+    connection: Connection, player_id: int
+) -> Optional[PlayerSnapshot]:
+    row = connection.execute(PLAYER_SNAPSHOT_QUERY, {"player_id": player_id}).first()
+    return None if row is None else PlayerSnapshot(row)
+
+
+def load_player_snapshots(
+    connection: Connection, player_ids: Iterable[int]
+) -> List[PlayerSnapshot]:
+    rows = connection.execute(PLAYER_SNAPSHOTS_QUERY, {"player_ids": list(player_ids)})
+    return [PlayerSnapshot(row) for row in rows]
@@ -0,0 +1,149 @@
+"""Negotiated response formats and compression.
+
+Envelopes are rendered as JSON unless the request's ``Accept`` header prefers
+MessagePack (``application/msgpack``, or the older ``application/x-msgpack``
+and ``application/vnd.msgpack``), which is several times smaller on batch and
+list responses because keys and integers are not spelled out in text.
+``msgpack`` is optional; without it every client gets JSON.
+
+:class:`Compressor` then applies ``br`` (when ``brotli`` is installed) or
+``gzip`` to responses of a compressible type that are at least
+``COMPRESSION_MIN_SIZE`` bytes, following the request's ``Accept-Encoding``.
+Streamed responses (NDJSON exports) are compressed chunk by chunk since their
+size is unknown; Server-Sent Events are never compressed because the
+compressor would hold events back.
+"""
+
+import gzip
+import zlib
+from typing import Any, Iterable, Iterator, Optional
+
+from flask import Flask, Response, request
+from werkzeug.datastructures import MIMEAccept
+
+try:  # pragma: no cover - exercised through whichever branch is installed
+    import msgpack
+except ImportError:  # pragma: no cover
+    msgpack = None
+
+try:  # pragma: no cover
+    import brotli
+except ImportError:  # pragma: no cover
+    brotli = None
+
+JSON_MIMETYPE = "application/json"
+MSGPACK_MIMETYPE = "application/msgpack"
+_OFFERED = (
+    JSON_MIMETYPE,
+    MSGPACK_MIMETYPE,
+    "application/x-msgpack",
+    "application/vnd.msgpack",
+)
+
+COMPRESSIBLE_MIMETYPES = frozenset(
+    {
+        JSON_MIMETYPE,
+        MSGPACK_MIMETYPE,
+        "application/x-ndjson",
+        "text/csv",
+        "text/plain",
+    }
+)
+
+
+def wants_msgpack(accept: MIMEAccept) -> bool:
+    """Whether *accept* prefers MessagePack to JSON (ties go to JSON)."""
+
+    if msgpack is None or not accept:
+        return False
+    return accept.best_match(_OFFERED, default=JSON_MIMETYPE) != JSON_MIMETYPE
+
+
+def pack(obj: Any) -> bytes:
+    return msgpack.packb(obj, use_bin_type=True)
+
+
+def unpack(data: bytes) -> Any:
+    return msgpack.unpackb(data, raw=False)
+
+
+class Compressor:
+    """Compress eligible responses according to ``Accept-Encoding``."""
+
+    def __init__(
+        self,
+        min_size: int = 1024,
+        gzip_level: int = 6,
+        brotli_quality: int = 4,
+        mimetypes: Iterable[str] = COMPRESSIBLE_MIMETYPES,
+    ) -> None:
+        self.min_size = min_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+        self.mimetypes = frozenset(mimetypes)
+        self.codings = ("br", "gzip") if brotli is not None else ("gzip",)
+
+    def init_app(self, app: Flask) -> None:
+        app.after_request(self._after_request)
+        app.extensions["compressor"] = self
+
+    def compress(self, data: bytes, coding: str) -> bytes:
+        if coding == "br":
+            return brotli.compress(data, quality=self.brotli_quality)
+        return gzip.compress(data, self.gzip_level, mtime=0)
+
+    def compress_stream(self, chunks: Iterable[bytes], coding: str) -> Iterator[bytes]:
+        """Compress *chunks* incrementally, yielding output as it is produced."""
+
+        if coding == "br":
+            compressor = brotli.Compressor(quality=self.brotli_quality)
+            process, finish = compressor.process, compressor.finish
+        else:
+            compressor = zlib.compressobj(self.gzip_level, zlib.DEFLATED, 31)
+            process, finish = compressor.compress, compressor.flush
+
+        for chunk in chunks:
+            output = process(chunk)
+            if output:
+                yield output
+        yield finish()
+
+    def _after_request(self, response: Response) -> Response:
+        if (
+            request.method == "HEAD"
+            or response.status_code in (204, 304)
+            or response.direct_passthrough
+            or response.mimetype not in self.mimetypes
+            or "Content-Encoding" in response.headers
+        ):
+            return response
+
+        response.vary.add("Accept-Encoding")
+        coding = request.accept_encodings.best_match(self.codings)
+        if coding is None:
+            return response
+
+        if response.is_streamed:
+            response.response = _closing(
+                self.compress_stream(response.iter_encoded(), coding),
+                response.response,
+            )
+            response.headers.pop("Content-Length", None)
+        else:
+            data = response.get_data()
+            if len(data) < self.min_size:
+                return response
+            response.set_data(self.compress(data, coding))
+        response.headers["Content-Encoding"] = coding
+        return response
+
+
+def _closing(chunks: Iterator[bytes], source: Any) -> Iterator[bytes]:
+    # The server closes the iterable it is given; pass that on to the
+    # original one so that its cleanup (database cursor, app context) runs.
+    try:
+        yield from chunks
+    finally:
+        close: Optional[Any] = getattr(source, "close", None)
+        if close is not None:
+            close()
@@ -0,0 +1,5 @@
+"""WSGI entry point used by gunicorn (``gunicorn src.wsgi:app``)."""
+
+from .main import create_app
+
+app = create_app()
@@ -0,0 +1,491 @@
+"""Write-behind ingestion of XP events.
+
+Gameplay servers report experience gains far more often than the database
+should see transactions. ``POST /players/xp:events`` only appends events to a
+buffer; an :class:`XpFlusher` drains it on an interval (or as soon as enough
+events are waiting), sums the amounts per player and applies them with
+:func:`~src.experience.apply_experience_awards` in one transaction per batch.
+
+Delivery is at-least-once: a batch is acknowledged to the buffer only after
+its transaction commits, and a failed batch is retried. Redeliveries are made
+harmless by the ``xp_event_receipts`` table: every applied event id is
+recorded in the same transaction as the award, and ids already recorded are
+skipped. Receipts are pruned after ``retention`` seconds, which bounds the
+window in which a duplicate is recognised. Archived players addressed by a
+batch are restored in its transaction; events for players that do not exist
+are dropped without a receipt.
+
+Two buffers are provided: a bounded in-process queue for single-node and test
+setups, and a Redis stream read through a consumer group, which survives
+worker restarts and lets any worker pick up a dead worker's pending events.
+"""
+
+import atexit
+import logging
+import os
+import socket
+import threading
+import time
+from collections import deque
+from datetime import datetime, timedelta, timezone
+from typing import Any, Deque, Dict, List, NamedTuple, Optional, Sequence, Set
+
+from flask import Flask
+from redis.exceptions import RedisError, ResponseError
+from sqlalchemy import select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+from .archive import restore_players
+from .experience import apply_experience_awards
+from .extensions import db
+from .models import Player, XpEventReceipt
+from .signals import PlayerChange, players_changed
+from .snapshots import PlayerSnapshot
+
+logger = logging.getLogger(__name__)
+
+_players = Player.__table__
+
+
+class XpEvent(NamedTuple):
+    """A single experience gain reported by a game server."""
+
+    event_id: str
+    player_id: int
+    amount: int
+
+
+class XpBatch(NamedTuple):
+    """Events taken from a buffer, with the handles needed to acknowledge them."""
+
+    events: List[XpEvent]
+    handles: List[Any]
+
+
+class BufferFull(Exception):
+    """The buffer cannot accept more events until the flusher catches up."""
+
+
+class BufferUnavailable(Exception):
+    """The buffer backend could not be reached."""
+
+
+class LocalXpBuffer:
+    """Bounded in-process FIFO of XP events.
+
+    Events are lost if the process dies before they are flushed; use the
+    Redis buffer when that matters.
+    """
+
+    def __init__(self, maxsize: int = 100_000) -> None:
+        self.maxsize = maxsize
+        self._events: Deque[XpEvent] = deque()
+        self._lock = threading.Lock()
+
+    def offer(self, events: Sequence[XpEvent]) -> None:
+        """Append all of *events*, or none of them if they do not fit."""
+
+        with self._lock:
+            if len(self._events) + len(events) > self.maxsize:
+                raise BufferFull()
+            self._events.extend(events)
+
+    def take(self, limit: int) -> XpBatch:
+        with self._lock:
+            count = min(limit, len(self._events))
+            events = [self._events.popleft() for _ in range(count)]
+        return XpBatch(events, [])
+
+    def ack(self, batch: XpBatch) -> None:
+        pass
+
+    def retry(self, batch: XpBatch) -> None:
+        """Put an unapplied batch back at the head of the queue."""
+
+        with self._lock:
+            self._events.extendleft(reversed(batch.events))
+
+    def __len__(self) -> int:
+        return len(self._events)
+
+
+class RedisXpBuffer:
+    """XP events stored in a Redis stream and consumed through a group.
+
+    Entries stay in the group's pending list until acknowledged, so a batch
+    whose flush failed is read again by the same consumer, and entries held by
+    a consumer that disappeared are claimed by another after ``claim_after``
+    seconds. Acknowledged entries are deleted, which keeps ``XLEN`` equal to
+    the number of unapplied events.
+
+    The capacity check and the ``XADD`` are separate round-trips, so
+    concurrent writers may overshoot ``maxsize`` by one request's worth of
+    events.
+    """
+
+    def __init__(
+        self,
+        redis_client: Any,
+        maxsize: int = 1_000_000,
+        stream: str = "xp:events",
+        group: str = "xp-flushers",
+        consumer: Optional[str] = None,
+        claim_after: float = 60.0,
+    ) -> None:
+        self.redis = redis_client
+        self.maxsize = maxsize
+        self.stream = stream
+        self.group = group
+        self._consumer = consumer
+        self.claim_after = claim_after
+        self._group_ready = False
+
+    @property
+    def consumer(self) -> str:
+        # Resolved per process: workers forked from a preloaded master must
+        # not share a consumer name (and therefore a pending list).
+        return self._consumer or f"{socket.gethostname()}-{os.getpid()}"
+
+    def offer(self, events: Sequence[XpEvent]) -> None:
+        try:
+            if self.redis.xlen(self.stream) + len(events) > self.maxsize:
+                raise BufferFull()
+            pipe = self.redis.pipeline(transaction=True)
+            for event in events:
+                pipe.xadd(
+                    self.stream,
+                    {
+                        "id": event.event_id,
+                        "player": event.player_id,
+                        "amount": event.amount,
+                    },
+                )
+            pipe.execute()
+        except RedisError as exc:
+            raise BufferUnavailable(str(exc)) from exc
+
+    def take(self, limit: int) -> XpBatch:
+        self._ensure_group()
+        # Our own unacknowledged entries first (a failed flush), then entries
+        # abandoned by other consumers, then new ones.
+        entries = self._read("0", limit)
+        if not entries:
+            _, entries, *_ = self.redis.xautoclaim(
+                self.stream,
+                self.group,
+                self.consumer,
+                min_idle_time=int(self.claim_after * 1000),
+                start_id="0-0",
+                count=limit,
+            )
+        if not entries:
+            entries = self._read(">", limit)
+
+        events: List[XpEvent] = []
+        handles: List[Any] = []
+        for entry_id, fields in entries:
+            handles.append(entry_id)
+            event = self._decode(fields)
+            if event is None:
+                logger.warning("Dropping malformed XP event %r", entry_id)
+            else:
+                events.append(event)
+        return XpBatch(events, handles)
+
+    def ack(self, batch: XpBatch) -> None:
+        if not batch.handles:
+            return
+
+        pipe = self.redis.pipeline(transaction=False)
+        pipe.xack(self.stream, self.group, *batch.handles)
+        pipe.xdel(self.stream, *batch.handles)
+        pipe.execute()
+
+    def retry(self, batch: XpBatch) -> None:
+        """Leave the batch pending; the next ``take`` reads it again."""
+
+    def __len__(self) -> int:
+        return self.redis.xlen(self.stream)
+
+    def _ensure_group(self) -> None:
+        if self._group_ready:
+            return
+
+        try:
+            self.redis.xgroup_create(self.stream, self.group, id="0", mkstream=True)
+        except ResponseError as exc:
+            if "BUSYGROUP" not in str(exc):
+                raise
+        self._group_ready = True
+
+    def _read(self, start: str, limit: int) -> List[Any]:
+        response = self.redis.xreadgroup(
+            self.group, self.consumer, {self.stream: start}, count=limit
+        )
+        return response[0][1] if response else []
+
+    @staticmethod
+    def _decode(fields: Dict[bytes, bytes]) -> Optional[XpEvent]:
+        try:
+            return XpEvent(
+                fields[b"id"].decode("utf-8"),
+                int(fields[b"player"]),
+                int(fields[b"amount"]),
+            )
+        except (KeyError, ValueError, UnicodeDecodeError):
+            return None
+
+
+def _dialect_insert(session: Session):
+    if session.get_bind().dialect.name == "postgresql":
+        return postgresql.insert
+    return sqlite.insert
+
+
+def record_receipts(session: Session, events: Sequence[XpEvent]) -> List[XpEvent]:
+    """Record *events* as applied and return those not recorded before.
+
+    Runs in the caller's transaction, so receipts only persist together with
+    the awards they guard.
+    """
+
+    unique: Dict[str, XpEvent] = {}
+    for event in events:
+        unique.setdefault(event.event_id, event)
+    if not unique:
+        return []
+
+    receipts = XpEventReceipt.__table__
+    statement = (
+        _dialect_insert(session)(receipts)
+        .on_conflict_do_nothing(index_elements=[receipts.c.event_id])
+        .returning(receipts.c.event_id)
+    )
+    inserted = session.execute(
+        statement,
+        [
+            {"event_id": event.event_id, "player_id": event.player_id}
+            for event in unique.values()
+        ],
+    ).scalars()
+    return [unique[event_id] for event_id in inserted]
+
+
+class XpFlusher:
+    """Drain an XP buffer into the database from a background thread.
+
+    The thread is started lazily by :meth:`ensure_running` so that a
+    preforking server starts one per worker rather than one in the master.
+    """
+
+    def __init__(
+        self,
+        app: Flask,
+        buffer: Any,
+        interval: float = 1.0,
+        batch_size: int = 1000,
+        chunk_size: int = 1000,
+        retention: float = 86400.0,
+        retry_delay: float = 1.0,
+    ) -> None:
+        self.app = app
+        self.buffer = buffer
+        self.interval = interval
+        self.batch_size = batch_size
+        self.chunk_size = chunk_size
+        self.retention = retention
+        self.retry_delay = retry_delay
+        self._wake = threading.Event()
+        self._stopping = threading.Event()
+        self._flush_lock = threading.Lock()
+        self._start_lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._pid: Optional[int] = None
+        self._exit_hook_registered = False
+        self._queued = 0
+        self._last_prune = 0.0
+
+    def ensure_running(self) -> None:
+        """Start the background thread in this process if it is not running."""
+
+        if self._thread is not None and self._pid == os.getpid():
+            return
+
+        with self._start_lock:
+            if self._thread is not None and self._pid == os.getpid():
+                return
+            self._stopping.clear()
+            self._pid = os.getpid()
+            self._thread = threading.Thread(
+                target=self._run, name="xp-flusher", daemon=True
+            )
+            self._thread.start()
+            if not self._exit_hook_registered:
+                atexit.register(self.stop)
+                self._exit_hook_registered = True
+
+    def notify(self, count: int) -> None:
+        """Record *count* newly buffered events; wake the flusher on a full batch."""
+
+        self._queued += count
+        if self._queued >= self.batch_size:
+            self._wake.set()
+
+    def stop(self, timeout: Optional[float] = None) -> None:
+        """Stop the background thread and flush whatever is still buffered."""
+
+        self._stopping.set()
+        self._wake.set()
+        if self._thread is not None and self._pid == os.getpid():
+            self._thread.join(timeout)
+        self._thread = None
+        try:
+            self.flush()
+        except Exception:
+            logger.exception("Final XP flush failed")
+
+    def flush(self) -> int:
+        """Apply every buffered event; return the number of events applied."""
+
+        applied = 0
+        with self._flush_lock:
+            self._queued = 0
+            while True:
+                batch = self.buffer.take(self.batch_size)
+                if not batch.events and not batch.handles:
+                    break
+                applied += self._apply(batch)
+            self._prune()
+        return applied
+
+    def _run(self) -> None:
+        while not self._stopping.is_set():
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            if self._stopping.is_set():
+                break
+            try:
+                self.flush()
+            except Exception:
+                logger.exception("XP flush failed; retrying in %.1fs", self.retry_delay)
+                self._stopping.wait(self.retry_delay)
+
+    def _apply(self, batch: XpBatch) -> int:
+        shards = self.app.extensions["shards"]
+        by_shard: Dict[int, List[XpEvent]] = {}
+        for event in batch.events:
+            by_shard.setdefault(shards.shard_for_player(event.player_id), []).append(
+                event
+            )
+
+        with self.app.app_context():
+            try:
+                # Receipts live on the player's shard, next to the awards they
+                # guard; a batch spanning shards commits one transaction each.
+                events: List[XpEvent] = []
+                restored: List[PlayerSnapshot] = []
+                results = {}
+                for shard, shard_events in by_shard.items():
+                    with shards.bind(shard):
+                        live = self._lock_players(shard_events, restored)
+                        applied = record_receipts(
+                            db.session,
+                            [
+                                event
+                                for event in shard_events
+                                if event.player_id in live
+                            ],
+                        )
+                        awards: Dict[int, int] = {}
+                        for event in applied:
+                            awards[event.player_id] = (
+                                awards.get(event.player_id, 0) + event.amount
+                            )
+                        results.update(
+                            apply_experience_awards(awards, chunk_size=self.chunk_size)
+                        )
+                    events.extend(applied)
+                db.session.commit()
+            except Exception:
+                db.session.rollback()
+                self.buffer.retry(batch)
+                raise
+
+        self.buffer.ack(batch)
+        skipped = len(batch.events) - len(events)
+        if skipped:
+            logger.info(
+                "Skipped %d already applied or unknown player XP events", skipped
+            )
+        if restored:
+            players_changed.send(
+                self.app,
+                changes=[
+                    PlayerChange(
+                        snapshot.id, snapshot.level, snapshot.xp, snapshot.to_payload()
+                    )
+                    for snapshot in restored
+                ],
+            )
+        if results:
+            players_changed.send(
+                self.app,
+                changes=[
+                    PlayerChange(player_id, result.level, result.xp)
+                    for player_id, result in results.items()
+                ],
+            )
+        return len(events)
+
+    def _lock_players(
+        self, events: Sequence[XpEvent], restored: List[PlayerSnapshot]
+    ) -> Set[int]:
+        """Restore archived players of *events* and lock the live ones.
+
+        Returns the ids of the players that exist, so that no receipt is
+        recorded for an event whose award could not be applied.
+        """
+
+        connection = db.session.connection()
+        player_ids = sorted({event.player_id for event in events})
+        restored.extend(restore_players(connection, player_ids, self.chunk_size))
+
+        live: Set[int] = set()
+        for start in range(0, len(player_ids), self.chunk_size):
+            live.update(
+                connection.scalars(
+                    select(_players.c.id)
+                    .where(
+                        _players.c.id.in_(player_ids[start : start + self.chunk_size])
+                    )
+                    .with_for_update()
+                )
+            )
+        return live
+
+    def _prune(self) -> None:
+        now = time.monotonic()
+        if now - self._last_prune < min(self.retention, 60.0):
+            return
+
+        self._last_prune = now
+        cutoff = datetime.now(timezone.utc).replace(tzinfo=None) - timedelta(
+            seconds=self.retention
+        )
+        receipts = XpEventReceipt.__table__
+        shards = self.app.extensions["shards"]
+        with self.app.app_context():
+            # Receipts are written on each player's shard: prune them all.
+            for shard in range(len(shards.engines)):
+                with shards.bind(shard):
+                    try:
+                        db.session.execute(
+                            receipts.delete().where(receipts.c.applied_at < cutoff)
+                        )
+                        db.session.commit()
+                    except Exception:
+                        db.session.rollback()
+                        logger.exception(
+                            "Pruning XP event receipts failed on shard %d", shard
+                        )
@@ -1,3 +1,4 @@
+import fakeredis
 import pytest
 
 from src.extensions import db
@@ -5,20 +6,31 @@ from src.main import create_app
 
 
 @pytest.fixture
-def app():
+def app_config():
+    """Configuration overrides applied when building the test application."""
+
+    return {
+        "TESTING": True,
+        "SQLALCHEMY_DATABASE_URI": "sqlite://",
+        "API_AUTH_TOKEN": "test-token",
+        "REDIS_URL": None,
+        "LAST_SEEN_BACKGROUND": False,
+        "LEADERBOARD_REBUILD_BACKGROUND": False,
+        "POPULATION_STATS_REBUILD_BACKGROUND": False,
+    }
+
+
+@pytest.fixture
+def app(app_config):
     """Create application for testing."""
 
-    app = create_app()
-    app.config.update(
-        {
-            "TESTING": True,
-            "SQLALCHEMY_DATABASE_URI": "sqlite://",
-            "API_AUTH_TOKEN": "test-token",
-        }
-    )
+    app = create_app(app_config)
 
     with app.app_context():
         db.create_all()
+        # As after the rebuild commands on a fresh deployment.
+        app.extensions["leaderboard"].rebuild()
+        app.extensions["population"].rebuild()
 
     yield app
 
@@ -31,3 +43,10 @@ def app():
 def client(app):
     """Create test client."""
     return app.test_client()
+
+
+@pytest.fixture
+def fake_redis():
+    """In-memory Redis server standing in for the real one."""
+
+    return fakeredis.FakeRedis()
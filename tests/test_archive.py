@@ -0,0 +1,312 @@
+"""Tests pour la suppression logique et l'archivage des joueurs inactifs."""
+
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from sqlalchemy import func, select, update
+
+from src.archive import LastSeenTracker, archive_inactive
+from src.extensions import db
+from src.main import create_app
+from src.models import Player, PlayerArchive, PlayerStats, XpEventReceipt
+
+AUTH_HEADERS = {"Authorization": "Bearer test-token"}
+
+
+@pytest.fixture(params=["local", "redis"])
+def app_config(request, app_config, fake_redis):
+    app_config = {**app_config, "XP_EVENTS_BACKGROUND": False}
+    if request.param == "redis":
+        return {**app_config, "REDIS_CLIENT": fake_redis}
+    return app_config
+
+
+def _now():
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def _create_player(client, user_id):
+    response = client.post(
+        "/players",
+        json={"name": user_id.title()},
+        headers={**AUTH_HEADERS, "X-User-Id": user_id},
+    )
+    assert response.status_code == 201, response.get_json()
+    return response.get_json()["data"]["id"]
+
+
+def _set_last_seen(app, player_ids, when):
+    players = Player.__table__
+    with app.app_context():
+        db.session.execute(
+            update(players)
+            .where(players.c.id.in_(player_ids))
+            .values(last_seen_at=when)
+        )
+        db.session.commit()
+
+
+def _count(app, model):
+    with app.app_context():
+        return db.session.scalar(select(func.count()).select_from(model))
+
+
+def test_delete_player_archives_it_as_deleted(client, app):
+    player_id = _create_player(client, "alice")
+    headers = {**AUTH_HEADERS, "X-User-Id": "alice"}
+
+    missing_user = client.delete(f"/players/{player_id}", headers=AUTH_HEADERS)
+    assert missing_user.status_code == 400
+    other = client.delete(
+        f"/players/{player_id}", headers={**AUTH_HEADERS, "X-User-Id": "bob"}
+    )
+    assert other.status_code == 403
+    stale = client.delete(
+        f"/players/{player_id}", headers={**headers, "If-Match": '"7"'}
+    )
+    assert stale.status_code == 412
+    assert stale.headers["ETag"] == '"1"'
+
+    response = client.delete(f"/players/{player_id}", headers=headers)
+    assert response.status_code == 200
+    assert response.get_json()["data"] == {"id": player_id}
+
+    assert client.get(f"/players/{player_id}", headers=AUTH_HEADERS).status_code == 404
+    rank = client.get(f"/leaderboard/players/{player_id}", headers=AUTH_HEADERS)
+    assert rank.status_code == 404
+    assert client.delete(f"/players/{player_id}", headers=headers).status_code == 404
+    assert _count(app, Player) == 0 and _count(app, PlayerStats) == 0
+    with app.app_context():
+        archived = db.session.get(PlayerArchive, player_id)
+        assert archived.deleted_at is not None
+        assert archived.health == 100
+
+    summary = client.get("/players/stats/summary", headers=AUTH_HEADERS).get_json()
+    assert summary["data"]["players"] == 0
+
+    new_id = _create_player(client, "alice")
+    assert new_id != player_id
+
+
+def test_inactive_players_are_archived_and_restored_on_access(client, app):
+    ids = [_create_player(client, f"user-{index}") for index in range(5)]
+    client.patch(
+        f"/players/{ids[0]}/stats",
+        json={"attack": 7, "xp": 150},
+        headers={**AUTH_HEADERS, "X-User-Id": "user-0"},
+    )
+    assert client.get("/leaderboard", headers=AUTH_HEADERS).status_code == 200
+    search = client.get("/players/search?prefix=user", headers=AUTH_HEADERS)
+    assert len(search.get_json()["data"]) == 5
+    before = client.get(f"/players/{ids[0]}", headers=AUTH_HEADERS).get_json()["data"]
+    _set_last_seen(app, ids[:3], _now() - timedelta(days=200))
+
+    with app.app_context():
+        report = archive_inactive(_now() - timedelta(days=180), batch_size=2)
+    assert (report.archived, report.batches) == (3, 2)
+    assert _count(app, Player) == 2 and _count(app, PlayerStats) == 2
+    assert _count(app, PlayerArchive) == 3
+
+    leaderboard = client.get("/leaderboard", headers=AUTH_HEADERS).get_json()
+    assert leaderboard["meta"]["total"] == 2
+    search = client.get("/players/search?prefix=user", headers=AUTH_HEADERS)
+    assert [player["id"] for player in search.get_json()["data"]] == ids[3:]
+    summary = client.get("/players/stats/summary", headers=AUTH_HEADERS).get_json()
+    assert summary["data"]["players"] == 2
+
+    partial = client.get(f"/players/{ids[3]}?fields=name", headers=AUTH_HEADERS)
+    assert partial.get_json()["data"] == {"id": ids[3], "name": "User-3", "version": 1}
+    restored = client.get(f"/players/{ids[0]}", headers=AUTH_HEADERS)
+    assert restored.status_code == 200
+    assert restored.get_json()["data"] == before
+    assert restored.headers["ETag"] == f'"{before["version"]}"'
+    renamed = client.put(
+        f"/players/{ids[1]}",
+        json={"name": "Back"},
+        headers={**AUTH_HEADERS, "X-User-Id": "user-1"},
+    )
+    assert renamed.status_code == 200
+    assert renamed.get_json()["data"]["name"] == "Back"
+    rank = client.get(f"/leaderboard/players/{ids[2]}", headers=AUTH_HEADERS)
+    assert rank.status_code == 200
+
+    assert _count(app, PlayerArchive) == 0
+    with app.app_context():
+        last_seen = db.session.get(Player, ids[0]).last_seen_at
+    assert last_seen > _now() - timedelta(minutes=1)
+    summary = client.get("/players/stats/summary", headers=AUTH_HEADERS).get_json()
+    assert summary["data"]["players"] == 5
+    assert summary["data"]["xp"]["average"] == 10
+
+
+def test_creating_a_player_over_an_archived_one_conflicts(client, app):
+    first = _create_player(client, "carol")
+    newest = _create_player(client, "dave")
+    _set_last_seen(app, [first, newest], _now() - timedelta(days=365))
+    with app.app_context():
+        archive_inactive(_now() - timedelta(days=180))
+
+    archived = client.post(
+        "/players",
+        json={"name": "Again"},
+        headers={**AUTH_HEADERS, "X-User-Id": "carol"},
+    )
+    duplicate = client.post(
+        "/players",
+        json={"name": "Again"},
+        headers={**AUTH_HEADERS, "X-User-Id": "carol"},
+    )
+    assert archived.status_code == duplicate.status_code == 409
+    assert archived.get_json() == duplicate.get_json()
+    assert archived.get_json()["message"] == (
+        "Un joueur existe déjà pour cet utilisateur."
+    )
+    # The archived player is back, untouched by the requested name.
+    restored = client.get(f"/players/{first}", headers=AUTH_HEADERS)
+    assert restored.get_json()["data"]["name"] == "Carol"
+    assert restored.headers["ETag"] == '"1"'
+    with app.app_context():
+        assert db.session.get(PlayerArchive, first) is None
+
+    # The largest id is archived: it must not be handed out again.
+    assert _create_player(client, "erin") > newest
+    assert client.get(f"/players/{newest}", headers=AUTH_HEADERS).status_code == 200
+
+
+def test_last_seen_writes_are_coalesced(client, app):
+    player_id = _create_player(client, "frank")
+    tracker = app.extensions["last_seen"]
+    assert tracker.flush() == 1
+
+    for _ in range(3):
+        client.get(f"/players/{player_id}", headers=AUTH_HEADERS)
+    assert tracker.flush() == 0
+
+    def last_seen():
+        with app.app_context():
+            return db.session.get(Player, player_id).last_seen_at
+
+    recent = last_seen()
+    other_worker = LastSeenTracker(app, resolution=3600, background=False)
+    other_worker.touch([player_id])
+    other_worker.flush()
+    assert last_seen() == recent
+
+    _set_last_seen(app, [player_id], _now() - timedelta(days=2))
+    other_worker = LastSeenTracker(app, resolution=3600, background=False)
+    other_worker.touch([player_id, player_id])
+    assert other_worker.flush() == 1
+    assert last_seen() > _now() - timedelta(minutes=1)
+
+
+def test_archive_command_reports_table_sizes(client, app):
+    ids = [_create_player(client, f"user-{index}") for index in range(4)]
+    _set_last_seen(app, ids[1:], _now() - timedelta(days=40))
+
+    result = app.test_cli_runner().invoke(
+        args=["archive", "inactive", "--inactive-days", "30", "--pause", "0"]
+    )
+    assert result.exit_code == 0, result.output
+    lines = result.output.splitlines()
+    assert lines[0].startswith("players : 4 lignes, données ")
+    assert "→ 1 lignes" in lines[0]
+    assert lines[2].startswith("players_archive : 0 lignes")
+    assert "→ 3 lignes" in lines[2]
+    assert "3 joueurs inactifs depuis 30 jours archivés en 1 lots" in lines[3]
+
+    sizes = app.test_cli_runner().invoke(args=["archive", "sizes"])
+    assert sizes.exit_code == 0
+    assert "player_stats : 1 lignes" in sizes.output
+
+
+def test_experience_events_restore_archived_players(client, app):
+    player_id = _create_player(client, "grace")
+    _set_last_seen(app, [player_id], _now() - timedelta(days=365))
+    with app.app_context():
+        archive_inactive(_now() - timedelta(days=180))
+
+    response = client.post(
+        "/players/xp:events",
+        json={
+            "events": [
+                {"event_id": "e1", "player_id": player_id, "amount": 150},
+                {"event_id": "e2", "player_id": 999_999, "amount": 10},
+            ]
+        },
+        headers=AUTH_HEADERS,
+    )
+    assert response.status_code == 202
+    assert app.extensions["xp_flusher"].flush() == 1
+
+    data = client.get(f"/players/{player_id}", headers=AUTH_HEADERS).get_json()["data"]
+    assert (data["level"], data["xp"]) == (2, 50)
+    assert data["stats"] == {"health": 100, "attack": 10, "defense": 5}
+    assert _count(app, PlayerArchive) == 0
+    with app.app_context():
+        receipts = XpEventReceipt.query.all()
+        assert [receipt.event_id for receipt in receipts] == ["e1"]
+    summary = client.get("/players/stats/summary", headers=AUTH_HEADERS).get_json()
+    assert summary["data"]["players"] == 1
+    assert summary["data"]["xp"]["average"] == 50
+
+
+def test_experience_batch_restores_archived_players(client, app):
+    player_id = _create_player(client, "heidi")
+    _set_last_seen(app, [player_id], _now() - timedelta(days=365))
+    with app.app_context():
+        archive_inactive(_now() - timedelta(days=180))
+
+    response = client.post(
+        "/players/xp:batch",
+        json={"awards": [{"player_id": player_id, "amount": 100}]},
+        headers=AUTH_HEADERS,
+    )
+    assert response.status_code == 200
+    body = response.get_json()
+    assert body["meta"]["missing_ids"] == []
+    assert body["data"][0]["level"] == 2
+    rank = client.get(f"/leaderboard/players/{player_id}", headers=AUTH_HEADERS)
+    assert rank.get_json()["data"]["level"] == 2
+
+
+def test_single_player_reads_refresh_last_seen(app_config):
+    app = create_app({**app_config, "LAST_SEEN_RESOLUTION": 0})
+    with app.app_context():
+        db.create_all()
+    client = app.test_client()
+    ids = [_create_player(client, f"user-{index}") for index in range(2)]
+    etag = client.get(f"/players/{ids[0]}", headers=AUTH_HEADERS).headers["ETag"]
+
+    reads = [
+        lambda: client.get(
+            f"/players/{ids[0]}", headers={**AUTH_HEADERS, "If-None-Match": etag}
+        ),
+        lambda: client.get(f"/players/{ids[1]}", headers=AUTH_HEADERS),
+    ]
+    for player_id, read in zip(ids, reads):
+        app.extensions["last_seen"].flush()
+        _set_last_seen(app, [player_id], _now() - timedelta(days=30))
+        assert read().status_code in (200, 304)
+        app.extensions["last_seen"].flush()
+        with app.app_context():
+            last_seen = db.session.get(Player, player_id).last_seen_at
+        assert last_seen > _now() - timedelta(minutes=1)
+
+
+def test_listing_players_does_not_keep_them_active(app_config):
+    app = create_app({**app_config, "LAST_SEEN_RESOLUTION": 0})
+    with app.app_context():
+        db.create_all()
+    client = app.test_client()
+    ids = [_create_player(client, f"user-{index}") for index in range(3)]
+    app.extensions["last_seen"].flush()
+    _set_last_seen(app, ids, _now() - timedelta(days=365))
+
+    client.get("/players?limit=10", headers=AUTH_HEADERS)
+    client.get("/players/search?prefix=user", headers=AUTH_HEADERS)
+    client.post("/players:batchGet", json={"ids": ids}, headers=AUTH_HEADERS)
+    app.extensions["last_seen"].flush()
+
+    with app.app_context():
+        report = archive_inactive(_now() - timedelta(days=180))
+    assert report.archived == 3
@@ -0,0 +1,70 @@
+"""Tests for the benchmark suite's reporting and regression checks."""
+
+from benchmarks.common import percentile, summarize
+from benchmarks.suite import compare, main
+
+
+def _results(throughput, p95, p99=None):
+    return {
+        "scenarios": {
+            "get_player": {
+                "throughput": throughput,
+                "p50_ms": 1.0,
+                "p95_ms": p95,
+                "p99_ms": p99 if p99 is not None else p95,
+            }
+        }
+    }
+
+
+def test_percentile_uses_nearest_rank():
+    values = [float(value) for value in range(1, 101)]
+
+    assert percentile(values, 0.50) == 50.0
+    assert percentile(values, 0.99) == 99.0
+    assert percentile([], 0.5) == 0.0
+
+
+def test_summarize_reports_throughput_and_latency_in_ms():
+    summary = summarize([0.002, 0.001, 0.003, 0.004], elapsed=0.5)
+
+    assert summary["requests"] == 4
+    assert summary["throughput"] == 8.0
+    assert summary["p50_ms"] == 2.0
+    assert summary["p99_ms"] == 4.0
+
+
+def test_compare_flags_regressions_beyond_threshold():
+    baseline = _results(throughput=1000, p95=2.0)
+
+    assert compare(_results(900, 2.2), baseline, threshold=0.25) == []
+
+    regressions = compare(_results(700, 3.0), baseline, threshold=0.25)
+    assert len(regressions) == 3
+    assert regressions[0].startswith("get_player: throughput")
+
+
+def test_compare_honours_per_scenario_thresholds():
+    baseline = {**_results(throughput=1000, p95=2.0), "thresholds": {"get_player": 1}}
+
+    assert compare(_results(10, 3.9), baseline, threshold=0.1) == []
+
+
+def test_suite_saves_and_checks_baseline(tmp_path):
+    baseline = tmp_path / "baseline.json"
+    args = [
+        "--players",
+        "20",
+        "--requests",
+        "3",
+        "--warmup",
+        "1",
+        "--scenarios",
+        "health,get_player",
+        "--baseline",
+        str(baseline),
+    ]
+
+    assert main([*args, "--save-baseline"]) == 0
+    assert baseline.exists()
+    assert main([*args, "--threshold", "1000"]) == 0
@@ -0,0 +1,194 @@
+"""Tests pour l'import et l'export en masse des joueurs (CLI)."""
+
+import csv
+import io
+import json
+
+from sqlalchemy import select
+
+from src.bulk import read_records, validate_record
+from src.extensions import db
+from src.main import create_app
+from src.models import Player, PlayerStats
+from src.sharding import slot_for_player, slot_for_user
+
+AUTH_HEADERS = {"Authorization": "Bearer test-token"}
+
+RECORDS = [
+    {"user_id": "legacy-1", "name": "  Alice ", "level": 3, "xp": 120},
+    {"user_id": "legacy-2", "name": "Bob", "stats": {"health": 80}},
+    {"user_id": "legacy-1", "name": "Alice again"},
+    {"user_id": "legacy-3", "name": " "},
+    {"user_id": "legacy-4", "name": "Carol", "level": 1, "xp": 100},
+    {"user_id": "owner", "name": "Already there"},
+    {"user_id": "legacy-5", "name": "Dave", "attack": 42},
+]
+
+
+def _ndjson(records):
+    return "".join(json.dumps(record) + "\n" for record in records)
+
+
+def _import(app, data, *args):
+    result = app.test_cli_runner().invoke(
+        args=["players", "import", "-", *args], input=data
+    )
+    assert result.exit_code == 0, result.output + result.stderr
+    return result
+
+
+def test_validation_follows_create_player_rules():
+    assert validate_record(1, {"user_id": "u", "name": " Zed "}).name == "Zed"
+    assert validate_record(1, {"user_id": "u", "name": "Zed"}).health == 100
+    assert validate_record(1, {"name": "Zed"}).code == "user_id_missing"
+    assert validate_record(1, {"user_id": "u"}).code == "invalid_payload"
+    assert validate_record(1, {"user_id": "u" * 65, "name": "Zed"}).code == (
+        "invalid_payload"
+    )
+    assert validate_record(1, {"user_id": "u", "name": "Z", "level": 0}).code == (
+        "invalid_payload"
+    )
+    assert validate_record(1, None).code == "invalid_payload"
+
+    rows = list(read_records(io.StringIO("user_id,name,level\n7,42,2\n"), "csv"))
+    assert rows == [(2, {"user_id": "7", "name": "42", "level": 2})]
+
+
+def test_import_ndjson_reports_rejected_rows(app, client, tmp_path):
+    client.post(
+        "/players",
+        json={"name": "Owner"},
+        headers={**AUTH_HEADERS, "X-User-Id": "owner"},
+    )
+    rejects = tmp_path / "rejects.ndjson"
+
+    result = _import(
+        app,
+        _ndjson(RECORDS) + "{not json\n",
+        "--batch-size",
+        "3",
+        "--rejects",
+        str(rejects),
+    )
+
+    assert "3 joueurs importés, 5 rejetés" in result.stdout
+    assert "joueurs/s" in result.stdout
+    rejected = [json.loads(line) for line in rejects.read_text().splitlines()]
+    assert [(row["line"], row["code"]) for row in rejected] == [
+        (3, "player_already_exists"),
+        (4, "invalid_payload"),
+        (5, "invalid_payload"),
+        (6, "player_already_exists"),
+        (8, "invalid_payload"),
+    ]
+
+    with app.app_context():
+        players = {
+            player.user_id: player
+            for player in db.session.scalars(select(Player).order_by(Player.id))
+        }
+        alice = players["legacy-1"]
+        assert (alice.name, alice.name_folded, alice.level, alice.xp) == (
+            "Alice",
+            "alice",
+            3,
+            120,
+        )
+        stats = {
+            player.user_id: (player.stats.health, player.stats.attack)
+            for player in players.values()
+        }
+    assert stats["legacy-2"] == (80, 10)
+    assert stats["legacy-5"] == (100, 42)
+
+    response = client.get(f"/players/{alice.id}", headers=AUTH_HEADERS)
+    assert response.get_json()["data"]["stats"] == {
+        "health": 100,
+        "attack": 10,
+        "defense": 5,
+    }
+    top = client.get("/leaderboard?limit=1", headers=AUTH_HEADERS).get_json()
+    assert top["data"][0]["player_id"] == alice.id
+
+
+def test_export_streams_ndjson_and_csv_that_import_back(app, tmp_path):
+    _import(app, _ndjson(RECORDS[:2]), "--batch-size", "1")
+    runner = app.test_cli_runner()
+
+    exported = runner.invoke(args=["players", "export", "-", "--batch-size", "1"])
+    assert exported.exit_code == 0, exported.stderr
+    rows = [json.loads(line) for line in exported.stdout.splitlines()]
+    assert [row["user_id"] for row in rows] == ["legacy-1", "legacy-2"]
+    assert rows[1]["stats"] == {"health": 80, "attack": 10, "defense": 5}
+    assert "2 joueurs exportés" in exported.stderr
+
+    path = tmp_path / "players.csv"
+    assert runner.invoke(args=["players", "export", str(path)]).exit_code == 0
+    table = list(csv.DictReader(path.open()))
+    assert list(table[0]) == [
+        "id",
+        "user_id",
+        "name",
+        "level",
+        "xp",
+        "version",
+        "health",
+        "attack",
+        "defense",
+    ]
+    assert table[1]["health"] == "80"
+
+    partial = runner.invoke(args=["players", "export", "-", "--fields", "name"])
+    assert [json.loads(line) for line in partial.stdout.splitlines()][0] == {
+        "id": rows[0]["id"],
+        "name": "Alice",
+        "version": 1,
+    }
+
+    target = create_app(
+        {**app.config, "SQLALCHEMY_DATABASE_URI": f"sqlite:///{tmp_path / 'new.db'}"}
+    )
+    # The fixture's application context is still pushed; the CLI reuses the
+    # current one.
+    with target.app_context():
+        db.create_all()
+        result = target.test_cli_runner().invoke(args=["players", "import", str(path)])
+    assert "2 joueurs importés, 0 rejetés" in result.stdout, result.stderr
+    with target.app_context():
+        assert db.session.scalar(
+            select(PlayerStats.health).where(PlayerStats.health == 80)
+        )
+
+
+def test_import_places_players_on_their_shard(app_config, tmp_path):
+    urls = [f"sqlite:///{tmp_path / f'shard-{index}.db'}" for index in range(3)]
+    app = create_app(
+        {
+            **app_config,
+            "SQLALCHEMY_DATABASE_URI": urls[0],
+            "DATABASE_SHARD_URLS": urls[1:],
+        }
+    )
+    shards = app.extensions["shards"]
+    for engine in shards.engines:
+        db.metadata.create_all(engine)
+
+    records = [{"user_id": f"user-{index}", "name": f"P{index}"} for index in range(20)]
+    _import(app, _ndjson(records), "--batch-size", "7")
+    _import(app, _ndjson(records[:1]))
+
+    placed = 0
+    for shard, engine in enumerate(shards.engines):
+        with engine.connect() as connection:
+            for player_id, user_id in connection.execute(
+                select(Player.id, Player.user_id)
+            ):
+                assert slot_for_player(player_id) == slot_for_user(user_id)
+                assert shards.shard_for_user(user_id) == shard
+                placed += 1
+    assert placed == len(records)
+
+    client = app.test_client()
+    listed = client.get("/players?limit=100", headers=AUTH_HEADERS).get_json()
+    assert len(listed["data"]) == len(records)
+    shards.dispose()
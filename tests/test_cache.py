@@ -0,0 +1,234 @@
+"""Tests for the player read-through cache."""
+
+import threading
+import time
+
+import fakeredis
+import pytest
+
+from src.cache import LocalLRU, PlayerCache, SingleFlight, shape_version
+from src.extensions import db
+from src.main import PLAYER_PAYLOAD_SHAPE
+from src.models import Player, PlayerStats
+
+AUTH_HEADERS = {"Authorization": "Bearer test-token"}
+
+
+@pytest.fixture
+def app_config(app_config, fake_redis):
+    return {**app_config, "REDIS_CLIENT": fake_redis}
+
+
+def _payload(player_id, name="Umbra"):
+    return {"id": player_id, "name": name}
+
+
+def test_local_lru_evicts_least_recently_used():
+    lru = LocalLRU(maxsize=2, ttl=60)
+    lru.set("a", 1)
+    lru.set("b", 2)
+    assert lru.get("a") == 1
+
+    lru.set("c", 3)
+
+    assert lru.get("b") is None
+    assert lru.get("a") == 1
+    assert lru.get("c") == 3
+    assert len(lru) == 2
+
+
+def test_local_lru_expires_entries():
+    lru = LocalLRU(maxsize=2, ttl=0)
+    lru.set("a", 1)
+
+    assert lru.get("a") is None
+
+
+def test_single_flight_coalesces_concurrent_calls():
+    flight = SingleFlight()
+    calls = []
+    release = threading.Event()
+    results = []
+
+    def slow_load():
+        calls.append(1)
+        release.wait(timeout=5)
+        return "value"
+
+    threads = [
+        threading.Thread(target=lambda: results.append(flight.do("k", slow_load)))
+        for _ in range(8)
+    ]
+    for thread in threads:
+        thread.start()
+    time.sleep(0.05)
+    release.set()
+    for thread in threads:
+        thread.join(timeout=5)
+
+    assert len(calls) == 1
+    assert results == ["value"] * 8
+
+
+def test_single_flight_propagates_errors_and_resets():
+    flight = SingleFlight()
+
+    def boom():
+        raise RuntimeError("db down")
+
+    with pytest.raises(RuntimeError):
+        flight.do("k", boom)
+
+    assert flight.do("k", lambda: "ok") == "ok"
+
+
+def test_player_cache_reads_through_redis(fake_redis):
+    cache = PlayerCache(fake_redis, version="t")
+    loads = []
+
+    def loader(player_id):
+        loads.append(player_id)
+        return _payload(player_id)
+
+    assert cache.get_or_load(1, loader) == _payload(1)
+    assert fake_redis.ttl("player:t:1") > 0
+
+    cache.clear_local()
+    assert cache.get_or_load(1, loader) == _payload(1)
+    assert loads == [1]
+
+
+def test_player_cache_does_not_cache_missing_players(fake_redis):
+    cache = PlayerCache(fake_redis, version="t")
+
+    assert cache.get_or_load(1, lambda _: None) is None
+    assert cache.get_or_load(1, lambda pid: _payload(pid)) == _payload(1)
+
+
+def test_player_cache_falls_back_when_redis_is_down():
+    server = fakeredis.FakeServer()
+    server.connected = False
+    cache = PlayerCache(fakeredis.FakeRedis(server=server), version="t")
+    loads = []
+
+    def loader(player_id):
+        loads.append(player_id)
+        return _payload(player_id)
+
+    assert cache.get_or_load(1, loader) == _payload(1)
+    cache.set(1, _payload(1, "Renamed"))
+    cache.invalidate(1)
+    assert cache.get_or_load(1, loader) == _payload(1)
+    assert loads == [1, 1]
+
+
+def test_player_cache_invalidate_drops_both_tiers(fake_redis):
+    cache = PlayerCache(fake_redis, version="t")
+    cache.set(1, _payload(1))
+
+    cache.invalidate(1)
+
+    assert fake_redis.get("player:t:1") is None
+    assert cache.get_or_load(1, lambda _: None) is None
+
+
+@pytest.mark.parametrize("write", ["set", "invalidate"])
+@pytest.mark.parametrize("variant", [None, "name"])
+def test_player_cache_load_racing_a_write_is_not_stored(fake_redis, write, variant):
+    cache = PlayerCache(fake_redis, version="t")
+    writer = PlayerCache(fake_redis, version="t")
+
+    def stale_loader(player_id):
+        # The row is read, then a write commits before the fill.
+        if write == "set":
+            writer.set(player_id, {**_payload(player_id, "Fresh"), "version": 2})
+        else:
+            writer.invalidate(player_id)
+        return {**_payload(player_id, "Stale"), "version": 1}
+
+    assert cache.get_or_load(1, stale_loader, variant=variant)["name"] == "Stale"
+    cache.clear_local()
+    remote = cache.get(1, variant)
+    assert remote is None or remote["name"] == "Fresh"
+
+    found = cache.get_many_or_load([2], lambda ids: {2: stale_loader(2)}, variant)
+    assert found[2]["name"] == "Stale"
+    cache.clear_local()
+    remote = cache.get(2, variant)
+    assert remote is None or remote["name"] == "Fresh"
+
+    assert cache.get_or_load(3, lambda pid: _payload(pid), variant=variant)
+    cache.clear_local()
+    assert cache.get(3, variant) == _payload(3)
+
+
+def test_payload_shape_matches_serializer(client, app):
+    response = client.post(
+        "/players",
+        json={"name": "Shape"},
+        headers={**AUTH_HEADERS, "X-User-Id": "user-shape"},
+    )
+    data = response.get_json()["data"]
+
+    keys = [key for key in data if key != "stats"]
+    keys += [f"stats.{key}" for key in data["stats"]]
+    assert sorted(keys) == sorted(PLAYER_PAYLOAD_SHAPE)
+    assert app.extensions["player_cache"].prefix.endswith(
+        f":{shape_version(PLAYER_PAYLOAD_SHAPE)}:"
+    )
+
+
+def _create_player():
+    player = Player(user_id="user-123", name="Cached", stats=PlayerStats())
+    db.session.add(player)
+    db.session.commit()
+    return player.id
+
+
+def test_get_player_is_served_from_cache(client, app):
+    with app.app_context():
+        player_id = _create_player()
+
+    assert client.get(f"/players/{player_id}", headers=AUTH_HEADERS).status_code == 200
+
+    with app.app_context():
+        db.session.get(Player, player_id).name = "Out of band"
+        db.session.commit()
+
+    response = client.get(f"/players/{player_id}", headers=AUTH_HEADERS)
+    assert response.get_json()["data"]["name"] == "Cached"
+
+
+def test_update_player_refreshes_cache(client, app, fake_redis):
+    with app.app_context():
+        player_id = _create_player()
+
+    client.get(f"/players/{player_id}", headers=AUTH_HEADERS)
+    client.put(
+        f"/players/{player_id}",
+        json={"name": "Renamed"},
+        headers={**AUTH_HEADERS, "X-User-Id": "user-123"},
+    )
+    app.extensions["player_cache"].clear_local()
+
+    response = client.get(f"/players/{player_id}", headers=AUTH_HEADERS)
+    assert response.get_json()["data"]["name"] == "Renamed"
+
+
+def test_player_cache_get_many_combines_tiers(fake_redis):
+    cache = PlayerCache(fake_redis, version="t")
+    cache.set(1, _payload(1))
+    cache.set(2, _payload(2))
+    cache.clear_local()
+    cache.set(1, _payload(1, "Local"))
+    requested = []
+
+    def loader(player_ids):
+        requested.append(player_ids)
+        return {3: _payload(3)}
+
+    found = cache.get_many_or_load([1, 2, 3, 4], loader)
+
+    assert found == {1: _payload(1, "Local"), 2: _payload(2), 3: _payload(3)}
+    assert requested == [[3, 4]]
+    assert fake_redis.get("player:t:3") is not None
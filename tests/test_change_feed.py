@@ -0,0 +1,177 @@
+"""Tests pour le flux de changements des joueurs (Server-Sent Events)."""
+
+import json
+
+import pytest
+
+from src.changefeed import ChangeFeed, LocalChangeFeed, RedisChangeFeed, event_key
+from src.signals import PlayerChange
+
+AUTH_HEADERS = {"Authorization": "Bearer test-token"}
+
+
+@pytest.fixture
+def app_config(app_config):
+    return {
+        **app_config,
+        "CHANGE_FEED_MAX_DURATION": 0,
+        "CHANGE_FEED_HEARTBEAT": 0.01,
+    }
+
+
+def _create_player(client, user_id, name):
+    response = client.post(
+        "/players",
+        json={"name": name},
+        headers={**AUTH_HEADERS, "X-User-Id": user_id},
+    )
+    assert response.status_code == 201
+    return response.get_json()["data"]["id"]
+
+
+def _rename(client, player_id, user_id, name):
+    response = client.put(
+        f"/players/{player_id}",
+        json={"name": name},
+        headers={**AUTH_HEADERS, "X-User-Id": user_id},
+    )
+    assert response.status_code == 200
+
+
+def _change(player_id, name, version):
+    return PlayerChange(player_id, 1, 0, {"name": name, "version": version})
+
+
+def _read_events(client, query, last_event_id=None):
+    headers = dict(AUTH_HEADERS)
+    if last_event_id is not None:
+        headers["Last-Event-ID"] = last_event_id
+    response = client.get(f"/players/changes?{query}", headers=headers)
+    assert response.status_code == 200, response.get_data(as_text=True)
+    assert response.mimetype == "text/event-stream"
+
+    events = []
+    for block in response.get_data(as_text=True).split("\n\n"):
+        fields = dict(
+            line.split(": ", 1) for line in block.splitlines() if ": " in line
+        )
+        if "event" in fields:
+            events.append(
+                (fields.get("id"), fields["event"], json.loads(fields["data"]))
+            )
+    return events
+
+
+def test_feeds_must_implement_publish_and_replay():
+    class Partial(ChangeFeed):
+        def publish(self, events):
+            pass
+
+    with pytest.raises(TypeError, match="replay"):
+        Partial()
+
+
+def test_event_keys_order_local_and_redis_ids():
+    assert event_key("42") == (42, 0)
+    assert event_key("1700000000000-3") == (1700000000000, 3)
+    assert event_key("1-2") < event_key("2") < event_key("2-1")
+    assert event_key("abc") is None
+    assert event_key("1-x") is None
+
+
+def test_stream_replays_missed_events_of_subscribed_players(client):
+    alice = _create_player(client, "user-0", "Alice")
+    bob = _create_player(client, "user-1", "Bob")
+    _rename(client, alice, "user-0", "Alicia")
+
+    events = _read_events(client, f"ids={alice}", last_event_id="0")
+    assert [(event_id, kind) for event_id, kind, _ in events] == [
+        ("1", "player"),
+        ("3", "player"),
+    ]
+    assert events[1][2] == {
+        "player_id": alice,
+        "level": 1,
+        "xp": 0,
+        "name": "Alicia",
+        "version": 2,
+    }
+
+    assert [
+        data["player_id"]
+        for _, _, data in _read_events(client, f"ids={alice},{bob}", last_event_id="1")
+    ] == [bob, alice]
+    assert _read_events(client, f"ids={alice}", last_event_id="3") == []
+    assert _read_events(client, f"ids={alice}") == []
+
+
+def test_stream_resets_when_history_left_the_ring():
+    feed = LocalChangeFeed(ring_size=2)
+    feed.publish([(1, {"player_id": 1})] * 3)
+
+    def replayed(last_event_id):
+        stream = feed.stream(feed.subscribe([1]), last_event_id, 0.01, duration=0)
+        return [chunk.split("\n")[:2] for chunk in stream if chunk.startswith("id")]
+
+    assert replayed("0") == [["id: 3", "event: reset"]]
+    assert replayed("1") == [["id: 2", "event: player"], ["id: 3", "event: player"]]
+    assert replayed("9") == [["id: 3", "event: reset"]]
+
+
+def test_live_events_are_delivered_once_after_replay():
+    feed = LocalChangeFeed(ring_size=10, max_subscribers=1)
+    feed.publish([(1, {"player_id": 1})])
+
+    subscription = feed.subscribe([1])
+    stream = feed.stream(subscription, "0", heartbeat=0.01, duration=5)
+    assert next(stream) == ": connected\n\n"
+    assert next(stream).startswith("id: 1\n")
+
+    feed.publish([(2, {"player_id": 2}), (1, {"player_id": 1})])
+    assert next(stream).startswith("id: 3\nevent: player\n")
+    assert next(stream) == ": keepalive\n\n"
+
+    stream.close()
+    assert feed.fanout.subscriber_count == 0
+
+
+def test_streams_are_limited_and_validated(client, app):
+    too_many = ",".join(str(i) for i in range(1, 102))
+    for query in ("", "ids=", "ids=0", "ids=1,x", f"ids={too_many}"):
+        response = client.get(f"/players/changes?{query}", headers=AUTH_HEADERS)
+        assert response.status_code == 400, query
+        assert response.get_json()["error"]["code"] == "invalid_query"
+
+    invalid_id = client.get(
+        "/players/changes?ids=1", headers={**AUTH_HEADERS, "Last-Event-ID": "x"}
+    )
+    assert invalid_id.status_code == 400
+    assert client.get("/players/changes?ids=1").status_code == 401
+
+    feed = app.extensions["change_feed"]
+    held = [feed.subscribe([1]) for _ in range(feed.fanout.max_subscribers)]
+    full = client.get("/players/changes?ids=1", headers=AUTH_HEADERS)
+    assert full.status_code == 503
+    assert full.get_json()["error"]["code"] == "change_feed_full"
+    assert full.headers["Retry-After"]
+    for subscription in held:
+        subscription.close()
+
+
+def test_redis_feed_replays_and_fans_out(client, app, fake_redis):
+    feed = RedisChangeFeed(fake_redis, ring_size=100, poll_interval=0.05)
+    player_id = _create_player(client, "user-0", "Alice")
+    feed.apply_changes(app, [_change(player_id, "Alice", 1)])
+    first_id = fake_redis.xrange(feed.stream)[0][0].decode("ascii")
+
+    subscription = feed.subscribe([player_id])
+    feed.apply_changes(app, [_change(player_id, "Alicia", 2)])
+    received = subscription.get(timeout=2)
+    subscription.close()
+    feed.stop()
+
+    assert [event.data["name"] for event in received] == ["Alicia"]
+    missed, newest = feed.replay(event_key(first_id), [player_id])
+    assert [event.data["version"] for event in missed] == [2]
+    assert newest == received[0].event_id
+    assert feed.replay((0, 0), [player_id])[0] is None
@@ -0,0 +1,107 @@
+"""Tests pour l'attribution groupée d'expérience."""
+
+from src.experience import ExperienceResult, apply_experience_awards
+from src.extensions import db
+from src.models import Player, PlayerStats
+
+AUTH_HEADERS = {"Authorization": "Bearer test-token"}
+
+
+def _create_players(*levels):
+    players = [
+        Player(user_id=f"user-{index}", name=f"P{index}", level=level, xp=0)
+        for index, level in enumerate(levels)
+    ]
+    for player in players:
+        player.stats = PlayerStats()
+    db.session.add_all(players)
+    db.session.commit()
+    return [player.id for player in players]
+
+
+def test_apply_experience_awards_updates_in_chunks(app):
+    with app.app_context():
+        first, second, third = _create_players(1, 2, 3)
+
+        results = apply_experience_awards(
+            {first: 350, second: 50, third: 10_000}, chunk_size=2
+        )
+        db.session.commit()
+
+        assert results[first] == ExperienceResult(level=3, xp=50, levels_gained=2)
+        assert results[second] == ExperienceResult(level=2, xp=50, levels_gained=0)
+        stored = db.session.get(Player, third)
+        assert (stored.level, stored.xp) == (
+            results[third].level,
+            results[third].xp,
+        )
+
+
+def test_xp_batch_requires_auth(client):
+    response = client.post(
+        "/players/xp:batch", json={"awards": [{"player_id": 1, "amount": 10}]}
+    )
+
+    assert response.status_code == 401
+
+
+def test_xp_batch_rejects_invalid_awards(client):
+    invalid = (
+        None,
+        [],
+        [{"player_id": 1}],
+        [{"player_id": 1, "amount": -5}],
+        [{"player_id": "1", "amount": 5}],
+        [{"player_id": 1, "amount": 2**31}],
+        [{"player_id": 1, "amount": 2**30}, {"player_id": 1, "amount": 2**30}],
+    )
+    for awards in invalid:
+        response = client.post(
+            "/players/xp:batch", json={"awards": awards}, headers=AUTH_HEADERS
+        )
+
+        assert response.status_code == 400
+        assert response.get_json()["error"]["code"] == "invalid_payload"
+
+
+def test_xp_batch_enforces_max_size(client, app):
+    app.config["XP_BATCH_MAX_SIZE"] = 1
+
+    response = client.post(
+        "/players/xp:batch",
+        json={"awards": [{"player_id": 1, "amount": 1}, {"player_id": 2, "amount": 1}]},
+        headers=AUTH_HEADERS,
+    )
+
+    assert response.status_code == 400
+    assert response.get_json()["error"]["code"] == "batch_too_large"
+
+
+def test_xp_batch_awards_experience(client, app):
+    with app.app_context():
+        first, second = _create_players(1, 4)
+
+    client.get(f"/players/{first}", headers=AUTH_HEADERS)
+    response = client.post(
+        "/players/xp:batch",
+        json={
+            "awards": [
+                {"player_id": second, "amount": 100},
+                {"player_id": 999, "amount": 10},
+                {"player_id": first, "amount": 200},
+                {"player_id": first, "amount": 150},
+            ]
+        },
+        headers=AUTH_HEADERS,
+    )
+
+    assert response.status_code == 200
+    payload = response.get_json()
+    assert payload["data"] == [
+        {"player_id": second, "level": 4, "xp": 100, "levels_gained": 0},
+        {"player_id": first, "level": 3, "xp": 50, "levels_gained": 2},
+    ]
+    assert payload["meta"] == {"missing_ids": [999]}
+
+    refreshed = client.get(f"/players/{first}", headers=AUTH_HEADERS).get_json()
+    assert refreshed["data"]["level"] == 3
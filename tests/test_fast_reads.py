@@ -0,0 +1,106 @@
+"""Tests for the ORM-free read path and the fast envelope encoder."""
+
+import pytest
+from flask import jsonify
+from hypothesis import given
+from hypothesis import strategies as st
+
+from src import serialization
+from src.extensions import db
+from src.main import create_app
+from src.models import Player, PlayerStats
+
+AUTH_HEADERS = {"Authorization": "Bearer test-token"}
+
+json_values = st.recursive(
+    st.none()
+    | st.booleans()
+    | st.integers(min_value=-(2**70), max_value=2**70)
+    | st.text(),
+    lambda children: st.lists(children, max_size=4)
+    | st.dictionaries(st.text(), children, max_size=4),
+    max_leaves=12,
+)
+
+
+ENCODER_APP = create_app({"SQLALCHEMY_DATABASE_URI": "sqlite://", "REDIS_URL": None})
+
+
+@given(data=json_values, message=st.text(), meta=json_values)
+def test_success_envelope_matches_jsonify(data, message, meta):
+    with ENCODER_APP.app_context():
+        expected = jsonify(
+            {
+                "success": True,
+                "data": data,
+                "message": message,
+                "error": None,
+                "meta": meta,
+            }
+        ).get_data()
+
+    assert serialization.success_envelope(data, message, meta) == expected
+
+
+def test_is_compatible_rejects_debug_output(app):
+    assert serialization.is_compatible(app)
+
+    app.debug = True
+    assert not serialization.is_compatible(app)
+
+
+@pytest.fixture
+def app_config(app_config):
+    return {**app_config, "PLAYER_FAST_READS": True}
+
+
+def _create_players():
+    players = [
+        Player(user_id="user-1", name="Élodie «Ombre»", level=3, xp=42),
+        Player(user_id="user-2", name="No stats\x7f"),
+    ]
+    players[0].stats = PlayerStats(health=80, attack=12, defense=7)
+    db.session.add_all(players)
+    db.session.commit()
+    return [player.id for player in players]
+
+
+def _fetch_all(client, player_ids):
+    responses = [
+        client.get(f"/players/{player_id}", headers=AUTH_HEADERS)
+        for player_id in player_ids
+    ]
+    responses.append(
+        client.post(
+            "/players:batchGet",
+            json={"ids": [*player_ids, 999]},
+            headers=AUTH_HEADERS,
+        )
+    )
+    return [(response.status_code, response.get_data()) for response in responses]
+
+
+def test_fast_reads_are_byte_compatible(client, app):
+    with app.app_context():
+        player_ids = _create_players()
+
+    fast = _fetch_all(client, player_ids)
+    app.config["PLAYER_FAST_READS"] = False
+    app.extensions["player_cache"].clear_local()
+    slow = _fetch_all(client, player_ids)
+
+    assert fast == slow
+    assert fast[0][0] == 200
+
+
+def test_fast_read_does_not_hydrate_orm_objects(client, app):
+    with app.app_context():
+        (player_id, _) = _create_players()
+
+    with app.test_request_context(headers=AUTH_HEADERS):
+        response, status = app.view_functions["get_player"](player_id)
+        assert status == 200
+        assert response.get_json()["data"]["stats"]["health"] == 80
+        assert not any(
+            isinstance(obj, Player) for obj in db.session.identity_map.values()
+        )
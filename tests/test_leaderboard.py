@@ -0,0 +1,252 @@
+"""Tests pour le classement des joueurs."""
+
+import fakeredis
+import pytest
+
+from src.extensions import db
+from src.leaderboard import (
+    Leaderboard,
+    LeaderboardEntry,
+    LeaderboardUnavailable,
+    LocalLeaderboardBackend,
+    RedisLeaderboardBackend,
+    decode_score,
+    encode_score,
+)
+from src.main import create_app
+from src.models import Player, PlayerStats
+from src.signals import PlayerChange
+
+AUTH_HEADERS = {"Authorization": "Bearer test-token"}
+
+
+@pytest.fixture(params=["local", "redis"])
+def backend(request):
+    if request.param == "local":
+        return LocalLeaderboardBackend()
+    return RedisLeaderboardBackend(fakeredis.FakeRedis())
+
+
+def _changes(*rows):
+    return [PlayerChange(player_id, level, xp) for player_id, level, xp in rows]
+
+
+def test_score_round_trip():
+    assert decode_score(float(encode_score(1_000_000, 99_999_999))) == (
+        1_000_000,
+        99_999_999,
+    )
+    assert encode_score(3, 0) > encode_score(2, 299)
+
+
+def test_backends_rank_by_level_then_xp(backend):
+    leaderboard = Leaderboard(backend)
+    leaderboard.apply_changes(
+        None, _changes((1, 2, 10), (2, 5, 0), (3, 2, 150), (4, 1, 0))
+    )
+
+    assert leaderboard.top(3) == [
+        LeaderboardEntry(1, 2, 5, 0),
+        LeaderboardEntry(2, 3, 2, 150),
+        LeaderboardEntry(3, 1, 2, 10),
+    ]
+    assert leaderboard.top(10, offset=3) == [LeaderboardEntry(4, 4, 1, 0)]
+    assert leaderboard.rank(1) == LeaderboardEntry(3, 1, 2, 10)
+    assert leaderboard.rank(99) is None
+    assert leaderboard.size() == 4
+
+
+def test_backends_update_existing_scores(backend):
+    leaderboard = Leaderboard(backend)
+    leaderboard.apply_changes(None, _changes((1, 1, 0), (2, 3, 0)))
+
+    leaderboard.apply_changes(None, _changes((1, 4, 0)))
+    leaderboard.remove(2)
+
+    assert leaderboard.top(10) == [LeaderboardEntry(1, 1, 4, 0)]
+
+
+def test_backends_window_around_player(backend):
+    leaderboard = Leaderboard(backend)
+    leaderboard.apply_changes(
+        None, _changes(*[(player_id, player_id, 0) for player_id in range(1, 11)])
+    )
+
+    window = leaderboard.around(9, radius=2)
+
+    assert [entry.player_id for entry in window] == [10, 9, 8, 7]
+    assert [entry.rank for entry in window] == [1, 2, 3, 4]
+    assert leaderboard.around(42, radius=2) is None
+
+
+def test_backends_break_ties_by_id(backend):
+    leaderboard = Leaderboard(backend)
+    leaderboard.apply_changes(None, _changes((10, 1, 0), (9, 1, 0), (100, 1, 0)))
+
+    assert [entry.player_id for entry in leaderboard.top(3)] == [9, 10, 100]
+    assert leaderboard.rank(100).rank == 3
+
+
+def test_backends_keep_writes_made_during_rebuild(backend):
+    leaderboard = Leaderboard(backend)
+    assert not backend.is_ready()
+
+    def batches():
+        yield {1: encode_score(1, 0), 2: encode_score(1, 0), 3: encode_score(2, 0)}
+        # Committed while the rebuild streams the table.
+        leaderboard.apply_changes(None, _changes((1, 5, 0), (4, 3, 0)))
+        leaderboard.apply_removals(None, [3])
+        assert backend.replace(iter([])) is None
+        yield {5: encode_score(1, 0)}
+
+    assert backend.replace(batches()) == 4
+    assert backend.is_ready()
+    assert [entry.player_id for entry in leaderboard.top(10)] == [1, 4, 2, 5]
+
+
+def test_redis_errors_surface_as_unavailable():
+    server = fakeredis.FakeServer()
+    server.connected = False
+    leaderboard = Leaderboard(
+        RedisLeaderboardBackend(fakeredis.FakeRedis(server=server))
+    )
+
+    leaderboard.apply_changes(None, _changes((1, 1, 0)))
+    with pytest.raises(LeaderboardUnavailable):
+        leaderboard.top(10)
+
+
+def _create_players(*levels):
+    players = [
+        Player(user_id=f"user-{index}", name=f"P{index}", level=level, xp=0)
+        for index, level in enumerate(levels)
+    ]
+    for player in players:
+        player.stats = PlayerStats()
+    db.session.add_all(players)
+    db.session.commit()
+    return [player.id for player in players]
+
+
+def _wait_for_rebuild(app):
+    rebuilding = app.extensions["leaderboard"]._rebuilding
+    assert rebuilding.acquire(timeout=5)
+    rebuilding.release()
+
+
+def test_leaderboard_endpoint_builds_from_database(client, app):
+    with app.app_context():
+        low, high, mid = _create_players(1, 9, 4)
+        app.extensions["leaderboard"].rebuild()
+
+    response = client.get("/leaderboard?limit=2", headers=AUTH_HEADERS)
+
+    assert response.status_code == 200
+    payload = response.get_json()
+    assert [entry["player_id"] for entry in payload["data"]] == [high, mid]
+    assert payload["data"][0] == {"rank": 1, "player_id": high, "level": 9, "xp": 0}
+    assert payload["meta"] == {"total": 3}
+
+
+def test_leaderboard_tracks_player_writes(client, app):
+    with app.app_context():
+        (existing,) = _create_players(2)
+        app.extensions["leaderboard"].rebuild()
+
+    created = client.post(
+        "/players",
+        json={"name": "Newcomer"},
+        headers={**AUTH_HEADERS, "X-User-Id": "user-new"},
+    ).get_json()["data"]["id"]
+    client.post(
+        "/players/xp:batch",
+        json={"awards": [{"player_id": created, "amount": 1_000}]},
+        headers=AUTH_HEADERS,
+    )
+
+    payload = client.get(
+        f"/leaderboard/players/{existing}?radius=1", headers=AUTH_HEADERS
+    ).get_json()
+    assert payload["data"]["rank"] == 2
+    assert [entry["player_id"] for entry in payload["data"]["around"]] == [
+        created,
+        existing,
+    ]
+
+
+@pytest.mark.parametrize("with_redis", [False, True])
+def test_missing_leaderboard_is_rebuilt_in_background(
+    app_config, fake_redis, tmp_path, with_redis
+):
+    app = create_app(
+        {
+            **app_config,
+            "SQLALCHEMY_DATABASE_URI": f"sqlite:///{tmp_path / 'players.db'}",
+            "REDIS_CLIENT": fake_redis if with_redis else None,
+            "LEADERBOARD_REBUILD_BACKGROUND": True,
+        }
+    )
+    with app.app_context():
+        db.create_all()
+        low, high = _create_players(1, 4)
+    client = app.test_client()
+
+    # With Redis, a flush later drops the ready marker and starts over.
+    for attempt in range(2 if with_redis else 1):
+        if attempt:
+            fake_redis.flushall()
+        rebuilding = client.get(f"/leaderboard/players/{low}", headers=AUTH_HEADERS)
+        assert rebuilding.status_code == 503
+        assert rebuilding.get_json()["error"]["code"] == "leaderboard_rebuilding"
+        assert rebuilding.headers["Retry-After"] == "5"
+        _wait_for_rebuild(app)
+
+        rank = client.get(f"/leaderboard/players/{low}", headers=AUTH_HEADERS)
+        assert rank.status_code == 200
+        assert rank.get_json()["data"]["rank"] == 2
+
+    assert client.get("/leaderboard", headers=AUTH_HEADERS).get_json()["meta"] == {
+        "total": 2
+    }
+
+
+def test_missing_leaderboard_waits_for_the_command(client, app):
+    with app.app_context():
+        app.extensions["leaderboard"].backend._ready = False
+
+    response = client.get("/leaderboard", headers=AUTH_HEADERS)
+
+    assert response.status_code == 503
+    assert response.get_json()["error"]["code"] == "leaderboard_rebuilding"
+    assert app.extensions["leaderboard"]._rebuilding.acquire(blocking=False)
+
+
+def test_player_rank_not_found(client):
+    response = client.get("/leaderboard/players/999", headers=AUTH_HEADERS)
+
+    assert response.status_code == 404
+    assert response.get_json()["error"]["code"] == "player_not_found"
+
+
+def test_leaderboard_requires_auth(client):
+    assert client.get("/leaderboard").status_code == 401
+    assert client.get("/leaderboard/players/1").status_code == 401
+
+
+def test_leaderboard_rejects_invalid_query(client):
+    response = client.get("/leaderboard?limit=0", headers=AUTH_HEADERS)
+
+    assert response.status_code == 400
+    assert response.get_json()["error"]["code"] == "invalid_query"
+
+
+def test_leaderboard_rebuild_command(app):
+    with app.app_context():
+        _create_players(3, 1)
+
+    result = app.test_cli_runner().invoke(args=["leaderboard", "rebuild"])
+
+    assert result.exit_code == 0
+    assert "2 joueurs" in result.output
+    with app.app_context():
+        assert app.extensions["leaderboard"].size() == 2
@@ -0,0 +1,69 @@
+"""Tests for the closed-form experience curve."""
+
+import numpy as np
+import pytest
+from hypothesis import given
+from hypothesis import strategies as st
+
+from src.leveling import apply_experience, apply_experience_batch
+from src.models import Player
+
+levels = st.integers(min_value=-50, max_value=5_000)
+xps = st.integers(min_value=0, max_value=1_000_000)
+amounts = st.integers(min_value=0, max_value=10_000_000)
+
+
+def _loop_reference(level, xp, amount):
+    """Level up one iteration at a time, as ``add_experience`` used to."""
+
+    xp += amount
+    levels_gained = 0
+    while xp >= max(level, 1) * 100:
+        xp -= max(level, 1) * 100
+        level += 1
+        levels_gained += 1
+    return level, xp, levels_gained
+
+
+@given(levels, xps, amounts)
+def test_apply_experience_matches_loop(level, xp, amount):
+    assert apply_experience(level, xp, amount) == _loop_reference(level, xp, amount)
+
+
+@given(st.lists(st.tuples(levels, xps, amounts), min_size=1, max_size=50))
+def test_apply_experience_batch_matches_loop(rows):
+    level_arr, xp_arr, amount_arr = (np.array(column) for column in zip(*rows))
+
+    new_levels, new_xps, gained = apply_experience_batch(level_arr, xp_arr, amount_arr)
+
+    expected = [_loop_reference(*row) for row in rows]
+    assert list(zip(new_levels.tolist(), new_xps.tolist(), gained.tolist())) == (
+        expected
+    )
+
+
+@given(levels, xps, amounts)
+def test_player_add_experience_matches_loop(level, xp, amount):
+    player = Player(level=level, xp=xp)
+
+    levels_gained = player.add_experience(amount)
+
+    assert (player.level, player.xp, levels_gained) == _loop_reference(
+        level, xp, amount
+    )
+
+
+def test_apply_experience_handles_huge_grants():
+    level, xp, gained = apply_experience(1, 0, 10**15)
+
+    assert gained == level - 1
+    assert xp == 10**15 - 100 * gained * (gained + 1) // 2
+    assert 0 <= xp < level * 100
+
+
+def test_apply_experience_rejects_negative_amount():
+    with pytest.raises(ValueError):
+        apply_experience(1, 0, -1)
+
+    with pytest.raises(ValueError):
+        apply_experience_batch(np.array([1]), np.array([0]), np.array([-1]))
@@ -0,0 +1,142 @@
+"""Tests for request metrics and database instrumentation."""
+
+import logging
+
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import OperationalError
+
+from src.extensions import db
+from src.metrics import (
+    Histogram,
+    Metrics,
+    RequestStats,
+    TimedQueuePool,
+    _request_stats,
+)
+from src.models import Player, PlayerStats
+
+AUTH_HEADERS = {"Authorization": "Bearer test-token"}
+
+
+def _create_player():
+    player = Player(user_id="user-123", name="Measured", stats=PlayerStats())
+    db.session.add(player)
+    db.session.commit()
+    return player.id
+
+
+def _sample(body, line_prefix):
+    for line in body.splitlines():
+        if line.startswith(line_prefix):
+            return float(line.rsplit(" ", 1)[1])
+    return None
+
+
+def test_histogram_renders_cumulative_buckets():
+    histogram = Histogram("demo_seconds", "Demo.", ("route",), buckets=(0.1, 1))
+    histogram.observe(0.05, ("/a",))
+    histogram.observe(0.5, ("/a",))
+    histogram.observe(5, ("/a",))
+
+    assert histogram.render() == [
+        "# HELP demo_seconds Demo.",
+        "# TYPE demo_seconds histogram",
+        'demo_seconds_bucket{route="/a",le="0.1"} 1',
+        'demo_seconds_bucket{route="/a",le="1"} 2',
+        'demo_seconds_bucket{route="/a",le="+Inf"} 3',
+        'demo_seconds_sum{route="/a"} 5.55',
+        'demo_seconds_count{route="/a"} 3',
+    ]
+
+
+def test_metrics_endpoint_reports_requests(client, app):
+    with app.app_context():
+        player_id = _create_player()
+
+    client.get(f"/players/{player_id}", headers=AUTH_HEADERS)
+    client.get("/players/999", headers=AUTH_HEADERS)
+    client.get("/health")
+
+    response = client.get("/metrics")
+
+    assert response.status_code == 200
+    assert response.mimetype == "text/plain"
+    body = response.get_data(as_text=True)
+    route = 'method="GET",route="/players/<int:player_id>"'
+    assert _sample(body, f'http_requests_total{{{route},status="200"}}') == 1
+    assert _sample(body, f'http_requests_total{{{route},status="404"}}') == 1
+    assert _sample(body, f"http_request_duration_seconds_count{{{route}}}") == 2
+    assert _sample(body, "http_requests_in_flight ") == 1
+
+
+def test_sql_statements_are_counted_per_request(client, app):
+    with app.app_context():
+        player_id = _create_player()
+    metrics = app.extensions["metrics"]
+    labels = ("GET", "/players/<int:player_id>")
+
+    client.get(f"/players/{player_id}", headers=AUTH_HEADERS)
+    client.get(f"/players/{player_id}", headers=AUTH_HEADERS)
+
+    assert metrics.sql_statements.count(labels) == 2
+    assert metrics.sql_statements.total(labels) == 1
+    assert metrics.db_time.total(labels) > 0
+
+
+def test_failed_statements_leave_no_state_on_the_connection():
+    engine = create_engine("sqlite://")
+    Metrics().instrument_engine(engine)
+    stats = RequestStats()
+    token = _request_stats.set(stats)
+    try:
+        with engine.connect() as connection:
+            info = dict(connection.info)
+            for _ in range(3):
+                with pytest.raises(OperationalError):
+                    connection.execute(text("SELECT * FROM missing"))
+            connection.execute(text("SELECT 1"))
+            assert connection.info == info
+    finally:
+        _request_stats.reset(token)
+        engine.dispose()
+
+    assert stats.sql_count == 1
+
+
+@pytest.fixture
+def app_config(app_config):
+    return {**app_config, "SLOW_QUERY_THRESHOLD_MS": 0.0001}
+
+
+def test_slow_queries_are_logged(client, app, caplog):
+    with caplog.at_level(logging.WARNING, logger="src.metrics"):
+        client.get("/players/1", headers=AUTH_HEADERS)
+
+    assert any("Slow query" in record.message for record in caplog.records)
+    assert app.extensions["metrics"].slow_queries.value() >= 1
+
+
+def test_timed_pool_charges_wait_to_current_request(tmp_path):
+    engine = create_engine(
+        f"sqlite:///{tmp_path / 'pool.db'}", poolclass=TimedQueuePool
+    )
+    stats = RequestStats()
+    token = _request_stats.set(stats)
+    try:
+        with engine.connect() as connection:
+            connection.execute(text("SELECT 1"))
+    finally:
+        _request_stats.reset(token)
+        engine.dispose()
+
+    assert stats.pool_wait > 0
+
+
+def test_metrics_can_be_disabled(app_config):
+    from src.main import create_app
+
+    app = create_app({**app_config, "METRICS_ENABLED": False})
+
+    assert "metrics" not in app.extensions
+    assert app.test_client().get("/metrics").status_code == 404
@@ -0,0 +1,69 @@
+"""Tests for the Alembic migration history."""
+
+from pathlib import Path
+
+from alembic import command
+from alembic.autogenerate import compare_metadata
+from alembic.config import Config
+from alembic.migration import MigrationContext
+from sqlalchemy import create_engine, inspect, text
+
+from src.extensions import db
+
+ROOT = Path(__file__).resolve().parent.parent
+
+
+def _alembic_config(url):
+    config = Config(str(ROOT / "alembic.ini"))
+    config.set_main_option("script_location", str(ROOT / "migrations"))
+    config.set_main_option("sqlalchemy.url", url)
+    config.attributes["configure_logger"] = False
+    return config
+
+
+def test_migrations_match_models(tmp_path):
+    url = f"sqlite:///{tmp_path / 'migrated.db'}"
+
+    command.upgrade(_alembic_config(url), "head")
+
+    engine = create_engine(url)
+    with engine.connect() as connection:
+        context = MigrationContext.configure(connection)
+        assert compare_metadata(context, db.metadata) == []
+
+    indexes = {index["name"] for index in inspect(engine).get_indexes("players")}
+    assert "ix_players_leaderboard" in indexes
+    engine.dispose()
+
+
+def test_migrations_downgrade_to_base(tmp_path):
+    url = f"sqlite:///{tmp_path / 'migrated.db'}"
+    config = _alembic_config(url)
+
+    command.upgrade(config, "head")
+    command.downgrade(config, "base")
+
+    engine = create_engine(url)
+    assert set(inspect(engine).get_table_names()) == {"alembic_version"}
+    engine.dispose()
+
+
+def test_name_folded_is_backfilled(tmp_path):
+    url = f"sqlite:///{tmp_path / 'migrated.db'}"
+    config = _alembic_config(url)
+    command.upgrade(config, "0004_xp_event_receipts")
+
+    engine = create_engine(url)
+    with engine.begin() as connection:
+        connection.execute(
+            text(
+                "INSERT INTO players (user_id, name, level, xp) "
+                "VALUES ('u', 'ÉLAN', 1, 0)"
+            )
+        )
+
+    command.upgrade(config, "head")
+
+    with engine.connect() as connection:
+        assert connection.scalar(text("SELECT name_folded FROM players")) == "élan"
+    engine.dispose()
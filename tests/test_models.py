@@ -1,8 +1,10 @@
 """Tests for the player and player stats models."""
+import sys
+
 import pytest
 
 from src.extensions import db
-from src.models import Player, PlayerStats
+from src.models import FOLDED_NAME_LENGTH, NAME_LENGTH, Player, PlayerStats, fold_name
 
 
 def test_player_stats_relationship(app):
@@ -47,3 +49,11 @@ def test_player_add_experience_rejects_negative_amount(app):
 
         with pytest.raises(ValueError):
             player.add_experience(-5)
+
+
+def test_folded_name_column_fits_any_folded_name():
+    """The longest name still fits ``name_folded`` once case-folded."""
+
+    expansion = max(len(fold_name(chr(code))) for code in range(sys.maxunicode + 1))
+    assert expansion * NAME_LENGTH <= FOLDED_NAME_LENGTH
+    assert Player.__table__.c.name_folded.type.length == FOLDED_NAME_LENGTH
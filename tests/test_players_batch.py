@@ -0,0 +1,90 @@
+"""Tests pour la lecture groupée de joueurs."""
+
+from sqlalchemy import event
+
+from src.extensions import db
+from src.models import Player, PlayerStats
+
+AUTH_HEADERS = {"Authorization": "Bearer test-token"}
+
+
+def _create_players(count):
+    players = [
+        Player(user_id=f"user-{index}", name=f"Player {index}", stats=PlayerStats())
+        for index in range(count)
+    ]
+    db.session.add_all(players)
+    db.session.commit()
+    return [player.id for player in players]
+
+
+def test_batch_get_requires_auth(client):
+    response = client.post("/players:batchGet", json={"ids": [1]})
+
+    assert response.status_code == 401
+    assert response.get_json()["error"]["code"] == "auth_invalid"
+
+
+def test_batch_get_rejects_invalid_ids(client):
+    for ids in (None, [], ["1"], [0], [True], "1,2"):
+        response = client.post(
+            "/players:batchGet", json={"ids": ids}, headers=AUTH_HEADERS
+        )
+
+        assert response.status_code == 400
+        assert response.get_json()["error"]["code"] == "invalid_payload"
+
+
+def test_batch_get_enforces_max_size(client, app):
+    app.config["PLAYER_BATCH_MAX_SIZE"] = 2
+
+    response = client.post(
+        "/players:batchGet", json={"ids": [1, 2, 3]}, headers=AUTH_HEADERS
+    )
+
+    assert response.status_code == 400
+    assert response.get_json()["error"]["code"] == "batch_too_large"
+
+
+def test_batch_get_returns_players_in_request_order(client, app):
+    with app.app_context():
+        first, second, third = _create_players(3)
+
+    response = client.post(
+        "/players:batchGet",
+        json={"ids": [third, 999, first, third, second]},
+        headers=AUTH_HEADERS,
+    )
+
+    assert response.status_code == 200
+    payload = response.get_json()
+    assert payload["success"] is True
+    assert [player["id"] for player in payload["data"]] == [third, first, second]
+    assert payload["data"][0]["stats"]["health"] == 100
+    assert payload["meta"] == {"missing_ids": [999]}
+
+
+def test_batch_get_loads_all_players_in_one_query(client, app):
+    with app.app_context():
+        player_ids = _create_players(5)
+        engine = db.engine
+
+    statements = []
+
+    def _count(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(engine, "before_cursor_execute", _count)
+    try:
+        response = client.post(
+            "/players:batchGet", json={"ids": player_ids}, headers=AUTH_HEADERS
+        )
+        cached = client.post(
+            "/players:batchGet", json={"ids": player_ids}, headers=AUTH_HEADERS
+        )
+    finally:
+        event.remove(engine, "before_cursor_execute", _count)
+
+    assert len(response.get_json()["data"]) == 5
+    assert cached.get_json()["data"] == response.get_json()["data"]
+    assert len(statements) == 1
@@ -0,0 +1,209 @@
+"""Tests pour la création de joueurs par upsert et les clés d'idempotence."""
+
+import hashlib
+
+import pytest
+from sqlalchemy import event, func, select
+from sqlalchemy.dialects import postgresql
+
+from src.extensions import db
+from src.idempotency import IdempotencyStore
+from src.main import create_app
+from src.models import Player, PlayerStats
+from src.registration import insert_player, postgresql_insert_statement
+
+AUTH_HEADERS = {"Authorization": "Bearer test-token"}
+
+
+def _headers(user_id="user-1", key=None):
+    headers = {**AUTH_HEADERS, "X-User-Id": user_id}
+    if key is not None:
+        headers["Idempotency-Key"] = key
+    return headers
+
+
+def _record_statements(app, statements):
+    with app.app_context():
+        engine = db.engine
+
+    def _record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(engine, "before_cursor_execute", _record)
+    return lambda: event.remove(engine, "before_cursor_execute", _record)
+
+
+def _player_count(app):
+    with app.app_context():
+        return db.session.scalar(select(func.count()).select_from(Player))
+
+
+def test_create_player_inserts_player_and_stats_without_existence_check(client, app):
+    statements = []
+    stop = _record_statements(app, statements)
+    try:
+        response = client.post("/players", json={"name": " Hero "}, headers=_headers())
+    finally:
+        stop()
+
+    assert response.status_code == 201
+    assert response.headers["ETag"] == '"1"'
+    data = response.get_json()["data"]
+    assert data["name"] == "Hero"
+    assert data["level"] == 1 and data["xp"] == 0 and data["version"] == 1
+    assert data["stats"] == {"health": 100, "attack": 10, "defense": 5}
+    assert [s.split()[0] for s in statements] == ["INSERT", "INSERT"]
+    assert "ON CONFLICT" in statements[0]
+    with app.app_context():
+        stats = db.session.scalars(select(PlayerStats)).one()
+        assert stats.player_id == data["id"]
+
+
+def test_create_player_conflict_leaves_single_row(client, app):
+    first = client.post("/players", json={"name": "One"}, headers=_headers())
+    second = client.post("/players", json={"name": "Two"}, headers=_headers())
+
+    assert first.status_code == 201
+    assert second.status_code == 409
+    assert second.get_json()["error"]["code"] == "player_already_exists"
+    assert _player_count(app) == 1
+    with app.app_context():
+        assert db.session.scalar(select(func.count()).select_from(PlayerStats)) == 1
+
+
+def test_insert_player_returns_none_on_conflict(app):
+    with app.app_context():
+        created = insert_player(db.session, "user-9", "First")
+        db.session.commit()
+        duplicate = insert_player(db.session, "user-9", "Second")
+        db.session.commit()
+
+        assert created.to_payload()["stats"]["health"] == 100
+        assert duplicate is None
+
+
+def test_postgresql_statement_inserts_stats_in_same_statement():
+    sql = str(
+        postgresql_insert_statement("user-1", "Hero").compile(
+            dialect=postgresql.dialect()
+        )
+    )
+
+    assert sql.startswith("WITH new_player AS")
+    assert "ON CONFLICT (user_id) DO NOTHING" in sql
+    assert "INSERT INTO player_stats" in sql
+    assert sql.count("INSERT") == 2
+
+
+def test_idempotent_retry_replays_stored_response(client, app):
+    first = client.post(
+        "/players", json={"name": "Hero"}, headers=_headers(key="signup-1")
+    )
+    statements = []
+    stop = _record_statements(app, statements)
+    try:
+        retry = client.post(
+            "/players", json={"name": "Hero"}, headers=_headers(key="signup-1")
+        )
+    finally:
+        stop()
+
+    assert first.status_code == retry.status_code == 201
+    assert retry.get_data() == first.get_data()
+    assert retry.headers["ETag"] == first.headers["ETag"]
+    assert retry.headers["Idempotent-Replayed"] == "true"
+    assert "Idempotent-Replayed" not in first.headers
+    assert statements == []
+    assert _player_count(app) == 1
+
+
+def test_idempotent_conflict_is_replayed_too(client):
+    client.post("/players", json={"name": "Hero"}, headers=_headers())
+
+    first = client.post(
+        "/players", json={"name": "Again"}, headers=_headers(key="signup-2")
+    )
+    retry = client.post(
+        "/players", json={"name": "Again"}, headers=_headers(key="signup-2")
+    )
+
+    assert first.status_code == retry.status_code == 409
+    assert retry.get_data() == first.get_data()
+
+
+def test_idempotency_key_reused_with_other_body(client):
+    client.post("/players", json={"name": "Hero"}, headers=_headers(key="k"))
+
+    response = client.post(
+        "/players", json={"name": "Other"}, headers=_headers(key="k")
+    )
+
+    assert response.status_code == 422
+    assert response.get_json()["error"]["code"] == "idempotency_key_reused"
+
+
+def test_idempotency_keys_are_scoped_per_user(client, app):
+    first = client.post("/players", json={"name": "A"}, headers=_headers("a", "k"))
+    second = client.post("/players", json={"name": "A"}, headers=_headers("b", "k"))
+
+    assert first.status_code == second.status_code == 201
+    assert first.get_json()["data"]["id"] != second.get_json()["data"]["id"]
+    assert _player_count(app) == 2
+
+
+def test_idempotency_key_in_use(client, app):
+    store = app.extensions["idempotency"]
+    body = b'{"name": "Hero"}'
+    key = store.key("players:create:user-1", "busy")
+    assert store.begin(key, hashlib.sha256(body).hexdigest()) is None
+
+    response = client.post(
+        "/players",
+        data=body,
+        content_type="application/json",
+        headers=_headers(key="busy"),
+    )
+
+    assert response.status_code == 409
+    assert response.get_json()["error"]["code"] == "idempotency_key_in_use"
+    assert _player_count(app) == 0
+
+
+def test_idempotency_key_too_long(client):
+    response = client.post(
+        "/players", json={"name": "Hero"}, headers=_headers(key="k" * 256)
+    )
+
+    assert response.status_code == 400
+    assert response.get_json()["error"]["code"] == "invalid_idempotency_key"
+
+
+def test_idempotency_keys_are_shared_through_redis(app_config, fake_redis):
+    config = {**app_config, "REDIS_CLIENT": fake_redis}
+    first_app = create_app(config)
+    second_app = create_app(config)
+    with first_app.app_context():
+        db.create_all()
+
+    first = first_app.test_client().post(
+        "/players", json={"name": "Hero"}, headers=_headers(key="shared")
+    )
+    retry = second_app.test_client().post(
+        "/players", json={"name": "Hero"}, headers=_headers(key="shared")
+    )
+
+    assert first.status_code == 201
+    assert retry.status_code == 201
+    assert retry.headers["Idempotent-Replayed"] == "true"
+    assert retry.get_data() == first.get_data()
+
+
+@pytest.mark.parametrize("redis_client", [None, "fake"])
+def test_store_release_allows_retry(redis_client, fake_redis):
+    store = IdempotencyStore(fake_redis if redis_client else None)
+    key = store.key("scope", "k")
+
+    assert store.begin(key, "f") is None
+    store.release(key)
+
+    assert store.begin(key, "f") is None
@@ -0,0 +1,187 @@
+"""Tests pour les ETags et la concurrence optimiste sur les joueurs."""
+
+from sqlalchemy import event
+
+from src.extensions import db
+from src.models import Player, PlayerStats
+
+AUTH_HEADERS = {"Authorization": "Bearer test-token"}
+OWNER_HEADERS = {**AUTH_HEADERS, "X-User-Id": "user-123"}
+
+
+def _create_player():
+    player = Player(user_id="user-123", name="Versioned", stats=PlayerStats())
+    db.session.add(player)
+    db.session.commit()
+    return player.id
+
+
+def _count_statements(engine, statements):
+    def _record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(engine, "before_cursor_execute", _record)
+    return lambda: event.remove(engine, "before_cursor_execute", _record)
+
+
+def test_get_player_exposes_version_as_etag(client, app):
+    with app.app_context():
+        player_id = _create_player()
+
+    response = client.get(f"/players/{player_id}", headers=AUTH_HEADERS)
+
+    assert response.status_code == 200
+    assert response.headers["ETag"] == '"1"'
+    assert response.get_json()["data"]["version"] == 1
+
+
+def test_get_player_if_none_match_returns_304_from_cache(client, app):
+    with app.app_context():
+        player_id = _create_player()
+        engine = db.engine
+    client.get(f"/players/{player_id}", headers=AUTH_HEADERS)
+
+    statements = []
+    stop = _count_statements(engine, statements)
+    try:
+        response = client.get(
+            f"/players/{player_id}",
+            headers={**AUTH_HEADERS, "If-None-Match": '"1"'},
+        )
+    finally:
+        stop()
+
+    assert response.status_code == 304
+    assert response.data == b""
+    assert response.headers["ETag"] == '"1"'
+    assert statements == []
+
+
+def test_get_player_if_none_match_on_cache_miss_reads_version_only(client, app):
+    with app.app_context():
+        player_id = _create_player()
+        engine = db.engine
+
+    statements = []
+    stop = _count_statements(engine, statements)
+    try:
+        response = client.get(
+            f"/players/{player_id}",
+            headers={**AUTH_HEADERS, "If-None-Match": '"1"'},
+        )
+    finally:
+        stop()
+
+    assert response.status_code == 304
+    assert len(statements) == 1
+    assert "player_stats" not in statements[0]
+
+
+def test_get_player_if_none_match_stale_returns_body(client, app):
+    with app.app_context():
+        player_id = _create_player()
+
+    response = client.get(
+        f"/players/{player_id}",
+        headers={**AUTH_HEADERS, "If-None-Match": '"0"'},
+    )
+
+    assert response.status_code == 200
+    assert response.get_json()["data"]["id"] == player_id
+
+
+def test_update_player_bumps_version(client, app):
+    with app.app_context():
+        player_id = _create_player()
+
+    response = client.put(
+        f"/players/{player_id}", json={"name": "Renamed"}, headers=OWNER_HEADERS
+    )
+
+    assert response.status_code == 200
+    assert response.headers["ETag"] == '"2"'
+    assert response.get_json()["data"]["version"] == 2
+
+
+def test_update_player_if_match_success(client, app):
+    with app.app_context():
+        player_id = _create_player()
+
+    response = client.put(
+        f"/players/{player_id}",
+        json={"name": "Renamed"},
+        headers={**OWNER_HEADERS, "If-Match": '"1"'},
+    )
+
+    assert response.status_code == 200
+    assert response.get_json()["data"]["name"] == "Renamed"
+
+
+def test_update_player_if_match_mismatch_returns_412(client, app):
+    with app.app_context():
+        player_id = _create_player()
+    client.put(f"/players/{player_id}", json={"name": "First"}, headers=OWNER_HEADERS)
+
+    response = client.put(
+        f"/players/{player_id}",
+        json={"name": "Lost update"},
+        headers={**OWNER_HEADERS, "If-Match": '"1"'},
+    )
+
+    assert response.status_code == 412
+    assert response.get_json()["error"]["code"] == "precondition_failed"
+    assert response.headers["ETag"] == '"2"'
+    with app.app_context():
+        assert db.session.get(Player, player_id).name == "First"
+
+
+def test_update_player_if_match_checks_with_single_update(client, app):
+    with app.app_context():
+        player_id = _create_player()
+        engine = db.engine
+
+    statements = []
+    stop = _count_statements(engine, statements)
+    try:
+        client.put(
+            f"/players/{player_id}",
+            json={"name": "Renamed"},
+            headers={**OWNER_HEADERS, "If-Match": '"1"'},
+        )
+    finally:
+        stop()
+
+    assert statements[0].startswith("UPDATE players")
+    assert "version IN" in statements[0]
+
+
+def test_update_player_returns_the_updated_row(client, app):
+    with app.app_context():
+        player_id = _create_player()
+        engine = db.engine
+
+    statements = []
+    stop = _count_statements(engine, statements)
+    try:
+        response = client.put(
+            f"/players/{player_id}", json={"name": "Renamed"}, headers=OWNER_HEADERS
+        )
+    finally:
+        stop()
+
+    data = response.get_json()["data"]
+    assert (data["name"], data["version"]) == ("Renamed", 2)
+    assert data["stats"] is not None
+    assert "RETURNING" in statements[0]
+    assert not any("FROM players" in statement for statement in statements)
+
+
+def test_orm_writes_bump_version(app):
+    with app.app_context():
+        player_id = _create_player()
+        player = db.session.get(Player, player_id)
+
+        player.add_experience(150)
+        db.session.commit()
+
+        assert player.version == 2
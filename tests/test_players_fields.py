@@ -0,0 +1,140 @@
+"""Tests pour les sélections de champs (fields/include) sur les lectures."""
+
+import json
+
+import pytest
+from sqlalchemy import event
+
+from src.extensions import db
+from src.fieldsets import FULL_FIELDSET, parse_fieldset
+from src.models import Player, PlayerStats
+
+AUTH_HEADERS = {"Authorization": "Bearer test-token"}
+OWNER_HEADERS = {**AUTH_HEADERS, "X-User-Id": "user-0"}
+
+
+@pytest.fixture
+def app_config(app_config, fake_redis):
+    return {**app_config, "REDIS_CLIENT": fake_redis}
+
+
+def _create_players(count=3):
+    players = [
+        Player(user_id=f"user-{index}", name=f"P{index}", stats=PlayerStats())
+        for index in range(count)
+    ]
+    db.session.add_all(players)
+    db.session.commit()
+    return [player.id for player in players]
+
+
+def _record_statements(engine):
+    statements = []
+
+    def _record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(engine, "before_cursor_execute", _record)
+    return statements, lambda: event.remove(engine, "before_cursor_execute", _record)
+
+
+def test_parse_fieldset():
+    assert parse_fieldset(None, None) is FULL_FIELDSET
+    assert parse_fieldset(None, "stats") is FULL_FIELDSET
+    assert parse_fieldset("level,name", None).fields == (
+        "id",
+        "name",
+        "level",
+        "version",
+    )
+    assert parse_fieldset("level", None).stats is False
+    assert parse_fieldset("level", "stats").stats is True
+    assert parse_fieldset("level,stats", None).stats is True
+    assert parse_fieldset("password", None) is None
+    assert parse_fieldset("name", "inventory") is None
+
+
+def test_get_player_selects_only_requested_columns(client, app):
+    with app.app_context():
+        player_id = _create_players(1)[0]
+        engine = db.engine
+
+    statements, stop = _record_statements(engine)
+    try:
+        response = client.get(
+            f"/players/{player_id}?fields=name,level", headers=AUTH_HEADERS
+        )
+    finally:
+        stop()
+
+    assert response.status_code == 200
+    assert response.get_json()["data"] == {
+        "id": player_id,
+        "name": "P0",
+        "level": 1,
+        "version": 1,
+    }
+    assert response.headers["ETag"] == '"1"'
+    assert len(statements) == 1
+    assert "player_stats" not in statements[0]
+    assert "user_id" not in statements[0]
+
+    with_stats = client.get(
+        f"/players/{player_id}?fields=name&include=stats", headers=AUTH_HEADERS
+    ).get_json()["data"]
+    assert with_stats["stats"] == {"health": 100, "attack": 10, "defense": 5}
+    assert "level" not in with_stats
+
+    invalid = client.get(f"/players/{player_id}?fields=secret", headers=AUTH_HEADERS)
+    assert invalid.status_code == 400
+    assert invalid.get_json()["error"]["code"] == "invalid_query"
+
+
+def test_partial_payloads_are_cached_separately_and_invalidated(
+    client, app, fake_redis
+):
+    with app.app_context():
+        player_id = _create_players(1)[0]
+    cache = app.extensions["player_cache"]
+
+    client.get(f"/players/{player_id}?fields=name", headers=AUTH_HEADERS)
+    client.get(f"/players/{player_id}", headers=AUTH_HEADERS)
+    assert fake_redis.hkeys(cache.variants_key(player_id)) == [b"id,name,version"]
+    assert fake_redis.get(cache.key(player_id)) is not None
+
+    cached = client.get(
+        f"/players/{player_id}?fields=name",
+        headers={**AUTH_HEADERS, "If-None-Match": '"1"'},
+    )
+    assert cached.status_code == 304
+
+    client.put(f"/players/{player_id}", json={"name": "Renamed"}, headers=OWNER_HEADERS)
+    assert not fake_redis.exists(cache.variants_key(player_id))
+
+    response = client.get(f"/players/{player_id}?fields=name", headers=AUTH_HEADERS)
+    assert response.get_json()["data"]["name"] == "Renamed"
+    assert response.headers["ETag"] == '"2"'
+
+
+def test_batch_get_and_list_honour_fields(client, app):
+    with app.app_context():
+        ids = _create_players()
+
+    batch = client.post(
+        "/players:batchGet?fields=level", json={"ids": ids}, headers=AUTH_HEADERS
+    ).get_json()
+    assert batch["data"] == [{"id": pid, "level": 1, "version": 1} for pid in ids]
+
+    page = client.get("/players?fields=name&limit=2", headers=AUTH_HEADERS).get_json()
+    assert page["data"] == [
+        {"id": ids[0], "name": "P0", "version": 1},
+        {"id": ids[1], "name": "P1", "version": 1},
+    ]
+    assert page["meta"]["next_cursor"] == ids[1]
+
+    export = client.get(
+        "/players?fields=xp&include=stats",
+        headers={**AUTH_HEADERS, "Accept": "application/x-ndjson"},
+    )
+    rows = [json.loads(line) for line in export.text.splitlines()]
+    assert [set(row) for row in rows] == [{"id", "xp", "version", "stats"}] * 3
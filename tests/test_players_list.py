@@ -0,0 +1,95 @@
+"""Tests pour la liste paginée et l'export en flux des joueurs."""
+
+import json
+
+from src.extensions import db
+from src.models import Player, PlayerStats
+
+AUTH_HEADERS = {"Authorization": "Bearer test-token"}
+
+
+def _create_players(count):
+    players = [
+        Player(user_id=f"user-{index}", name=f"P{index}", level=index % 5 + 1)
+        for index in range(count)
+    ]
+    for index, player in enumerate(players):
+        if index % 2 == 0:
+            player.stats = PlayerStats()
+    db.session.add_all(players)
+    db.session.commit()
+    return [player.id for player in players]
+
+
+def test_list_players_requires_auth(client):
+    assert client.get("/players").status_code == 401
+
+
+def test_list_players_rejects_invalid_query(client):
+    for query in ("limit=0", "limit=abc", "cursor=-1", "min_level=0"):
+        response = client.get(f"/players?{query}", headers=AUTH_HEADERS)
+
+        assert response.status_code == 400
+        assert response.get_json()["error"]["code"] == "invalid_query"
+
+
+def test_list_players_paginates_with_cursor(client, app):
+    with app.app_context():
+        player_ids = _create_players(5)
+
+    seen = []
+    cursor = ""
+    while cursor is not None:
+        response = client.get(f"/players?limit=2&cursor={cursor}", headers=AUTH_HEADERS)
+        assert response.status_code == 200
+        payload = response.get_json()
+        assert payload["meta"]["limit"] == 2
+        seen.extend(player["id"] for player in payload["data"])
+        cursor = payload["meta"]["next_cursor"]
+
+    assert seen == player_ids
+    first = client.get("/players?limit=1", headers=AUTH_HEADERS).get_json()["data"]
+    assert first[0]["stats"] == {"health": 100, "attack": 10, "defense": 5}
+
+
+def test_list_players_caps_limit(client, app):
+    app.config["PLAYER_LIST_MAX_LIMIT"] = 3
+    with app.app_context():
+        _create_players(5)
+
+    payload = client.get("/players?limit=100", headers=AUTH_HEADERS).get_json()
+
+    assert len(payload["data"]) == 3
+    assert payload["meta"]["limit"] == 3
+
+
+def test_list_players_filters_by_level_range(client, app):
+    with app.app_context():
+        _create_players(10)
+
+    payload = client.get(
+        "/players?min_level=2&max_level=3", headers=AUTH_HEADERS
+    ).get_json()
+
+    assert {player["level"] for player in payload["data"]} == {2, 3}
+    assert len(payload["data"]) == 4
+    assert payload["meta"]["next_cursor"] is None
+
+
+def test_list_players_streams_ndjson(client, app):
+    app.config["PLAYER_STREAM_BATCH_SIZE"] = 2
+    with app.app_context():
+        player_ids = _create_players(5)
+
+    response = client.get(
+        f"/players?cursor={player_ids[0]}",
+        headers={**AUTH_HEADERS, "Accept": "application/x-ndjson"},
+    )
+
+    assert response.status_code == 200
+    assert response.is_streamed
+    assert response.mimetype == "application/x-ndjson"
+    lines = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    assert [line["id"] for line in lines] == player_ids[1:]
+    assert lines[0]["stats"] is None
+    assert lines[1]["stats"]["health"] == 100
@@ -0,0 +1,115 @@
+"""Tests pour la recherche de joueurs par préfixe de nom."""
+
+import pytest
+from sqlalchemy import text
+
+from src.extensions import db
+from src.search import decode_cursor, encode_cursor, prefix_upper_bound
+
+AUTH_HEADERS = {"Authorization": "Bearer test-token"}
+NAMES = ["alice", "Albert", "ALFRED", "Bob", "Straße", "al"]
+
+
+@pytest.fixture(params=["memory", "database"])
+def app_config(request, app_config):
+    return {**app_config, "PLAYER_SEARCH_BACKEND": request.param}
+
+
+def _create_players(client, names=NAMES, first_user=0):
+    ids = {}
+    for index, name in enumerate(names, first_user):
+        response = client.post(
+            "/players",
+            json={"name": name},
+            headers={**AUTH_HEADERS, "X-User-Id": f"user-{index}"},
+        )
+        assert response.status_code == 201
+        ids[name] = response.get_json()["data"]["id"]
+    return ids
+
+
+def _search(client, query):
+    response = client.get(f"/players/search?{query}", headers=AUTH_HEADERS)
+    assert response.status_code == 200, response.get_json()
+    return response.get_json()
+
+
+def test_prefix_bounds_and_cursors():
+    assert prefix_upper_bound("ab") == "ac"
+    assert prefix_upper_bound("a" + chr(0x10FFFF)) == "b"
+    assert prefix_upper_bound(chr(0x10FFFF)) is None
+    assert decode_cursor(encode_cursor(("straße", 42))) == ("straße", 42)
+    assert decode_cursor("not-a-cursor") is None
+
+
+def test_search_is_case_insensitive_and_ordered(client):
+    ids = _create_players(client)
+
+    result = _search(client, "prefix=AL")
+    assert [player["name"] for player in result["data"]] == [
+        "al",
+        "Albert",
+        "ALFRED",
+        "alice",
+    ]
+    assert result["meta"]["next_cursor"] is None
+
+    assert [p["id"] for p in _search(client, "prefix=STRASS")["data"]] == [
+        ids["Straße"]
+    ]
+    assert _search(client, "prefix=zz")["data"] == []
+
+
+def test_search_paginates_by_keyset_with_fields(client):
+    _create_players(client)
+
+    seen, cursor = [], None
+    while True:
+        query = "prefix=al&limit=3&fields=name"
+        if cursor:
+            query += f"&cursor={cursor}"
+        page = _search(client, query)
+        assert all(set(player) == {"id", "name", "version"} for player in page["data"])
+        seen.extend(player["name"] for player in page["data"])
+        cursor = page["meta"]["next_cursor"]
+        if cursor is None:
+            break
+
+    assert seen == ["al", "Albert", "ALFRED", "alice"]
+
+
+def test_search_follows_creations_and_renames(client):
+    ids = _create_players(client)
+    assert len(_search(client, "prefix=al")["data"]) == 4
+
+    client.put(
+        f"/players/{ids['alice']}",
+        json={"name": "Zelda"},
+        headers={**AUTH_HEADERS, "X-User-Id": "user-0"},
+    )
+    _create_players(client, ["Alma"], first_user=len(NAMES))
+
+    names = [player["name"] for player in _search(client, "prefix=al")["data"]]
+    assert names == ["al", "Albert", "ALFRED", "Alma"]
+    assert [p["name"] for p in _search(client, "prefix=z")["data"]] == ["Zelda"]
+
+
+def test_search_validates_parameters(client):
+    for query in ("", "prefix=", "prefix=a&limit=0", "prefix=a&cursor=%21%21"):
+        response = client.get(f"/players/search?{query}", headers=AUTH_HEADERS)
+        assert response.status_code == 400, query
+
+
+def test_prefix_range_uses_name_index(app):
+    with app.app_context():
+        plan = db.session.execute(
+            text(
+                "EXPLAIN QUERY PLAN SELECT name_folded, id FROM players "
+                "WHERE name_folded >= 'al' AND name_folded < 'am' "
+                "ORDER BY name_folded, id"
+            )
+        ).all()
+
+    assert "COVERING INDEX ix_players_name_folded" in " ".join(
+        str(row[-1]) for row in plan
+    )
@@ -0,0 +1,126 @@
+"""Tests pour les incréments atomiques de statistiques et d'expérience."""
+
+import random
+
+from sqlalchemy import event
+
+from src.extensions import db
+from src.increments import MAX_STAT_VALUE, apply_increments
+from src.leveling import apply_experience
+from src.models import Player, PlayerStats
+
+AUTH_HEADERS = {"Authorization": "Bearer test-token"}
+
+
+def _create_player(user_id="user-123", **stats):
+    player = Player(user_id=user_id, name="Fighter", stats=PlayerStats(**stats))
+    db.session.add(player)
+    db.session.commit()
+    return player.id
+
+
+def _patch(client, player_id, payload, **headers):
+    return client.patch(
+        f"/players/{player_id}/stats",
+        json=payload,
+        headers={**AUTH_HEADERS, "X-User-Id": "user-123", **headers},
+    )
+
+
+def test_patch_stats_applies_deltas_in_one_update(client, app):
+    with app.app_context():
+        player_id = _create_player()
+        engine = db.engine
+
+    statements = []
+
+    def _record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(engine, "before_cursor_execute", _record)
+    try:
+        response = _patch(client, player_id, {"health": -30, "attack": 5, "xp": 250})
+    finally:
+        event.remove(engine, "before_cursor_execute", _record)
+
+    assert response.status_code == 200, response.get_json()
+    data = response.get_json()["data"]
+    assert data["stats"] == {"health": 70, "attack": 15, "defense": 5}
+    assert (data["level"], data["xp"]) == apply_experience(1, 0, 250)[:2]
+    assert data["version"] == 2
+    assert response.headers["ETag"] == '"2"'
+    assert not any(statement.lstrip().startswith("SELECT") for statement in statements)
+
+    cached = client.get(f"/players/{player_id}", headers=AUTH_HEADERS)
+    assert cached.get_json()["data"] == data
+
+
+def test_patch_stats_rejects_or_clamps_negative_results(client, app):
+    with app.app_context():
+        player_id = _create_player(health=20)
+
+    rejected = _patch(client, player_id, {"health": -50, "xp": 10})
+    assert rejected.status_code == 409
+    assert rejected.get_json()["error"]["code"] == "stats_out_of_range"
+    assert rejected.headers["ETag"] == '"1"'
+
+    unchanged = client.get(f"/players/{player_id}", headers=AUTH_HEADERS)
+    assert unchanged.get_json()["data"]["xp"] == 0
+    assert unchanged.get_json()["data"]["stats"]["health"] == 20
+
+    clamped = _patch(client, player_id, {"health": -50, "defense": 3, "clamp": True})
+    assert clamped.status_code == 200
+    assert clamped.get_json()["data"]["stats"] == {
+        "health": 0,
+        "attack": 10,
+        "defense": 8,
+    }
+
+    capped = _patch(client, player_id, {"attack": MAX_STAT_VALUE, "clamp": True})
+    assert capped.get_json()["data"]["stats"]["attack"] == MAX_STAT_VALUE
+
+
+def test_patch_stats_validates_payload_and_preconditions(client, app):
+    with app.app_context():
+        player_id = _create_player()
+        db.session.add(Player(user_id="no-stats", name="Bare"))
+        db.session.commit()
+        bare_id = db.session.query(Player.id).filter_by(user_id="no-stats").scalar()
+
+    for payload in ({}, {"health": 0}, {"health": "1"}, {"xp": -1}, {"clamp": 1}):
+        response = _patch(client, player_id, payload)
+        assert response.status_code == 400, payload
+
+    assert _patch(client, 999, {"health": 1}).status_code == 404
+    missing_stats = _patch(client, bare_id, {"health": 1}, **{"X-User-Id": "no-stats"})
+    assert missing_stats.status_code == 404
+    assert missing_stats.get_json()["error"]["code"] == "stats_not_found"
+
+    missing_user = client.patch(
+        f"/players/{player_id}/stats", json={"health": 1}, headers=AUTH_HEADERS
+    )
+    assert missing_user.status_code == 400
+    other = _patch(client, player_id, {"health": 1}, **{"X-User-Id": "user-456"})
+    assert other.status_code == 403
+    assert other.get_json()["error"]["code"] == "forbidden"
+
+    stale = _patch(client, player_id, {"health": 1}, **{"If-Match": '"7"'})
+    assert stale.status_code == 412
+    assert stale.headers["ETag"] == '"1"'
+
+    fresh = _patch(client, player_id, {"health": 1}, **{"If-Match": '"1"'})
+    assert fresh.status_code == 200
+    assert fresh.get_json()["data"]["stats"]["health"] == 101
+
+
+def test_sql_levelling_matches_python_curve(app):
+    rng = random.Random(7)
+    with app.app_context():
+        player_id = _create_player()
+        level, xp = 1, 0
+        for _ in range(50):
+            amount = rng.choice([0, 1, 99, 100, 12_345, rng.randrange(2**31)])
+            snapshot = apply_increments(db.session, player_id, {"health": 1}, xp=amount)
+            db.session.commit()
+            level, xp, _ = apply_experience(level, xp, amount)
+            assert (snapshot.level, snapshot.xp) == (level, xp)
@@ -0,0 +1,178 @@
+"""Tests pour les statistiques de la population (GET /players/stats/summary)."""
+
+import random
+
+import fakeredis
+import pytest
+
+from src.extensions import db
+from src.main import create_app
+from src.population import (
+    LocalPopulationBackend,
+    RedisPopulationBackend,
+    bucket_bounds,
+    bucket_index,
+    contribution,
+    estimate_percentile,
+)
+
+AUTH_HEADERS = {"Authorization": "Bearer test-token"}
+
+
+@pytest.fixture(params=["local", "redis"])
+def app_config(request, app_config, fake_redis):
+    if request.param == "redis":
+        return {**app_config, "REDIS_CLIENT": fake_redis}
+    return app_config
+
+
+def _create_player(client, user_id):
+    response = client.post(
+        "/players",
+        json={"name": user_id},
+        headers={**AUTH_HEADERS, "X-User-Id": user_id},
+    )
+    assert response.status_code == 201
+    return response.get_json()["data"]["id"]
+
+
+def _summary(client):
+    response = client.get("/players/stats/summary", headers=AUTH_HEADERS)
+    assert response.status_code == 200
+    return response.get_json()
+
+
+def test_buckets_cover_values_and_estimate_percentiles():
+    for value in [0, 1, 31, 32, 33, 100, 1000, 2**31 - 1]:
+        lower, upper = bucket_bounds(bucket_index(value))
+        assert lower <= value < upper
+        assert upper - lower <= max(1, lower / 16)
+    assert [bucket_index(value) for value in (30, 31, 32, 34)] == [30, 31, 32, 33]
+
+    rng = random.Random(7)
+    values = [rng.randint(0, 5000) for _ in range(2000)]
+    histogram = {}
+    for value in values:
+        histogram[bucket_index(value)] = histogram.get(bucket_index(value), 0) + 1
+    for percentile in (50, 90, 99):
+        exact = sorted(values)[int(percentile / 100 * len(values)) - 1]
+        assert abs(estimate_percentile(histogram, percentile) - exact) <= exact * 0.07
+    assert 100 <= estimate_percentile({bucket_index(100): 3}, 50) < 104
+    assert estimate_percentile({bucket_index(10): 3}, 50) == 10
+    assert estimate_percentile({}, 50) is None
+
+
+def test_summary_follows_writes_and_matches_rebuild(client, app):
+    empty = _summary(client)
+    assert empty["data"]["players"] == 0
+    assert empty["data"]["xp"]["average"] is None
+    assert empty["meta"]["computed_at"]
+
+    ids = [_create_player(client, f"user-{index}") for index in range(4)]
+    client.patch(
+        f"/players/{ids[0]}/stats",
+        json={"health": 400, "attack": 5},
+        headers={**AUTH_HEADERS, "X-User-Id": "user-0"},
+    )
+    client.post(
+        "/players/xp:batch",
+        json={
+            "awards": [
+                {"player_id": ids[1], "amount": 250},
+                {"player_id": ids[2], "amount": 30},
+            ]
+        },
+        headers=AUTH_HEADERS,
+    )
+    client.put(
+        f"/players/{ids[3]}",
+        json={"name": "Renamed"},
+        headers={**AUTH_HEADERS, "X-User-Id": "user-3"},
+    )
+
+    summary = _summary(client)["data"]
+    assert summary["players"] == 4
+    assert summary["levels"] == [
+        {"level": 1, "players": 3},
+        {"level": 2, "players": 1},
+    ]
+    assert summary["xp"]["average"] == 45
+    assert summary["stats"]["health"]["players"] == 4
+    assert 100 <= summary["stats"]["health"]["p50"] < 104
+    assert 480 <= summary["stats"]["health"]["p99"] <= 511
+    assert summary["stats"]["attack"]["p50"] == 10
+
+    with app.app_context():
+        assert app.extensions["population"].rebuild() == 4
+    assert _summary(client)["data"] == summary
+
+
+def test_stale_summary_is_rebuilt_in_background(client, app):
+    population = app.extensions["population"]
+    _create_player(client, "user-0")
+    _summary(client)
+    population.backend.apply({999: (7, 0, None, None, None)})
+    assert _summary(client)["data"]["players"] == 2
+
+    population.background = True
+    population.recompute_interval = 0.001
+    _summary(client)
+    population._rebuilding.acquire(timeout=5)
+    population._rebuilding.release()
+    population.recompute_interval = 0
+    assert _summary(client)["data"]["players"] == 1
+
+
+@pytest.mark.parametrize("backend_name", ["local", "redis"])
+def test_rebuild_keeps_writes_made_meanwhile(backend_name):
+    if backend_name == "local":
+        backend = LocalPopulationBackend()
+    else:
+        backend = RedisPopulationBackend(fakeredis.FakeRedis())
+    stats = {"health": 100, "attack": 10, "defense": 5}
+    backend.apply({1: contribution(1, 0, stats), 2: contribution(1, 0, stats)})
+
+    def batches():
+        yield {1: contribution(1, 0, stats), 2: contribution(1, 0, stats)}
+        # Committed while the rebuild streams the tables.
+        backend.apply({1: contribution(3, 10, None), 3: contribution(2, 0, None)})
+        backend.remove([2])
+        assert backend.replace(iter([]), 2.0) is None
+        yield {3: contribution(1, 0, {**stats, "attack": 40})}
+        yield {4: contribution(1, 50, stats)}
+
+    assert backend.replace(batches(), 1.0) == 3
+    counters = backend.counters()
+    assert counters["level:1"] == counters["level:2"] == counters["level:3"] == 1
+    assert counters["xp_sum"] == 60
+    assert counters[f"attack:{bucket_index(40)}"] == 1
+    assert counters[f"health:{bucket_index(100)}"] == 3
+    assert counters["computed_at"] == 1.0
+
+
+def test_missing_summary_is_rebuilt_in_background(app_config, tmp_path):
+    app = create_app(
+        {
+            **app_config,
+            "SQLALCHEMY_DATABASE_URI": f"sqlite:///{tmp_path / 'players.db'}",
+            "POPULATION_STATS_REBUILD_BACKGROUND": True,
+        }
+    )
+    with app.app_context():
+        db.create_all()
+    client = app.test_client()
+    _create_player(client, "user-0")
+
+    response = client.get("/players/stats/summary", headers=AUTH_HEADERS)
+    assert response.status_code == 503
+    assert response.get_json()["error"]["code"] == "population_stats_rebuilding"
+    assert response.headers["Retry-After"] == "5"
+
+    rebuilding = app.extensions["population"]._rebuilding
+    assert rebuilding.acquire(timeout=5)
+    rebuilding.release()
+    assert _summary(client)["data"]["players"] == 1
+
+
+def test_summary_requires_auth(client):
+    assert client.get("/players/stats/summary").status_code == 401
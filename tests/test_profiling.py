@@ -0,0 +1,151 @@
+"""Tests pour le profilage à la demande des requêtes."""
+
+import cProfile
+import marshal
+import os
+import pstats
+import threading
+import time
+from collections import Counter
+
+import pytest
+
+from src.main import create_app
+from src.profiling import Profiler, StackSampler, read_collapsed
+
+AUTH_HEADERS = {"Authorization": "Bearer test-token"}
+ADMIN_HEADERS = {"Authorization": "Bearer profile-admin"}
+
+
+@pytest.fixture
+def app_config(app_config, tmp_path):
+    return {
+        **app_config,
+        "PROFILING_ENABLED": True,
+        "PROFILING_DIR": str(tmp_path / "profiles"),
+        "PROFILING_TOKEN": "profile-secret",
+        "PROFILING_ADMIN_TOKEN": "profile-admin",
+        "PROFILING_INTERVAL_MS": 1,
+    }
+
+
+def _update_player(client, user_id, profile_token=None):
+    headers = {**AUTH_HEADERS, "X-User-Id": user_id}
+    if profile_token is not None:
+        headers["X-Profile-Token"] = profile_token
+    created = client.post("/players", json={"name": "Alice"}, headers=headers)
+    player_id = created.get_json()["data"]["id"]
+    response = client.put(
+        f"/players/{player_id}", json={"name": "Alicia"}, headers=headers
+    )
+    assert response.status_code == 200
+
+
+def test_sampler_collapses_stacks_root_first():
+    ready = threading.Event()
+    done = threading.Event()
+
+    def busy_wait():
+        ready.set()
+        done.wait(1)
+
+    worker = threading.Thread(target=busy_wait)
+    worker.start()
+    ready.wait()
+    sampler = StackSampler(worker.ident, 0.001)
+    sampler.start()
+    time.sleep(0.05)
+    stacks = sampler.stop()
+    done.set()
+    worker.join()
+
+    stack, count = stacks.most_common(1)[0]
+    frames = stack.split(";")
+    assert frames[0].startswith("_bootstrap (")
+    assert any(
+        frame.startswith("busy_wait (tests/test_profiling.py:") for frame in frames
+    )
+    assert count > 0
+    assert read_collapsed([f"{stack} {count}\n", "garbage\n"]) == stacks.__class__(
+        {stack: count}
+    )
+
+
+def test_requests_with_the_token_are_profiled_per_endpoint(client, app):
+    _update_player(client, "user-0", "wrong")
+    assert client.get("/debug/profiles", headers=ADMIN_HEADERS).get_json()["data"] == []
+
+    _update_player(client, "user-1", "profile-secret")
+    _update_player(client, "user-2", "profile-secret")
+
+    listed = client.get("/debug/profiles", headers=ADMIN_HEADERS).get_json()["data"]
+    summaries = {summary["endpoint"]: summary for summary in listed}
+    assert set(summaries) == {"create_player", "update_player"}
+    assert summaries["update_player"]["requests"] == 2
+    assert summaries["update_player"]["workers"] == 1
+    assert summaries["update_player"]["downloads"]["pstats"] == (
+        "/debug/profiles/update_player.pstats"
+    )
+
+    response = client.get("/debug/profiles/update_player.pstats", headers=ADMIN_HEADERS)
+    assert response.status_code == 200
+    stats = pstats.Stats()
+    stats.stats = marshal.loads(response.data)
+    functions = {name for _, _, name in stats.stats}
+    assert "update_player" in functions
+    assert "_require_authentication" in functions
+
+    collapsed = client.get(
+        "/debug/profiles/update_player.collapsed", headers=ADMIN_HEADERS
+    )
+    assert collapsed.mimetype == "text/plain"
+    assert all(
+        line.rsplit(" ", 1)[1].isdigit()
+        for line in collapsed.get_data(as_text=True).splitlines()
+    )
+
+
+def test_profile_endpoints_are_protected(client):
+    assert client.get("/debug/profiles").status_code == 401
+    assert client.get("/debug/profiles/update_player.pstats").status_code == 401
+    # The API token is not enough.
+    assert client.get("/debug/profiles", headers=AUTH_HEADERS).status_code == 401
+    for name in ("update_player.pstats", "update_player.txt", "nothing"):
+        response = client.get(f"/debug/profiles/{name}", headers=ADMIN_HEADERS)
+        assert response.status_code == 404
+        assert response.get_json()["error"]["code"] == "profile_not_found"
+
+
+def test_profiling_is_absent_unless_enabled(app_config):
+    app = create_app({**app_config, "PROFILING_ENABLED": False})
+    assert "profiler" not in app.extensions
+    assert app.test_client().get("/debug/profiles").status_code == 404
+
+
+def test_profiles_are_not_served_without_an_admin_token(app_config):
+    app = create_app({**app_config, "PROFILING_ADMIN_TOKEN": None})
+    assert "profiler" in app.extensions
+    for headers in (AUTH_HEADERS, ADMIN_HEADERS):
+        assert app.test_client().get(
+            "/debug/profiles", headers=headers
+        ).status_code == (404)
+
+
+def test_stalest_profiles_are_deleted_beyond_the_cap(tmp_path):
+    directory = tmp_path / "profiles"
+    directory.mkdir()
+    for age, name in enumerate(("newer.1", "older.2")):
+        for suffix in ("pstats", "collapsed", "json"):
+            path = directory / f"{name}.{suffix}"
+            path.write_bytes(b"x" * 1000)
+            stamp = time.time() - 100 * (age + 1)
+            os.utime(path, (stamp, stamp))
+    profiler = Profiler(str(directory), max_bytes=5000)
+
+    profile = cProfile.Profile()
+    profile.enable()
+    profile.disable()
+    profiler.record("update_player", profile, Counter({"a;b": 1}), 0.01)
+
+    remaining = {path.name.rsplit(".", 1)[0] for path in directory.iterdir()}
+    assert remaining == {"newer.1", f"update_player.{os.getpid()}"}
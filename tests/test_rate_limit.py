@@ -0,0 +1,153 @@
+"""Tests pour la limitation de débit par client et le contrôle d'admission."""
+
+import pytest
+from redis.exceptions import ConnectionError
+
+from src.extensions import db
+from src.main import create_app
+from src.metrics import TimedQueuePool
+from src.ratelimit import (
+    AdmissionController,
+    LocalBuckets,
+    Rate,
+    RateLimiter,
+    RedisBuckets,
+    parse_rate,
+    parse_route_rates,
+)
+
+AUTH_HEADERS = {"Authorization": "Bearer test-token"}
+
+
+@pytest.fixture
+def app_config(app_config):
+    return {
+        **app_config,
+        "RATE_LIMIT_DEFAULT": parse_rate("3/min"),
+        "RATE_LIMITS": parse_route_rates("create_player=1/min,get_leaderboard=none"),
+    }
+
+
+def test_rates_are_parsed():
+    assert parse_rate("100/s") == Rate(100, 1.0)
+    assert parse_rate(" 5/MIN ") == Rate(5, 60.0)
+    assert parse_rate("none") is None
+    assert parse_route_rates("a=1/h, b=0") == {"a": Rate(1, 3600.0), "b": None}
+    for text in ("5", "0/min", "x/s", "5/week"):
+        with pytest.raises(ValueError):
+            parse_rate(text)
+    with pytest.raises(ValueError):
+        parse_route_rates("5/min")
+
+
+@pytest.mark.parametrize("backend", ["local", "redis"])
+def test_buckets_allow_bursts_then_refill(backend, fake_redis):
+    buckets = LocalBuckets() if backend == "local" else RedisBuckets(fake_redis)
+    rate = Rate(2, 0.1)
+
+    decisions = [buckets.take("client", rate) for _ in range(3)]
+    assert [d.allowed for d in decisions] == [True, True, False]
+    assert [d.remaining for d in decisions] == [1, 0, 0]
+    assert 0 < decisions[2].retry_after <= 0.05
+    assert buckets.take("other", rate).allowed
+
+    if backend == "redis":
+        assert 0 < fake_redis.pttl("ratelimit:client") <= 1100
+
+
+def test_local_buckets_are_bounded():
+    buckets = LocalBuckets(maxsize=2)
+    for key in ("a", "b", "c"):
+        buckets.take(key, Rate(1, 60))
+    assert len(buckets) == 2
+    assert buckets.take("a", Rate(1, 60)).allowed
+
+
+def test_requests_are_limited_per_client_and_route(client):
+    for remaining in (2, 1, 0):
+        response = client.get("/players", headers=AUTH_HEADERS)
+        assert response.status_code == 200
+        assert response.headers["RateLimit-Remaining"] == str(remaining)
+    assert response.headers["RateLimit-Limit"] == "3"
+    assert response.headers["RateLimit-Policy"] == "3;w=60"
+    assert int(response.headers["RateLimit-Reset"]) == 60
+
+    limited = client.get("/players/1", headers=AUTH_HEADERS)
+    assert limited.status_code == 429
+    assert limited.get_json()["error"]["code"] == "rate_limited"
+    assert 1 <= int(limited.headers["Retry-After"]) <= 20
+
+    other_user = client.get("/players", headers={**AUTH_HEADERS, "X-User-Id": "u2"})
+    assert other_user.status_code == 200
+    assert client.get("/leaderboard", headers=AUTH_HEADERS).status_code == 200
+    assert "RateLimit-Limit" not in client.get("/health").headers
+
+    headers = {**AUTH_HEADERS, "X-User-Id": "u3"}
+    created = client.post("/players", json={"name": "Alice"}, headers=headers)
+    assert created.status_code == 201
+    assert created.headers["RateLimit-Limit"] == "1"
+    assert client.post("/players", json={"name": "A"}, headers=headers).status_code == (
+        429
+    )
+
+
+def test_redis_outage_falls_back_to_local_buckets():
+    class BrokenRedis:
+        def register_script(self, script):
+            def run(keys, args):
+                raise ConnectionError("down")
+
+            return run
+
+    limiter = RateLimiter(BrokenRedis(), default=Rate(1, 60))
+    assert limiter.check("get_player", "c").allowed
+    assert not limiter.check("get_player", "c").allowed
+
+
+def test_admission_sheds_saturated_worker(app_config):
+    admission = AdmissionController(max_in_flight=1, max_pool_wait=0.05)
+    assert admission.enter() is None
+    assert admission.enter() == "in_flight"
+    admission.leave()
+
+    admission.observe_pool_wait(0.2)
+    assert admission.enter() == "pool_wait"
+    admission._observed_at -= 2
+    assert admission.pool_wait < 0.05
+    assert admission.enter() is None
+    admission.leave()
+
+    app = create_app({**app_config, "ADMISSION_MAX_IN_FLIGHT": 1})
+    with app.app_context():
+        db.create_all()
+    client = app.test_client()
+    app.extensions["admission"].in_flight = 1
+    shed = client.get("/players", headers=AUTH_HEADERS)
+    assert shed.status_code == 503
+    assert shed.get_json()["error"]["code"] == "overloaded"
+    assert shed.headers["Retry-After"] == "1"
+    assert client.get("/health").status_code == 200
+
+    app.extensions["admission"].in_flight = 0
+    assert client.get("/players", headers=AUTH_HEADERS).status_code == 200
+    assert app.extensions["admission"].in_flight == 0
+
+
+def test_admission_measures_pool_wait_without_metrics(app_config, tmp_path):
+    app = create_app(
+        {
+            **app_config,
+            "SQLALCHEMY_DATABASE_URI": f"sqlite:///{tmp_path / 'pool.db'}",
+            "SQLALCHEMY_ENGINE_OPTIONS": {"poolclass": TimedQueuePool},
+            "METRICS_ENABLED": False,
+            "ADMISSION_MAX_POOL_WAIT_MS": 1000,
+        }
+    )
+    with app.app_context():
+        db.create_all()
+
+    assert app.test_client().get("/players", headers=AUTH_HEADERS).status_code == 200
+    assert app.extensions["admission"].pool_wait > 0
+
+    with pytest.raises(ValueError, match="ADMISSION_MAX_POOL_WAIT_MS"):
+        create_app({**app_config, "ADMISSION_MAX_POOL_WAIT_MS": 1000})
@@ -0,0 +1,196 @@
+"""Tests pour le routage des lectures vers les répliques."""
+
+import sqlite3
+import time
+
+import pytest
+from sqlalchemy import event, text, update
+from sqlalchemy.exc import OperationalError
+
+from src.extensions import db
+from src.main import create_app
+from src.models import Player, PlayerStats
+
+AUTH_HEADERS = {"Authorization": "Bearer test-token"}
+OWNER_HEADERS = {**AUTH_HEADERS, "X-User-Id": "user-123"}
+
+
+def _copy_database(source, target):
+    with sqlite3.connect(source) as src, sqlite3.connect(target) as dst:
+        src.backup(dst)
+
+
+def _make_app(app_config, primary, replicas, **overrides):
+    return create_app(
+        {
+            **app_config,
+            "SQLALCHEMY_DATABASE_URI": f"sqlite:///{primary}",
+            "DATABASE_REPLICA_URLS": [f"sqlite:///{path}" for path in replicas],
+            "PLAYER_CACHE_LOCAL_SIZE": 0,
+            **overrides,
+        }
+    )
+
+
+@pytest.fixture
+def databases(app_config, tmp_path):
+    """A primary with one player, and a replica lagging one rename behind."""
+
+    primary, replica = tmp_path / "primary.db", tmp_path / "replica.db"
+    seed = create_app({**app_config, "SQLALCHEMY_DATABASE_URI": f"sqlite:///{primary}"})
+    with seed.app_context():
+        db.create_all()
+        db.session.add(Player(user_id="user-123", name="Stale", stats=PlayerStats()))
+        db.session.commit()
+        db.session.execute(text("PRAGMA wal_checkpoint(FULL)"))
+        _copy_database(primary, replica)
+        db.session.execute(update(Player).values(name="Fresh"))
+        db.session.commit()
+        db.engine.dispose()
+    return primary, replica
+
+
+def _name(response):
+    assert response.status_code == 200, response.get_json()
+    return response.get_json()["data"]["name"]
+
+
+def test_reads_go_to_replica_and_writes_to_primary(app_config, databases):
+    app = _make_app(app_config, databases[0], databases[1:])
+    client = app.test_client()
+
+    assert _name(client.get("/players/1", headers=AUTH_HEADERS)) == "Stale"
+    batch = client.post("/players:batchGet", json={"ids": [1]}, headers=AUTH_HEADERS)
+    assert batch.get_json()["data"][0]["name"] == "Stale"
+
+    created = client.post(
+        "/players", json={"name": "New"}, headers={**AUTH_HEADERS, "X-User-Id": "u2"}
+    )
+    assert created.status_code == 201
+    with app.app_context():
+        assert db.session.get(Player, created.get_json()["data"]["id"]) is not None
+
+
+def test_unknown_player_reads_stay_on_the_replica(app_config, databases):
+    app = _make_app(app_config, databases[0], databases[1:])
+    client = app.test_client()
+    with app.app_context():
+        primary = db.engine
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(primary, "before_cursor_execute", record)
+    try:
+        response = client.get("/players/999", headers=AUTH_HEADERS)
+    finally:
+        event.remove(primary, "before_cursor_execute", record)
+
+    assert response.status_code == 404
+    assert statements == []
+
+
+def test_writer_is_pinned_to_primary(app_config, databases):
+    app = _make_app(app_config, databases[0], databases[1:], REPLICA_STICKY_SECONDS=60)
+    client = app.test_client()
+
+    response = client.put("/players/1", json={"name": "Renamed"}, headers=OWNER_HEADERS)
+    assert response.status_code == 200
+
+    assert _name(client.get("/players/1", headers=OWNER_HEADERS)) == "Renamed"
+    assert _name(client.get("/players/1", headers=AUTH_HEADERS)) == "Stale"
+
+
+def test_pin_expires_after_window(app_config, databases):
+    app = _make_app(
+        app_config, databases[0], databases[1:], REPLICA_STICKY_SECONDS=0.05
+    )
+    client = app.test_client()
+
+    client.put("/players/1", json={"name": "Renamed"}, headers=OWNER_HEADERS)
+    time.sleep(0.1)
+
+    assert _name(client.get("/players/1", headers=OWNER_HEADERS)) == "Stale"
+
+
+def test_failed_writes_do_not_pin(app_config, databases):
+    app = _make_app(app_config, databases[0], databases[1:], REPLICA_STICKY_SECONDS=60)
+    client = app.test_client()
+
+    response = client.put("/players/1", json={"name": ""}, headers=OWNER_HEADERS)
+    assert response.status_code == 400
+
+    assert _name(client.get("/players/1", headers=OWNER_HEADERS)) == "Stale"
+
+
+def test_pins_are_shared_through_redis(app_config, databases, fake_redis):
+    config = {**app_config, "REDIS_CLIENT": fake_redis, "REPLICA_STICKY_SECONDS": 60}
+    writer = _make_app(config, databases[0], databases[1:]).test_client()
+    reader = _make_app(config, databases[0], databases[1:]).test_client()
+
+    writer.put("/players/1", json={"name": "Renamed"}, headers=OWNER_HEADERS)
+
+    reader.application.extensions["player_cache"].clear_local()
+    fake_redis.delete(*fake_redis.keys("player:*"))
+    assert _name(reader.get("/players/1", headers=OWNER_HEADERS)) == "Renamed"
+
+
+def test_replica_reads_do_not_fill_redis(app_config, databases, fake_redis):
+    config = {**app_config, "REDIS_CLIENT": fake_redis, "REPLICA_STICKY_SECONDS": 60}
+    app = _make_app(config, databases[0], databases[1:])
+    client = app.test_client()
+
+    client.put("/players/1", json={"name": "Renamed"}, headers=OWNER_HEADERS)
+    awarded = client.post(
+        "/players/xp:batch",
+        json={"awards": [{"player_id": 1, "amount": 30}]},
+        headers=AUTH_HEADERS,
+    )
+    assert awarded.status_code == 200
+
+    assert _name(client.get("/players/1", headers=AUTH_HEADERS)) == "Stale"
+    client.post("/players:batchGet", json={"ids": [1]}, headers=AUTH_HEADERS)
+    assert fake_redis.get(app.extensions["player_cache"].key(1)) is None
+
+    data = client.get("/players/1", headers=OWNER_HEADERS).get_json()["data"]
+    assert (data["name"], data["xp"]) == ("Renamed", 30)
+
+
+def test_unhealthy_replica_falls_back_to_primary(app_config, databases, tmp_path):
+    missing = tmp_path / "missing" / "replica.db"
+    app = _make_app(app_config, databases[0], [missing])
+    client = app.test_client()
+    router = app.extensions["replica_router"]
+
+    assert _name(client.get("/players/1", headers=AUTH_HEADERS)) == "Fresh"
+    assert router.choose_replica() is None
+    assert _name(client.get("/players/1", headers=AUTH_HEADERS)) == "Fresh"
+
+
+def test_query_errors_on_a_replica_are_raised(app_config, databases, tmp_path):
+    # An empty replica has no tables: the query fails, the replica is fine.
+    empty = tmp_path / "empty.db"
+    sqlite3.connect(empty).close()
+    app = _make_app(app_config, databases[0], [empty])
+    client = app.test_client()
+    router = app.extensions["replica_router"]
+
+    with pytest.raises(OperationalError, match="no such table"):
+        client.get("/players/1", headers=AUTH_HEADERS)
+    assert router.choose_replica() is not None
+
+
+def test_replicas_are_used_round_robin(app_config, databases, tmp_path):
+    second = tmp_path / "replica-2.db"
+    _copy_database(databases[0], second)
+    app = _make_app(app_config, databases[0], [databases[1], second])
+    client = app.test_client()
+
+    names = [_name(client.get("/players/1", headers=AUTH_HEADERS)) for _ in range(4)]
+
+    assert sorted(names) == ["Fresh", "Fresh", "Stale", "Stale"]
+
+
+def test_without_replicas_everything_uses_primary(app):
+    assert app.extensions["replica_router"].replicas == []
@@ -0,0 +1,97 @@
+"""Tests for the production serving configuration."""
+
+import runpy
+from pathlib import Path
+
+from sqlalchemy import text
+
+from src.extensions import db, dispose_engines, engine_options
+from src.main import create_app
+
+ROOT = Path(__file__).resolve().parent.parent
+
+POOL_CONFIG = {
+    "DB_POOL_SIZE": 8,
+    "DB_MAX_OVERFLOW": 2,
+    "DB_POOL_TIMEOUT": 5,
+    "DB_POOL_RECYCLE": 1800,
+}
+
+
+def test_engine_options_size_pool_for_server_databases():
+    options = engine_options(
+        {"SQLALCHEMY_DATABASE_URI": "postgresql://u:p@db/players", **POOL_CONFIG}
+    )
+
+    assert options == {
+        "pool_size": 8,
+        "max_overflow": 2,
+        "pool_timeout": 5.0,
+        "pool_recycle": 1800,
+        "pool_pre_ping": True,
+    }
+
+
+def test_engine_options_leave_sqlite_alone():
+    assert engine_options({"SQLALCHEMY_DATABASE_URI": "sqlite://", **POOL_CONFIG}) == {}
+
+
+def test_pool_size_defaults_to_gunicorn_threads(monkeypatch):
+    monkeypatch.delenv("DB_POOL_SIZE", raising=False)
+    monkeypatch.setenv("GUNICORN_THREADS", "6")
+
+    app = create_app({"SQLALCHEMY_DATABASE_URI": "sqlite://", "REDIS_URL": None})
+
+    assert app.config["DB_POOL_SIZE"] == 6
+
+
+def test_file_sqlite_uses_wal(tmp_path):
+    app = create_app(
+        {
+            "SQLALCHEMY_DATABASE_URI": f"sqlite:///{tmp_path / 'players.db'}",
+            "REDIS_URL": None,
+        }
+    )
+
+    with app.app_context():
+        mode = db.session.execute(text("PRAGMA journal_mode")).scalar()
+        db.session.remove()
+        db.engine.dispose()
+
+    assert mode == "wal"
+
+
+def test_dispose_engines_drops_inherited_connections(tmp_path):
+    app = create_app(
+        {
+            "SQLALCHEMY_DATABASE_URI": f"sqlite:///{tmp_path / 'players.db'}",
+            "REDIS_URL": None,
+        }
+    )
+    with app.app_context():
+        db.session.execute(text("SELECT 1"))
+        db.session.remove()
+        pool = db.engine.pool
+        assert pool.checkedin() == 1
+
+    dispose_engines(app)
+
+    with app.app_context():
+        assert db.engine.pool is not pool
+        assert db.engine.pool.checkedin() == 0
+
+
+def test_gunicorn_config_reads_environment(monkeypatch):
+    monkeypatch.setenv("WEB_CONCURRENCY", "3")
+    monkeypatch.setenv("GUNICORN_THREADS", "8")
+    monkeypatch.setenv("PORT", "8080")
+
+    settings = runpy.run_path(str(ROOT / "gunicorn.conf.py"))
+
+    assert settings["workers"] == 3
+    assert settings["threads"] == 8
+    assert settings["worker_class"] == "gthread"
+    assert settings["bind"] == "0.0.0.0:8080"
+    assert settings["preload_app"] is True
+    assert callable(settings["post_fork"])
+    assert callable(settings["worker_exit"])
@@ -0,0 +1,322 @@
+"""Tests pour le partitionnement des joueurs entre plusieurs bases."""
+
+import io
+import json
+from datetime import datetime
+
+import pytest
+from sqlalchemy import create_engine, func, insert, select, update
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.schema import CreateTable
+
+from src.extensions import db
+from src.main import create_app
+from src.models import Player, PlayerArchive, PlayerStats, XpEventReceipt
+from src.sharding import (
+    SLOT_COUNT,
+    ReshardError,
+    reshard,
+    slot_for_player,
+    slot_for_user,
+    slot_owners,
+)
+
+AUTH_HEADERS = {"Authorization": "Bearer test-token"}
+USERS = [f"user-{index}" for index in range(12)]
+
+
+@pytest.fixture
+def app_config(app_config):
+    return {**app_config, "XP_EVENTS_BACKGROUND": False, "PLAYER_CACHE_LOCAL_SIZE": 0}
+
+
+def _urls(tmp_path, prefix, count):
+    return [f"sqlite:///{tmp_path / f'{prefix}-{index}.db'}" for index in range(count)]
+
+
+def _make_app(app_config, urls):
+    app = create_app(
+        {
+            **app_config,
+            "SQLALCHEMY_DATABASE_URI": urls[0],
+            "DATABASE_SHARD_URLS": urls[1:],
+        }
+    )
+    for engine in app.extensions["shards"].engines:
+        db.metadata.create_all(engine)
+    with app.app_context():
+        app.extensions["leaderboard"].rebuild()
+    return app
+
+
+@pytest.fixture
+def sharded_app(app_config, tmp_path):
+    app = _make_app(app_config, _urls(tmp_path, "shard", 3))
+    yield app
+    app.extensions["shards"].dispose()
+
+
+def _create_players(client, users=USERS):
+    ids = {}
+    for user_id in users:
+        response = client.post(
+            "/players",
+            json={"name": user_id.title()},
+            headers={**AUTH_HEADERS, "X-User-Id": user_id},
+        )
+        assert response.status_code == 201, response.get_json()
+        ids[user_id] = response.get_json()["data"]["id"]
+    return ids
+
+
+def _player_ids_on(engine):
+    with engine.connect() as connection:
+        return set(connection.scalars(select(Player.id)))
+
+
+def test_slots_are_stable_and_spread_over_shards():
+    assert slot_for_user("user-1") == slot_for_user("user-1")
+    assert 0 <= slot_for_user("user-1") < SLOT_COUNT
+    assert slot_for_player(5 * SLOT_COUNT + 17) == 17
+
+    owners = slot_owners(3)
+    assert owners == sorted(owners)
+    assert set(owners) == {0, 1, 2}
+    assert slot_owners(1) == [0] * SLOT_COUNT
+
+
+def test_players_are_created_on_their_shard(sharded_app):
+    client = sharded_app.test_client()
+    shards = sharded_app.extensions["shards"]
+    ids = _create_players(client)
+
+    for user_id, player_id in ids.items():
+        assert slot_for_player(player_id) == slot_for_user(user_id)
+        assert player_id in _player_ids_on(shards.engine_for_player(player_id))
+    assert sum(len(_player_ids_on(engine)) for engine in shards.engines) == len(USERS)
+    assert len({shards.shard_for_user(user_id) for user_id in USERS}) > 1
+
+    user_id, player_id = next(iter(ids.items()))
+    response = client.get(f"/players/{player_id}", headers=AUTH_HEADERS)
+    assert response.get_json()["data"]["user_id"] == user_id
+
+    renamed = client.put(
+        f"/players/{player_id}",
+        json={"name": "Renamed"},
+        headers={**AUTH_HEADERS, "X-User-Id": user_id},
+    )
+    assert renamed.get_json()["data"]["name"] == "Renamed"
+
+    duplicate = client.post(
+        "/players",
+        json={"name": "Again"},
+        headers={**AUTH_HEADERS, "X-User-Id": user_id},
+    )
+    assert duplicate.status_code == 409
+
+
+def test_player_ids_outgrow_32_bits(sharded_app):
+    # A deleted player holds an id past 2**31 on every shard.
+    high_id = 2**31 + SLOT_COUNT
+    for engine in sharded_app.extensions["shards"].engines:
+        with engine.begin() as connection:
+            connection.execute(
+                insert(PlayerArchive.__table__).values(
+                    id=high_id,
+                    user_id="deleted",
+                    name="Deleted",
+                    level=1,
+                    xp=0,
+                    version=1,
+                    last_seen_at=func.current_timestamp(),
+                    archived_at=func.current_timestamp(),
+                    deleted_at=func.current_timestamp(),
+                )
+            )
+
+    client = sharded_app.test_client()
+    ids = _create_players(client, USERS[:3])
+    for user_id, player_id in ids.items():
+        assert player_id > high_id
+        assert slot_for_player(player_id) == slot_for_user(user_id)
+        response = client.get(f"/players/{player_id}", headers=AUTH_HEADERS)
+        assert response.get_json()["data"]["user_id"] == user_id
+
+    for model, column in (
+        (Player, "id BIGSERIAL"),
+        (PlayerStats, "player_id BIGINT"),
+        (XpEventReceipt, "player_id BIGINT"),
+        (PlayerArchive, "id BIGINT"),
+    ):
+        ddl = CreateTable(model.__table__).compile(dialect=postgresql.dialect())
+        assert column in str(ddl)
+
+
+def test_batch_get_and_listing_merge_all_shards(sharded_app):
+    client = sharded_app.test_client()
+    ids = sorted(_create_players(client).values())
+
+    batch = client.post(
+        "/players:batchGet", json={"ids": ids + [3]}, headers=AUTH_HEADERS
+    ).get_json()
+    assert [player["id"] for player in batch["data"]] == ids
+    assert batch["meta"]["missing_ids"] == [3]
+
+    listed, cursor = [], None
+    while True:
+        query = "?limit=5" + (f"&cursor={cursor}" if cursor else "")
+        page = client.get(f"/players{query}", headers=AUTH_HEADERS).get_json()
+        listed.extend(player["id"] for player in page["data"])
+        cursor = page["meta"]["next_cursor"]
+        if cursor is None:
+            break
+    assert listed == ids
+
+    export = client.get(
+        "/players", headers={**AUTH_HEADERS, "Accept": "application/x-ndjson"}
+    )
+    assert [json.loads(line)["id"] for line in export.text.splitlines()] == ids
+
+
+def test_experience_is_applied_on_every_shard(sharded_app):
+    client = sharded_app.test_client()
+    shards = sharded_app.extensions["shards"]
+    ids = sorted(_create_players(client).values())
+
+    response = client.post(
+        "/players/xp:batch",
+        json={"awards": [{"player_id": pid, "amount": 100} for pid in ids]},
+        headers=AUTH_HEADERS,
+    )
+    assert response.status_code == 200
+    assert len(response.get_json()["data"]) == len(ids)
+
+    events = [{"event_id": f"evt-{pid}", "player_id": pid, "amount": 5} for pid in ids]
+    response = client.post(
+        "/players/xp:events", json={"events": events}, headers=AUTH_HEADERS
+    )
+    assert response.status_code == 202
+    assert sharded_app.extensions["xp_flusher"].flush() == len(ids)
+
+    for pid in ids:
+        with shards.engine_for_player(pid).connect() as connection:
+            version = select(Player.version).where(Player.id == pid)
+            assert connection.scalar(version) == 3
+            assert (
+                connection.scalar(
+                    select(XpEventReceipt.event_id).where(
+                        XpEventReceipt.player_id == pid
+                    )
+                )
+                == f"evt-{pid}"
+            )
+
+    leaderboard = client.get("/leaderboard", headers=AUTH_HEADERS).get_json()
+    assert leaderboard["meta"]["total"] == len(ids)
+
+
+def test_receipts_are_pruned_on_every_shard(sharded_app):
+    client = sharded_app.test_client()
+    shards = sharded_app.extensions["shards"]
+    ids = sorted(_create_players(client).values())
+    events = [{"event_id": f"evt-{pid}", "player_id": pid, "amount": 5} for pid in ids]
+    client.post("/players/xp:events", json={"events": events}, headers=AUTH_HEADERS)
+    flusher = sharded_app.extensions["xp_flusher"]
+    assert flusher.flush() == len(ids)
+
+    def receipt_counts():
+        counts = []
+        for engine in shards.engines:
+            with engine.connect() as connection:
+                counts.append(
+                    connection.scalar(
+                        select(func.count()).select_from(XpEventReceipt.__table__)
+                    )
+                )
+        return counts
+
+    assert all(receipt_counts())
+    for engine in shards.engines:
+        with engine.begin() as connection:
+            connection.execute(
+                update(XpEventReceipt.__table__).values(applied_at=datetime(2000, 1, 1))
+            )
+
+    flusher._last_prune = 0.0
+    flusher._prune()
+    assert receipt_counts() == [0] * len(shards.engines)
+
+
+def test_reshard_renumbers_legacy_players(app_config, tmp_path):
+    source = create_app(
+        {**app_config, "SQLALCHEMY_DATABASE_URI": _urls(tmp_path, "old", 1)[0]}
+    )
+    with source.app_context():
+        db.create_all()
+        for user_id in USERS:
+            db.session.add(Player(user_id=user_id, name=user_id, stats=PlayerStats()))
+        db.session.commit()
+        source_engine = db.engine
+
+        targets = [create_engine(url) for url in _urls(tmp_path, "new", 3)]
+        with pytest.raises(ReshardError):
+            reshard([source_engine], targets)
+
+        id_map = io.StringIO()
+        report = reshard(
+            [source_engine], targets, renumber_legacy_ids=True, id_map=id_map
+        )
+        for engine in targets:
+            engine.dispose()
+
+    mapping = dict(line.split(",") for line in id_map.getvalue().splitlines())
+    assert sum(report.players_per_shard) == len(USERS)
+    assert report.renumbered == len(mapping) > 0
+
+    app = _make_app(app_config, _urls(tmp_path, "new", 3))
+    client = app.test_client()
+    for old_id, new_id in mapping.items():
+        data = client.get(f"/players/{new_id}", headers=AUTH_HEADERS).get_json()["data"]
+        assert data["name"] == USERS[int(old_id) - 1]
+        assert data["stats"] is not None
+    app.extensions["shards"].dispose()
+
+
+def test_reshard_command_keeps_sharded_ids(sharded_app, app_config, tmp_path):
+    ids = _create_players(sharded_app.test_client())
+    urls = _urls(tmp_path, "split", 2)
+
+    result = sharded_app.test_cli_runner().invoke(
+        args=["shards", "reshard", "--batch-size", "5"]
+        + [arg for url in urls for arg in ("--target", url)]
+    )
+    assert result.exit_code == 0, result.output
+    assert f"{len(USERS)} joueurs copiés" in result.output
+
+    app = _make_app(app_config, urls)
+    client = app.test_client()
+    for user_id, player_id in ids.items():
+        data = client.get(f"/players/{player_id}", headers=AUTH_HEADERS).get_json()
+        assert data["data"]["user_id"] == user_id
+    with app.app_context():
+        assert db.session.scalar(select(func.count()).select_from(Player)) < len(USERS)
+    app.extensions["shards"].dispose()
+
+    again = sharded_app.test_cli_runner().invoke(
+        args=["shards", "reshard", "--target", urls[0]]
+    )
+    assert again.exit_code != 0
+    assert "not empty" in again.output
+
+
+@pytest.mark.parametrize(
+    "overrides",
+    [
+        {"SQLALCHEMY_DATABASE_URI": "mysql://umbra@localhost/players"},
+        {"DATABASE_SHARD_URLS": ["sqlite://", "mssql://umbra@localhost/shard"]},
+        {"DATABASE_REPLICA_URLS": ["oracle://umbra@localhost/replica"]},
+    ],
+)
+def test_unsupported_database_dialects_are_rejected_at_startup(app_config, overrides):
+    with pytest.raises(ValueError, match="Unsupported database dialect"):
+        create_app({**app_config, **overrides})
@@ -0,0 +1,110 @@
+"""Tests pour la négociation MessagePack et la compression des réponses."""
+
+import gzip
+import json
+
+import brotli
+import msgpack
+import pytest
+
+from src.wire import Compressor
+
+AUTH_HEADERS = {"Authorization": "Bearer test-token"}
+MSGPACK = {**AUTH_HEADERS, "Accept": "application/msgpack"}
+
+
+@pytest.fixture
+def players(client):
+    ids = []
+    for index in range(30):
+        response = client.post(
+            "/players",
+            json={"name": f"Player {index}"},
+            headers={**AUTH_HEADERS, "X-User-Id": f"user-{index}"},
+        )
+        ids.append(response.get_json()["data"]["id"])
+    return ids
+
+
+def test_msgpack_is_negotiated_with_accept(client, players):
+    as_json = client.get("/players", headers=AUTH_HEADERS)
+    as_msgpack = client.get("/players", headers=MSGPACK)
+
+    assert as_json.mimetype == "application/json"
+    assert as_msgpack.mimetype == "application/msgpack"
+    assert "Accept" in as_msgpack.vary
+    assert msgpack.unpackb(as_msgpack.data) == as_json.get_json()
+    assert len(as_msgpack.data) < len(as_json.data) * 0.8
+
+    either = {**AUTH_HEADERS, "Accept": "application/json, application/msgpack"}
+    assert client.get("/players", headers=either).mimetype == "application/json"
+    legacy = {**AUTH_HEADERS, "Accept": "application/x-msgpack"}
+    assert client.get("/players", headers=legacy).mimetype == "application/msgpack"
+
+    denied = client.get("/players", headers={"Accept": "application/msgpack"})
+    assert denied.status_code == 401
+    assert msgpack.unpackb(denied.data)["error"]["code"] == "auth_invalid"
+
+
+def test_idempotent_replay_follows_the_replayed_request(client):
+    headers = {**AUTH_HEADERS, "X-User-Id": "user-1", "Idempotency-Key": "k1"}
+    first = client.post(
+        "/players", json={"name": "Alice"}, headers={**headers, **MSGPACK}
+    )
+    replayed = client.post("/players", json={"name": "Alice"}, headers=headers)
+
+    assert first.status_code == replayed.status_code == 201
+    assert replayed.headers["Idempotent-Replayed"] == "true"
+    assert replayed.get_json() == msgpack.unpackb(first.data)
+
+
+@pytest.mark.parametrize("coding", ["gzip", "br"])
+def test_large_responses_are_compressed(client, players, coding):
+    headers = {**AUTH_HEADERS, "Accept-Encoding": f"{coding}, identity"}
+    response = client.get("/players", headers=headers)
+
+    assert response.headers["Content-Encoding"] == coding
+    assert "Accept-Encoding" in response.vary
+    decompress = gzip.decompress if coding == "gzip" else brotli.decompress
+    body = decompress(response.data)
+    assert len(json.loads(body)["data"]) == len(players)
+    assert int(response.headers["Content-Length"]) == len(response.data)
+
+
+def test_small_responses_stay_uncompressed(client, players):
+    headers = {**AUTH_HEADERS, "Accept-Encoding": "gzip, br"}
+    for path in ("/health", f"/players/{players[0]}"):
+        response = client.get(path, headers=headers)
+        assert "Content-Encoding" not in response.headers, path
+    assert (
+        "Content-Encoding" not in client.get("/players", headers=AUTH_HEADERS).headers
+    )
+
+
+def test_streamed_responses_are_compressed_incrementally(client, players):
+    response = client.get(
+        "/players",
+        headers={
+            **AUTH_HEADERS,
+            "Accept": "application/x-ndjson",
+            "Accept-Encoding": "gzip",
+        },
+    )
+    assert response.headers["Content-Encoding"] == "gzip"
+    assert "Content-Length" not in response.headers
+    lines = gzip.decompress(response.data).decode().splitlines()
+    assert [json.loads(line)["id"] for line in lines] == players
+
+    compressor = Compressor()
+    chunks = list(compressor.compress_stream([b"a" * 100_000, b"b" * 10], "br"))
+    assert len(chunks) >= 1
+    assert brotli.decompress(b"".join(chunks)) == b"a" * 100_000 + b"b" * 10
+
+
+def test_event_streams_are_not_compressed(client, app):
+    app.config["CHANGE_FEED_MAX_DURATION"] = 0
+    response = client.get(
+        "/players/changes?ids=1", headers={**AUTH_HEADERS, "Accept-Encoding": "gzip"}
+    )
+    assert response.mimetype == "text/event-stream"
+    assert "Content-Encoding" not in response.headers
@@ -0,0 +1,220 @@
+"""Tests pour l'ingestion différée des événements d'expérience."""
+
+import time
+
+import pytest
+
+from src import xp_events
+from src.extensions import db
+from src.main import create_app
+from src.models import Player, PlayerStats, XpEventReceipt
+from src.xp_events import RedisXpBuffer, XpEvent
+
+AUTH_HEADERS = {"Authorization": "Bearer test-token"}
+
+
+@pytest.fixture
+def app_config(app_config):
+    return {**app_config, "XP_EVENTS_BACKGROUND": False}
+
+
+def _create_player(user_id="user-1"):
+    player = Player(user_id=user_id, name="Grinder", stats=PlayerStats())
+    db.session.add(player)
+    db.session.commit()
+    return player.id
+
+
+def _post_events(client, *events):
+    return client.post(
+        "/players/xp:events",
+        json={
+            "events": [
+                {"event_id": event_id, "player_id": player_id, "amount": amount}
+                for event_id, player_id, amount in events
+            ]
+        },
+        headers=AUTH_HEADERS,
+    )
+
+
+def _player_state(app, player_id):
+    with app.app_context():
+        player = db.session.get(Player, player_id)
+        return player.level, player.xp, player.version
+
+
+def test_events_are_buffered_then_coalesced(client, app):
+    with app.app_context():
+        player_id = _create_player()
+
+    response = _post_events(
+        client, ("e1", player_id, 60), ("e2", player_id, 60), ("e3", player_id, 30)
+    )
+
+    assert response.status_code == 202
+    assert response.get_json()["data"] == {"accepted": 3}
+    assert _player_state(app, player_id) == (1, 0, 1)
+
+    assert app.extensions["xp_flusher"].flush() == 3
+    assert _player_state(app, player_id) == (2, 50, 2)
+
+
+def test_redelivered_events_are_applied_once(client, app):
+    with app.app_context():
+        player_id = _create_player()
+    flusher = app.extensions["xp_flusher"]
+
+    _post_events(client, ("e1", player_id, 40), ("e1", player_id, 40))
+    flusher.flush()
+    _post_events(client, ("e1", player_id, 40), ("e2", player_id, 5))
+
+    assert flusher.flush() == 1
+    assert _player_state(app, player_id)[:2] == (1, 45)
+    with app.app_context():
+        assert db.session.query(XpEventReceipt).count() == 2
+
+
+def test_flushed_events_refresh_player_reads(client, app):
+    with app.app_context():
+        player_id = _create_player()
+    client.get(f"/players/{player_id}", headers=AUTH_HEADERS)
+
+    _post_events(client, ("e1", player_id, 150))
+    app.extensions["xp_flusher"].flush()
+
+    data = client.get(f"/players/{player_id}", headers=AUTH_HEADERS).get_json()["data"]
+    assert (data["level"], data["xp"]) == (2, 50)
+
+
+def test_failed_flush_keeps_events_for_retry(client, app, monkeypatch):
+    with app.app_context():
+        player_id = _create_player()
+    flusher = app.extensions["xp_flusher"]
+    _post_events(client, ("e1", player_id, 10))
+
+    def _fail(*args, **kwargs):
+        raise RuntimeError("database down")
+
+    monkeypatch.setattr(xp_events, "apply_experience_awards", _fail)
+    with pytest.raises(RuntimeError):
+        flusher.flush()
+    monkeypatch.undo()
+
+    assert len(flusher.buffer) == 1
+    assert flusher.flush() == 1
+    assert _player_state(app, player_id)[:2] == (1, 10)
+
+
+def test_events_for_unknown_players_are_dropped(client, app):
+    response = _post_events(client, ("e1", 999, 10))
+
+    assert response.status_code == 202
+    assert app.extensions["xp_flusher"].flush() == 0
+    assert len(app.extensions["xp_flusher"].buffer) == 0
+    with app.app_context():
+        assert XpEventReceipt.query.count() == 0
+
+
+@pytest.mark.parametrize(
+    "events",
+    [
+        [],
+        [{"event_id": "", "player_id": 1, "amount": 1}],
+        [{"event_id": "e" * 65, "player_id": 1, "amount": 1}],
+        [{"event_id": "e1", "player_id": 0, "amount": 1}],
+        [{"event_id": "e1", "player_id": 1, "amount": -1}],
+        [{"event_id": "e1", "player_id": True, "amount": 1}],
+    ],
+)
+def test_invalid_events_are_rejected(client, events):
+    response = client.post(
+        "/players/xp:events", json={"events": events}, headers=AUTH_HEADERS
+    )
+
+    assert response.status_code == 400
+    assert response.get_json()["error"]["code"] == "invalid_payload"
+
+
+def test_full_buffer_applies_backpressure(app_config):
+    app = create_app({**app_config, "XP_EVENTS_BUFFER_SIZE": 3})
+    client = app.test_client()
+
+    rejected = _post_events(client, ("a", 1, 1), ("b", 1, 1), ("c", 1, 1), ("d", 1, 1))
+    accepted = _post_events(client, ("a", 1, 1), ("b", 1, 1))
+
+    assert rejected.status_code == 503
+    assert rejected.headers["Retry-After"] == "1"
+    assert rejected.get_json()["error"]["code"] == "xp_buffer_full"
+    assert accepted.status_code == 202
+    assert len(app.extensions["xp_flusher"].buffer) == 2
+
+
+def test_stop_flushes_remaining_events(client, app):
+    with app.app_context():
+        player_id = _create_player()
+    _post_events(client, ("e1", player_id, 100))
+
+    app.extensions["xp_flusher"].stop()
+
+    assert _player_state(app, player_id)[:2] == (2, 0)
+
+
+def test_background_flusher_applies_events(app_config, tmp_path):
+    app = create_app(
+        {
+            **app_config,
+            "SQLALCHEMY_DATABASE_URI": f"sqlite:///{tmp_path / 'xp.db'}",
+            "XP_EVENTS_BACKGROUND": True,
+            "XP_EVENTS_FLUSH_INTERVAL": 0.05,
+        }
+    )
+    with app.app_context():
+        db.create_all()
+        player_id = _create_player()
+
+    _post_events(app.test_client(), ("e1", player_id, 100))
+    deadline = time.monotonic() + 5
+    while _player_state(app, player_id)[0] == 1 and time.monotonic() < deadline:
+        time.sleep(0.02)
+    app.extensions["xp_flusher"].stop(timeout=5)
+
+    assert _player_state(app, player_id)[:2] == (2, 0)
+
+
+@pytest.fixture
+def redis_app(app_config, fake_redis):
+    app = create_app({**app_config, "REDIS_CLIENT": fake_redis})
+    with app.app_context():
+        db.create_all()
+    yield app
+    with app.app_context():
+        db.drop_all()
+
+
+def test_redis_stream_buffer_round_trip(redis_app, fake_redis):
+    with redis_app.app_context():
+        player_id = _create_player()
+    flusher = redis_app.extensions["xp_flusher"]
+    assert isinstance(flusher.buffer, RedisXpBuffer)
+
+    _post_events(redis_app.test_client(), ("e1", player_id, 70), ("e2", player_id, 70))
+    assert fake_redis.xlen("xp:events") == 2
+
+    assert flusher.flush() == 2
+    assert fake_redis.xlen("xp:events") == 0
+    assert _player_state(redis_app, player_id)[:2] == (2, 40)
+
+
+def test_redis_stream_redelivers_unacknowledged_events(fake_redis):
+    crashed = RedisXpBuffer(fake_redis, consumer="worker-1", claim_after=0)
+    survivor = RedisXpBuffer(fake_redis, consumer="worker-2", claim_after=0)
+    crashed.offer([XpEvent("e1", 1, 5), XpEvent("e2", 2, 5)])
+
+    assert len(crashed.take(10).events) == 2
+
+    batch = survivor.take(10)
+    assert [event.event_id for event in batch.events] == ["e1", "e2"]
+    survivor.ack(batch)
+    assert survivor.take(10).events == []
+    assert len(survivor) == 0